@@ -23,8 +23,11 @@ def analyze():
 @click.option("--account", "-a", help="账号名称")
 @click.option("--days", "-d", default=7, type=int, help="分析天数")
 @click.option("--no-cache", is_flag=True, help="强制刷新缓存")
+@click.option("--all-accounts", is_flag=True, help="并行扫描所有已配置账号")
+@click.option("--workers", default=16, type=int, help="多账号扫描的工作线程数")
+@click.option("--resume", "resume_run", help="从检查点续跑指定的多账号扫描 run_id")
 @handle_exceptions
-def analyze_idle(account, days, no_cache):
+def analyze_idle(account, days, no_cache, all_accounts, workers, resume_run):
     """检测闲置资源 - 基于监控指标分析"""
     from cloudlens.core.services.analysis_service import AnalysisService
     from cloudlens.core.rules_manager import RulesManager
@@ -33,6 +36,25 @@ def analyze_idle(account, days, no_cache):
     cm = ConfigManager()
     ctx_mgr = ContextManager()
 
+    if all_accounts or resume_run:
+        account_names = [acc.name for acc in cm.list_accounts()]
+        console.print(f"[cyan]🔍 并行扫描 {len(account_names)} 个账号最近 {days} 天的闲置资源...[/cyan]")
+        with Progress() as progress:
+            task = progress.add_task("[cyan]正在分析资源...", total=None)
+            idle_instances, stats = AnalysisService.analyze_idle_resources_multi(
+                account_names,
+                days,
+                max_workers=workers,
+                run_id=resume_run,
+                progress_callback=lambda done, total: progress.update(task, completed=done, total=total),
+                on_start=lambda run_id: progress.console.print(
+                    f"[dim]run_id: {run_id}（中断后可使用 --resume {run_id} 续跑）[/dim]"
+                ),
+            )
+        display_idle_results(idle_instances)
+        display_scan_stats(stats)
+        return
+
     if not account:
         account = ctx_mgr.get_last_account()
         if not account:
@@ -66,6 +88,26 @@ def analyze_idle(account, days, no_cache):
         console.print(f"[red]分析失败: {str(e)}[/red]")
 
 
+def display_scan_stats(stats):
+    """展示多账号扫描吞吐统计"""
+    table = Table(title=f"扫描统计 (run_id: {stats['run_id']})", box=box.SIMPLE)
+    table.add_column("账号", style="cyan")
+    table.add_column("任务数", justify="right")
+    table.add_column("失败", justify="right", style="red")
+    table.add_column("API调用/秒", justify="right")
+
+    for name, acc in sorted(stats["accounts"].items()):
+        table.add_row(name, str(acc["tasks"]), str(acc["failed"]), f"{acc['api_calls_per_second']:.2f}")
+
+    console.print(table)
+    console.print(
+        f"[dim]耗时 {stats['elapsed_seconds']:.1f}s（配额理论下限 {stats.get('quota_bound_seconds', 0):.1f}s），"
+        f"任务窃取 {stats['steals']} 次[/dim]"
+    )
+    if stats.get("errors"):
+        console.print(f"[yellow]⚠️  {len(stats['errors'])} 个任务失败，可使用 --resume {stats['run_id']} 重试[/yellow]")
+
+
 def display_idle_results(idle_instances):
     """展示闲置资源结果"""
 
@@ -189,6 +231,7 @@ def analyze_renewal(account, days):
 @handle_exceptions
 def analyze_forecast(account, days, export):
     """AI成本预测 - 基于历史数据预测未来成本"""
+    from cloudlens.core.cost_index import bill_account_id
     from cloudlens.core.cost_predictor import CostPredictor
     from rich.table import Table
     from rich.panel import Panel
@@ -209,13 +252,12 @@ def analyze_forecast(account, days, export):
         console.print(f"[red]❌ 账号 '{account}' 不存在[/red]")
         return
 
-    predictor = CostPredictor()
+    predictor = CostPredictor(account_id=bill_account_id(account_config))
     result = predictor.train_and_predict(days)
 
     if "error" in result:
         console.print(f"[red]预测失败: {result['error']}[/red]")
-        if "scikit-learn" in result['error']:
-             console.print("[yellow]提示: 请运行 'pip install scikit-learn numpy' 安装必要的依赖库[/yellow]")
+        console.print("[yellow]提示: 请先运行账单同步，预测基于账单中的日成本数据[/yellow]")
         return
 
     # 展示预测结果
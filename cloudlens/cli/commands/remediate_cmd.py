@@ -23,8 +23,10 @@ def remediate():
 @click.option("--env", default="production", help="环境标签(默认:production)")
 @click.option("--owner", default="cloudlens", help="所有者标签(默认:cloudlens)")
 @click.option("--confirm", is_flag=True, help="确认执行(不加此标志为干运行)")
+@click.option("--workers", default=4, type=int, help="并发执行的批次数(默认:4)")
+@click.option("--resume", "resume_run", help="从检查点续跑指定的修复 run_id")
 @handle_exceptions
-def remediate_tags(account, env, owner, confirm):
+def remediate_tags(account, env, owner, confirm, workers, resume_run):
     """为无标签资源自动打标签"""
     from cloudlens.core.remediation_engine import RemediationEngine
     from cloudlens.providers.aliyun.provider import AliyunProvider
@@ -81,6 +83,8 @@ def remediate_tags(account, env, owner, confirm):
         default_tags=default_tags,
         dry_run=dry_run,
         provider=provider,
+        max_workers=workers,
+        run_id=resume_run,
     )
 
     # 显示结果
@@ -111,7 +115,8 @@ def remediate_tags(account, env, owner, confirm):
     else:
         console.print(Panel.fit(
             f"[bold green]成功:[/bold green] {result['success']}\n"
-            f"[bold red]失败:[/bold red] {result.get('failed', 0)}",
+            f"[bold red]失败:[/bold red] {result.get('failed', 0)}\n"
+            f"[bold cyan]API调用:[/bold cyan] {result.get('api_calls', 0)}",
             title="执行结果"
         ))
 
@@ -119,6 +124,7 @@ def remediate_tags(account, env, owner, confirm):
             console.print("\n[red]失败的资源:[/red]")
             for item in result["failed_details"]:
                 console.print(f"  • {item['resource_id']}: {item['error']}")
+            console.print(f"[yellow]可使用 --resume {result['run_id']} 重试失败的资源[/yellow]")
 
 
 @remediate.command("security")
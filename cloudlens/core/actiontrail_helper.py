@@ -1,19 +1,60 @@
 """
 ActionTrail Helper
 用于查询实例操作历史
+
+所有查询都由本地事件索引（ActionTrailEventIndex）回答：每个 (账号, 区域) 批量、增量拉取一次
+ActionTrail 写事件，不再逐个资源调用 LookupEvents。add_stop_times 供 Web 请求使用，
+只读已有索引并把同步放到后台。
 """
 
-import json
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterable
+
+from cloudlens.core.actiontrail_index import TIME_FORMAT, ActionTrailEventIndex
 
 logger = logging.getLogger("ActionTrailHelper")
 
+# 停机事件（批量接口为复数，单实例接口为单数）
+STOP_EVENTS = ["StopInstances", "StopInstance"]
+
+# 常见的配置变更事件
+CONFIG_CHANGE_EVENTS = [
+    "ModifyInstanceAttribute",
+    "ModifySecurityGroupAttribute",
+    "ModifyDBInstanceAttribute",
+    "ModifyLoadBalancerInstanceSpec",
+    "ModifyVpcAttribute",
+    "ModifyInstanceSpec",
+]
+
 
 class ActionTrailHelper:
     """操作审计辅助类"""
 
+    @staticmethod
+    def _synced_index(provider, lookback_days: int) -> Optional[ActionTrailEventIndex]:
+        """获取并同步 provider 对应的事件索引，同步失败时返回 None"""
+        index = ActionTrailEventIndex.for_provider(provider)
+        try:
+            index.sync(provider, lookback_days)
+        except ImportError:
+            logger.warning("ActionTrail SDK not installed")
+            return None
+        except Exception as e:
+            logger.error(f"同步 ActionTrail 事件索引失败 ({provider.region}): {e}")
+            # 已有索引数据仍可回答查询
+            if index.cursor is None:
+                return None
+        return index
+
+    @staticmethod
+    def _format_time(event: Dict) -> Optional[str]:
+        event_time = event.get("eventTime")
+        if not event_time:
+            return None
+        return datetime.strptime(event_time, TIME_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+
     @staticmethod
     def get_instance_stop_time(
         provider, instance_id: str, raw_data: dict = None, lookback_days: int = 90
@@ -30,45 +71,78 @@ class ActionTrailHelper:
         Returns:
             停机时间字符串，格式 YYYY-MM-DD HH:MM:SS，如果找不到返回 None
         """
-        try:
-            from aliyunsdkactiontrail.request.v20200706 import LookupEventsRequest
-
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=lookback_days)
-
-            request = LookupEventsRequest.LookupEventsRequest()
-            request.set_StartTime(start_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_EndTime(end_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_MaxResults("50")
-
-            # 使用正确的 API 参数格式
-            request.add_query_param("LookupAttribute.1.Key", "ResourceName")
-            request.add_query_param("LookupAttribute.1.Value", instance_id)
-            request.add_query_param("LookupAttribute.2.Key", "EventName")
-            request.add_query_param("LookupAttribute.2.Value", "StopInstances")  # 注意是复数！
-
-            # 调用 API - 使用 provider 的 _get_client() 方法
-            client = provider._get_client()
-            response = client.do_action_with_exception(request)
-            result = json.loads(response)
-
-            # 查找最近的 StopInstance 事件
-            events = result.get("Events", [])
-            if events and len(events) > 0:
-                event_time = events[0].get("eventTime")
-                if event_time:
-                    dt = datetime.strptime(event_time, "%Y-%m-%dT%H:%M:%SZ")
-                    logger.info(f"Found stop time from ActionTrail for {instance_id}: {event_time}")
-                    return dt.strftime("%Y-%m-%d %H:%M:%S")
+        return ActionTrailHelper.get_instance_stop_times(provider, [instance_id], lookback_days)[instance_id]
 
-        except ImportError:
-            logger.warning("ActionTrail SDK not installed")
-        except Exception as e:
-            logger.debug(f"ActionTrail query failed for {instance_id}: {e}")
+    @staticmethod
+    def get_instance_stop_times(
+        provider, instance_ids: Iterable[str], lookback_days: int = 90
+    ) -> Dict[str, Optional[str]]:
+        """
+        批量查询实例的停机时间（一次同步，全部从索引回答）
 
-        # 如果 ActionTrail 没有数据，返回 None
-        logger.warning(f"No stop time found in ActionTrail for {instance_id} (may be >90 days ago)")
-        return None
+        Args:
+            provider: AliyunProvider 实例
+            instance_ids: 实例 ID 列表
+            lookback_days: ActionTrail 回溯天数
+
+        Returns:
+            {实例 ID: 停机时间字符串或 None}
+        """
+        instance_ids = list(instance_ids)
+        index = ActionTrailHelper._synced_index(provider, lookback_days)
+        if index is None:
+            return {instance_id: None for instance_id in instance_ids}
+        return ActionTrailHelper._stop_times_from_index(index, instance_ids, lookback_days)
+
+    @staticmethod
+    def _stop_times_from_index(
+        index: ActionTrailEventIndex, instance_ids: List[str], lookback_days: int
+    ) -> Dict[str, Optional[str]]:
+        since = datetime.utcnow() - timedelta(days=lookback_days)
+        stop_times: Dict[str, Optional[str]] = {}
+        for instance_id in instance_ids:
+            events = index.events_for(instance_id, STOP_EVENTS, since=since)
+            stop_times[instance_id] = ActionTrailHelper._format_time(events[0]) if events else None
+            if stop_times[instance_id] is None:
+                logger.debug(f"No stop time found in ActionTrail for {instance_id} (may be >{lookback_days} days ago)")
+        return stop_times
+
+    @staticmethod
+    def add_stop_times(
+        stopped: List[Dict], provider_for_region: Callable[[str], Any], lookback_days: int = 90
+    ) -> List[Dict]:
+        """
+        给停止实例列表补充停机时间（stopped_time）：按区域分组读已有索引
+
+        不在调用线程同步：每个区域提交一次后台同步（失败退避期内不再提交），
+        索引尚未覆盖时 stopped_time 为 None，后续请求读到同步后的结果。
+
+        Args:
+            stopped: 停止实例列表（含 id、region）
+            provider_for_region: 区域 -> AliyunProvider
+            lookback_days: ActionTrail 回溯天数
+
+        Returns:
+            原列表（就地补充 stopped_time，查不到时为 None）
+        """
+        by_region: Dict[str, List[Dict]] = {}
+        for item in stopped:
+            if item.get("id") and item.get("region"):
+                by_region.setdefault(item["region"], []).append(item)
+        for region, items in by_region.items():
+            try:
+                provider = provider_for_region(region)
+                index = ActionTrailEventIndex.for_provider(provider)
+                index.sync_in_background(provider, lookback_days)
+                stop_times = ActionTrailHelper._stop_times_from_index(
+                    index, [item["id"] for item in items], lookback_days
+                )
+            except Exception as e:
+                logger.warning(f"查询停机时间失败 ({region}): {e}")
+                continue
+            for item in items:
+                item["stopped_time"] = stop_times.get(item["id"])
+        return stopped
 
     @staticmethod
     def get_resource_operation_history(
@@ -79,7 +153,7 @@ class ActionTrailHelper:
         event_names: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
-        查询资源的操作历史记录
+        查询资源的操作历史记录（写操作）
         
         Args:
             provider: AliyunProvider 实例
@@ -89,61 +163,25 @@ class ActionTrailHelper:
             event_names: 事件名称列表（如 ["StopInstances", "StartInstances"]），如果为 None 则查询所有事件
             
         Returns:
-            操作历史记录列表，每个记录包含 eventTime, eventName, userIdentity 等信息
+            操作历史记录列表（按时间倒序），每个记录包含 eventTime, eventName, userIdentity 等信息
         """
-        try:
-            from aliyunsdkactiontrail.request.v20200706 import LookupEventsRequest
-
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=lookback_days)
-
-            request = LookupEventsRequest.LookupEventsRequest()
-            request.set_StartTime(start_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_EndTime(end_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_MaxResults("100")  # 增加返回数量
-
-            # 按资源名称查询
-            request.add_query_param("LookupAttribute.1.Key", "ResourceName")
-            request.add_query_param("LookupAttribute.1.Value", resource_id)
-
-            # 如果指定了事件名称，添加过滤条件
-            if event_names:
-                for idx, event_name in enumerate(event_names[:5], start=2):  # 最多支持 5 个事件名称
-                    request.add_query_param(f"LookupAttribute.{idx}.Key", "EventName")
-                    request.add_query_param(f"LookupAttribute.{idx}.Value", event_name)
-
-            client = provider._get_client()
-            response = client.do_action_with_exception(request)
-            result = json.loads(response)
-
-            events = result.get("Events", [])
-            operation_history = []
-            
-            for event in events:
-                event_time = event.get("eventTime", "")
-                event_name = event.get("eventName", "")
-                user_identity = event.get("userIdentity", {})
-                source_ip = event.get("sourceIPAddress", "")
-                user_agent = event.get("userAgent", "")
-                
-                operation_history.append({
-                    "event_time": event_time,
-                    "event_name": event_name,
-                    "user_identity": user_identity,
-                    "source_ip": source_ip,
-                    "user_agent": user_agent,
-                    "raw_event": event  # 保留原始事件数据
-                })
-            
-            return operation_history
-
-        except ImportError:
-            logger.warning("ActionTrail SDK not installed")
-            return []
-        except Exception as e:
-            logger.error(f"查询资源 {resource_id} 的操作历史失败: {e}")
+        index = ActionTrailHelper._synced_index(provider, lookback_days)
+        if index is None:
             return []
 
+        since = datetime.utcnow() - timedelta(days=lookback_days)
+        return [
+            {
+                "event_time": event.get("eventTime", ""),
+                "event_name": event.get("eventName", ""),
+                "user_identity": event.get("userIdentity", {}),
+                "source_ip": event.get("sourceIPAddress", ""),
+                "user_agent": event.get("userAgent", ""),
+                "raw_event": event  # 保留原始事件数据
+            }
+            for event in index.events_for(resource_id, event_names, since=since)
+        ]
+
     @staticmethod
     def get_recent_config_changes(
         provider,
@@ -159,55 +197,20 @@ class ActionTrailHelper:
             lookback_days: 回溯天数，默认 7 天
             
         Returns:
-            配置变更记录列表
+            配置变更记录列表（按时间倒序）
         """
-        # 常见的配置变更事件
-        config_change_events = [
-            "ModifyInstanceAttribute",
-            "ModifySecurityGroupAttribute",
-            "ModifyDBInstanceAttribute",
-            "ModifyLoadBalancerInstanceSpec",
-            "ModifyVpcAttribute",
-            "ModifyInstanceSpec",
-        ]
-        
-        try:
-            from aliyunsdkactiontrail.request.v20200706 import LookupEventsRequest
-
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=lookback_days)
-
-            request = LookupEventsRequest.LookupEventsRequest()
-            request.set_StartTime(start_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_EndTime(end_time.strftime("%Y-%m-%dT%H:%M:%SZ"))
-            request.set_MaxResults("100")
-
-            # 按事件名称查询配置变更事件
-            for idx, event_name in enumerate(config_change_events[:5], start=1):
-                request.add_query_param(f"LookupAttribute.{idx}.Key", "EventName")
-                request.add_query_param(f"LookupAttribute.{idx}.Value", event_name)
-
-            client = provider._get_client()
-            response = client.do_action_with_exception(request)
-            result = json.loads(response)
-
-            events = result.get("Events", [])
-            changes = []
-            
-            for event in events:
-                changes.append({
-                    "event_time": event.get("eventTime", ""),
-                    "event_name": event.get("eventName", ""),
-                    "resource_name": event.get("resourceName", ""),
-                    "user_identity": event.get("userIdentity", {}),
-                    "source_ip": event.get("sourceIPAddress", ""),
-                })
-            
-            return changes
-
-        except ImportError:
-            logger.warning("ActionTrail SDK not installed")
-            return []
-        except Exception as e:
-            logger.error(f"查询配置变更历史失败: {e}")
+        index = ActionTrailHelper._synced_index(provider, lookback_days)
+        if index is None:
             return []
+
+        since = datetime.utcnow() - timedelta(days=lookback_days)
+        return [
+            {
+                "event_time": event.get("eventTime", ""),
+                "event_name": event.get("eventName", ""),
+                "resource_name": event.get("resourceName", ""),
+                "user_identity": event.get("userIdentity", {}),
+                "source_ip": event.get("sourceIPAddress", ""),
+            }
+            for event in index.events_named(CONFIG_CHANGE_EVENTS, since=since)
+        ]
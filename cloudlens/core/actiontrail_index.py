@@ -0,0 +1,392 @@
+"""
+ActionTrail 本地事件索引
+
+按 (账号, 区域) 批量拉取 ActionTrail 写事件，保存到本地并按资源、事件名建索引，
+停机时间、操作历史、配置变更查询都从索引回答，不再逐个资源调用 LookupEvents：
+- 首次同步拉取回溯窗口内的全部写事件，之后从上次游标增量拉取（带少量重叠，按事件 ID 去重）
+- 查询窗口早于已覆盖范围时，只补拉缺的那一段
+- 同一进程内短时间重复查询不会重复同步（min_refresh_interval），同步失败后在
+  failure_backoff 内不再重试，避免每次请求都重新发起全量拉取
+- Web 请求通过 sync_in_background 在后台线程同步，请求本身只读已有索引
+- 事件追加写入 JSONL，游标和覆盖范围写入同名 .meta.json，超过保留期的事件在加载时清理
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cloudlens.providers.aliyun.paginator import paginate
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# ActionTrail 事件查询只保留 90 天
+RETENTION_DAYS = 90
+# 事件投递有延迟，增量同步时从游标往前重叠一段
+SYNC_OVERLAP = timedelta(minutes=10)
+
+_RESOURCE_SPLIT = re.compile(r"[;,\s]+")
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _event_resources(event: Dict) -> List[str]:
+    """事件涉及的资源 ID（批量操作的 resourceName 可能包含多个 ID）"""
+    names = event.get("resourceName") or ""
+    return [name for name in _RESOURCE_SPLIT.split(names) if name]
+
+
+class ActionTrailEventIndex:
+    """
+    单个 (账号, 区域) 的 ActionTrail 事件索引
+
+    内存索引: resource_id -> event_name -> [事件]（按时间倒序），
+    另按事件名保留一份全局列表，用于跨资源的配置变更查询。
+    """
+
+    _shared: Dict[Tuple[str, str], "ActionTrailEventIndex"] = {}
+    _shared_lock = threading.Lock()
+    # 后台同步线程池（延迟创建，各索引共用）
+    _sync_executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(
+        self,
+        account: str,
+        region: str,
+        state_dir: Optional[str] = None,
+        min_refresh_interval: float = 300,
+        page_size: int = 50,
+        failure_backoff: float = 600,
+    ):
+        """
+        Args:
+            account: 账号名
+            region: 区域
+            state_dir: 索引目录，默认 ~/.cloudlens/actiontrail
+            min_refresh_interval: 两次增量同步的最小间隔（秒）
+            page_size: LookupEvents 每页条数（接口上限 50）
+            failure_backoff: 同步失败后暂停重试的时长（秒）
+        """
+        base = Path(state_dir) if state_dir else Path.home() / ".cloudlens" / "actiontrail"
+        base.mkdir(parents=True, exist_ok=True)
+        safe_account = re.sub(r"[^\w.-]", "_", account or "default")
+        self.account = account
+        self.region = region
+        self.path = base / f"{safe_account}_{region}.jsonl"
+        self.meta_path = base / f"{safe_account}_{region}.meta.json"
+        self.min_refresh_interval = min_refresh_interval
+        self.page_size = page_size
+        self.failure_backoff = failure_backoff
+
+        self._lock = threading.RLock()
+        # 串行化同步（拉取期间不持有 _lock）
+        self._sync_lock = threading.Lock()
+        self._by_resource: Dict[str, Dict[str, List[Dict]]] = defaultdict(lambda: defaultdict(list))
+        self._by_name: Dict[str, List[Dict]] = defaultdict(list)
+        self._seen: set = set()
+        self.covered_from: Optional[datetime] = None
+        self.cursor: Optional[datetime] = None
+        self._last_sync = 0.0
+        # 最近一次同步失败的原因和时间（monotonic），成功后清空
+        self.last_error: Optional[str] = None
+        self._failed_at: Optional[float] = None
+        self._sync_future: Optional[Future] = None
+        self.api_calls = 0
+        self._load()
+
+    @classmethod
+    def for_provider(cls, provider) -> "ActionTrailEventIndex":
+        """获取 provider 对应 (账号, 区域) 的共享索引"""
+        key = (getattr(provider, "account_name", "") or "", provider.region)
+        with cls._shared_lock:
+            index = cls._shared.get(key)
+            if index is None:
+                index = cls._shared[key] = cls(*key)
+            return index
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """清空共享索引（测试或切换配置时使用）"""
+        with cls._shared_lock:
+            cls._shared.clear()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        if self.meta_path.exists():
+            try:
+                meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+                self.covered_from = _parse_time(meta.get("covered_from"))
+                self.cursor = _parse_time(meta.get("cursor"))
+            except ValueError:
+                logger.warning(f"ActionTrail 索引元数据损坏，将重新同步: {self.meta_path}")
+        if self.covered_from is None or self.cursor is None or not self.path.exists():
+            self.covered_from = self.cursor = None
+            return
+
+        expire = (datetime.utcnow() - timedelta(days=RETENTION_DAYS)).strftime(TIME_FORMAT)
+        expired = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能写了一半
+                    continue
+                if (event.get("eventTime") or "") < expire:
+                    expired += 1
+                    continue
+                self._add(event)
+        self._sort()
+
+        if expired:
+            self._compact()
+            if self.covered_from < datetime.utcnow() - timedelta(days=RETENTION_DAYS):
+                self.covered_from = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+                self._save_meta()
+
+    def _compact(self) -> None:
+        """重写事件文件，去掉过期事件"""
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for event in self._iter_events():
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        tmp.replace(self.path)
+
+    def _save_meta(self) -> None:
+        meta = {
+            "account": self.account,
+            "region": self.region,
+            "covered_from": self.covered_from.strftime(TIME_FORMAT) if self.covered_from else None,
+            "cursor": self.cursor.strftime(TIME_FORMAT) if self.cursor else None,
+        }
+        tmp = self.meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.meta_path)
+
+    # ------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------
+
+    def _event_key(self, event: Dict) -> str:
+        return event.get("eventId") or "|".join(
+            str(event.get(k, "")) for k in ("eventTime", "eventName", "resourceName", "requestId")
+        )
+
+    def _add(self, event: Dict) -> bool:
+        key = self._event_key(event)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        name = event.get("eventName", "")
+        for resource_id in _event_resources(event):
+            self._by_resource[resource_id][name].append(event)
+        self._by_name[name].append(event)
+        return True
+
+    def _sort(self) -> None:
+        def newest_first(events: List[Dict]) -> None:
+            events.sort(key=lambda e: e.get("eventTime", ""), reverse=True)
+
+        for by_name in self._by_resource.values():
+            for events in by_name.values():
+                newest_first(events)
+        for events in self._by_name.values():
+            newest_first(events)
+
+    def _iter_events(self) -> Iterable[Dict]:
+        for events in self._by_name.values():
+            yield from events
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    # ------------------------------------------------------------------
+    # 同步
+    # ------------------------------------------------------------------
+
+    def _lookup(self, provider, start: datetime, end: datetime) -> List[Dict]:
+        """批量拉取时间窗口内的全部写事件"""
+        from aliyunsdkactiontrail.request.v20200706 import LookupEventsRequest
+
+        def make_request():
+            request = LookupEventsRequest.LookupEventsRequest()
+            request.set_StartTime(start.strftime(TIME_FORMAT))
+            request.set_EndTime(end.strftime(TIME_FORMAT))
+            # 只索引写事件：停机、配置变更都是写操作，读事件量大且无用
+            request.add_query_param("LookupAttribute.1.Key", "EventRW")
+            request.add_query_param("LookupAttribute.1.Value", "Write")
+            return request
+
+        def fetch(request) -> Dict:
+            self.api_calls += 1
+            return json.loads(provider._get_client().do_action_with_exception(request))
+
+        return list(paginate(fetch, make_request, "Events", page_size=self.page_size, use_token=True))
+
+    def _ingest(self, events: List[Dict]) -> int:
+        added = [event for event in events if self._add(event)]
+        if added:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for event in added:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._sort()
+        return len(added)
+
+    def sync(self, provider, lookback_days: int = RETENTION_DAYS, force: bool = False) -> int:
+        """
+        确保索引覆盖最近 lookback_days 天并增量拉取新事件
+
+        Args:
+            provider: AliyunProvider 实例（用于 LookupEvents）
+            lookback_days: 需要覆盖的回溯天数（最多 90 天）
+            force: 忽略 min_refresh_interval 和 failure_backoff 强制同步
+
+        Returns:
+            新增事件数（失败退避期内跳过同步时为 0）
+        """
+        with self._sync_lock:
+            if not force and self.backing_off():
+                return 0
+            try:
+                added = self._sync(provider, lookback_days, force)
+            except Exception as e:
+                self.last_error = str(e)
+                self._failed_at = time.monotonic()
+                raise
+            self.last_error = self._failed_at = None
+            return added
+
+    def backing_off(self) -> bool:
+        """是否处于同步失败后的退避期"""
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.failure_backoff
+
+    def sync_in_background(self, provider, lookback_days: int = RETENTION_DAYS) -> bool:
+        """
+        在后台线程同步索引，立即返回（同一索引同时只有一个后台同步）
+
+        Returns:
+            是否提交了新的后台同步
+        """
+        with self._lock:
+            if self.backing_off() or (self._sync_future is not None and not self._sync_future.done()):
+                return False
+            cls = type(self)
+            with cls._shared_lock:
+                if cls._sync_executor is None:
+                    cls._sync_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="actiontrail-sync")
+            self._sync_future = cls._sync_executor.submit(self._sync_quietly, provider, lookback_days)
+            return True
+
+    def _sync_quietly(self, provider, lookback_days: int) -> None:
+        try:
+            self.sync(provider, lookback_days)
+        except ImportError:
+            logger.warning("ActionTrail SDK not installed")
+        except Exception as e:
+            logger.error(f"后台同步 ActionTrail 事件索引失败 ({self.region}): {e}")
+
+    def _sync(self, provider, lookback_days: int, force: bool) -> int:
+        # 调用方持有 _sync_lock；LookupEvents 在 _lock 之外执行，同步期间查询不被阻塞
+        now = datetime.utcnow().replace(microsecond=0)
+        want_from = now - timedelta(days=min(lookback_days, RETENTION_DAYS))
+        added = 0
+
+        if self.covered_from is None or self.cursor is None:
+            events = self._lookup(provider, want_from, now)
+            with self._lock:
+                added += self._ingest(events)
+                self.covered_from, self.cursor = want_from, now
+                self._last_sync = time.monotonic()
+                self._save_meta()
+            return added
+
+        if want_from < self.covered_from:
+            # 回溯窗口比已覆盖范围更长：只补拉缺的一段
+            events = self._lookup(provider, want_from, self.covered_from)
+            with self._lock:
+                added += self._ingest(events)
+                self.covered_from = want_from
+                self._save_meta()
+
+        if force or time.monotonic() - self._last_sync >= self.min_refresh_interval:
+            events = self._lookup(provider, self.cursor - SYNC_OVERLAP, now)
+            with self._lock:
+                added += self._ingest(events)
+                self.cursor = now
+                self._last_sync = time.monotonic()
+                self._save_meta()
+        return added
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def events_for(
+        self,
+        resource_id: str,
+        event_names: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """资源的事件（按时间倒序），可按事件名和起始时间过滤"""
+        with self._lock:
+            by_name = self._by_resource.get(resource_id)
+            if not by_name:
+                return []
+            if event_names is None:
+                groups = list(by_name.values())
+            else:
+                groups = [by_name[name] for name in event_names if name in by_name]
+        return self._merge(groups, since)
+
+    def events_named(self, event_names: Iterable[str], since: Optional[datetime] = None) -> List[Dict]:
+        """指定事件名的全部事件（按时间倒序）"""
+        with self._lock:
+            groups = [self._by_name[name] for name in event_names if name in self._by_name]
+        return self._merge(groups, since)
+
+    def latest(self, resource_id: str, event_names: Iterable[str]) -> Optional[Dict]:
+        """资源最近一次指定事件"""
+        events = self.events_for(resource_id, event_names)
+        return events[0] if events else None
+
+    @staticmethod
+    def _merge(groups: List[List[Dict]], since: Optional[datetime]) -> List[Dict]:
+        bound = since.strftime(TIME_FORMAT) if since else ""
+        merged: List[Dict] = []
+        for events in groups:
+            for event in events:
+                if event.get("eventTime", "") < bound:
+                    break
+                merged.append(event)
+        if len(groups) > 1:
+            merged.sort(key=lambda e: e.get("eventTime", ""), reverse=True)
+        return merged
+
+    def stats(self) -> Dict[str, Any]:
+        """索引概况"""
+        with self._lock:
+            return {
+                "account": self.account,
+                "region": self.region,
+                "events": len(self._seen),
+                "resources": len(self._by_resource),
+                "covered_from": self.covered_from.strftime(TIME_FORMAT) if self.covered_from else None,
+                "cursor": self.cursor.strftime(TIME_FORMAT) if self.cursor else None,
+                "api_calls": self.api_calls,
+                "last_error": self.last_error,
+            }
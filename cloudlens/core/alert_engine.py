@@ -11,6 +11,7 @@ from cloudlens.core.alert_manager import (
     AlertStorage, AlertRule, Alert, AlertCondition, AlertType, AlertSeverity, AlertStatus
 )
 from cloudlens.core.bill_storage import BillStorageManager
+from cloudlens.core.alert_planner import MetricPlanner, RuleEvaluationPlanner, rule_metric_key
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +51,7 @@ class AlertEvaluator:
             return None
         
         # 获取当前指标值
-        metric_value = self._get_metric_value(rule.metric, account_id, rule.tag_filter, rule.service_filter)
+        metric_value = self._get_metric_value(rule, account_id or rule.account_id)
         if metric_value is None:
             return None
         
@@ -85,130 +86,17 @@ class AlertEvaluator:
         # TODO: 实现安全合规检查逻辑
         return None
     
-    def _get_metric_value(
-        self,
-        metric: str,
-        account_id: Optional[str],
-        tag_filter: Optional[str],
-        service_filter: Optional[str]
-    ) -> Optional[float]:
-        """获取指标值"""
+    def _get_metric_value(self, rule: AlertRule, account_id: Optional[str]) -> Optional[float]:
+        """获取指标值（service_filter 限定产品；设置了 tag_filter 的规则不评估）"""
+        key = rule_metric_key(rule, account_id, datetime.now())
+        if key is None:
+            return None
         try:
-            if metric == "total_cost":
-                return self._get_total_cost(account_id, tag_filter, service_filter)
-            elif metric == "daily_cost":
-                return self._get_daily_cost(account_id, tag_filter, service_filter)
-            elif metric == "monthly_cost":
-                return self._get_monthly_cost(account_id, tag_filter, service_filter)
-            elif metric.startswith("cost_"):
-                # 支持 cost_ecs, cost_rds 等
-                service = metric.replace("cost_", "")
-                return self._get_service_cost(account_id, service, tag_filter)
-            else:
-                logger.warning(f"Unknown metric: {metric}")
-                return None
+            return MetricPlanner(self.bill_storage.db).compute([key])[key]
         except Exception as e:
             logger.error(f"Failed to get metric value: {e}")
             return None
     
-    def _get_total_cost(
-        self,
-        account_id: Optional[str],
-        tag_filter: Optional[str],
-        service_filter: Optional[str]
-    ) -> float:
-        """获取总成本"""
-        # 使用BillStorageManager的数据库抽象层
-        query = "SELECT SUM(pretax_amount) FROM bill_items WHERE 1=1"
-        params = []
-        
-        if account_id:
-            query += " AND account_id = ?"
-            params.append(account_id)
-        
-        # TODO: 应用tag_filter和service_filter
-        
-        rows = self.bill_storage.db.query(query, tuple(params) if params else None)
-        if rows and len(rows) > 0:
-            row = rows[0]
-            value = row[0] if isinstance(row, (list, tuple)) else list(row.values())[0]
-            return float(value) if value else 0.0
-        return 0.0
-    
-    def _get_daily_cost(
-        self,
-        account_id: Optional[str],
-        tag_filter: Optional[str],
-        service_filter: Optional[str]
-    ) -> float:
-        """获取今日成本"""
-        # 使用BillStorageManager的数据库抽象层
-        today = datetime.now().strftime('%Y-%m-%d')
-        query = "SELECT SUM(pretax_amount) FROM bill_items WHERE billing_date = ?"
-        params = [today]
-        
-        if account_id:
-            query += " AND account_id = ?"
-            params.append(account_id)
-        
-        rows = self.bill_storage.db.query(query, tuple(params))
-        if rows and len(rows) > 0:
-            row = rows[0]
-            value = row[0] if isinstance(row, (list, tuple)) else list(row.values())[0]
-            return float(value) if value else 0.0
-        return 0.0
-    
-    def _get_monthly_cost(
-        self,
-        account_id: Optional[str],
-        tag_filter: Optional[str],
-        service_filter: Optional[str]
-    ) -> float:
-        """获取本月成本"""
-        # 使用BillStorageManager的数据库抽象层
-        now = datetime.now()
-        month_start = now.replace(day=1).strftime('%Y-%m-%d')
-        month_end = now.strftime('%Y-%m-%d')
-        
-        query = """
-            SELECT SUM(pretax_amount) FROM bill_items
-            WHERE billing_date >= ? AND billing_date <= ?
-        """
-        params = [month_start, month_end]
-        
-        if account_id:
-            query += " AND account_id = ?"
-            params.append(account_id)
-        
-        rows = self.bill_storage.db.query(query, tuple(params))
-        if rows and len(rows) > 0:
-            row = rows[0]
-            value = row[0] if isinstance(row, (list, tuple)) else list(row.values())[0]
-            return float(value) if value else 0.0
-        return 0.0
-    
-    def _get_service_cost(
-        self,
-        account_id: Optional[str],
-        service: str,
-        tag_filter: Optional[str]
-    ) -> float:
-        """获取服务成本"""
-        # 使用BillStorageManager的数据库抽象层
-        query = "SELECT SUM(pretax_amount) FROM bill_items WHERE product_code = ?"
-        params = [service]
-        
-        if account_id:
-            query += " AND account_id = ?"
-            params.append(account_id)
-        
-        rows = self.bill_storage.db.query(query, tuple(params))
-        if rows and len(rows) > 0:
-            row = rows[0]
-            value = row[0] if isinstance(row, (list, tuple)) else list(row.values())[0]
-            return float(value) if value else 0.0
-        return 0.0
-    
     def _check_condition(self, value: float, condition: str, threshold: float) -> bool:
         """检查条件是否满足"""
         if condition == AlertCondition.GT.value:
@@ -288,26 +176,58 @@ class AlertEngine:
     def __init__(self, alert_storage: AlertStorage, bill_storage: BillStorageManager):
         self.alert_storage = alert_storage
         self.evaluator = AlertEvaluator(alert_storage, bill_storage)
+        self.planner = RuleEvaluationPlanner(alert_storage, bill_storage)
     
     def check_all_rules(self, account_id: Optional[str] = None) -> List[Alert]:
-        """检查所有启用的告警规则"""
+        """检查所有启用的告警规则（成本阈值规则批量评估，共享指标计算）"""
         rules = self.alert_storage.list_rules(account_id=account_id, enabled_only=True)
         triggered_alerts = []
         
+        try:
+            triggered = self.planner.evaluate(rules, account_id)
+        except Exception as e:
+            logger.error(f"Failed to evaluate cost threshold rules: {e}")
+            triggered = []
+        
+        candidates = [
+            self.evaluator._create_alert(
+                rule=rule,
+                title=f"成本阈值告警: {rule.name}",
+                message=f"{rule.metric} = {metric_value:.2f}，超过阈值 {rule.threshold}",
+                metric_value=metric_value,
+                threshold=rule.threshold,
+                account_id=account_id
+            )
+            for rule, metric_value in triggered
+        ]
+        
+        # 其他类型的规则逐条评估
         for rule in rules:
+            if rule.type == AlertType.COST_THRESHOLD.value:
+                continue
             try:
                 alert = self.evaluator.evaluate_rule(rule, account_id)
                 if alert:
-                    # 保存告警
-                    alert_id = self.alert_storage.create_alert(alert)
-                    alert.id = alert_id
-                    triggered_alerts.append(alert)
-                    logger.info(f"Alert triggered: {alert.title} (Rule: {rule.name})")
+                    candidates.append(alert)
             except Exception as e:
                 logger.error(f"Failed to evaluate rule {rule.id}: {e}")
         
+        for alert in candidates:
+            try:
+                # 保存告警
+                alert.id = self.alert_storage.create_alert(alert)
+                triggered_alerts.append(alert)
+                logger.info(f"Alert triggered: {alert.title} (Rule: {alert.rule_name})")
+            except Exception as e:
+                logger.error(f"Failed to save alert for rule {alert.rule_id}: {e}")
+        
         return triggered_alerts
     
+    @property
+    def last_cycle_stats(self) -> Optional[Dict[str, Any]]:
+        """最近一轮批量评估的统计（规则数、指标数、查询数、各阶段耗时）"""
+        return self.planner.last_cycle
+    
     def check_rule(self, rule_id: str, account_id: Optional[str] = None) -> Optional[Alert]:
         """检查单个告警规则"""
         rule = self.alert_storage.get_rule(rule_id)
@@ -444,6 +444,35 @@ class AlertStorage:
         
         return [self._row_to_alert(row) for row in rows]
     
+    def last_triggered_times(
+        self,
+        rule_ids: List[str],
+        account_id: Optional[str] = None
+    ) -> Dict[str, datetime]:
+        """批量获取规则最近一次触发时间（用于冷却期判断）"""
+        if not rule_ids:
+            return {}
+        placeholder = self._get_placeholder()
+        query = f"""
+            SELECT rule_id, MAX(triggered_at) AS last_triggered FROM alerts
+            WHERE rule_id IN ({', '.join([placeholder] * len(rule_ids))})
+        """
+        params = list(rule_ids)
+
+        if account_id:
+            query += f" AND account_id = {placeholder}"
+            params.append(account_id)
+
+        query += " GROUP BY rule_id"
+
+        result = {}
+        for row in self._get_db().query(query, tuple(params)) or []:
+            rule_id, value = (row['rule_id'], row['last_triggered']) if isinstance(row, dict) else (row[0], row[1])
+            if not value:
+                continue
+            result[rule_id] = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+        return result
+    
     def update_alert_status(
         self,
         alert_id: str,
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+告警规则批量评估
+
+把一轮检查中的所有成本阈值规则按 (指标, 账号, 时间窗口) 归并，
+每个不同的指标只计算一次：不限时间的指标（total_cost、cost_<服务>）共用一次
+按 (账号, 产品) 分组的查询，按日期的指标（daily_cost、monthly_cost）共用一次
+按 (账号, 账单日期) 分组的查询。冷却期由一次按规则分组的查询取得，
+条件判断和冷却判断用 NumPy 对全部规则一次完成，每轮记录各阶段耗时。
+
+规则的 service_filter 把指标限定到指定产品（与 cost_<服务> 取交集）；
+账单明细没有可靠的标签维度，设置了 tag_filter 的规则不参与评估并记录警告。
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from cloudlens.core.alert_manager import AlertCondition, AlertRule, AlertStorage, AlertType
+
+logger = logging.getLogger(__name__)
+
+# 条件 -> 编码，用于向量化判断
+_CONDITION_CODES = {c.value: i for i, c in enumerate(AlertCondition)}
+
+
+class MetricKey(NamedTuple):
+    """一个待计算的指标：指标名、账号（None 表示全部账号）、日期窗口（None 表示不限）和限定的产品"""
+
+    metric: str
+    account_id: Optional[str]
+    start: Optional[str] = None
+    end: Optional[str] = None
+    services: Optional[Tuple[str, ...]] = None
+
+    @property
+    def service(self) -> Optional[str]:
+        if self.metric.startswith("cost_"):
+            return self.metric[len("cost_"):]
+        return None
+
+    @property
+    def products(self) -> Optional[FrozenSet[str]]:
+        """统计的产品：cost_<服务> 与 service_filter 的交集，None 表示不限"""
+        products = frozenset(self.services) if self.services is not None else None
+        if self.service is not None:
+            products = frozenset([self.service]) & products if products is not None else frozenset([self.service])
+        return products
+
+
+def _date_str(value) -> str:
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+def parse_service_filter(service_filter: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    解析规则的 service_filter（JSON 列表 ["ecs", "rds"] 或 {"services": [...]}）
+
+    Returns:
+        排序后的产品代码，未设置时返回 None
+
+    Raises:
+        ValueError: 格式无法识别
+    """
+    if not service_filter:
+        return None
+    value = json.loads(service_filter)
+    if isinstance(value, dict):
+        value = value.get("services")
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"无法识别的 service_filter: {service_filter}")
+    return tuple(sorted(set(value))) or None
+
+
+def metric_key(
+    metric: str, account_id: Optional[str], now: datetime, services: Optional[Tuple[str, ...]] = None
+) -> Optional[MetricKey]:
+    """规则指标对应的 MetricKey，未知指标返回 None"""
+    today = now.strftime("%Y-%m-%d")
+    if metric == "daily_cost":
+        return MetricKey(metric, account_id, today, today, services)
+    if metric == "monthly_cost":
+        return MetricKey(metric, account_id, now.replace(day=1).strftime("%Y-%m-%d"), today, services)
+    if metric == "total_cost" or (metric.startswith("cost_") and len(metric) > len("cost_")):
+        return MetricKey(metric, account_id, services=services)
+    return None
+
+
+def rule_metric_key(
+    rule: AlertRule, account_id: Optional[str], now: datetime
+) -> Optional[MetricKey]:
+    """规则（含过滤条件）对应的 MetricKey；未知指标、tag_filter 或无效 service_filter 返回 None"""
+    if rule.tag_filter:
+        logger.warning(f"告警规则 {rule.id} 设置了 tag_filter，账单明细不支持按标签统计，跳过评估")
+        return None
+    try:
+        services = parse_service_filter(rule.service_filter)
+    except ValueError as e:
+        logger.warning(f"告警规则 {rule.id} 的 service_filter 无效，跳过评估: {e}")
+        return None
+    key = metric_key(rule.metric, account_id, now, services)
+    if key is None:
+        logger.warning(f"Unknown metric: {rule.metric}")
+    return key
+
+
+class MetricPlanner:
+    """
+    成本指标批量计算
+
+    用法:
+        planner = MetricPlanner(db)
+        values = planner.compute([MetricKey("daily_cost", "acc", "2024-03-11", "2024-03-11")])
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = 0
+
+    def _query(self, sql: str, params: Tuple, columns: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        self.queries += 1
+        rows = []
+        for row in self.db.query(sql, params) or []:
+            rows.append(row if isinstance(row, dict) else dict(zip(columns, row)))
+        return rows
+
+    @staticmethod
+    def _account_filter(keys: Iterable[MetricKey]) -> Tuple[str, Tuple]:
+        """任一指标统计全部账号时不加账号条件，否则限定到涉及的账号"""
+        accounts = set()
+        for key in keys:
+            if key.account_id is None:
+                return "", ()
+            accounts.add(key.account_id)
+        accounts = sorted(accounts)
+        return f" AND account_id IN ({', '.join(['%s'] * len(accounts))})", tuple(accounts)
+
+    def compute(self, keys: Iterable[MetricKey]) -> Dict[MetricKey, float]:
+        """计算一组指标，无账单数据的指标为 0.0"""
+        keys = set(keys)
+        values: Dict[MetricKey, float] = {}
+        unbounded = [k for k in keys if k.start is None]
+        dated = [k for k in keys if k.start is not None]
+
+        if unbounded:
+            # (账号, 产品) -> 金额
+            totals: Dict[Tuple[Optional[str], str], float] = {}
+            where, params = self._account_filter(unbounded)
+            if all(k.products is not None for k in unbounded):
+                services = sorted(set().union(*(k.products for k in unbounded)))
+                where += f" AND product_code IN ({', '.join(['%s'] * len(services))})" if services else " AND 1 = 0"
+                params += tuple(services)
+            for row in self._query(
+                f"""
+                SELECT account_id, product_code, SUM(pretax_amount) AS total
+                FROM bill_items
+                WHERE pretax_amount IS NOT NULL{where}
+                GROUP BY account_id, product_code
+                """,
+                params,
+                ("account_id", "product_code", "total"),
+            ):
+                totals[(row["account_id"], row["product_code"] or "")] = float(row["total"] or 0)
+            for key in unbounded:
+                values[key] = sum(
+                    amount
+                    for (account, product), amount in totals.items()
+                    if (key.account_id is None or account == key.account_id)
+                    and (key.products is None or product in key.products)
+                )
+
+        if dated:
+            # (账号, 账单日期, 产品) -> 金额；没有规则限定产品时不按产品分组
+            daily: Dict[Tuple[Optional[str], str, str], float] = {}
+            where, params = self._account_filter(dated)
+            start = min(k.start for k in dated)
+            end = max(k.end for k in dated)
+            by_product = any(k.products is not None for k in dated)
+            product = ", product_code" if by_product else ""
+            for row in self._query(
+                f"""
+                SELECT account_id, billing_date{product}, SUM(pretax_amount) AS total
+                FROM bill_items
+                WHERE billing_date >= %s AND billing_date <= %s
+                  AND pretax_amount IS NOT NULL{where}
+                GROUP BY account_id, billing_date{product}
+                """,
+                (start, end) + params,
+                ("account_id", "billing_date", "product_code", "total") if by_product
+                else ("account_id", "billing_date", "total"),
+            ):
+                cell = (row["account_id"], _date_str(row["billing_date"]), row.get("product_code") or "")
+                daily[cell] = daily.get(cell, 0.0) + float(row["total"] or 0)
+            for key in dated:
+                values[key] = sum(
+                    amount
+                    for (account, day, code), amount in daily.items()
+                    if (key.account_id is None or account == key.account_id)
+                    and key.start <= day <= key.end
+                    and (key.products is None or code in key.products)
+                )
+
+        return values
+
+
+class RuleEvaluationPlanner:
+    """
+    告警规则批量评估器
+
+    用法:
+        planner = RuleEvaluationPlanner(alert_storage, bill_storage)
+        for rule, value in planner.evaluate(rules, account_id):
+            ...   # 触发的规则及其指标值
+        planner.last_cycle   # 本轮统计：规则数、指标数、查询数、各阶段耗时（毫秒）
+    """
+
+    HISTORY_SIZE = 60
+
+    def __init__(self, alert_storage: AlertStorage, bill_storage):
+        self.alert_storage = alert_storage
+        self.bill_storage = bill_storage
+        self.last_cycle: Optional[Dict[str, Any]] = None
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=self.HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def evaluate(
+        self,
+        rules: List[AlertRule],
+        account_id: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Tuple[AlertRule, float]]:
+        """
+        评估一组规则，返回触发的 (规则, 指标值)
+
+        只处理启用的成本阈值规则；规则本身绑定账号时按该账号计算指标，
+        与触发告警归属的账号一致。
+        """
+        now = now or datetime.now()
+        started = time.perf_counter()
+        metrics = MetricPlanner(self.bill_storage.db)
+        stats: Dict[str, Any] = {"started_at": now.isoformat(), "rules": len(rules)}
+
+        # 1. 规划：筛选可评估的规则并归并指标
+        planned: List[Tuple[AlertRule, MetricKey]] = []
+        for rule in rules:
+            if not rule.enabled or rule.type != AlertType.COST_THRESHOLD.value:
+                continue
+            if not rule.threshold or not rule.metric:
+                continue
+            key = rule_metric_key(rule, account_id or rule.account_id, now)
+            if key is None:
+                continue
+            planned.append((rule, key))
+        stats["plan_ms"] = (time.perf_counter() - started) * 1000
+
+        # 2. 冷却期：一次查询取得所有规则最近的触发时间
+        phase = time.perf_counter()
+        cooling = [r.id for r, _ in planned if r.cooldown_period > 0]
+        last_triggered = self.alert_storage.last_triggered_times(cooling, account_id) if cooling else {}
+        if planned:
+            last_ts = np.array(
+                [last_triggered[r.id].timestamp() if r.id in last_triggered else -np.inf for r, _ in planned]
+            )
+            cooldown = np.array([max(r.cooldown_period, 0) for r, _ in planned], dtype=float)
+            active = ~((cooldown > 0) & (now.timestamp() < last_ts + cooldown))
+            planned = [p for p, keep in zip(planned, active) if keep]
+        stats["cooldown_ms"] = (time.perf_counter() - phase) * 1000
+
+        # 3. 每个不同的指标只计算一次
+        phase = time.perf_counter()
+        values = metrics.compute(k for _, k in planned) if planned else {}
+        stats["metrics"] = len(values)
+        stats["metrics_ms"] = (time.perf_counter() - phase) * 1000
+
+        # 4. 向量化判断条件
+        phase = time.perf_counter()
+        triggered = []
+        if planned:
+            value = np.array([values[k] for _, k in planned], dtype=float)
+            threshold = np.array([r.threshold for r, _ in planned], dtype=float)
+            code = np.array([_CONDITION_CODES.get(r.condition, -1) for r, _ in planned])
+            for rule, _ in planned:
+                if rule.condition not in _CONDITION_CODES:
+                    logger.warning(f"Unknown condition: {rule.condition}")
+            near = np.abs(value - threshold) < 0.01  # 浮点数比较
+            outcomes = {
+                AlertCondition.GT.value: value > threshold,
+                AlertCondition.GTE.value: value >= threshold,
+                AlertCondition.LT.value: value < threshold,
+                AlertCondition.LTE.value: value <= threshold,
+                AlertCondition.EQ.value: near,
+                AlertCondition.NE.value: ~near,
+            }
+            hit = np.zeros(len(planned), dtype=bool)
+            for condition, outcome in outcomes.items():
+                hit |= (code == _CONDITION_CODES[condition]) & outcome
+            triggered = [(planned[i][0], float(value[i])) for i in np.flatnonzero(hit)]
+        stats["evaluate_ms"] = (time.perf_counter() - phase) * 1000
+
+        stats.update(
+            evaluated=len(planned),
+            triggered=len(triggered),
+            queries=metrics.queries + (1 if cooling else 0),
+            total_ms=(time.perf_counter() - started) * 1000,
+        )
+        with self._lock:
+            self.last_cycle = stats
+            self.history.append(stats)
+        return triggered
+
+    def latency_summary(self) -> Dict[str, Any]:
+        """最近若干轮的评估耗时统计"""
+        with self._lock:
+            cycles = list(self.history)
+        if not cycles:
+            return {"cycles": 0, "last": None}
+        totals = np.array([c["total_ms"] for c in cycles])
+        return {
+            "cycles": len(cycles),
+            "avg_ms": float(totals.mean()),
+            "p95_ms": float(np.percentile(totals, 95)),
+            "max_ms": float(totals.max()),
+            "last": cycles[-1],
+        }
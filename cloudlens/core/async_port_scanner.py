@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+异步端口扫描引擎
+
+用于对自有资产的公网IP做安全深度扫描：基于 asyncio 在单线程内并发探测，
+全局并发预算限制同时在途的连接数，按主机限流（并发数 + 连接间隔）避免打满单台主机，
+连接和读取都有超时；每台主机扫描完成即产出结果（流式）。
+
+端口结果按 (ip, port, banner 哈希) 缓存：重复扫描时仍需连接取 banner，
+但 banner 未变化的端点直接复用上次的版本识别、CVE 匹配和证书检查结果。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cloudlens.core.progress_manager import ProgressManager
+from cloudlens.core.security_scanner import PublicIPScanner
+
+logger = logging.getLogger(__name__)
+
+# 全局最大在途连接数
+DEFAULT_CONCURRENCY = 256
+# 单台主机最大在途连接数
+DEFAULT_PER_HOST = 4
+# 同一主机两次连接之间的最小间隔（秒）
+DEFAULT_HOST_INTERVAL = 0.02
+# banner 读取上限
+BANNER_BYTES = 1024
+# 保留结果的后台任务数
+MAX_KEPT_JOBS = 20
+
+
+@dataclass
+class PortProbe:
+    """单个端口的探测结果"""
+
+    ip: str
+    port: int
+    open: bool
+    banner: Optional[str] = None
+
+    @property
+    def banner_hash(self) -> str:
+        return hashlib.sha1((self.banner or "").encode("utf-8")).hexdigest()
+
+
+class ScanResultCache:
+    """
+    端口分析结果缓存（线程安全）
+
+    键为 (ip, port, banner 哈希)，值为该端点的版本识别、CVE 和证书信息；
+    条目超过 max_age_seconds 后视为过期（证书可能在 banner 不变时更新）。
+    指定 path 时可从 JSON 文件加载/保存，跨进程重启复用。
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_age_seconds: int = 7 * 86400):
+        self.path = Path(path) if path else None
+        self.max_age_seconds = max_age_seconds
+        self._entries: Dict[Tuple[str, int, str], Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ip: str, port: int, banner_hash: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get((ip, port, banner_hash))
+            if entry is not None and time.time() - entry["cached_at"] < self.max_age_seconds:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, ip: str, port: int, banner_hash: str, analysis: Dict) -> None:
+        with self._lock:
+            # 同一端点只保留最新 banner 的结果
+            for key in [k for k in self._entries if k[0] == ip and k[1] == port]:
+                del self._entries[key]
+            self._entries[(ip, port, banner_hash)] = dict(analysis, cached_at=time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def load(self) -> "ScanResultCache":
+        """从文件加载（文件不存在或损坏时忽略）"""
+        if not self.path or not self.path.exists():
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for item in data:
+                    self._entries[(item["ip"], int(item["port"]), item["banner_hash"])] = item["analysis"]
+        except Exception as e:
+            logger.warning(f"加载端口扫描缓存失败: {e}")
+        return self
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                data = [
+                    {"ip": ip, "port": port, "banner_hash": banner_hash, "analysis": analysis}
+                    for (ip, port, banner_hash), analysis in self._entries.items()
+                ]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"保存端口扫描缓存失败: {e}")
+
+
+class AsyncPortScanner:
+    """
+    asyncio 端口扫描器
+
+    用法:
+        scanner = AsyncPortScanner(concurrency=256)
+        async for host_result in scanner.stream(ips):
+            ...
+        # 或在同步代码中
+        results = scanner.scan(ips, on_result=callback)
+
+    每台主机的结果结构与 PublicIPScanner.scan_ip 相同，另带 cached_ports（命中缓存的端口）。
+    """
+
+    def __init__(
+        self,
+        ports: Optional[Iterable[int]] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        per_host: int = DEFAULT_PER_HOST,
+        host_interval: float = DEFAULT_HOST_INTERVAL,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 2.0,
+        check_ssl: bool = True,
+        cache: Optional[ScanResultCache] = None,
+    ):
+        """
+        Args:
+            ports: 扫描端口，默认 PublicIPScanner.COMMON_PORTS
+            concurrency: 全局并发预算（同时在途的连接数）
+            per_host: 单台主机同时在途的连接数
+            host_interval: 同一主机两次建连之间的最小间隔（秒）
+            connect_timeout / read_timeout: 建连和读取 banner 的超时（秒）
+            check_ssl: 443 开放时是否检查证书
+            cache: 结果缓存，默认仅本次扫描内有效
+        """
+        self.ports = list(ports) if ports is not None else list(PublicIPScanner.COMMON_PORTS)
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.host_interval = max(0.0, host_interval)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.check_ssl = check_ssl
+        self.cache = cache if cache is not None else ScanResultCache()
+
+    # ---- 探测 ----
+
+    async def _connect(self, ip: str, port: int) -> PortProbe:
+        """建连并读取 banner（已在并发预算内调用）"""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, port), timeout=self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return PortProbe(ip, port, False)
+
+        banner = None
+        try:
+            writer.write(PublicIPScanner.probe_message(port))
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(BANNER_BYTES), timeout=self.read_timeout)
+            banner = data.decode("utf-8", errors="ignore").strip() or None
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        return PortProbe(ip, port, True, banner)
+
+    async def _pace(self, ip: str) -> None:
+        """同一主机的建连间隔"""
+        if not self.host_interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._host_pacing.setdefault(ip, asyncio.Lock()):
+            wait = self._next_start.get(ip, 0.0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start[ip] = loop.time() + self.host_interval
+
+    async def probe(self, ip: str, port: int) -> PortProbe:
+        """在主机限流和全局预算内探测一个端口"""
+        async with self._host_slots.setdefault(ip, asyncio.Semaphore(self.per_host)):
+            await self._pace(ip)
+            async with self._budget:
+                return await self._connect(ip, port)
+
+    # ---- 分析 ----
+
+    async def _analyze(self, probe: PortProbe) -> Tuple[Dict, bool]:
+        """版本识别、CVE 匹配和证书检查；banner 未变化时直接取缓存"""
+        banner_hash = probe.banner_hash
+        cached = self.cache.get(probe.ip, probe.port, banner_hash)
+        if cached is not None:
+            return cached, True
+
+        service_info = PublicIPScanner.identify_service_version(probe.banner, probe.port)
+        analysis = {
+            "service_info": service_info,
+            "cve_findings": PublicIPScanner.match_cves(service_info, probe.port),
+            "ssl_info": None,
+        }
+        if self.check_ssl and probe.port == 443:
+            # asyncio.to_thread 需要 Python 3.9，项目仍支持 3.8
+            analysis["ssl_info"] = await asyncio.get_running_loop().run_in_executor(
+                None, PublicIPScanner.check_ssl_certificate, probe.ip
+            )
+        self.cache.put(probe.ip, probe.port, banner_hash, analysis)
+        return analysis, False
+
+    async def scan_host(self, ip: str) -> Dict:
+        """扫描一台主机的全部端口"""
+        probes = await asyncio.gather(*(self.probe(ip, port) for port in self.ports))
+
+        open_ports, high_risk_ports, cve_findings, cached_ports = [], [], [], []
+        ssl_info = None
+        for probe in sorted((p for p in probes if p.open), key=lambda p: p.port):
+            analysis, hit = await self._analyze(probe)
+            if hit:
+                cached_ports.append(probe.port)
+            open_ports.append(PublicIPScanner.port_entry(probe.port, probe.banner, analysis["service_info"]))
+            cve_findings.extend(analysis["cve_findings"])
+            if analysis.get("ssl_info"):
+                ssl_info = analysis["ssl_info"]
+            if PublicIPScanner.COMMON_PORTS.get(probe.port, {}).get("risk") in ["HIGH", "CRITICAL"]:
+                high_risk_ports.append(probe.port)
+
+        return {
+            "ip": ip,
+            "open_ports": open_ports,
+            "high_risk_ports": high_risk_ports,
+            "cve_findings": cve_findings,
+            "ssl_info": ssl_info,
+            "risk_level": PublicIPScanner.assess_risk(open_ports, high_risk_ports, cve_findings),
+            "scan_time": datetime.now().isoformat(),
+            "cached_ports": cached_ports,
+        }
+
+    async def stream(self, ips: Iterable[str]) -> AsyncIterator[Dict]:
+        """并发扫描多台主机，按完成顺序逐台产出结果"""
+        # asyncio 原语需在扫描所在的事件循环内创建
+        self._budget = asyncio.Semaphore(self.concurrency)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_pacing: Dict[str, asyncio.Lock] = {}
+        self._next_start: Dict[str, float] = {}
+
+        tasks = [asyncio.ensure_future(self.scan_host(ip)) for ip in dict.fromkeys(ips)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def scan(self, ips: Iterable[str], on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """
+        同步入口（在新事件循环中运行，不能在已运行事件循环的线程中调用）
+
+        Args:
+            ips: IP 列表（自动去重）
+            on_result: 每台主机扫描完成时的回调
+        """
+
+        async def _run() -> List[Dict]:
+            results = []
+            async for result in self.stream(ips):
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            return results
+
+        return asyncio.run(_run())
+
+
+# ==================== 后台扫描任务 ====================
+
+class DeepScanJobManager:
+    """
+    后台深度扫描任务（进程内单例）
+
+    任务ID即 ProgressManager 的 task_id；扫描过程中每完成一台主机即追加结果，
+    可通过 get_results 按偏移增量拉取。端口结果缓存在任务之间共享并落盘。
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deep-scan")
+                    instance._results: Dict[str, List[Dict]] = {}
+                    instance._results_lock = threading.Lock()
+                    instance.cache = ScanResultCache(
+                        Path.home() / ".cloudlens" / "cache" / "port_scan_cache.json"
+                    ).load()
+                    cls._instance = instance
+        return cls._instance
+
+    def submit(
+        self,
+        collect_ips: Callable[[], List[str]],
+        on_complete: Optional[Callable[[List[Dict]], None]] = None,
+        **scanner_options,
+    ) -> str:
+        """
+        提交后台扫描任务
+
+        Args:
+            collect_ips: 在后台线程中调用，返回待扫描的公网IP（资源枚举也较慢，一并放到后台）
+            on_complete: 扫描完成后的回调（如保存结果、清理缓存）
+            scanner_options: 透传给 AsyncPortScanner 的参数
+
+        Returns:
+            任务ID
+        """
+        job_id = f"deep-scan-{uuid.uuid4().hex[:12]}"
+        with self._results_lock:
+            # 只保留最近的任务结果（dict 保持插入顺序）
+            while len(self._results) >= MAX_KEPT_JOBS:
+                self._results.pop(next(iter(self._results)))
+            self._results[job_id] = []
+        ProgressManager().set_progress(job_id, 0, 0, "扫描任务已提交", "queued")
+        self._executor.submit(self._run, job_id, collect_ips, on_complete, scanner_options)
+        return job_id
+
+    def _run(self, job_id, collect_ips, on_complete, scanner_options) -> None:
+        progress = ProgressManager()
+        try:
+            progress.set_progress(job_id, 0, 0, "正在收集公网IP...", "collecting")
+            ips = list(dict.fromkeys(ip for ip in collect_ips() if ip))
+            total = len(ips)
+            progress.set_progress(job_id, 0, total, f"开始扫描 {total} 个公网IP", "scanning")
+
+            def on_result(result: Dict) -> None:
+                with self._results_lock:
+                    # 运行中的任务也可能被更新的任务挤出 MAX_KEPT_JOBS，之后的结果不再保留
+                    bucket = self._results.get(job_id)
+                    if bucket is None:
+                        return
+                    bucket.append(result)
+                    done = len(bucket)
+                progress.set_progress(job_id, done, total, f"已扫描 {done}/{total}: {result['ip']}", "scanning")
+
+            scanner = AsyncPortScanner(cache=self.cache, **scanner_options)
+            results = scanner.scan(ips, on_result=on_result) if ips else []
+            self.cache.save()
+            if on_complete:
+                on_complete(results)
+            progress.set_completed(job_id, {
+                "count": len(results),
+                "high_risk": sum(1 for r in results if r["risk_level"] in ["HIGH", "CRITICAL"]),
+                "cached_ports": sum(len(r["cached_ports"]) for r in results),
+            })
+        except Exception as e:
+            logger.error(f"深度扫描任务失败 [{job_id}]: {e}")
+            progress.set_failed(job_id, str(e))
+
+    def get_results(self, job_id: str, offset: int = 0) -> Optional[List[Dict]]:
+        """已完成主机的扫描结果（从 offset 开始），任务不存在时返回 None"""
+        with self._results_lock:
+            results = self._results.get(job_id)
+            return None if results is None else list(results[offset:])
@@ -2,16 +2,25 @@
 """
 审计日志模块
 记录用户操作、API 调用等关键操作
+
+日志按天分段存储（audit_YYYY-MM-DD.jsonl），每个分段配一个列式边车索引
+（audit_YYYY-MM-DD.idx.json）：时间戳、行偏移以及 user / action /
+resource_type / result 的字典编码列。查询从最新分段倒序扫描，用索引筛出命中行后
+只读取这些行，凑够 limit 即停止；冷分段压缩为 .jsonl.gz。
 """
 
+import gzip
 import json
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # 审计日志目录
@@ -49,9 +58,95 @@ class AuditResult(str, Enum):
     PARTIAL = "partial"
 
 
+class _SegmentIndex:
+    """单个日分段的列式索引"""
+    
+    COLUMNS = ("user", "action", "resource_type", "result")
+    
+    def __init__(self):
+        self.size = 0  # 已索引的字节数（压缩分段为解压后的大小）
+        self.ts: List[float] = []
+        self.offsets: List[int] = []
+        self.values: Dict[str, List[Optional[str]]] = {c: [] for c in self.COLUMNS}
+        self.codes: Dict[str, List[int]] = {c: [] for c in self.COLUMNS}
+        self._lookup: Dict[str, Dict[Optional[str], int]] = {c: {} for c in self.COLUMNS}
+        self._arrays: Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]] = None
+    
+    def _add(self, offset: int, entry: Dict[str, Any]):
+        self.ts.append(datetime.fromisoformat(entry["timestamp"]).timestamp())
+        self.offsets.append(offset)
+        for column in self.COLUMNS:
+            value = entry.get(column)
+            lookup = self._lookup[column]
+            if value not in lookup:
+                lookup[value] = len(self.values[column])
+                self.values[column].append(value)
+            self.codes[column].append(lookup[value])
+    
+    def extend(self, data: bytes):
+        """索引从 self.size 开始的新数据（只处理完整的行）"""
+        position = 0
+        while True:
+            end = data.find(b"\n", position)
+            if end < 0:
+                break
+            line = data[position:end]
+            if line.strip():
+                try:
+                    self._add(self.size + position, json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"跳过无法解析的审计日志行 (offset={self.size + position}): {e}")
+            position = end + 1
+        self.size += position
+        self._arrays = None
+    
+    def match(self, start_ts: float, end_ts: float, filters: Dict[str, str]) -> np.ndarray:
+        """返回命中的行号（按时间倒序）"""
+        if not self.ts:
+            return np.empty(0, dtype=int)
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.ts, dtype=float),
+                {c: np.asarray(self.codes[c], dtype=np.int32) for c in self.COLUMNS},
+            )
+        ts, codes = self._arrays
+        mask = (ts >= start_ts) & (ts <= end_ts)
+        for column, value in filters.items():
+            code = self._lookup[column].get(value)
+            if code is None:
+                return np.empty(0, dtype=int)
+            mask &= codes[column] == code
+        rows = np.flatnonzero(mask)
+        # 按时间倒序，同一时间戳按写入顺序倒序
+        return rows[np.lexsort((-rows, -ts[rows]))]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "ts": self.ts,
+            "offsets": self.offsets,
+            "columns": {c: {"values": self.values[c], "codes": self.codes[c]} for c in self.COLUMNS},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_SegmentIndex":
+        index = cls()
+        index.size = data["size"]
+        index.ts = data["ts"]
+        index.offsets = data["offsets"]
+        for column in cls.COLUMNS:
+            index.values[column] = data["columns"][column]["values"]
+            index.codes[column] = data["columns"][column]["codes"]
+            index._lookup[column] = {v: i for i, v in enumerate(index.values[column])}
+        return index
+
+
 class AuditLogger:
     """审计日志记录器"""
     
+    # 超过该天数的分段压缩存储
+    COLD_AFTER_DAYS = 7
+    
     def __init__(self, log_dir: Path = AUDIT_LOG_DIR):
         """
         初始化审计日志记录器
@@ -61,12 +156,24 @@ class AuditLogger:
         """
         self.log_dir = log_dir
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        # 日期 -> 分段索引（进程内缓存）
+        self._indexes: Dict[str, _SegmentIndex] = {}
+        self._lock = threading.RLock()
+        self._active_day: Optional[str] = None
     
     def _get_log_file(self) -> Path:
         """获取当前日志文件（按日期）"""
         today = datetime.now().strftime("%Y-%m-%d")
         return self.log_dir / f"audit_{today}.jsonl"
     
+    def _segment_paths(self, day: str) -> Tuple[Path, Path, Path]:
+        """分段的 (明文, 压缩, 索引) 路径"""
+        return (
+            self.log_dir / f"audit_{day}.jsonl",
+            self.log_dir / f"audit_{day}.jsonl.gz",
+            self.log_dir / f"audit_{day}.idx.json",
+        )
+    
     def log_operation(
         self,
         user: str,
@@ -110,6 +217,95 @@ class AuditLogger:
                 f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
         except Exception as e:
             logger.error(f"写入审计日志失败: {e}")
+        
+        # 跨天后压缩冷分段
+        today = log_file.stem.replace("audit_", "")
+        if self._active_day != today:
+            self._active_day = today
+            try:
+                self.compress_cold_segments()
+            except Exception as e:
+                logger.warning(f"压缩审计日志分段失败: {e}")
+    
+    def _load_index(self, day: str) -> Optional[Tuple[_SegmentIndex, Path, bool]]:
+        """
+        获取分段索引（追平明文分段新写入的行），分段不存在时返回 None
+        
+        Returns:
+            (索引, 分段文件, 是否压缩)
+        """
+        plain, packed, sidecar = self._segment_paths(day)
+        with self._lock:
+            index = self._indexes.get(day)
+            
+            if packed.exists() and not plain.exists():
+                # 压缩分段不再变化
+                if index is None:
+                    index = self._read_sidecar(sidecar)
+                    if index is None:
+                        index = _SegmentIndex()
+                        with gzip.open(packed, "rb") as f:
+                            index.extend(f.read())
+                        self._write_sidecar(sidecar, index)
+                    self._indexes[day] = index
+                return index, packed, True
+            
+            if not plain.exists():
+                self._indexes.pop(day, None)
+                return None
+            
+            size = plain.stat().st_size
+            if index is None:
+                index = self._read_sidecar(sidecar)
+            if index is None or index.size > size:
+                index = _SegmentIndex()
+            if index.size < size:
+                with open(plain, "rb") as f:
+                    f.seek(index.size)
+                    index.extend(f.read())
+                if day != datetime.now().strftime("%Y-%m-%d"):
+                    # 历史分段不再写入，持久化索引
+                    self._write_sidecar(sidecar, index)
+            self._indexes[day] = index
+            return index, plain, False
+    
+    @staticmethod
+    def _read_sidecar(sidecar: Path) -> Optional[_SegmentIndex]:
+        if not sidecar.exists():
+            return None
+        try:
+            with open(sidecar, "r", encoding="utf-8") as f:
+                return _SegmentIndex.from_dict(json.load(f))
+        except Exception as e:
+            logger.warning(f"审计日志索引损坏，重新建立 {sidecar}: {e}")
+            return None
+    
+    @staticmethod
+    def _write_sidecar(sidecar: Path, index: _SegmentIndex):
+        tmp = sidecar.with_suffix(".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, sidecar)
+        except Exception as e:
+            logger.warning(f"写入审计日志索引失败 {sidecar}: {e}")
+    
+    @staticmethod
+    def _read_rows(path: Path, compressed: bool, index: _SegmentIndex, rows) -> List[Dict[str, Any]]:
+        """按索引偏移读取指定行"""
+        entries = []
+        if compressed:
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+            for row in rows:
+                start = index.offsets[row]
+                entries.append(json.loads(data[start:data.find(b"\n", start)]))
+        else:
+            with open(path, "rb") as f:
+                for row in rows:
+                    f.seek(index.offsets[row])
+                    entries.append(json.loads(f.readline()))
+        return entries
     
     def query_logs(
         self,
@@ -122,7 +318,7 @@ class AuditLogger:
         limit: int = 1000
     ) -> list:
         """
-        查询审计日志
+        查询审计日志（按时间倒序）
         
         Args:
             start_date: 开始日期
@@ -144,53 +340,65 @@ class AuditLogger:
         if end_date is None:
             end_date = datetime.now()
         
-        # 遍历日期范围内的所有日志文件
-        current_date = start_date
-        while current_date <= end_date:
-            log_file = self.log_dir / f"audit_{current_date.strftime('%Y-%m-%d')}.jsonl"
-            
-            if log_file.exists():
-                try:
-                    with open(log_file, "r", encoding="utf-8") as f:
-                        for line in f:
-                            if not line.strip():
-                                continue
-                            
-                            entry = json.loads(line)
-                            entry_date = datetime.fromisoformat(entry["timestamp"])
-                            
-                            # 日期过滤
-                            if entry_date < start_date or entry_date > end_date:
-                                continue
-                            
-                            # 其他过滤条件
-                            if user and entry.get("user") != user:
-                                continue
-                            if action and entry.get("action") != action.value:
-                                continue
-                            if resource_type and entry.get("resource_type") != resource_type:
-                                continue
-                            if result and entry.get("result") != result.value:
-                                continue
-                            
-                            logs.append(entry)
-                            
-                            if len(logs) >= limit:
-                                break
-                except Exception as e:
-                    logger.warning(f"读取日志文件失败 {log_file}: {e}")
-            
-            # 移动到下一天
-            from datetime import timedelta
-            current_date += timedelta(days=1)
+        filters = {
+            column: getattr(value, "value", value)
+            for column, value in (("user", user), ("action", action), ("resource_type", resource_type), ("result", result))
+            if value
+        }
+        start_ts, end_ts = start_date.timestamp(), end_date.timestamp()
+        
+        # 从最新的分段倒序扫描，凑够 limit 即停止
+        current_date = end_date.date()
+        while current_date >= start_date.date() and len(logs) < limit:
+            day = current_date.strftime("%Y-%m-%d")
+            current_date -= timedelta(days=1)
+            try:
+                segment = self._load_index(day)
+                if segment is None:
+                    continue
+                index, path, compressed = segment
+                rows = index.match(start_ts, end_ts, filters)[: limit - len(logs)]
+                if len(rows):
+                    logs.extend(self._read_rows(path, compressed, index, rows))
+            except Exception as e:
+                logger.warning(f"读取审计日志分段失败 {day}: {e}")
+        
+        return logs
+    
+    def compress_cold_segments(self, days: Optional[int] = None) -> int:
+        """
+        压缩冷分段（早于指定天数）为 .jsonl.gz，并固化其索引
+        
+        Args:
+            days: 冷分段天数，默认 COLD_AFTER_DAYS
             
-            if len(logs) >= limit:
-                break
+        Returns:
+            压缩的分段数量
+        """
+        cutoff = (datetime.now() - timedelta(days=self.COLD_AFTER_DAYS if days is None else days)).strftime("%Y-%m-%d")
+        compressed = 0
         
-        # 按时间倒序排序
-        logs.sort(key=lambda x: x["timestamp"], reverse=True)
+        for log_file in sorted(self.log_dir.glob("audit_*.jsonl")):
+            day = log_file.stem.replace("audit_", "")
+            if day >= cutoff:
+                continue
+            plain, packed, sidecar = self._segment_paths(day)
+            with self._lock:
+                segment = self._load_index(day)
+                if segment is None:
+                    continue
+                index = segment[0]
+                with open(plain, "rb") as f:
+                    data = f.read(index.size)
+                tmp = packed.with_suffix(".tmp")
+                with gzip.open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, packed)
+                self._write_sidecar(sidecar, index)
+                plain.unlink()
+                compressed += 1
         
-        return logs[:limit]
+        return compressed
     
     def cleanup_old_logs(self, days: int = 90):
         """
@@ -199,18 +407,18 @@ class AuditLogger:
         Args:
             days: 保留天数
         """
-        from datetime import timedelta
-        
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        for log_file in self.log_dir.glob("audit_*.jsonl"):
+        for log_file in self.log_dir.glob("audit_*"):
             try:
                 # 从文件名提取日期
-                date_str = log_file.stem.replace("audit_", "")
+                date_str = log_file.name[len("audit_"):len("audit_YYYY-MM-DD")]
                 file_date = datetime.strptime(date_str, "%Y-%m-%d")
                 
                 if file_date < cutoff_date:
                     log_file.unlink()
+                    with self._lock:
+                        self._indexes.pop(date_str, None)
                     logger.info(f"已删除旧日志文件: {log_file}")
             except Exception as e:
                 logger.warning(f"处理日志文件失败 {log_file}: {e}")
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+备份块存储
+
+按内容寻址（SHA-256）的去重块存储：相同内容只保存一份。
+块内容流式压缩（zlib/gzip 格式），启用加密时按帧加密：
+每帧为 4 字节大端长度 + Fernet 令牌，读写内存占用与帧大小相关而与块大小无关。
+"""
+
+import hashlib
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 流式读写的帧大小
+FRAME_SIZE = 1024 * 1024
+_LENGTH = struct.Struct(">I")
+
+
+def hash_file(path: Path) -> Tuple[str, int]:
+    """计算文件内容的 SHA-256 和大小"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(FRAME_SIZE), b""):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class ChunkStore:
+    """内容寻址的备份块存储"""
+
+    def __init__(self, root: Path, cipher=None):
+        """
+        初始化块存储
+
+        Args:
+            root: 块存储目录
+            cipher: Fernet 加密器（None 表示不加密）
+        """
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cipher = cipher
+
+    @property
+    def suffix(self) -> str:
+        return ".gz.enc" if self.cipher else ".gz"
+
+    def path(self, digest: str) -> Path:
+        """块文件路径（按哈希前两位分目录）"""
+        return self.root / digest[:2] / f"{digest}{self.suffix}"
+
+    def has(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def _frames(self, source: BinaryIO) -> Iterator[bytes]:
+        """读取源数据并产出压缩后的帧"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for block in iter(lambda: source.read(FRAME_SIZE), b""):
+            data = compressor.compress(block)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def put_file(self, source: Path, digest: str) -> int:
+        """
+        保存文件内容为块（已存在则跳过）
+
+        Returns:
+            新写入的字节数（已存在时为 0）
+        """
+        target = self.path(digest)
+        if target.exists():
+            return 0
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        written = 0
+        try:
+            with open(source, "rb") as src, open(tmp, "wb") as out:
+                for frame in self._frames(src):
+                    if not frame:
+                        continue
+                    if self.cipher:
+                        frame = self.cipher.encrypt(frame)
+                        out.write(_LENGTH.pack(len(frame)))
+                        written += _LENGTH.size
+                    out.write(frame)
+                    written += len(frame)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return written
+
+    def open(self, digest: str) -> Iterator[bytes]:
+        """流式读取块的原始内容"""
+        path = self.path(digest)
+        if not path.exists():
+            raise FileNotFoundError(f"备份块不存在: {digest}")
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        with open(path, "rb") as f:
+            while True:
+                if self.cipher:
+                    header = f.read(_LENGTH.size)
+                    if not header:
+                        break
+                    frame = self.cipher.decrypt(f.read(_LENGTH.unpack(header)[0]))
+                else:
+                    frame = f.read(FRAME_SIZE)
+                    if not frame:
+                        break
+                data = decompressor.decompress(frame)
+                if data:
+                    yield data
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def read(self, digest: str) -> bytes:
+        return b"".join(self.open(digest))
+
+    def digests(self) -> Iterable[str]:
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            yield path.name[: -len(self.suffix)]
+
+    def remove_unreferenced(self, referenced: Set[str]) -> int:
+        """删除未被任何备份清单引用的块"""
+        removed = 0
+        for digest in list(self.digests()):
+            if digest not in referenced:
+                try:
+                    self.path(digest).unlink()
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"删除备份块失败 {digest}: {e}")
+        return removed
@@ -2,6 +2,10 @@
 """
 数据备份管理器
 实现自动备份、备份文件加密、异地存储等功能
+
+增量备份模式按表（bill_items 再按账期）分块导出，块按内容哈希去重存储，
+并行压缩、流式加密；账期指纹未变化的块直接复用上一次备份，
+恢复时数据块并行导入。
 """
 
 import os
@@ -13,7 +17,10 @@ from pathlib import Path
 from typing import Optional, List, Dict, Any
 import logging
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+from cloudlens.core.backup_chunk_store import ChunkStore, hash_file
 from cloudlens.core.encryption import get_encryption
 
 logger = logging.getLogger(__name__)
@@ -30,28 +37,49 @@ BACKUP_DATA_DIRS = [
     Path.home() / ".cloudlens" / "audit_logs",
 ]
 
+# 按分区列分块导出的表：表名 -> (分区列, 分区指纹表达式)
+# 指纹未变化的分区直接复用上一次备份的块，不再导出
+CHUNKED_TABLES = {
+    "bill_items": ("billing_cycle", "COUNT(*) AS row_count, MAX(id) AS max_id, SUM(pretax_amount) AS total"),
+}
+
 
 class BackupManager:
     """数据备份管理器"""
     
-    def __init__(self, backup_dir: Path = BACKUP_DIR, encrypt: bool = True):
+    def __init__(self, backup_dir: Path = BACKUP_DIR, encrypt: bool = True, workers: int = 4):
         """
         初始化备份管理器
         
         Args:
             backup_dir: 备份目录
             encrypt: 是否加密备份文件
+            workers: 增量备份/恢复的并行度
         """
         self.backup_dir = backup_dir
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         self.encrypt = encrypt
         self.encryption = get_encryption() if encrypt else None
+        self.workers = workers
+        self.chunk_store = ChunkStore(
+            self.backup_dir / "chunks",
+            cipher=self.encryption.cipher if self.encryption else None
+        )
+        self._db = None
+    
+    def _get_db(self):
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            from cloudlens.core.database import DatabaseFactory
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
     
     def create_backup(
         self,
         backup_name: Optional[str] = None,
         include_database: bool = True,
-        include_files: bool = True
+        include_files: bool = True,
+        incremental: bool = False
     ) -> Path:
         """
         创建备份
@@ -60,6 +88,7 @@ class BackupManager:
             backup_name: 备份名称（如果为 None，则自动生成）
             include_database: 是否包含数据库
             include_files: 是否包含配置文件
+            incremental: 增量模式（分块去重存储，返回备份清单路径）
             
         Returns:
             备份文件路径
@@ -67,6 +96,9 @@ class BackupManager:
         if backup_name is None:
             backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
+        if incremental:
+            return self._create_incremental_backup(backup_name, include_database, include_files)
+        
         backup_path = self.backup_dir / f"{backup_name}.tar.gz"
         
         try:
@@ -234,6 +266,10 @@ class BackupManager:
         if not backup_path.exists():
             raise FileNotFoundError(f"备份文件不存在: {backup_path}")
         
+        if backup_path.name.endswith(".manifest.json"):
+            self._restore_incremental(backup_path, restore_database, restore_files)
+            return
+        
         try:
             # 解密备份文件（如果需要）
             if backup_path.suffixes == [".encrypted", ".tar", ".gz"]:
@@ -364,6 +400,221 @@ class BackupManager:
                 shutil.copy2(db_file, db_path)
                 logger.info(f"SQLite 恢复成功")
     
+    # ---- 增量备份 ----
+    
+    def _list_manifests(self) -> List[Dict[str, Any]]:
+        """读取所有增量备份清单（按创建时间升序）"""
+        manifests = []
+        for path in self.backup_dir.glob("*.manifest.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                manifest["_path"] = path
+                manifests.append(manifest)
+            except Exception as e:
+                logger.warning(f"读取备份清单失败 {path}: {e}")
+        manifests.sort(key=lambda m: m.get("created_at", ""))
+        return manifests
+    
+    @staticmethod
+    def _mysql_args() -> List[str]:
+        """MySQL 连接参数"""
+        return [
+            f"--host={os.getenv('MYSQL_HOST', 'localhost')}",
+            f"--user={os.getenv('MYSQL_USER', 'cloudlens')}",
+            f"--password={os.getenv('MYSQL_PASSWORD', '')}",
+        ]
+    
+    def _list_tables(self) -> List[str]:
+        tables = []
+        for row in self._get_db().query("SHOW TABLES") or []:
+            tables.append(list(row.values())[0] if isinstance(row, dict) else row[0])
+        return sorted(tables)
+    
+    def _partition_fingerprints(self, table: str) -> Dict[str, str]:
+        """分区 -> 指纹（行数、最大ID、金额合计）"""
+        column, expression = CHUNKED_TABLES[table]
+        fingerprints = {}
+        for row in self._get_db().query(
+            f"SELECT {column} AS part, {expression} FROM {table} GROUP BY {column}"
+        ) or []:
+            values = list(row.values()) if isinstance(row, dict) else list(row)
+            fingerprints[str(values[0])] = "|".join(str(v) for v in values[1:])
+        return fingerprints
+    
+    def _plan_database_chunks(self) -> List[Dict[str, Any]]:
+        """规划数据库块：存储过程、每张表的结构、按表或按分区的数据"""
+        chunks = [{"kind": "routines", "table": None, "part": None}]
+        for table in self._list_tables():
+            chunks.append({"kind": "schema", "table": table, "part": None})
+            if table in CHUNKED_TABLES:
+                for part, fingerprint in sorted(self._partition_fingerprints(table).items()):
+                    chunks.append({"kind": "data", "table": table, "part": part, "fingerprint": fingerprint})
+            else:
+                chunks.append({"kind": "data", "table": table, "part": None})
+        return chunks
+    
+    def _dump_chunk(self, chunk: Dict[str, Any], target: Path):
+        """用 mysqldump 导出单个块（输出稳定，便于内容去重）"""
+        db_name = os.getenv("MYSQL_DATABASE", "cloudlens")
+        cmd = ["mysqldump", *self._mysql_args(), "--single-transaction", "--skip-comments", "--order-by-primary"]
+        
+        if chunk["kind"] == "routines":
+            cmd += ["--no-data", "--no-create-info", "--no-create-db", "--routines", "--skip-triggers", db_name]
+        elif chunk["kind"] == "schema":
+            cmd += ["--no-data", db_name, chunk["table"]]
+        else:
+            # 数据块不加表锁，恢复时可以并行导入同一张表
+            cmd += ["--no-create-info", "--skip-triggers", "--skip-add-locks", "--skip-disable-keys"]
+            if chunk["part"] is not None:
+                column = CHUNKED_TABLES[chunk["table"]][0]
+                value = chunk["part"].replace("'", "''")
+                cmd.append(f"--where={column}='{value}'")
+            cmd += [db_name, chunk["table"]]
+        
+        with open(target, "wb") as f:
+            result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"mysqldump 导出失败 ({chunk['kind']} {chunk['table']} {chunk['part']}): "
+                               f"{result.stderr.decode('utf-8', 'replace')}")
+    
+    def _store_file(self, source: Path, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """哈希并存储一个块（内容已存在时只记录引用）"""
+        digest, size = hash_file(source)
+        written = self.chunk_store.put_file(source, digest)
+        return {**entry, "hash": digest, "size": size, "stored_bytes": written, "reused": False}
+    
+    def _backup_chunk(self, chunk: Dict[str, Any], previous: Dict[tuple, Dict[str, Any]], work_dir: Path) -> Dict[str, Any]:
+        """导出、哈希、压缩加密单个数据库块；指纹未变化时复用上次的块"""
+        key = (chunk["kind"], chunk["table"], chunk["part"])
+        last = previous.get(key)
+        if (
+            chunk.get("fingerprint") is not None
+            and last is not None
+            and last.get("fingerprint") == chunk["fingerprint"]
+            and self.chunk_store.has(last["hash"])
+        ):
+            return {**chunk, "hash": last["hash"], "size": last["size"], "stored_bytes": 0, "reused": True}
+        
+        target = work_dir / f"{chunk['kind']}_{chunk['table']}_{chunk['part']}.sql"
+        try:
+            self._dump_chunk(chunk, target)
+            return self._store_file(target, chunk)
+        finally:
+            if target.exists():
+                target.unlink()
+    
+    def _backup_file_chunks(self) -> List[Dict[str, Any]]:
+        """配置文件和审计日志逐个文件存储为块"""
+        cloudlens_dir = Path.home() / ".cloudlens"
+        entries = []
+        for root in BACKUP_DATA_DIRS:
+            if not root.exists():
+                continue
+            for file_path in ([root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())):
+                entries.append(self._store_file(
+                    file_path,
+                    {"kind": "file", "table": None, "part": None, "path": str(file_path.relative_to(cloudlens_dir))}
+                ))
+        return entries
+    
+    def _create_incremental_backup(self, backup_name: str, include_database: bool, include_files: bool) -> Path:
+        """
+        创建增量备份
+        
+        每个块按内容哈希存入块存储，已存在的内容不再写入；
+        备份本身只是一份引用块哈希的清单。
+        """
+        manifests = [m for m in self._list_manifests() if m.get("encrypted", False) == bool(self.encryption)]
+        previous = {
+            (e["kind"], e["table"], e["part"]): e
+            for e in (manifests[-1].get("chunks", []) if manifests else [])
+        }
+        
+        entries: List[Dict[str, Any]] = []
+        if include_files:
+            entries.extend(self._backup_file_chunks())
+        
+        if include_database:
+            db_type = os.getenv("DB_TYPE", "mysql").lower()
+            if db_type == "mysql":
+                chunks = self._plan_database_chunks()
+                with tempfile.TemporaryDirectory(dir=self.backup_dir) as work_dir:
+                    with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                        entries.extend(executor.map(
+                            lambda c: self._backup_chunk(c, previous, Path(work_dir)), chunks
+                        ))
+            else:
+                db_path = os.getenv("SQLITE_DB_PATH") or str(Path.home() / ".cloudlens" / "cloudlens.db")
+                if os.path.exists(db_path):
+                    entries.append(self._store_file(Path(db_path), {"kind": "sqlite", "table": None, "part": None}))
+        
+        manifest = {
+            "backup_name": backup_name,
+            "created_at": datetime.now().isoformat(),
+            "mode": "incremental",
+            "encrypted": bool(self.encryption),
+            "include_database": include_database,
+            "include_files": include_files,
+            "chunks": entries,
+            "reused_chunks": sum(1 for e in entries if e["reused"] or not e["stored_bytes"]),
+            "new_bytes": sum(e["stored_bytes"] for e in entries),
+        }
+        manifest_path = self.backup_dir / f"{backup_name}.manifest.json"
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        
+        logger.info(
+            f"增量备份创建成功: {manifest_path}（{len(entries)} 个块，"
+            f"新写入 {len(entries) - manifest['reused_chunks']} 个，{manifest['new_bytes']} 字节）"
+        )
+        return manifest_path
+    
+    def _run_mysql(self, stream):
+        """把 SQL 流导入 MySQL"""
+        cmd = ["mysql", *self._mysql_args(), os.getenv("MYSQL_DATABASE", "cloudlens")]
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            for data in stream:
+                process.stdin.write(data)
+        finally:
+            process.stdin.close()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"MySQL 导入失败: {stderr.decode('utf-8', 'replace')}")
+    
+    def _restore_incremental(self, manifest_path: Path, restore_database: bool, restore_files: bool):
+        """恢复增量备份：结构按顺序导入，数据块并行导入"""
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        chunks = manifest.get("chunks", [])
+        
+        if restore_files:
+            cloudlens_dir = Path.home() / ".cloudlens"
+            for entry in (e for e in chunks if e["kind"] == "file"):
+                dest_path = cloudlens_dir / entry["path"]
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(dest_path, "wb") as f:
+                    for data in self.chunk_store.open(entry["hash"]):
+                        f.write(data)
+        
+        if restore_database:
+            for entry in (e for e in chunks if e["kind"] == "sqlite"):
+                db_path = os.getenv("SQLITE_DB_PATH") or str(Path.home() / ".cloudlens" / "cloudlens.db")
+                with open(db_path, "wb") as f:
+                    for data in self.chunk_store.open(entry["hash"]):
+                        f.write(data)
+            
+            for entry in (e for e in chunks if e["kind"] in ("schema", "routines")):
+                self._run_mysql(self.chunk_store.open(entry["hash"]))
+            
+            data_chunks = [e for e in chunks if e["kind"] == "data"]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # list() 让任一块失败时抛出异常
+                list(executor.map(lambda e: self._run_mysql(self.chunk_store.open(e["hash"])), data_chunks))
+        
+        logger.info(f"增量备份恢复成功: {manifest_path}")
+    
     def list_backups(self) -> List[Dict[str, Any]]:
         """列出所有备份"""
         backups = []
@@ -381,6 +632,18 @@ class BackupManager:
             except Exception as e:
                 logger.warning(f"读取备份文件信息失败 {backup_file}: {e}")
         
+        for manifest in self._list_manifests():
+            backups.append({
+                "name": manifest["_path"].name,
+                "path": str(manifest["_path"]),
+                "size": manifest.get("new_bytes", 0),
+                "created_at": manifest["created_at"],
+                "encrypted": manifest.get("encrypted", False),
+                "incremental": True,
+                "chunks": len(manifest.get("chunks", [])),
+                "reused_chunks": manifest.get("reused_chunks", 0)
+            })
+        
         # 按创建时间倒序排序
         backups.sort(key=lambda x: x["created_at"], reverse=True)
         
@@ -414,6 +677,17 @@ class BackupManager:
                 except Exception as e:
                     logger.warning(f"删除备份失败 {backup_path}: {e}")
         
+        # 回收不再被任何增量备份引用的块
+        if deleted_count:
+            referenced = {
+                entry["hash"]
+                for manifest in self._list_manifests()
+                for entry in manifest.get("chunks", [])
+            }
+            removed = self.chunk_store.remove_unreferenced(referenced)
+            if removed:
+                logger.info(f"回收了 {removed} 个未引用的备份块")
+        
         logger.info(f"清理完成，删除了 {deleted_count} 个旧备份")
 
 
@@ -5,16 +5,33 @@
 """
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
 from cloudlens.core.cache import CacheManager
+from cloudlens.core.cost_index import CostIndex, account_id_for
 from cloudlens.core.db_manager import DatabaseManager
 from cloudlens.core.threshold_manager import ThresholdManager
 
 
+@dataclass
+class PipelineConfig:
+    """analyze 流水线的各阶段并发配置"""
+
+    list_workers: int = 4  # 并发列举的区域数
+    metric_workers: int = 8
+    metric_batch_size: int = 20  # 每次交给 get_metrics_many 的实例数
+    cost_workers: int = 4
+    cost_batch_size: int = 50  # 每次交给 get_cost_many 的实例数
+    queue_size: int = 256  # 阶段间队列容量
+
+
 class BaseResourceAnalyzer(ABC):
     """资源分析器抽象基类"""
 
+    # 子类可覆盖以调整流水线并发（如受限于API配额时降低 metric_workers）
+    pipeline_config = PipelineConfig()
+
     def __init__(
         self,
         access_key_id: str,
@@ -23,6 +40,7 @@ class BaseResourceAnalyzer(ABC):
         threshold_manager: ThresholdManager = None,
         cache_manager: CacheManager = None,
         db_manager: DatabaseManager = None,
+        cost_index: CostIndex = None,
     ):
         """
         初始化资源分析器
@@ -34,6 +52,7 @@ class BaseResourceAnalyzer(ABC):
             threshold_manager: 阈值管理器
             cache_manager: 缓存管理器
             db_manager: 数据库管理器
+            cost_index: 账单成本索引，默认使用该账号的进程内共享索引；命中时不再调用 get_cost
         """
         self.access_key_id = access_key_id
         self.access_key_secret = access_key_secret
@@ -41,6 +60,13 @@ class BaseResourceAnalyzer(ABC):
         self.threshold_manager = threshold_manager or ThresholdManager()
         self.cache_manager = cache_manager
         self.db_manager = db_manager
+        self.cost_index = cost_index
+
+    def _get_cost_index(self) -> Optional[CostIndex]:
+        """未显式传入时取该账号的共享成本索引（同一进程内各分析器共用）"""
+        if self.cost_index is None and self.access_key_id and self.tenant_name:
+            self.cost_index = CostIndex.for_account(account_id_for(self.access_key_id, self.tenant_name))
+        return self.cost_index
 
     @abstractmethod
     def get_resource_type(self) -> str:
@@ -107,49 +133,125 @@ class BaseResourceAnalyzer(ABC):
         """
         return 0.0
 
+    def get_instance_id(self, instance: Any) -> str:
+        """从实例数据中取出实例ID（兼容API字典与 UnifiedResource）"""
+        if isinstance(instance, dict):
+            return instance.get("InstanceId") or instance.get("DBInstanceId", "")
+        return getattr(instance, "id", "")
+
+    def get_metrics_many(self, region: str, instance_ids: List[str], days: int = 14) -> Dict[str, Dict[str, float]]:
+        """
+        批量获取监控指标（流水线钩子，默认逐个调用 get_metrics）
+
+        子类可重写为批量接口（如一次 DescribeMetricList 查询多个实例）。
+
+        Returns:
+            {instance_id: {metric_name: value}}
+        """
+        return {instance_id: self.get_metrics(region, instance_id, days) for instance_id in instance_ids}
+
+    def get_cost_many(self, region: str, instance_ids: List[str]) -> Dict[str, float]:
+        """
+        批量获取成本（流水线钩子）
+
+        默认先查账单成本索引，未命中的实例再逐个调用 get_cost。
+
+        Returns:
+            {instance_id: 月度成本}
+        """
+        index = self._get_cost_index()
+        costs = index.get_many(instance_ids) if index is not None else {}
+        for instance_id in instance_ids:
+            if instance_id not in costs:
+                costs[instance_id] = self.get_cost(region, instance_id)
+        return costs
+
     def analyze(self, regions: List[str] = None, days: int = 14) -> List[Dict]:
         """
         分析资源（通用流程，子类可重写）
 
+        list -> metrics/is_idle -> cost 三个阶段以有界队列串联，
+        区域列举、监控查询和成本查询相互重叠；各阶段并发数与批大小见 pipeline_config。
+
         Args:
             regions: 要分析的区域列表（None则分析所有区域）
             days: 统计天数
 
         Returns:
-            闲置资源列表
+            闲置资源列表（按区域、实例的原始顺序）
         """
+        from cloudlens.core.pipeline import Stage, StagedPipeline
+        from cloudlens.utils.error_handler import ErrorHandler
+
         if regions is None:
             regions = self.get_all_regions()
 
-        idle_resources = []
-
-        for region in regions:
-            try:
-                instances = self.get_instances(region)
-                for instance in instances:
-                    instance_id = instance.get("InstanceId") or instance.get("DBInstanceId", "")
-                    metrics = self.get_metrics(region, instance_id, days)
-
-                    is_idle, conditions = self.is_idle(instance, metrics)
-                    if is_idle:
-                        optimization = self.get_optimization_suggestions(instance, metrics)
-                        cost = self.get_cost(region, instance_id)
-
-                        idle_resources.append(
-                            {
-                                "instance": instance,
-                                "metrics": metrics,
-                                "idle_conditions": conditions,
-                                "optimization": optimization,
-                                "cost": cost,
-                                "region": region,
-                            }
-                        )
-            except Exception as e:
-                # 记录错误但继续处理其他区域
-                from cloudlens.utils.error_handler import ErrorHandler
-
-                ErrorHandler.handle_region_error(e, region, self.get_resource_type())
-                continue
-
-        return idle_resources
+        config = self.pipeline_config
+        resource_type = self.get_resource_type()
+        failed_regions = set()
+
+        def report_region_error(e: Exception, region: str) -> None:
+            # 记录错误但继续处理其他区域（每个区域只报告一次）
+            if region not in failed_regions:
+                failed_regions.add(region)
+                ErrorHandler.handle_region_error(e, region, resource_type)
+
+        def list_stage(batch):
+            for region_idx, region in batch:
+                try:
+                    instances = self.get_instances(region)
+                except Exception as e:
+                    report_region_error(e, region)
+                    continue
+                for inst_idx, instance in enumerate(instances):
+                    yield (region_idx, inst_idx), region, instance
+
+        def metrics_stage(batch):
+            for region, items in _group_by_region(batch).items():
+                try:
+                    ids = [self.get_instance_id(instance) for _, _, instance in items]
+                    metrics_map = self.get_metrics_many(region, ids, days)
+                    for (order, _, instance), instance_id in zip(items, ids):
+                        metrics = metrics_map.get(instance_id) or {}
+                        is_idle, conditions = self.is_idle(instance, metrics)
+                        if is_idle:
+                            yield order, region, instance, metrics, conditions
+                except Exception as e:
+                    report_region_error(e, region)
+
+        def cost_stage(batch):
+            for region, items in _group_by_region(batch).items():
+                try:
+                    ids = [self.get_instance_id(item[2]) for item in items]
+                    costs = self.get_cost_many(region, ids)
+                    for (order, _, instance, metrics, conditions), instance_id in zip(items, ids):
+                        yield order, {
+                            "instance": instance,
+                            "metrics": metrics,
+                            "idle_conditions": conditions,
+                            "optimization": self.get_optimization_suggestions(instance, metrics),
+                            "cost": costs.get(instance_id, 0.0),
+                            "region": region,
+                        }
+                except Exception as e:
+                    report_region_error(e, region)
+
+        pipeline = StagedPipeline(
+            [
+                Stage("list", list_stage, workers=config.list_workers),
+                Stage("metrics", metrics_stage, workers=config.metric_workers, batch_size=config.metric_batch_size),
+                Stage("cost", cost_stage, workers=config.cost_workers, batch_size=config.cost_batch_size),
+            ],
+            queue_size=config.queue_size,
+        )
+        results = pipeline.run(enumerate(regions))
+        results.sort(key=lambda r: r[0])
+        return [record for _, record in results]
+
+
+def _group_by_region(batch: List[Tuple]) -> Dict[str, List[Tuple]]:
+    """按区域分组（批量钩子以区域为单位调用）"""
+    grouped: Dict[str, List[Tuple]] = {}
+    for item in batch:
+        grouped.setdefault(item[1], []).append(item)
+    return grouped
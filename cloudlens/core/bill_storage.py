@@ -12,8 +12,15 @@ from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import json
 
+from cloudlens.core.budget_evaluator import BudgetEvaluator
+from cloudlens.core.cost_forecaster import CostForecaster
+from cloudlens.core.cost_index import CostIndex
+from cloudlens.core.cost_trend_engine import CostTrendEngine
 from cloudlens.core.database import DatabaseFactory, DatabaseAdapter
+from cloudlens.core.discount_cube import DiscountCube
+from cloudlens.core.opportunity_store import OpportunityStore
 from cloudlens.core.performance import monitor_db_query
+from cloudlens.core.tag_cost import TagCostAttributor
 
 logger = logging.getLogger(__name__)
 
@@ -203,6 +210,13 @@ class BillStorageManager:
                         skipped += len(batch)
             
             self._get_db().commit()
+            CostIndex.invalidate(account_id)
+            CostTrendEngine.invalidate(account_id)
+            OpportunityStore.on_bills_ingested(account_id)
+            TagCostAttributor.invalidate(periods=[billing_cycle])
+            DiscountCube.on_bills_ingested(account_id, billing_cycle)
+            BudgetEvaluator.notify_bills_ingested(account_id, billing_cycle)
+            CostForecaster.notify_bills_ingested()
             logger.info(f"账期 {billing_cycle} 批量插入 {inserted} 条，跳过 {skipped} 条")
             
             return inserted, skipped
@@ -275,6 +289,91 @@ class BillStorageManager:
 
         return self._get_db().query(sql, tuple(params) if params else None)
 
+    # 导出账单明细时的默认列
+    EXPORT_COLUMNS = [
+        "billing_cycle", "billing_date", "product_name", "product_code", "subscription_type",
+        "instance_id", "region", "zone", "billing_item", "pricing_unit", "usage",
+        "list_price", "invoice_discount", "pretax_amount", "payment_amount", "currency",
+    ]
+
+    def _export_conditions(
+        self,
+        account_id: str,
+        billing_cycle: Optional[str] = None,
+        start_cycle: Optional[str] = None,
+        end_cycle: Optional[str] = None,
+    ) -> Tuple[List[str], List]:
+        placeholder = self._get_placeholder()
+        conditions = [f"account_id = {placeholder}"]
+        params: List = [account_id]
+        if billing_cycle:
+            conditions.append(f"billing_cycle = {placeholder}")
+            params.append(billing_cycle)
+        if start_cycle:
+            conditions.append(f"billing_cycle >= {placeholder}")
+            params.append(start_cycle)
+        if end_cycle:
+            conditions.append(f"billing_cycle <= {placeholder}")
+            params.append(end_cycle)
+        return conditions, params
+
+    def count_bill_items(
+        self,
+        account_id: str,
+        billing_cycle: Optional[str] = None,
+        start_cycle: Optional[str] = None,
+        end_cycle: Optional[str] = None,
+    ) -> int:
+        """统计账单明细条数（用于导出进度）"""
+        conditions, params = self._export_conditions(account_id, billing_cycle, start_cycle, end_cycle)
+        row = self._get_db().query_one(
+            f"SELECT COUNT(*) AS cnt FROM bill_items WHERE {' AND '.join(conditions)}", tuple(params)
+        )
+        if not row:
+            return 0
+        return int((row.get("cnt") if isinstance(row, dict) else row[0]) or 0)
+
+    def iter_bill_items(
+        self,
+        account_id: str,
+        billing_cycle: Optional[str] = None,
+        start_cycle: Optional[str] = None,
+        end_cycle: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        page_size: int = 5000,
+    ):
+        """
+        按主键分页逐行读取账单明细（生成器，内存只保留一页）
+
+        Args:
+            account_id: 账号ID
+            billing_cycle: 单个账期
+            start_cycle / end_cycle: 账期范围（YYYY-MM，含边界）
+            columns: 输出列，默认 EXPORT_COLUMNS
+            page_size: 每页行数
+
+        Yields:
+            按 columns 顺序的行元组
+        """
+        columns = columns or self.EXPORT_COLUMNS
+        placeholder = self._get_placeholder()
+        select = ", ".join(["id"] + [self._quote_column(c) for c in columns])
+        conditions, params = self._export_conditions(account_id, billing_cycle, start_cycle, end_cycle)
+        conditions.append(f"id > {placeholder}")
+        sql = (
+            f"SELECT {select} FROM bill_items WHERE {' AND '.join(conditions)} "
+            f"ORDER BY id LIMIT {int(page_size)}"
+        )
+
+        last_id = 0
+        while True:
+            rows = self._get_db().query(sql, tuple(params + [last_id]))
+            for row in rows:
+                yield tuple(row.get(c) for c in columns)
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]["id"]
+
     @monitor_db_query
     def get_discount_analysis_data(
         self,
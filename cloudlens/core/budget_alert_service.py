@@ -6,7 +6,7 @@
 """
 
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 from datetime import datetime
 
 from cloudlens.core.budget_manager import BudgetStorage, Budget, BudgetStatus, BudgetCalculator
@@ -37,10 +37,13 @@ class BudgetAlertService:
         """
         try:
             budgets = self.budget_storage.list_budgets(account_id)
+            # 所有预算的支出一次批量计算，今日已发送的告警一次查出
+            statuses = self.budget_storage.calculate_budget_statuses(budgets, self.bill_storage)
+            sent_today = self._alerts_sent_today()
             all_alerts = []
             
             for budget in budgets:
-                alerts = self.check_budget(budget)
+                alerts = self.check_budget(budget, statuses.get(budget.id), sent_today)
                 all_alerts.extend(alerts)
             
             return all_alerts
@@ -49,28 +52,41 @@ class BudgetAlertService:
             logger.error(f"检查预算告警失败: {str(e)}")
             return []
     
-    def check_budget(self, budget: Budget) -> List[Dict]:
+    def check_budget(
+        self,
+        budget: Budget,
+        status: Optional[BudgetStatus] = None,
+        sent_today: Optional[Set[Tuple[str, float]]] = None
+    ) -> List[Dict]:
         """
         检查单个预算并发送告警
         
+        Args:
+            budget: 预算
+            status: 已计算的预算状态（批量检查时传入），为空时单独计算
+            sent_today: 今日已发送的 (budget_id, 阈值)，为空时逐条查询
+        
         Returns:
             触发的告警列表
         """
         try:
-            # 计算预算状态
-            status = self.budget_storage.calculate_budget_status(
-                budget,
-                budget.account_id,
-                self.bill_storage
-            )
-            
-            # 检查告警阈值
-            triggered = self.calculator.check_alerts(budget, status)
+            # 计算预算状态（包含已触发的告警阈值）
+            if status is None:
+                status = self.budget_storage.calculate_budget_status(
+                    budget,
+                    budget.account_id,
+                    self.bill_storage
+                )
+            triggered = status.alerts_triggered
             
             alerts_sent = []
             for alert in triggered:
                 # 检查是否已经发送过告警（避免重复发送）
-                if self._should_send_alert(budget.id, alert["threshold"]):
+                if sent_today is not None:
+                    should_send = (budget.id, float(alert["threshold"])) not in sent_today
+                else:
+                    should_send = self._should_send_alert(budget.id, alert["threshold"])
+                if should_send:
                     # 发送告警
                     result = self._send_budget_alert(budget, status, alert)
                     if result:
@@ -93,6 +109,23 @@ class BudgetAlertService:
             logger.error(f"检查预算 {budget.id} 告警失败: {str(e)}")
             return []
     
+    def _alerts_sent_today(self) -> Optional[Set[Tuple[str, float]]]:
+        """今日已发送的告警 (budget_id, 阈值)，查询失败时返回 None（退回逐条检查）"""
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            rows = self.budget_storage._get_db().query(
+                """SELECT budget_id, threshold FROM budget_alerts 
+                   WHERE DATE(triggered_at) = %s AND status = 'sent'""",
+                (today,)
+            )
+            return {
+                (row["budget_id"], float(row["threshold"])) if isinstance(row, dict) else (row[0], float(row[1]))
+                for row in rows or []
+            }
+        except Exception as e:
+            logger.error(f"查询今日告警记录失败: {str(e)}")
+            return None
+    
     def _should_send_alert(self, budget_id: str, threshold: float) -> bool:
         """检查是否应该发送告警（避免重复发送）"""
         try:
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+批量预算评估
+
+按 (账号, 账单日期, 产品) 把 bill_items 汇总成日粒度的内存汇总表，
+所有预算的支出由一次分组查询得到；每个预算维护周期累计支出计数器，
+账单入库后只重新汇总该账期并把差额累加到受影响的预算上。
+使用率、阈值告警和支出预测用 NumPy 对全部预算一次计算；明天起到周期结束的支出
+取自共享的 CostForecaster（Holt-Winters 周季节性），模型在后台拟合/更新，
+尚未就绪或没有对应序列时按日均线性外推。
+
+入库钩子只能通知到执行入库的进程，因此每个账期还记录数据版本
+（行数、最大 updated_at）；评估时按间隔比对版本，其他进程写入的账期同样增量重算。
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from cloudlens.core.budget_manager import Budget, BudgetStatus, BudgetType
+from cloudlens.core.cost_forecaster import TOTAL, CostForecaster
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+# 账号 -> 账单日期 -> 产品 -> 金额
+_Rollup = Dict[str, Dict[str, Dict[str, float]]]
+# (账号, 开始日期, 结束日期, 服务集合) —— 决定预算支出的全部因素
+_Scope = Tuple[str, str, str, Optional[FrozenSet[str]]]
+# 账号 -> 账期 -> (行数, 最大 updated_at)
+_Versions = Dict[str, Dict[str, Tuple[int, str]]]
+
+
+def _date_str(value) -> str:
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+def _as_day(value) -> date:
+    return date.fromisoformat(_date_str(value))
+
+
+def budget_scope(budget: Budget) -> _Scope:
+    """预算的支出范围：按服务预算限定产品，其余类型统计账号全部支出"""
+    services = None
+    if budget.type == BudgetType.SERVICE and budget.service_filter:
+        try:
+            names = json.loads(budget.service_filter).get("services") or []
+        except (ValueError, AttributeError):
+            names = []
+        if names:
+            services = frozenset(names)
+    return (budget.account_id or "", _date_str(budget.start_date), _date_str(budget.end_date), services)
+
+
+class BudgetEvaluator:
+    """
+    批量预算评估器
+
+    用法:
+        evaluator = BudgetEvaluator.shared()
+        statuses = evaluator.evaluate(budgets)   # {budget_id: BudgetStatus}
+
+    账单数据不会晚于当天，因此计数器统计预算整个周期 [开始, 结束] 内已入库的支出，
+    与按 [开始, min(今天, 结束)] 查询的结果一致。
+    """
+
+    def __init__(
+        self,
+        db: Optional[DatabaseAdapter] = None,
+        refresh_seconds: int = 60,
+        forecaster: Optional[CostForecaster] = None,
+    ):
+        """
+        Args:
+            db: 数据库适配器，默认延迟创建 MySQL 适配器
+            refresh_seconds: 比对账期数据版本的最小间隔（秒）
+            forecaster: 剩余天数的支出预测器，None 时按日均线性外推
+        """
+        self._db = db
+        self.refresh_seconds = refresh_seconds
+        self.forecaster = forecaster
+        self._rollup: _Rollup = {}
+        # 账号 -> 已加载的日期范围
+        self._coverage: Dict[str, Tuple[str, str]] = {}
+        # 预算ID -> (支出范围, 周期累计支出)
+        self._counters: Dict[str, Tuple[_Scope, float]] = {}
+        # 已汇总数据对应的账期版本
+        self._versions: _Versions = {}
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.queries = 0
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    # ---- 日汇总 ----
+
+    def _query_rollup(self, sql: str, params: Tuple) -> _Rollup:
+        self.queries += 1
+        rollup: _Rollup = {}
+        for row in self._get_db().query(sql, params) or []:
+            if not isinstance(row, dict):
+                row = dict(zip(("account_id", "billing_date", "product_name", "total"), row))
+            day = _date_str(row["billing_date"])
+            products = rollup.setdefault(row["account_id"], {}).setdefault(day, {})
+            product = row.get("product_name") or ""
+            products[product] = products.get(product, 0.0) + float(row.get("total") or 0)
+        return rollup
+
+    def _read_versions(self, accounts: List[str], start: str, end: str, cycle: Optional[str] = None) -> _Versions:
+        """读取账号在日期范围内（或指定账期）各账期的数据版本"""
+        if cycle is None:
+            cycle_filter, params = "billing_cycle >= %s AND billing_cycle <= %s", (start[:7], end[:7])
+        else:
+            cycle_filter, params = "billing_cycle = %s", (cycle,)
+        sql = f"""
+            SELECT account_id, billing_cycle, COUNT(*) AS row_count, MAX(updated_at) AS max_updated
+            FROM bill_items
+            WHERE account_id IN ({', '.join(['%s'] * len(accounts))}) AND {cycle_filter}
+            GROUP BY account_id, billing_cycle
+        """
+        rows = self._get_db().query(sql, (*accounts, *params)) or []
+        versions: _Versions = {account: {} for account in accounts}
+        for row in rows:
+            if not isinstance(row, dict):
+                row = dict(zip(("account_id", "billing_cycle", "row_count", "max_updated"), row))
+            versions.setdefault(row["account_id"], {})[str(row["billing_cycle"])] = (
+                int(row.get("row_count") or 0),
+                str(row.get("max_updated") or ""),
+            )
+        return versions
+
+    def _load_accounts(self, windows: Dict[str, Tuple[str, str]]) -> None:
+        """一次分组查询加载多个账号的日汇总（按所需日期范围的并集）"""
+        accounts = sorted(windows)
+        start = min(w[0] for w in windows.values())
+        end = max(w[1] for w in windows.values())
+        # 先读版本再汇总：两次查询之间写入的账单只会导致下次多重算一次，不会遗漏
+        versions = self._read_versions(accounts, start, end)
+        rollup = self._query_rollup(
+            f"""
+            SELECT account_id, billing_date, product_name, SUM(pretax_amount) AS total
+            FROM bill_items
+            WHERE account_id IN ({', '.join(['%s'] * len(accounts))})
+              AND billing_date >= %s AND billing_date <= %s
+              AND pretax_amount IS NOT NULL
+            GROUP BY account_id, billing_date, product_name
+            """,
+            (*accounts, start, end),
+        )
+        for account in accounts:
+            self._rollup[account] = rollup.get(account, {})
+            self._coverage[account] = (start, end)
+            self._versions[account] = versions.get(account, {})
+            # 汇总重载后该账号的计数器需要重算
+            for budget_id in [b for b, (scope, _) in self._counters.items() if scope[0] == account]:
+                del self._counters[budget_id]
+
+    @staticmethod
+    def _sum(days: Dict[str, Dict[str, float]], scope: _Scope) -> float:
+        _, start, end, services = scope
+        total = 0.0
+        for day, products in days.items():
+            if start <= day <= end:
+                if services is None:
+                    total += sum(products.values())
+                else:
+                    total += sum(v for p, v in products.items() if p in services)
+        return total
+
+    def _sync_versions(self, accounts: List[str]) -> None:
+        """比对已加载账号的账期版本，增量重算其他进程写入过的账期"""
+        if not accounts:
+            return
+        start = min(self._coverage[a][0] for a in accounts)
+        end = max(self._coverage[a][1] for a in accounts)
+        current = self._read_versions(accounts, start, end)
+        for account in accounts:
+            known = self._versions.get(account, {})
+            latest = current.get(account, {})
+            lo, hi = self._coverage[account][0][:7], self._coverage[account][1][:7]
+            for cycle in sorted(set(known) | set(latest)):
+                if lo <= cycle <= hi and known.get(cycle) != latest.get(cycle):
+                    self._refresh_cycle(account, cycle)
+            self._versions[account] = latest
+
+    def _ensure(self, budgets: Iterable[Budget]) -> List[Tuple[Budget, float]]:
+        """保证每个预算都有最新计数器，缺失的账号/日期范围合并成一次查询加载"""
+        scoped = [(b, budget_scope(b)) for b in budgets]
+        with self._lock:
+            if time.time() - self._checked_at >= self.refresh_seconds:
+                self._sync_versions(sorted({scope[0] for _, scope in scoped if scope[0] in self._coverage}))
+                self._checked_at = time.time()
+
+            missing: Dict[str, Tuple[str, str]] = {}
+            for _, (account, start, end, _) in scoped:
+                covered = self._coverage.get(account)
+                if covered and covered[0] <= start and end <= covered[1]:
+                    continue
+                lo, hi = missing.get(account, covered or (start, end))
+                missing[account] = (min(lo, start), max(hi, end))
+            if missing:
+                self._load_accounts(missing)
+
+            result = []
+            for budget, scope in scoped:
+                counter = self._counters.get(budget.id)
+                if counter is None or counter[0] != scope:
+                    counter = (scope, self._sum(self._rollup.get(scope[0], {}), scope))
+                    self._counters[budget.id] = counter
+                result.append((budget, counter[1]))
+            return result
+
+    def on_bills_ingested(self, account_id: str, billing_cycle: str) -> None:
+        """账单入库后：重新汇总该账期，把新旧差额累加到该账号的预算计数器"""
+        with self._lock:
+            if account_id not in self._coverage:
+                return
+            start, end = self._coverage[account_id]
+            version = self._read_versions([account_id], start, end, cycle=billing_cycle)[account_id]
+            self._refresh_cycle(account_id, billing_cycle)
+            cycles = self._versions.setdefault(account_id, {})
+            if billing_cycle in version:
+                cycles[billing_cycle] = version[billing_cycle]
+            else:
+                cycles.pop(billing_cycle, None)
+
+    def _refresh_cycle(self, account_id: str, billing_cycle: str) -> None:
+        """重新汇总账号的一个账期，把新旧差额累加到该账号的预算计数器"""
+        with self._lock:
+            fresh = self._query_rollup(
+                """
+                SELECT account_id, billing_date, product_name, SUM(pretax_amount) AS total
+                FROM bill_items
+                WHERE account_id = %s AND billing_cycle = %s
+                  AND billing_date IS NOT NULL AND billing_date <> ''
+                  AND pretax_amount IS NOT NULL
+                GROUP BY account_id, billing_date, product_name
+                """,
+                (account_id, billing_cycle),
+            ).get(account_id, {})
+
+            start, end = self._coverage[account_id]
+            days = self._rollup.setdefault(account_id, {})
+            old = {d: days.pop(d) for d in [d for d in days if d.startswith(billing_cycle)]}
+            days.update({d: p for d, p in fresh.items() if start <= d <= end})
+            new = {d: p for d, p in fresh.items() if start <= d <= end}
+
+            for budget_id, (scope, spent) in list(self._counters.items()):
+                if scope[0] == account_id:
+                    self._counters[budget_id] = (scope, spent + self._sum(new, scope) - self._sum(old, scope))
+
+    # ---- 评估 ----
+
+    def evaluate(self, budgets: Iterable[Budget], now: Optional[datetime] = None) -> Dict[str, BudgetStatus]:
+        """
+        批量计算预算状态（使用率、剩余、预测支出、触发的告警阈值）
+
+        Returns:
+            {budget_id: BudgetStatus}
+        """
+        now = now or datetime.now()
+        pairs = self._ensure(budgets)
+        return self.statuses(pairs, now, self.forecast_remaining([b for b, _ in pairs], now))
+
+    def forecast_remaining(self, budgets: List[Budget], now: datetime) -> Dict[str, float]:
+        """
+        用共享预测模型估计各预算从明天到周期结束的支出（今天已出的账单计入 spent）
+
+        按服务预算累加各产品序列，其余预算取账号合计序列；没有模型或序列时不返回该预算。
+        模型不在请求中拟合：尚未就绪时提交后台刷新，本次按日均外推。
+        """
+        today = now.date()
+        budgets = [b for b in budgets if today < _as_day(b.end_date)]
+        if self.forecaster is None or not budgets:
+            return {}
+        try:
+            models = self.forecaster.current(today)
+        except Exception as e:
+            logger.warning(f"读取预算预测模型失败，按日均外推: {e}")
+            return {}
+        if models is None or not len(models):
+            return {}
+
+        spans = {}
+        for budget in budgets:
+            account, _, _, services = budget_scope(budget)
+            keys = [(account, TOTAL)] if services is None else [(account, s) for s in sorted(services)]
+            rows = [models.index[k] for k in keys if k in models.index]
+            if rows:
+                # 预测第 h 天（从 1 开始）对应 last_date + h；明天起、周期结束前的天计入
+                first = max((today - models.last_date).days + 1, 1)
+                last = (_as_day(budget.end_date) - models.last_date).days - 1
+                if last >= first:
+                    spans[budget.id] = (rows, first, last)
+        if not spans:
+            return {}
+
+        forecast = models.forecast(max(last for _, _, last in spans.values()))
+        return {
+            budget_id: float(forecast[rows, first - 1:last].sum())
+            for budget_id, (rows, first, last) in spans.items()
+        }
+
+    @staticmethod
+    def statuses(
+        pairs: List[Tuple[Budget, float]],
+        now: Optional[datetime] = None,
+        remaining_forecast: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, BudgetStatus]:
+        """
+        由 (预算, 已支出) 向量化计算预算状态
+
+        Args:
+            remaining_forecast: 预算ID -> 预测的剩余支出；缺失的预算按日均线性外推
+        """
+        if not pairs:
+            return {}
+        now = now or datetime.now()
+        remaining_forecast = remaining_forecast or {}
+
+        amount = np.array([b.amount for b, _ in pairs], dtype=float)
+        spent = np.array([s for _, s in pairs], dtype=float)
+        days_total = np.array([(b.end_date - b.start_date).days for b, _ in pairs], dtype=float)
+        days_elapsed = np.clip(
+            np.array([(now - b.start_date).days for b, _ in pairs], dtype=float), 0, days_total
+        )
+
+        remaining = np.maximum(0.0, amount - spent)
+        usage_rate = np.divide(spent * 100, amount, out=np.zeros_like(spent), where=amount != 0)
+        has_elapsed = days_elapsed > 0
+        predicted = np.divide(spent * days_total, days_elapsed, out=np.zeros_like(spent), where=has_elapsed)
+        forecast = np.array([remaining_forecast.get(b.id, np.nan) for b, _ in pairs], dtype=float)
+        has_forecast = ~np.isnan(forecast)
+        predicted = np.where(has_forecast, spent + np.nan_to_num(forecast), predicted)
+        has_predicted = has_elapsed | has_forecast
+        overspend = np.maximum(0.0, predicted - amount)
+
+        # 阈值矩阵（预算 × 阈值），未启用或不足的位置填 inf
+        width = max((len(b.alerts) for b, _ in pairs), default=0)
+        thresholds = np.full((len(pairs), max(width, 1)), np.inf)
+        for i, (budget, _) in enumerate(pairs):
+            for j, alert in enumerate(budget.alerts):
+                if alert.enabled:
+                    thresholds[i, j] = alert.percentage
+        triggered = usage_rate[:, None] >= thresholds
+
+        triggered_at = now.isoformat()
+        statuses = {}
+        for i, (budget, _) in enumerate(pairs):
+            statuses[budget.id] = BudgetStatus(
+                budget_id=budget.id,
+                spent=float(spent[i]),
+                remaining=float(remaining[i]),
+                usage_rate=float(usage_rate[i]),
+                days_elapsed=int(days_elapsed[i]),
+                days_total=int(days_total[i]),
+                predicted_spend=float(predicted[i]) if has_predicted[i] else None,
+                predicted_overspend=float(overspend[i]) if has_predicted[i] else None,
+                alerts_triggered=[
+                    {
+                        "threshold": budget.alerts[j].percentage,
+                        "current_rate": float(usage_rate[i]),
+                        "channels": budget.alerts[j].notification_channels,
+                        "triggered_at": triggered_at,
+                    }
+                    for j in np.flatnonzero(triggered[i])
+                ],
+            )
+        return statuses
+
+    # ---- 进程内共享 ----
+
+    _shared: Optional["BudgetEvaluator"] = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, db: Optional[DatabaseAdapter] = None) -> "BudgetEvaluator":
+        """进程内共享的评估器（计数器跨请求复用，预测使用共享的 CostForecaster）"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(db=db, forecaster=CostForecaster.shared(db=db))
+            return cls._shared
+
+    @classmethod
+    def notify_bills_ingested(cls, account_id: str, billing_cycle: str) -> None:
+        """账单入库钩子：共享评估器已加载该账号时增量更新"""
+        evaluator = cls._shared
+        if evaluator is None:
+            return
+        try:
+            evaluator.on_bills_ingested(account_id, billing_cycle)
+        except Exception as e:
+            logger.warning(f"预算计数器增量更新失败，下次评估时重建: {e}")
+            cls.invalidate()
+
+    @classmethod
+    def invalidate(cls) -> None:
+        with cls._shared_lock:
+            cls._shared = None
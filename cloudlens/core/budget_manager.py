@@ -11,7 +11,7 @@ import json
 from datetime import datetime, timedelta, date
 from pathlib import Path
 from typing import List, Dict, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
 import uuid
 
@@ -627,20 +627,28 @@ class BudgetStorage:
     
     def record_spend(self, budget_id: str, date: datetime, spent: float, predicted: Optional[float] = None):
         """记录预算支出"""
+        self.record_spends([(budget_id, date, spent, predicted)])
+
+    def record_spends(self, records: List[Tuple[str, datetime, float, Optional[float]]]):
+        """
+        批量记录预算支出（一次 executemany）
+
+        Args:
+            records: [(budget_id, date, spent, predicted)]
+        """
+        if not records:
+            return
         placeholder = self._get_placeholder()
+        # MySQL使用REPLACE，SQLite使用INSERT OR REPLACE
+        verb = "REPLACE" if self.db_type == "mysql" else "INSERT OR REPLACE"
         try:
-            record_id = str(uuid.uuid4())
-            # MySQL使用REPLACE，SQLite使用INSERT OR REPLACE
-            if self.db_type == "mysql":
-                self._get_db().execute(f"""
-                    REPLACE INTO budget_records (id, budget_id, date, spent, predicted)
-                    VALUES ({', '.join([placeholder] * 5)})
-                """, (record_id, budget_id, date.date().isoformat(), spent, predicted))
-            else:
-                self._get_db().execute(f"""
-                INSERT OR REPLACE INTO budget_records (id, budget_id, date, spent, predicted)
-                    VALUES ({', '.join([placeholder] * 5)})
-                """, (record_id, budget_id, date.date().isoformat(), spent, predicted))
+            self._get_db().executemany(f"""
+                {verb} INTO budget_records (id, budget_id, date, spent, predicted)
+                VALUES ({', '.join([placeholder] * 5)})
+            """, [
+                (str(uuid.uuid4()), budget_id, day.date().isoformat(), spent, predicted)
+                for budget_id, day, spent, predicted in records
+            ])
         except Exception as e:
             logger.error(f"Error recording spend: {e}")
     
@@ -681,123 +689,44 @@ class BudgetStorage:
         Returns:
             预算状态
         """
-        now = datetime.now()
+        if account_id and account_id != budget.account_id:
+            budget = replace(budget, account_id=account_id)
+        return self.calculate_budget_statuses([budget], bill_storage_manager)[budget.id]
+    
+    def calculate_budget_statuses(
+        self,
+        budgets: List[Budget],
+        bill_storage_manager = None
+    ) -> Dict[str, BudgetStatus]:
+        """
+        批量计算预算状态
         
-        # 计算已过天数和总天数
-        days_total = (budget.end_date - budget.start_date).days
-        days_elapsed = (now - budget.start_date).days
-        days_elapsed = max(0, min(days_elapsed, days_total))
+        支出来自共享的 BudgetEvaluator：所有预算一次分组查询，之后由账单入库增量维护；
+        计算结果一次批量写入 budget_records。
         
-        # 计算已支出
-        spent = 0.0
+        Args:
+            budgets: 预算列表（按各自的 account_id 统计支出）
+            bill_storage_manager: 账单存储管理器（为空时支出按0计算）
+            
+        Returns:
+            {budget_id: 预算状态}
+        """
+        from cloudlens.core.budget_evaluator import BudgetEvaluator
         
+        now = datetime.now()
+        statuses = None
         if bill_storage_manager:
             try:
-                # 从账单数据库获取实际支出
-                # 使用BillStorageManager的数据库抽象层
-                db = bill_storage_manager.db
-                placeholder = "%s" if bill_storage_manager.db_type == "mysql" else "?"
-                
-                # 计算预算周期内的支出
-                start_date_str = budget.start_date.strftime('%Y-%m-%d')
-                end_date_str = min(now, budget.end_date).strftime('%Y-%m-%d')
-                
-                if budget.type == BudgetType.TOTAL:
-                    # 总预算：查询所有支出
-                    rows = db.query(f"""
-                        SELECT SUM(pretax_amount) as total
-                        FROM bill_items
-                        WHERE account_id = {placeholder}
-                            AND billing_date >= {placeholder}
-                            AND billing_date <= {placeholder}
-                            AND pretax_amount IS NOT NULL
-                    """, (account_id, start_date_str, end_date_str))
-                elif budget.type == BudgetType.SERVICE:
-                    # 按服务预算：需要解析service_filter
-                    service_filter = json.loads(budget.service_filter) if budget.service_filter else {}
-                    if service_filter.get('services'):
-                        placeholders = ','.join([placeholder for _ in service_filter['services']])
-                        rows = db.query(f"""
-                            SELECT SUM(pretax_amount) as total
-                            FROM bill_items
-                            WHERE account_id = {placeholder}
-                                AND billing_date >= {placeholder}
-                                AND billing_date <= {placeholder}
-                                AND product_name IN ({placeholders})
-                                AND pretax_amount IS NOT NULL
-                        """, (account_id, start_date_str, end_date_str, *service_filter['services']))
-                    else:
-                        rows = db.query(f"""
-                            SELECT SUM(pretax_amount) as total
-                            FROM bill_items
-                            WHERE account_id = {placeholder}
-                                AND billing_date >= {placeholder}
-                                AND billing_date <= {placeholder}
-                                AND pretax_amount IS NOT NULL
-                        """, (account_id, start_date_str, end_date_str))
-                else:
-                    # 按标签预算：需要匹配虚拟标签（TODO: 实现标签匹配）
-                    rows = db.query(f"""
-                        SELECT SUM(pretax_amount) as total
-                        FROM bill_items
-                        WHERE account_id = {placeholder}
-                            AND billing_date >= {placeholder}
-                            AND billing_date <= {placeholder}
-                            AND pretax_amount IS NOT NULL
-                    """, (account_id, start_date_str, end_date_str))
-                
-                if rows and len(rows) > 0:
-                    row = rows[0]
-                    total = row.get('total') if isinstance(row, dict) else row[0]
-                    if total:
-                        spent = float(total)
+                statuses = BudgetEvaluator.shared(bill_storage_manager.db).evaluate(budgets, now)
             except Exception as e:
                 logger.error(f"Error calculating budget spend from bills: {e}")
-        
-        # 计算剩余预算和使用率
-        remaining = max(0, budget.amount - spent)
-        usage_rate = BudgetCalculator.calculate_usage_rate(spent, budget.amount)
-        
-        # 预测支出
-        predicted_spend = None
-        predicted_overspend = None
-        if days_elapsed > 0:
-            predicted_spend = BudgetCalculator.predict_spend(
-                spent, days_elapsed, days_total
-            )
-            predicted_overspend = max(0, predicted_spend - budget.amount)
-        
-        # 创建临时状态用于告警检查
-        temp_status = BudgetStatus(
-            budget_id=budget.id,
-            spent=spent,
-            remaining=remaining,
-            usage_rate=usage_rate,
-            days_elapsed=days_elapsed,
-            days_total=days_total,
-            predicted_spend=predicted_spend,
-            predicted_overspend=predicted_overspend
-        )
-        
-        # 检查告警
-        alerts_triggered = BudgetCalculator.check_alerts(budget, temp_status)
-        
-        status = BudgetStatus(
-            budget_id=budget.id,
-            spent=spent,
-            remaining=remaining,
-            usage_rate=usage_rate,
-            days_elapsed=days_elapsed,
-            days_total=days_total,
-            predicted_spend=predicted_spend,
-            predicted_overspend=predicted_overspend,
-            alerts_triggered=alerts_triggered
-        )
+        if statuses is None:
+            statuses = BudgetEvaluator.statuses([(budget, 0.0) for budget in budgets], now)
         
         # 记录支出
-        self.record_spend(budget.id, now, spent, predicted_spend)
+        self.record_spends([
+            (budget_id, now, status.spent, status.predicted_spend)
+            for budget_id, status in statuses.items()
+        ])
         
-        return status
-
-
-
+        return statuses
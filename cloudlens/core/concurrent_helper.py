@@ -21,23 +21,36 @@ class ConcurrentQueryHelper:
 
         Args:
             accounts: 账号列表
-            query_func: 查询函数
-            *args, **kwargs: 传递给查询函数的参数
+            query_func: 查询函数（同步函数走线程池，协程函数直接在事件循环上并发）
+            *args, **kwargs: 传递给查询函数的参数；协程模式下可用 max_concurrency 限制并发
 
         Returns:
             所有账号的查询结果合并列表
         """
-        loop = asyncio.get_event_loop()
+        if not accounts:
+            return []
+
+        if asyncio.iscoroutinefunction(query_func):
+            # 原生协程（如 AsyncAliyunProvider）直接在事件循环上并发，无需线程
+            semaphore = asyncio.Semaphore(kwargs.pop("max_concurrency", 50))
+
+            async def _run(account):
+                async with semaphore:
+                    return await query_func(account, *args, **kwargs)
+
+            results = await asyncio.gather(*(_run(acc) for acc in accounts), return_exceptions=True)
+        else:
+            loop = asyncio.get_event_loop()
 
-        # 使用线程池执行同步的SDK调用
-        with ThreadPoolExecutor(max_workers=min(len(accounts), 10)) as executor:
-            tasks = []
-            for account in accounts:
-                task = loop.run_in_executor(executor, query_func, account, *args)
-                tasks.append(task)
+            # 使用线程池执行同步的SDK调用
+            with ThreadPoolExecutor(max_workers=min(len(accounts), 10)) as executor:
+                tasks = []
+                for account in accounts:
+                    task = loop.run_in_executor(executor, query_func, account, *args)
+                    tasks.append(task)
 
-            # 并发执行所有任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+                # 并发执行所有任务
+                results = await asyncio.gather(*tasks, return_exceptions=True)
 
         # 合并结果，过滤异常
         all_results = []
@@ -375,9 +375,10 @@ class CostAllocationStorage:
 class CostAllocator:
     """成本分配器"""
     
-    def __init__(self, storage: CostAllocationStorage, bill_storage_path: str = "data/bills.db"):
+    def __init__(self, storage: CostAllocationStorage, bill_storage_path: str = "data/bills.db", tag_storage=None):
         self.storage = storage
         self.bill_storage_path = bill_storage_path
+        self.tag_storage = tag_storage  # 按标签分配使用的 VirtualTagStorage，默认延迟创建
     
     def allocate(self, rule: AllocationRule) -> AllocationResult:
         """执行成本分配"""
@@ -542,10 +543,82 @@ class CostAllocator:
         rule: AllocationRule,
         source_costs: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
-        """按标签分配"""
-        # TODO: 需要集成虚拟标签系统
-        # 这里简化处理，使用平均分配
-        return self._allocate_equal(rule, source_costs)
+        """
+        按标签分配
+        
+        分配目标解析为虚拟标签（{"tag_id": ...} 或 {"key": ..., "value": ...}），
+        每个目标分得其标签下资源的账单成本（tag_matches 关联 bill_items）；
+        无法解析或没有归集到成本时退化为平均分配。
+        """
+        targets = json.loads(rule.allocation_targets) if rule.allocation_targets else []
+        if not targets:
+            return []
+        
+        try:
+            from cloudlens.core.tag_cost import TagCostAttributor
+            from cloudlens.core.virtual_tags import VirtualTagStorage
+            
+            tag_storage = self.tag_storage or VirtualTagStorage.shared()
+            tags = tag_storage.list_tags()
+            by_id = {t.id: t for t in tags}
+            by_kv = {(t.tag_key, t.tag_value): t for t in tags}
+            target_tags = [
+                by_id.get(target.get("tag_id")) or by_kv.get((target.get("key"), target.get("value")))
+                if isinstance(target, dict) else None
+                for target in targets
+            ]
+            tag_ids = [t.id for t in target_tags if t is not None]
+            if not tag_ids:
+                return self._allocate_equal(rule, source_costs)
+            
+            services = json.loads(rule.service_filter) if rule.service_filter else None
+            # 复用标签存储的连接；SQLite 标签存储的账单经 MySQL 账单库查询
+            attributor = TagCostAttributor.for_storage(tag_storage)
+            attributed = attributor.query(
+                tag_ids,
+                self._billing_cycles(rule),
+                bill_account_id=rule.account_id,
+                product_codes=services or None,
+            )
+        except Exception as e:
+            logger.warning(f"标签成本归集失败，按平均分配: {e}")
+            return self._allocate_equal(rule, source_costs)
+        
+        tag_costs: Dict[str, float] = {}
+        for (tag_id, _), amount in attributed.items():
+            tag_costs[tag_id] = tag_costs.get(tag_id, 0.0) + amount
+        amounts = [tag_costs.get(t.id, 0.0) if t is not None else 0.0 for t in target_tags]
+        attributed_total = sum(amounts)
+        if attributed_total <= 0:
+            return self._allocate_equal(rule, source_costs)
+        
+        # 同一资源可能命中多个标签，归集总额超过源成本时按比例缩放
+        total_cost = sum(cost["amount"] for cost in source_costs)
+        scale = total_cost / attributed_total if attributed_total > total_cost > 0 else 1.0
+        
+        return [
+            {
+                "target": target,
+                "amount": amount * scale,
+                "percentage": (amount * scale / total_cost * 100.0) if total_cost else 0.0
+            }
+            for target, amount in zip(targets, amounts)
+        ]
+    
+    @staticmethod
+    def _billing_cycles(rule: AllocationRule) -> List[str]:
+        """规则日期范围覆盖的账期（YYYY-MM），未设置时为当月"""
+        from cloudlens.core.cost_index import shift_billing_cycle
+        
+        current = datetime.now().strftime("%Y-%m")
+        dates = rule.date_range.split(",") if rule.date_range else []
+        if len(dates) != 2:
+            return [current]
+        start, end = dates[0].strip()[:7], dates[1].strip()[:7]
+        cycles = [start]
+        while cycles[-1] < end and len(cycles) < 120:
+            cycles.append(shift_billing_cycle(cycles[-1], 1))
+        return cycles
 
 
 
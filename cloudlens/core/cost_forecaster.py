@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""
+成本预测引擎
+
+统一的日成本预测：加法 Holt-Winters（水平 + 趋势 + 周季节性）。
+- 所有账号、所有产品的日成本序列组成一个矩阵（序列 × 天），一次 NumPy 循环同时拟合
+- 每条序列在参数网格上同时递推，按一步预测误差选出各自的最优参数
+- 拟合结果（参数和末状态）缓存在内存并落盘，之后每天只用新账单做一步递推更新，
+  超过 REFIT_DAYS 天才重新网格拟合；增量期间新出现的账号/产品单独拟合后并入
+- 只吸收已出全的账单日（SETTLE_DAYS 天之前），避免把不完整的日成本写进状态
+- backtest() 留出最后若干天评估准确率和拟合耗时，并与线性回归基线对比
+
+季节项按星期几存放，因此状态与序列起始日期无关，增量更新和预测直接按日期取季节项。
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+SEASON_LENGTH = 7
+
+# (alpha 水平, beta 趋势, gamma 季节) 参数网格
+PARAM_GRID = np.array(
+    list(itertools.product((0.1, 0.3, 0.5, 0.8), (0.0, 0.05, 0.2), (0.05, 0.2, 0.5))),
+    dtype=np.float64,
+)
+
+# 账号合计序列使用的产品名
+TOTAL = "*"
+
+# (账号ID, 产品名)
+SeriesKey = Tuple[str, str]
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def _initial_state(y: np.ndarray, weekday0: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按前两周估计初始水平、趋势和季节项；不足两周时季节项为 0"""
+    n, t = y.shape
+    season = np.zeros((n, SEASON_LENGTH))
+    if t >= 2 * SEASON_LENGTH:
+        first = y[:, :SEASON_LENGTH]
+        level = first.mean(axis=1)
+        trend = (y[:, SEASON_LENGTH:2 * SEASON_LENGTH].mean(axis=1) - level) / SEASON_LENGTH
+        weekdays = (weekday0 + np.arange(SEASON_LENGTH)) % SEASON_LENGTH
+        season[:, weekdays] = first - level[:, None]
+    else:
+        level = y[:, 0].copy()
+        trend = np.zeros(n)
+    return level, trend, season
+
+
+def _smooth(
+    y: np.ndarray,
+    params: np.ndarray,
+    level: np.ndarray,
+    trend: np.ndarray,
+    season: np.ndarray,
+    weekday0: int,
+    warmup: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Holt-Winters 递推（就地更新状态）
+
+    Args:
+        y: 观测值 (序列, 天)
+        params: (序列, 候选, 3) 或可广播到该形状的参数
+        level / trend: (序列, 候选)
+        season: (序列, 候选, 7)，按星期几存放
+        weekday0: y 第一列的星期几
+        warmup: 前 warmup 天的误差不计入
+
+    Returns:
+        (level, trend, season, 一步预测误差平方和)
+    """
+    alpha, beta, gamma = params[..., 0], params[..., 1], params[..., 2]
+    sse = np.zeros(level.shape)
+    for t in range(y.shape[1]):
+        wd = (weekday0 + t) % SEASON_LENGTH
+        obs = y[:, t][:, None]
+        s_old = season[..., wd]
+        forecast = level + trend + s_old
+        if t >= warmup:
+            sse += (obs - forecast) ** 2
+        new_level = alpha * (obs - s_old) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[..., wd] = gamma * (obs - new_level) + (1 - gamma) * s_old
+        level = new_level
+    return level, trend, season, sse
+
+
+@dataclass
+class ForecastModels:
+    """一批序列的拟合结果（参数 + 末状态 + 近期历史）"""
+
+    keys: List[SeriesKey]
+    params: np.ndarray  # (序列, 3)
+    level: np.ndarray  # (序列,)
+    trend: np.ndarray  # (序列,)
+    season: np.ndarray  # (序列, 7)，按星期几存放
+    rmse: np.ndarray  # 一步预测均方根误差
+    r2: np.ndarray  # 一步预测拟合度
+    last_date: date  # 已吸收的最后一天
+    history: np.ndarray  # (序列, 天)，最近 HISTORY_DAYS 天的观测
+    fitted_at: float = 0.0
+    index: Dict[SeriesKey, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.index:
+            self.index = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def history_start(self) -> date:
+        return self.last_date - timedelta(days=self.history.shape[1] - 1)
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """全部序列未来 horizon 天的预测 (序列, 天)，不小于 0"""
+        steps = np.arange(1, horizon + 1)
+        weekdays = (self.last_date.weekday() + steps) % SEASON_LENGTH
+        values = self.level[:, None] + self.trend[:, None] * steps + self.season[:, weekdays]
+        return np.maximum(values, 0.0)
+
+
+def fit_models(y: np.ndarray, keys: Sequence[SeriesKey], last_date, history_days: int = 180) -> ForecastModels:
+    """
+    在参数网格上一次拟合全部序列，每条序列取一步预测误差最小的参数
+
+    Args:
+        y: 日成本矩阵 (序列, 天)，缺失的天按 0 计
+        keys: 每行对应的 (账号ID, 产品名)
+        last_date: y 最后一列的日期
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    n, t = y.shape
+    last_date = _as_date(last_date)
+    weekday0 = (last_date - timedelta(days=t - 1)).weekday()
+    grid = len(PARAM_GRID)
+
+    level, trend, season = _initial_state(y, weekday0)
+    level = np.repeat(level[:, None], grid, axis=1)
+    trend = np.repeat(trend[:, None], grid, axis=1)
+    season = np.repeat(season[:, None, :], grid, axis=1)
+    warmup = SEASON_LENGTH if t >= 2 * SEASON_LENGTH else 1
+
+    level, trend, season, sse = _smooth(y, PARAM_GRID[None, :, :], level, trend, season, weekday0, warmup)
+
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(n)
+    evaluated = max(t - warmup, 1)
+    best_sse = sse[rows, best]
+    centered = y[:, warmup:] - y[:, warmup:].mean(axis=1, keepdims=True) if t > warmup else np.zeros((n, 1))
+    sst = (centered ** 2).sum(axis=1)
+    r2 = np.divide(sst - best_sse, sst, out=np.zeros(n), where=sst > 0)
+
+    return ForecastModels(
+        keys=list(keys),
+        params=PARAM_GRID[best],
+        level=level[rows, best],
+        trend=trend[rows, best],
+        season=season[rows, best],
+        rmse=np.sqrt(best_sse / evaluated),
+        r2=r2,
+        last_date=last_date,
+        history=y[:, -history_days:].copy(),
+        fitted_at=time.time(),
+    )
+
+
+def update_models(models: ForecastModels, y_new: np.ndarray, history_days: int = 180) -> ForecastModels:
+    """
+    用 last_date 之后的新观测递推更新状态（参数不变）
+
+    Args:
+        y_new: (序列, 新增天数)，行顺序与 models.keys 一致
+    """
+    y_new = np.nan_to_num(np.asarray(y_new, dtype=np.float64))
+    if y_new.shape[1] == 0:
+        return models
+    weekday0 = (models.last_date + timedelta(days=1)).weekday()
+    level, trend, season, _ = _smooth(
+        y_new,
+        models.params[:, None, :],
+        models.level[:, None].copy(),
+        models.trend[:, None].copy(),
+        models.season[:, None, :].copy(),
+        weekday0,
+    )
+    models.level, models.trend, models.season = level[:, 0], trend[:, 0], season[:, 0]
+    models.history = np.concatenate([models.history, y_new], axis=1)[:, -history_days:]
+    models.last_date = models.last_date + timedelta(days=y_new.shape[1])
+    return models
+
+
+def merge_models(models: ForecastModels, extra: ForecastModels) -> ForecastModels:
+    """把同一截止日期拟合的新序列并入已有模型（保留已有模型的拟合时间）"""
+    if extra.last_date != models.last_date:
+        raise ValueError("只能合并截止日期相同的模型")
+    days = min(models.history.shape[1], extra.history.shape[1])
+    return ForecastModels(
+        keys=models.keys + extra.keys,
+        params=np.concatenate([models.params, extra.params]),
+        level=np.concatenate([models.level, extra.level]),
+        trend=np.concatenate([models.trend, extra.trend]),
+        season=np.concatenate([models.season, extra.season]),
+        rmse=np.concatenate([models.rmse, extra.rmse]),
+        r2=np.concatenate([models.r2, extra.r2]),
+        last_date=models.last_date,
+        history=np.concatenate([models.history[:, -days:], extra.history[:, -days:]]),
+        fitted_at=models.fitted_at,
+    )
+
+
+def forecast_values(values: Sequence[float], horizon: int, last_date=None) -> np.ndarray:
+    """
+    单条日成本序列的预测（供预算等只有一段支出序列的场景使用）
+
+    Args:
+        values: 连续若干天的日成本
+        horizon: 预测天数
+        last_date: values 最后一天的日期，缺省时按今天之前一天对齐星期
+    """
+    last_date = _as_date(last_date) if last_date else date.today() - timedelta(days=1)
+    models = fit_models(np.asarray(values, dtype=np.float64)[None, :], [("", TOTAL)], last_date)
+    return models.forecast(horizon)[0]
+
+
+def backtest(y: np.ndarray, last_date, holdout: int = 14) -> Dict:
+    """
+    留出最后 holdout 天做回测
+
+    Returns:
+        {"series", "days", "holdout", "fit_seconds", "model": {...}, "baseline": {...}}，
+        model/baseline 含 mae、wape（加权绝对百分比误差）、mape（只统计实际值>0的点）
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    train, actual = y[:, :-holdout], y[:, -holdout:]
+    train_end = _as_date(last_date) - timedelta(days=holdout)
+
+    started = time.perf_counter()
+    models = fit_models(train, [("", str(i)) for i in range(len(y))], train_end)
+    fit_seconds = time.perf_counter() - started
+    predicted = models.forecast(holdout)
+
+    # 基线：对训练段做线性回归（np.polyfit 支持按列批量拟合）
+    x = np.arange(train.shape[1])
+    slope, intercept = np.polyfit(x, train.T, 1)
+    future = np.arange(train.shape[1], train.shape[1] + holdout)
+    baseline = np.maximum(slope[:, None] * future + intercept[:, None], 0.0)
+
+    def _metrics(pred: np.ndarray) -> Dict[str, float]:
+        err = np.abs(pred - actual)
+        positive = actual > 0
+        return {
+            "mae": round(float(err.mean()), 4),
+            "wape": round(float(err.sum() / actual.sum()) if actual.sum() > 0 else 0.0, 4),
+            "mape": round(float((err[positive] / actual[positive]).mean()) if positive.any() else 0.0, 4),
+        }
+
+    return {
+        "series": int(y.shape[0]),
+        "days": int(y.shape[1]),
+        "holdout": holdout,
+        "fit_seconds": round(fit_seconds, 4),
+        "model": _metrics(predicted),
+        "baseline": _metrics(baseline),
+    }
+
+
+class CostForecaster:
+    """
+    账单成本预测器
+
+    用法:
+        forecaster = CostForecaster.shared()
+        forecaster.refresh()                      # 首次全量拟合，之后每天增量更新
+        forecaster.predict(account_id, horizon=30)
+        forecaster.current()                      # 请求路径：不拟合，需要时提交后台刷新
+    """
+
+    HISTORY_DAYS = 180
+    REFIT_DAYS = 28
+    # 账单日在之后若干天内仍会补录，只吸收 today - SETTLE_DAYS 及更早的日期
+    SETTLE_DAYS = 2
+
+    def __init__(self, db: Optional[DatabaseAdapter] = None, state_path: Optional[str] = None):
+        """
+        Args:
+            db: 数据库适配器，默认延迟创建 MySQL 适配器
+            state_path: 拟合结果缓存文件，默认 ~/.cloudlens/forecast/models.npz
+        """
+        self._db = db
+        self.state_path = Path(state_path or os.path.expanduser("~/.cloudlens/forecast/models.npz"))
+        self.models: Optional[ForecastModels] = None
+        self._lock = threading.RLock()
+        self._refresh_future: Optional[Future] = None
+        self._future_lock = threading.Lock()
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    # ---- 账单日成本矩阵 ----
+
+    def _load_matrix(
+        self, start: date, end: date, keys: Optional[List[SeriesKey]] = None
+    ) -> Tuple[List[SeriesKey], np.ndarray]:
+        """一次分组查询得到 [start, end] 内全部账号 × 产品（含账号合计）的日成本矩阵，给定 keys 时只查这些账号"""
+        params: Tuple = (start.isoformat(), end.isoformat())
+        account_filter = ""
+        if keys is not None:
+            accounts = sorted({account for account, _ in keys})
+            account_filter = f"AND account_id IN ({', '.join(['%s'] * len(accounts))})"
+            params += tuple(accounts)
+        rows = self._get_db().query(
+            f"""
+            SELECT account_id, billing_date, product_name, SUM(pretax_amount) AS total
+            FROM bill_items
+            WHERE billing_date >= %s AND billing_date <= %s
+              AND pretax_amount IS NOT NULL {account_filter}
+            GROUP BY account_id, billing_date, product_name
+            """,
+            params,
+        ) or []
+
+        cells: Dict[SeriesKey, Dict[int, float]] = {}
+        for row in rows:
+            offset = (_as_date(row["billing_date"]) - start).days
+            value = float(row.get("total") or 0)
+            account = row["account_id"]
+            for key in ((account, row.get("product_name") or ""), (account, TOTAL)):
+                days = cells.setdefault(key, {})
+                days[offset] = days.get(offset, 0.0) + value
+
+        if keys is None:
+            keys = sorted(cells)
+        matrix = np.zeros((len(keys), (end - start).days + 1))
+        for i, key in enumerate(keys):
+            for offset, value in cells.get(key, {}).items():
+                matrix[i, offset] = value
+        return keys, matrix
+
+    # ---- 拟合与增量更新 ----
+
+    def last_complete_day(self, today: Optional[date] = None) -> date:
+        """已出全的最后一个账单日"""
+        return (today or date.today()) - timedelta(days=self.SETTLE_DAYS)
+
+    def fit(self, end: Optional[date] = None, keys: Optional[List[SeriesKey]] = None) -> ForecastModels:
+        """用最近 HISTORY_DAYS 天账单重新拟合全部序列（或只拟合 keys）"""
+        end = end or self.last_complete_day()
+        start = end - timedelta(days=self.HISTORY_DAYS - 1)
+        keys, matrix = self._load_matrix(start, end, keys)
+        started = time.perf_counter()
+        models = fit_models(matrix, keys, end, self.HISTORY_DAYS)
+        logger.info(f"成本预测拟合完成: {len(keys)} 条序列, 耗时 {time.perf_counter() - started:.2f}s")
+        return models
+
+    def _update(self, models: ForecastModels, end: date) -> ForecastModels:
+        """递推 last_date 之后到 end 的新账单日；新出现的序列按完整历史拟合后并入"""
+        seen, y_seen = self._load_matrix(models.last_date + timedelta(days=1), end)
+        y_new = np.zeros((len(models), y_seen.shape[1]))
+        added = []
+        for row, key in enumerate(seen):
+            i = models.index.get(key)
+            if i is None:
+                added.append(key)
+            else:
+                y_new[i] = y_seen[row]
+        models = update_models(models, y_new, self.HISTORY_DAYS)
+        if added:
+            models = merge_models(models, self.fit(end, added))
+            logger.info(f"成本预测新增 {len(added)} 条序列")
+        return models
+
+    def refresh(self, today: Optional[date] = None) -> Optional[ForecastModels]:
+        """
+        保证模型覆盖到最后一个已出全的账单日：没有模型或模型过旧时重新拟合，
+        否则只递推新增的天（新出现的账号/产品单独拟合并入）
+        """
+        end = self.last_complete_day(today)
+        with self._lock:
+            if self.models is None:
+                self.load()
+            models = self.models
+            try:
+                if models is None or time.time() - models.fitted_at > self.REFIT_DAYS * 86400:
+                    models = self.fit(end)
+                elif models.last_date < end:
+                    models = self._update(models, end)
+                else:
+                    return models
+            except Exception as e:
+                logger.warning(f"成本预测模型更新失败，沿用已有模型: {e}")
+                return self.models
+            self.models = models
+            self.save()
+            return models
+
+    def current(self, today: Optional[date] = None) -> Optional[ForecastModels]:
+        """
+        不阻塞地返回已有模型：尚未加载时尝试读取缓存文件（正在拟合时跳过），
+        没有模型、模型过旧或未覆盖到最后一个已出全的账单日时提交后台刷新
+
+        Returns:
+            已有模型（可能落后几天，预测按 last_date 对齐），没有模型时为 None
+        """
+        if self.models is None and self._lock.acquire(blocking=False):
+            try:
+                if self.models is None:
+                    self.load()
+            finally:
+                self._lock.release()
+        models = self.models
+        if (
+            models is None
+            or time.time() - models.fitted_at > self.REFIT_DAYS * 86400
+            or models.last_date < self.last_complete_day(today)
+        ):
+            self.refresh_in_background(today)
+        return models
+
+    def refresh_in_background(self, today: Optional[date] = None) -> bool:
+        """
+        在后台线程执行 refresh()，立即返回（同一预测器同时只有一个后台刷新）
+
+        Returns:
+            是否提交了新的后台刷新
+        """
+        with self._future_lock:
+            if self._refresh_future is not None and not self._refresh_future.done():
+                return False
+            cls = type(self)
+            with cls._shared_lock:
+                if cls._refresh_executor is None:
+                    cls._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cost-forecast")
+            self._refresh_future = cls._refresh_executor.submit(self.refresh, today)
+            return True
+
+    def predict(self, account_id: str, product: str = TOTAL, horizon: int = 30) -> Optional[Dict]:
+        """
+        单条序列的预测
+
+        Returns:
+            {"dates", "costs", "lower", "upper", "daily_trend", "rmse", "r2", "params",
+             "history": {"dates", "costs"}}；没有该序列时返回 None
+        """
+        with self._lock:
+            models = self.models
+        if models is None or (account_id, product) not in models.index:
+            return None
+        i = models.index[(account_id, product)]
+        costs = models.forecast(horizon)[i]
+        spread = 1.96 * models.rmse[i] * np.sqrt(np.arange(1, horizon + 1))
+        start = models.history_start
+        return {
+            "dates": [(models.last_date + timedelta(days=h)).isoformat() for h in range(1, horizon + 1)],
+            "costs": np.round(costs, 2).tolist(),
+            "lower": np.round(np.maximum(costs - spread, 0.0), 2).tolist(),
+            "upper": np.round(costs + spread, 2).tolist(),
+            "daily_trend": float(models.trend[i]),
+            "rmse": float(models.rmse[i]),
+            "r2": float(models.r2[i]),
+            "params": dict(zip(("alpha", "beta", "gamma"), models.params[i].tolist())),
+            "history": {
+                "dates": [(start + timedelta(days=d)).isoformat() for d in range(models.history.shape[1])],
+                "costs": np.round(models.history[i], 2).tolist(),
+            },
+        }
+
+    # ---- 持久化 ----
+
+    def save(self) -> None:
+        models = self.models
+        if models is None:
+            return
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_name(self.state_path.name + ".tmp.npz")
+            np.savez(
+                tmp,
+                accounts=np.array([k[0] for k in models.keys], dtype=str),
+                products=np.array([k[1] for k in models.keys], dtype=str),
+                params=models.params,
+                level=models.level,
+                trend=models.trend,
+                season=models.season,
+                rmse=models.rmse,
+                r2=models.r2,
+                history=models.history,
+                meta=np.array([models.last_date.isoformat(), repr(models.fitted_at)], dtype=str),
+            )
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.warning(f"保存成本预测模型失败: {e}")
+
+    def load(self) -> Optional[ForecastModels]:
+        if not self.state_path.exists():
+            return None
+        try:
+            with np.load(self.state_path) as data:
+                last_date, fitted_at = data["meta"].tolist()
+                self.models = ForecastModels(
+                    keys=list(zip(data["accounts"].tolist(), data["products"].tolist())),
+                    params=data["params"],
+                    level=data["level"],
+                    trend=data["trend"],
+                    season=data["season"],
+                    rmse=data["rmse"],
+                    r2=data["r2"],
+                    last_date=_as_date(last_date),
+                    history=data["history"],
+                    fitted_at=float(fitted_at),
+                )
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"读取成本预测模型失败，将重新拟合: {e}")
+            self.models = None
+        return self.models
+
+    # ---- 进程内共享 ----
+
+    _shared: Optional["CostForecaster"] = None
+    _shared_lock = threading.Lock()
+    _refresh_executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def shared(cls, db: Optional[DatabaseAdapter] = None) -> "CostForecaster":
+        """进程内共享的预测器"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(db=db)
+            return cls._shared
+
+    @classmethod
+    def notify_bills_ingested(cls) -> None:
+        """账单入库钩子：共享预测器已创建时在后台吸收新的已出全账单日"""
+        forecaster = cls._shared
+        if forecaster is not None:
+            forecaster.refresh_in_background()
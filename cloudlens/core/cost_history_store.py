@@ -0,0 +1,219 @@
+"""
+成本快照时序存储
+
+按账号、按月分段的追加写存储，替代每次整文件读写的 cost_history_{account}.json：
+- 每个分段两个文件：
+  - YYYY-MM.dat   快照记录（紧凑 JSON，追加写）
+  - YYYY-MM.idx   定长时间索引列（时间戳、偏移、长度、总成本、资源数），追加写
+- 追加 O(1)：两个文件各追加一条，不读取已有数据
+- 区间读取只打开时间范围覆盖的分段，用索引列筛选记录后按偏移读取，不解析无关快照
+- 降采样（日/周/月）只读索引列，只解析每个时间桶的代表快照
+- 保留期按整段删除
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 时间戳(秒)、记录偏移、记录长度、总成本、资源数
+INDEX_DTYPE = np.dtype([("ts", "<f8"), ("offset", "<u8"), ("length", "<u4"), ("total", "<f8"), ("count", "<u4")])
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+_SEGMENT_NAME = re.compile(r"^(\d{4})-(\d{2})\.idx$")
+
+
+def _segment_name(ts: datetime) -> str:
+    return ts.strftime("%Y-%m")
+
+
+def _segment_range(name: str) -> Tuple[datetime, datetime]:
+    """分段覆盖的 [月初, 下月初)"""
+    start = datetime.strptime(name, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _bucket_key(ts: datetime, freq: str) -> str:
+    if freq == "daily":
+        return ts.strftime("%Y-%m-%d")
+    if freq == "weekly":
+        # 以周一为一周起点
+        return (ts - timedelta(days=ts.weekday())).strftime("%Y-%m-%d")
+    return ts.strftime("%Y-%m")
+
+
+class CostHistoryStore:
+    """单个账号的成本快照时序存储"""
+
+    def __init__(self, root: Path, account_name: str):
+        self.account_name = account_name
+        self.dir = Path(root) / account_name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def append(self, snapshot: Dict) -> None:
+        """追加一个快照（snapshot 需包含 ISO 格式 timestamp、total_cost、resource_count）"""
+        ts = datetime.fromisoformat(snapshot["timestamp"])
+        record = (json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        name = _segment_name(ts)
+        with self._lock:
+            data_path = self.dir / f"{name}.dat"
+            with open(data_path, "ab") as f:
+                offset = f.tell()
+                f.write(record)
+            entry = np.array(
+                [(ts.timestamp(), offset, len(record), float(snapshot.get("total_cost", 0)),
+                  int(snapshot.get("resource_count", 0)))],
+                dtype=INDEX_DTYPE,
+            )
+            # 先写记录再写索引：崩溃时最多丢一条未索引的记录
+            with open(self.dir / f"{name}.idx", "ab") as f:
+                f.write(entry.tobytes())
+
+    def import_json(self, history: Iterable[Dict]) -> int:
+        """导入旧版 JSON 历史（按时间排序后追加）"""
+        count = 0
+        for snapshot in sorted(history, key=lambda s: s["timestamp"]):
+            self.append(snapshot)
+            count += 1
+        return count
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def segments(self) -> List[str]:
+        """全部分段名（YYYY-MM，升序）"""
+        names = []
+        for path in self.dir.iterdir():
+            match = _SEGMENT_NAME.match(path.name)
+            if match:
+                names.append(path.stem)
+        return sorted(names)
+
+    def _covering(self, start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+        names = []
+        for name in self.segments():
+            seg_start, seg_end = _segment_range(name)
+            if (start is None or seg_end > start) and (end is None or seg_start <= end):
+                names.append(name)
+        return names
+
+    def _load_index(self, name: str) -> np.ndarray:
+        raw = (self.dir / f"{name}.idx").read_bytes()
+        usable = len(raw) - len(raw) % INDEX_DTYPE.itemsize  # 忽略写了一半的索引项
+        return np.frombuffer(raw[:usable], dtype=INDEX_DTYPE)
+
+    def _select(self, start: Optional[datetime], end: Optional[datetime]) -> List[Tuple[str, np.ndarray]]:
+        """时间范围内的索引项（按分段），每段内按时间排序"""
+        lo = start.timestamp() if start else -np.inf
+        hi = end.timestamp() if end else np.inf
+        selected = []
+        for name in self._covering(start, end):
+            index = self._load_index(name)
+            rows = index[(index["ts"] > lo) & (index["ts"] <= hi)]
+            if len(rows):
+                selected.append((name, np.sort(rows, order="ts", kind="stable")))
+        return selected
+
+    def _read_records(self, name: str, rows: np.ndarray) -> List[Dict]:
+        snapshots = []
+        with open(self.dir / f"{name}.dat", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            for row in rows:
+                if int(row["offset"]) + int(row["length"]) > size:
+                    continue
+                f.seek(int(row["offset"]))
+                snapshots.append(json.loads(f.read(int(row["length"]))))
+        return snapshots
+
+    def read(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+        """读取 (start, end] 内的快照，按时间升序"""
+        snapshots: List[Dict] = []
+        for name, rows in self._select(start, end):
+            snapshots.extend(self._read_records(name, rows))
+        return snapshots
+
+    def series(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> np.ndarray:
+        """只读索引列的时间序列（ts, total, count），不解析快照"""
+        parts = [rows for _, rows in self._select(start, end)]
+        if not parts:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.concatenate(parts)
+
+    def downsample(
+        self,
+        freq: str = "daily",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """
+        降采样视图
+
+        每个时间桶取最后一个快照作为代表（成本快照是月成本估算值，取最新值而不是求和），
+        并给出桶内总成本的均值/最大/最小和快照数。
+
+        Args:
+            freq: daily / weekly / monthly
+
+        Returns:
+            按时间升序的桶列表，每项为代表快照加 period/samples/avg_cost/max_cost/min_cost
+        """
+        if freq not in FREQUENCIES:
+            raise ValueError(f"不支持的降采样粒度: {freq}")
+
+        buckets: Dict[str, List[Tuple[str, np.void]]] = {}
+        for name, rows in self._select(start, end):
+            for row in rows:
+                key = _bucket_key(datetime.fromtimestamp(float(row["ts"])), freq)
+                buckets.setdefault(key, []).append((name, row))
+
+        result = []
+        for key in sorted(buckets):
+            members = buckets[key]
+            name, last = members[-1]
+            records = self._read_records(name, np.array([last], dtype=INDEX_DTYPE))
+            if not records:
+                continue
+            totals = [float(row["total"]) for _, row in members]
+            result.append({
+                **records[0],
+                "period": key,
+                "samples": len(members),
+                "avg_cost": round(sum(totals) / len(totals), 2),
+                "max_cost": round(max(totals), 2),
+                "min_cost": round(min(totals), 2),
+            })
+        return result
+
+    # ------------------------------------------------------------------
+    # 保留期
+    # ------------------------------------------------------------------
+
+    def apply_retention(self, days: int, now: Optional[datetime] = None) -> List[str]:
+        """删除整段都早于保留期的分段，返回删除的分段名"""
+        cutoff = (now or datetime.now()) - timedelta(days=days)
+        dropped = []
+        with self._lock:
+            for name in self.segments():
+                if _segment_range(name)[1] <= cutoff:
+                    for suffix in (".idx", ".dat"):
+                        (self.dir / f"{name}{suffix}").unlink(missing_ok=True)
+                    dropped.append(name)
+        if dropped:
+            logger.info(f"成本历史 {self.account_name} 删除过期分段: {', '.join(dropped)}")
+        return dropped
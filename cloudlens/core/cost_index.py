@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+实例成本索引
+
+从 bill_items 一次分组查询构建 instance_id -> 成本 的哈希表，
+供闲置分析器、OptimizationEngine 和仪表盘节省潜力估算共享，
+替代按实例逐个查询成本。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+# 账单中一个月按30天折算
+DAYS_PER_MONTH = 30
+
+# 资源类型 -> bill_items.product_code
+RESOURCE_PRODUCT_CODES = {
+    "ecs": "ecs", "rds": "rds", "redis": "kvstore", "slb": "slb",
+    "eip": "eip", "nat": "nat_gw", "nat_gw": "nat_gw",
+    "yundisk": "yundisk", "disk": "yundisk", "snapshot": "snapshot",
+    "oss": "oss", "nas": "nas",
+}
+
+# 资源类型 -> 实例ID前缀（账单中同一产品代码下可能混有其他子资源）
+RESOURCE_ID_PREFIXES = {
+    "ecs": "i-", "rds": "rm-", "redis": "r-", "slb": "lb-",
+    "eip": "eip-", "nat": "ngw-", "nat_gw": "ngw-",
+    "yundisk": "d-", "disk": "d-", "snapshot": "s-",
+}
+
+
+@dataclass
+class CostEntry:
+    """单个实例的成本汇总"""
+
+    instance_id: str
+    product_code: str = ""
+    payg_monthly: float = 0.0  # 按量付费：按日均折算的月成本
+    subscription_monthly: float = 0.0  # 包年包月：窗口内费用按月摊销
+    last_seen: Optional[str] = None  # 最近一次出现在账单中的日期（或账期）
+
+    @property
+    def monthly_cost(self) -> float:
+        """月均成本（按量 + 包年包月摊销）"""
+        return round(self.payg_monthly + self.subscription_monthly, 2)
+
+    def to_dict(self) -> Dict:
+        return {
+            "instance_id": self.instance_id,
+            "product_code": self.product_code,
+            "monthly_cost": self.monthly_cost,
+            "payg_monthly": round(self.payg_monthly, 2),
+            "subscription_monthly": round(self.subscription_monthly, 2),
+            "last_seen": self.last_seen,
+        }
+
+
+def shift_billing_cycle(cycle: str, months: int) -> str:
+    """账期 YYYY-MM 向前/后平移若干个月"""
+    year, month = (int(x) for x in cycle.split("-"))
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class CostIndex:
+    """
+    实例成本索引
+
+    用法:
+        index = CostIndex.for_account(account_id)
+        index.monthly_cost("i-xxx")
+        index.cost_map(product_codes=["ecs"])
+    """
+
+    def __init__(
+        self,
+        account_id: str,
+        months: int = 3,
+        end_cycle: Optional[str] = None,
+        db: Optional[DatabaseAdapter] = None,
+    ):
+        """
+        Args:
+            account_id: bill_items 中的账号ID（{access_key_id[:10]}-{账号名}）
+            months: 统计窗口（含结束账期在内的最近 N 个账期）
+            end_cycle: 窗口结束账期 YYYY-MM，默认当月
+            db: 数据库适配器，默认延迟创建 MySQL 适配器
+        """
+        self.account_id = account_id
+        self.months = max(1, int(months))
+        self.end_cycle = end_cycle or datetime.now().strftime("%Y-%m")
+        self.start_cycle = shift_billing_cycle(self.end_cycle, -(self.months - 1))
+        self._db = db
+        self._entries: Dict[str, CostEntry] = {}
+        self.built_at: Optional[float] = None
+        # 构建失败时为 True（按空索引处理，只短暂缓存）
+        self.failed = False
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    def build(self) -> "CostIndex":
+        """一次分组查询构建索引"""
+        rows = self._get_db().query(
+            """
+            SELECT instance_id,
+                   subscription_type,
+                   MAX(product_code) AS product_code,
+                   SUM(pretax_amount) AS total,
+                   COUNT(DISTINCT billing_cycle) AS cycles,
+                   COUNT(DISTINCT NULLIF(billing_date, '')) AS days,
+                   MAX(billing_date) AS last_date,
+                   MAX(billing_cycle) AS last_cycle
+            FROM bill_items
+            WHERE account_id = %s
+              AND billing_cycle >= %s AND billing_cycle <= %s
+              AND instance_id IS NOT NULL AND instance_id <> ''
+            GROUP BY instance_id, subscription_type
+            """,
+            (self.account_id, self.start_cycle, self.end_cycle),
+        )
+        entries: Dict[str, CostEntry] = {}
+        for row in rows or []:
+            self._merge_row(entries, row)
+        self._entries = entries
+        self.built_at = time.time()
+        logger.info(
+            f"成本索引构建完成: {self.account_id} {self.start_cycle}~{self.end_cycle}, {len(entries)} 个实例"
+        )
+        return self
+
+    def _merge_row(self, entries: Dict[str, CostEntry], row: Dict) -> None:
+        instance_id = str(row.get("instance_id"))
+        total = float(row.get("total") or 0)
+        entry = entries.get(instance_id)
+        if entry is None:
+            entry = entries[instance_id] = CostEntry(instance_id, row.get("product_code") or "")
+
+        if (row.get("subscription_type") or "") == "Subscription":
+            # 包年包月通常在某个账期一次性出账，按窗口月数摊销
+            entry.subscription_monthly += total / self.months
+        else:
+            days = int(row.get("days") or 0)
+            cycles = int(row.get("cycles") or 0)
+            if days > 0:
+                entry.payg_monthly += total / days * DAYS_PER_MONTH
+            elif cycles > 0:
+                entry.payg_monthly += total / cycles
+
+        last_seen = row.get("last_date") or row.get("last_cycle")
+        if last_seen is not None:
+            last_seen = last_seen.strftime("%Y-%m-%d") if hasattr(last_seen, "strftime") else str(last_seen)
+            if entry.last_seen is None or last_seen > entry.last_seen:
+                entry.last_seen = last_seen
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, instance_id: str) -> bool:
+        return instance_id in self._entries
+
+    def get(self, instance_id: str) -> Optional[CostEntry]:
+        return self._entries.get(instance_id)
+
+    def monthly_cost(self, instance_id: str, default: Optional[float] = None) -> Optional[float]:
+        """实例月均成本，未出现在账单中时返回 default"""
+        entry = self._entries.get(instance_id)
+        return entry.monthly_cost if entry is not None else default
+
+    def get_many(self, instance_ids: Iterable[str]) -> Dict[str, float]:
+        """批量获取月均成本（只包含命中的实例）"""
+        result = {}
+        for instance_id in instance_ids:
+            entry = self._entries.get(instance_id)
+            if entry is not None:
+                result[instance_id] = entry.monthly_cost
+        return result
+
+    def cost_map(self, product_codes: Optional[Iterable[str]] = None, prefix: Optional[str] = None) -> Dict[str, float]:
+        """
+        导出 instance_id -> 月均成本
+
+        Args:
+            product_codes: 只保留这些产品代码（如 ecs、rds、kvstore）
+            prefix: 只保留以该前缀开头的实例ID（如 i-）
+        """
+        codes = {c.lower() for c in product_codes} if product_codes else None
+        return {
+            instance_id: entry.monthly_cost
+            for instance_id, entry in self._entries.items()
+            if entry.monthly_cost > 0
+            and (codes is None or (entry.product_code or "").lower() in codes)
+            and (prefix is None or instance_id.startswith(prefix))
+        }
+
+    # ---- 进程内共享 ----
+
+    _shared: Dict[Tuple[str, int], "CostIndex"] = {}
+    _shared_lock = threading.Lock()
+    # 每个 (账号, 窗口) 一把构建锁：同一索引只构建一次，不同账号的构建互不阻塞
+    _build_locks: Dict[Tuple[str, int], threading.Lock] = {}
+    # invalidate 计数，构建期间发生失效时结果不写入共享表
+    _generation = 0
+    # 构建失败的空索引缓存时长（秒），数据库恢复后尽快重建
+    FAILURE_TTL_SECONDS = 60
+
+    @classmethod
+    def _fresh(cls, index: Optional["CostIndex"], ttl_seconds: int) -> bool:
+        if index is None or not index.built_at:
+            return False
+        ttl = min(ttl_seconds, cls.FAILURE_TTL_SECONDS) if index.failed else ttl_seconds
+        return time.time() - index.built_at < ttl
+
+    @classmethod
+    def for_account(
+        cls,
+        account_id: str,
+        months: int = 3,
+        ttl_seconds: int = 3600,
+        db: Optional[DatabaseAdapter] = None,
+    ) -> "CostIndex":
+        """
+        获取账号的共享索引（同一进程内一次扫描只构建一次）
+
+        构建在全局锁之外进行，同一索引的并发请求等待同一次构建。
+        构建失败（如数据库不可用）时返回空索引，调用方按未命中处理；
+        失败结果只缓存 FAILURE_TTL_SECONDS。
+        """
+        key = (account_id, months)
+        with cls._shared_lock:
+            index = cls._shared.get(key)
+            if cls._fresh(index, ttl_seconds):
+                return index
+            build_lock = cls._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with cls._shared_lock:
+                index = cls._shared.get(key)
+                if cls._fresh(index, ttl_seconds):
+                    return index
+                generation = cls._generation
+            index = cls(account_id, months=months, db=db)
+            try:
+                index.build()
+            except Exception as e:
+                logger.warning(f"成本索引构建失败，按空索引处理: {e}")
+                index.failed = True
+                index.built_at = time.time()
+            with cls._shared_lock:
+                if generation == cls._generation:
+                    cls._shared[key] = index
+            return index
+
+    @classmethod
+    def invalidate(cls, account_id: Optional[str] = None) -> None:
+        """账单同步后清除共享索引"""
+        with cls._shared_lock:
+            cls._generation += 1
+            if account_id is None:
+                cls._shared.clear()
+            else:
+                for key in [k for k in cls._shared if k[0] == account_id]:
+                    del cls._shared[key]
+
+
+def account_id_for(access_key_id: str, account_name: str) -> str:
+    """由 AccessKey 和账号名得到 bill_items 中使用的账号ID"""
+    return f"{access_key_id[:10]}-{account_name}"
+
+
+def bill_account_id(account_config) -> str:
+    """bill_items 中使用的账号ID"""
+    return account_id_for(account_config.access_key_id, account_config.name)
+
+
+def resource_cost_map(resource_type: str, account_config) -> Dict[str, float]:
+    """
+    某类资源的 instance_id -> 月均成本（取账号的共享索引）
+
+    资源类型未知或账单未同步时返回空表，调用方回退到其他成本来源。
+    """
+    product_code = RESOURCE_PRODUCT_CODES.get(resource_type)
+    if not product_code:
+        return {}
+    try:
+        index = CostIndex.for_account(bill_account_id(account_config))
+        return index.cost_map(product_codes=[product_code], prefix=RESOURCE_ID_PREFIXES.get(resource_type))
+    except Exception as e:
+        logger.debug(f"成本索引不可用: {e}")
+        return {}
+
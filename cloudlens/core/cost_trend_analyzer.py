@@ -11,6 +11,12 @@ from pathlib import Path
 # 移除sqlite3导入，改用数据库抽象层
 import os
 
+import numpy as np
+
+from cloudlens.core.cost_history_store import CostHistoryStore
+from cloudlens.core.cost_index import bill_account_id
+from cloudlens.core.cost_trend_engine import CostTrendEngine, default_granularity
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,11 +31,36 @@ class CostTrendAnalyzer:
         
         # 账单数据库路径
         self.bills_db_path = os.path.expanduser("~/.cloudlens/bills.db")
-    
+        # 成本快照时序存储（按账号隔离）
+        self._stores: Dict[str, CostHistoryStore] = {}
+        # 账单趋势查询（结果按账号/日期范围/粒度共享缓存）
+        self._trend_engine: Optional[CostTrendEngine] = None
+        self._bill_account_ids: Dict[str, Optional[str]] = {}
+
+    # 成本快照保留天数
+    HISTORY_RETENTION_DAYS = 365
+
     def _get_cost_history_file(self, account_name: str) -> Path:
-        """获取指定账号的成本历史文件路径（按账号隔离）"""
+        """获取指定账号的旧版成本历史文件路径（仅用于迁移）"""
         return self.data_dir / f"cost_history_{account_name}.json"
 
+    def _get_history_store(self, account_name: str) -> CostHistoryStore:
+        """获取指定账号的成本快照存储，首次使用时迁移旧版 JSON 历史"""
+        store = self._stores.get(account_name)
+        if store is None:
+            store = CostHistoryStore(self.data_dir / "history", account_name)
+            legacy_file = self._get_cost_history_file(account_name)
+            if legacy_file.exists():
+                try:
+                    with open(legacy_file, "r") as f:
+                        imported = store.import_json(json.load(f))
+                    legacy_file.rename(legacy_file.with_suffix(".json.migrated"))
+                    logger.info(f"已迁移 {account_name} 的 {imported} 条成本历史到时序存储")
+                except Exception as e:
+                    logger.warning(f"Failed to migrate cost history for {account_name}: {e}")
+            self._stores[account_name] = store
+        return store
+
     def record_cost_snapshot(
         self, account_name: str, resources: List, timestamp: Optional[datetime] = None
     ):
@@ -179,33 +210,10 @@ class CostTrendAnalyzer:
         return base_cost
 
     def _append_snapshot(self, snapshot: Dict, account_name: str):
-        """追加快照到历史文件（按账号隔离）"""
-        history_file = self._get_cost_history_file(account_name)
-        history = []
-
-        # 读取现有历史
-        if history_file.exists():
-            try:
-                with open(history_file, "r") as f:
-                    history = json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load cost history for {account_name}: {e}")
-                history = []
-
-        # 追加新快照
-        history.append(snapshot)
-
-        # 保留最近365天数据
-        cutoff_date = datetime.now() - timedelta(days=365)
-        history = [
-            s
-            for s in history
-            if datetime.fromisoformat(s["timestamp"]) > cutoff_date
-        ]
-
-        # 保存
-        with open(history_file, "w") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        """追加快照到时序存储（按账号隔离），按整段清理超过保留期的数据"""
+        store = self._get_history_store(account_name)
+        store.append(snapshot)
+        store.apply_retention(self.HISTORY_RETENTION_DAYS)
 
     def get_cost_trend(
         self, account_name: str, days: int = 30
@@ -220,37 +228,42 @@ class CostTrendAnalyzer:
         Returns:
             (history_data, analysis)
         """
-        # 读取历史数据（按账号隔离的文件）
-        history_file = self._get_cost_history_file(account_name)
-        if not history_file.exists():
+        store = self._get_history_store(account_name)
+        if not store.segments():
             return [], {"error": "No cost history available"}
 
+        # 只读取时间范围覆盖的分段（已按时间排序）
         try:
-            with open(history_file, "r") as f:
-                history = json.load(f)
+            history = store.read(start=datetime.now() - timedelta(days=days))
         except Exception as e:
             logger.warning(f"Failed to load cost history for {account_name}: {e}")
             return [], {"error": f"Failed to load cost history: {str(e)}"}
 
-        # 筛选时间范围（账号已经在文件名中隔离，不需要再筛选）
-        cutoff_date = datetime.now() - timedelta(days=days)
-        history = [
-            s
-            for s in history
-            if datetime.fromisoformat(s["timestamp"]) > cutoff_date
-        ]
-
         if len(history) < 2:
             return history, {"error": "Insufficient data for trend analysis"}
 
-        # 按时间排序
-        history.sort(key=lambda x: x["timestamp"])
-
         # 分析趋势
         analysis = self._analyze_trend(history)
 
         return history, analysis
 
+    def get_cost_history_downsampled(
+        self, account_name: str, days: int = 365, freq: str = "daily"
+    ) -> List[Dict]:
+        """
+        获取降采样后的成本快照（按账号隔离）
+
+        Args:
+            account_name: 账号名称
+            days: 查询天数
+            freq: daily / weekly / monthly
+
+        Returns:
+            每个时间桶一条（桶内最后一个快照 + period/samples/avg_cost/max_cost/min_cost）
+        """
+        store = self._get_history_store(account_name)
+        return store.downsample(freq, start=datetime.now() - timedelta(days=days))
+
     def _analyze_trend(self, history: List[Dict]) -> Dict:
         """分析成本趋势"""
         if len(history) < 2:
@@ -314,12 +327,26 @@ class CostTrendAnalyzer:
             "trend": "上升" if total_change > 0 else "下降" if total_change < 0 else "平稳",
         }
 
+    def _get_trend_engine(self) -> CostTrendEngine:
+        if self._trend_engine is None:
+            self._trend_engine = CostTrendEngine()
+        return self._trend_engine
+
+    def _resolve_bill_account_id(self, account_name: str) -> Optional[str]:
+        """账号名 -> bill_items 中的账号ID（同一分析器内只读取一次配置）"""
+        if account_name not in self._bill_account_ids:
+            from cloudlens.core.config import ConfigManager
+            account_config = ConfigManager().get_account(account_name)
+            self._bill_account_ids[account_name] = bill_account_id(account_config) if account_config else None
+        return self._bill_account_ids[account_name]
+
     def get_real_cost_from_bills(
         self, 
         account_name: str, 
         days: int = 30,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        granularity: Optional[str] = None,
     ) -> Dict:
         """
         从账单数据库读取真实成本数据
@@ -329,463 +356,92 @@ class CostTrendAnalyzer:
             days: 查询天数，0表示获取所有历史数据（当start_date和end_date都提供时，此参数被忽略）
             start_date: 开始日期 YYYY-MM-DD格式（可选）
             end_date: 结束日期 YYYY-MM-DD格式（可选）
+            granularity: 时间粒度 day/week/month，默认一年以内按日、更长按周
             
         Returns:
             成本趋势数据
         """
-        # 使用BillStorageManager的数据库抽象层
         try:
-            from cloudlens.core.bill_storage import BillStorageManager
-            storage = BillStorageManager(self.bills_db_path)
-            db = storage.db
-            
+            account_id = self._resolve_bill_account_id(account_name)
+            if not account_id:
+                logger.warning(f"账号 '{account_name}' 未找到，无法查询账单数据")
+                return {"error": f"Account '{account_name}' not found"}
+
+            engine = self._get_trend_engine()
+
             # 计算起始和结束日期
             if start_date and end_date:
-                # 使用提供的日期范围
                 start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
                 end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-                logger.info(f"使用自定义日期范围: {start_date} 至 {end_date}")
             else:
-                # 使用days参数计算
                 end_date_obj = datetime.now()
                 if days == 0:
-                    # 获取所有历史数据：查询最早的账期
-                    rows = db.query("""
-                        SELECT MIN(billing_cycle) as earliest_cycle
-                        FROM bill_items
-                        WHERE account_id LIKE ?
-                            AND billing_cycle IS NOT NULL
-                    """, (f"%{account_name}%",))
-                    result = rows[0] if rows else None
-                    if result:
-                        earliest_cycle = result['earliest_cycle'] if isinstance(result, dict) else result[0]
-                        if earliest_cycle:
-                            year, month = map(int, earliest_cycle.split('-'))
-                            start_date_obj = datetime(year, month, 1)
-                            logger.info(f"获取所有历史数据，从最早账期开始: {earliest_cycle}")
-                        else:
-                            start_date_obj = end_date_obj - timedelta(days=90)
-                            logger.warning(f"未找到历史数据，使用默认90天")
+                    # 获取所有历史数据：从最早账期开始
+                    earliest = engine.earliest_date(account_id)
+                    if earliest:
+                        start_date_obj = datetime.strptime(earliest, "%Y-%m-%d")
                     else:
                         start_date_obj = end_date_obj - timedelta(days=90)
                         logger.warning(f"未找到历史数据，使用默认90天")
                 else:
                     start_date_obj = end_date_obj - timedelta(days=days)
-            
-            start_billing_date = start_date_obj.strftime("%Y-%m-%d")
-            end_billing_date = end_date_obj.strftime("%Y-%m-%d")
-            
-            # 根据 account_name 获取 account_config，构造正确的 account_id
-            # account_id 格式：{access_key_id[:10]}-{account_name}
-            from cloudlens.core.config import ConfigManager
-            cm = ConfigManager()
-            account_config = cm.get_account(account_name)
-            
-            if not account_config:
-                logger.warning(f"账号 '{account_name}' 未找到，无法查询账单数据")
-                return {"error": f"Account '{account_name}' not found"}
-            
-            # 构造正确的 account_id 格式
-            account_id = f"{account_config.access_key_id[:10]}-{account_name}"
-            
-            # 验证 account_id 是否存在（精确匹配）
-            rows = db.query("""
-                SELECT DISTINCT account_id 
-                FROM bill_items 
-                WHERE account_id = ?
-                LIMIT 1
-            """, (account_id,))
-            
-            if not rows:
-                # 如果精确匹配失败，尝试模糊匹配（兼容旧数据）
-                logger.warning(f"精确匹配失败，尝试模糊匹配: {account_id}")
-                rows = db.query("""
-                    SELECT DISTINCT account_id 
-                    FROM bill_items 
-                    WHERE account_id LIKE ?
-                    LIMIT 1
-                """, (f"%{account_name}%",))
-                
-                if not rows:
-                    logger.warning(f"未找到账号 '{account_name}' (account_id: {account_id}) 的账单数据")
-                    return {"error": "No cost history available"}
-                
-                result = rows[0]
-                matched_account_id = result['account_id'] if isinstance(result, dict) else result[0]
-                
-                if matched_account_id and matched_account_id != account_id:
-                    logger.warning(f"使用模糊匹配的 account_id: {matched_account_id} (期望: {account_id})")
-                    account_id = matched_account_id
-            else:
-                # 精确匹配成功
-                result = rows[0]
-                matched_account_id = result['account_id'] if isinstance(result, dict) else result[0]
-                account_id = matched_account_id
-            
-            logger.info(f"找到账号ID: {account_id}, 查询时间范围: {start_billing_date} 至今")
-            
-            # 计算起始账期（YYYY-MM格式）
-            start_billing_cycle = start_date_obj.strftime("%Y-%m")
-            end_billing_cycle = end_date_obj.strftime("%Y-%m")
-            
-            logger.info(f"查询账期范围: {start_billing_cycle} 到 {end_billing_cycle}")
-            
-            # 优先尝试通过API按天获取数据（仅当日期范围较小时，避免API调用过多）
-            daily_data = None
-            date_range_days = (end_date_obj - start_date_obj).days + 1
-            
-            if date_range_days <= 90:  # 只对90天内的数据尝试API获取
-                try:
-                    from cloudlens.core.config import ConfigManager
-                    from cloudlens.core.bill_fetcher import BillFetcher
-                    
-                    cm = ConfigManager()
-                    account_config = cm.get_account(account_name)
-                    
-                    if account_config:
-                        logger.info(f"尝试通过API按天获取数据: {start_billing_date} 至 {end_billing_date}")
-                        fetcher = BillFetcher(
-                            account_config.access_key_id,
-                            account_config.access_key_secret,
-                            use_database=False
-                        )
-                        
-                        # 按天获取账单数据
-                        daily_bills = fetcher.fetch_daily_bills(
-                            start_date=start_billing_date,
-                            end_date=end_billing_date
-                        )
-                        
-                        # 聚合每日成本
-                        api_daily_data = []
-                        for date_str, bills in sorted(daily_bills.items()):
-                            if bills:
-                                daily_cost = sum(float(bill.get('PretaxAmount', 0) or 0) for bill in bills)
-                                instance_count = len(set(bill.get('InstanceID', '') for bill in bills if bill.get('InstanceID')))
-                                api_daily_data.append((date_str, daily_cost, instance_count, len(bills)))
-                        
-                        if api_daily_data and len(api_daily_data) >= 2:
-                            logger.info(f"✅ 通过API获取到 {len(api_daily_data)} 天的按天数据")
-                            daily_data = api_daily_data
-                        else:
-                            logger.warning(f"API按天查询返回数据不足（{len(api_daily_data) if api_daily_data else 0}天），尝试从数据库查询")
-                    else:
-                        logger.warning(f"未找到账号配置，无法通过API获取按天数据")
-                except (ImportError, ModuleNotFoundError) as e:
-                    # 依赖缺失错误，需要明确提示用户
-                    logger.error(f"\n{'='*60}")
-                    logger.error(f"❌ 账单数据获取失败：缺少依赖包")
-                    logger.error(f"{str(e)}")
-                    logger.error(f"{'='*60}")
-                    # 不再继续尝试，而是向用户说明问题
-                    raise
-                except Exception as e:
-                    logger.warning(f"通过API按天获取数据失败: {str(e)}，尝试从数据库查询")
-            
-            # 如果API获取失败，尝试从数据库按日期聚合
-            if not daily_data or len(daily_data) < 2:
-                logger.info(f"从数据库按日期查询: {start_billing_date} 至 {end_billing_date}")
-                rows = db.query("""
-                    SELECT 
-                        billing_date,
-                        SUM(pretax_amount) as daily_cost,
-                        COUNT(DISTINCT instance_id) as instance_count,
-                        COUNT(*) as record_count
-                    FROM bill_items
-                    WHERE account_id = ?
-                        AND billing_date >= ?
-                        AND billing_date <= ?
-                        AND billing_date IS NOT NULL
-                        AND billing_date != ''
-                        AND pretax_amount IS NOT NULL
-                    GROUP BY billing_date
-                    ORDER BY billing_date
-                """, (account_id, start_billing_date, end_billing_date))
-                
-                # 转换为元组格式以保持兼容性
-                daily_data = [
-                    (row['billing_date'] if isinstance(row, dict) else row[0],
-                     float(row['daily_cost'] or 0) if isinstance(row, dict) else float(row[1] or 0),
-                     int(row['instance_count'] or 0) if isinstance(row, dict) else int(row[2] or 0),
-                     int(row['record_count'] or 0) if isinstance(row, dict) else int(row[3] or 0))
-                    for row in rows
-                ]
-                if daily_data:
-                    logger.info(f"从数据库获取到 {len(daily_data)} 天的按天数据")
-            
-            # 如果按日期查询仍然没有足够数据，则按账期查询并生成每日数据
-            if not daily_data or len(daily_data) < 2:
-                logger.info(f"按日期查询数据不足（{len(daily_data) if daily_data else 0}天），改用按账期查询")
-                
-                # 按账期聚合成本数据
-                rows = db.query("""
-                    SELECT
-                        billing_cycle,
-                        SUM(pretax_amount) as cycle_cost,
-                        COUNT(DISTINCT instance_id) as instance_count,
-                        COUNT(*) as record_count
-                    FROM bill_items
-                    WHERE account_id = ?
-                        AND billing_cycle >= ?
-                        AND billing_cycle <= ?
-                        AND billing_cycle IS NOT NULL
-                        AND pretax_amount IS NOT NULL
-                    GROUP BY billing_cycle
-                    ORDER BY billing_cycle
-                """, (account_id, start_billing_cycle, end_billing_cycle))
-                
-                cycle_data = rows
-
-                if not cycle_data or len(cycle_data) < 1:
-                    logger.warning(f"账单数据不足，没有找到账期数据")
-                    return {"error": "Insufficient data for trend analysis"}
-                
-                # 改进的按天分配逻辑：尝试从账单明细中获取更细粒度的数据
-                # 首先尝试按实例和计费类型分组，然后按天分配
-                dates = []
-                costs = []
-                instance_counts = []
-                
-                from calendar import monthrange
-                import random
-                
-                # 为每个账期生成按天的成本数据
-                for row in cycle_data:
-                    # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                    billing_cycle = row['billing_cycle'] if isinstance(row, dict) else row[0]
-                    cycle_cost = round(float(row['cycle_cost'] or 0) if isinstance(row, dict) else float(row[1] or 0), 2)
-                    instance_count = int(row['instance_count'] or 0) if isinstance(row, dict) else int(row[2] or 0)
-                    
-                    # 解析账期
-                    year, month = map(int, billing_cycle.split('-'))
-                    # 获取该月的天数
-                    days_in_month = monthrange(year, month)[1]
-                    
-                    # 计算该月的起始和结束日期
-                    cycle_start = datetime(year, month, 1)
-                    cycle_end = datetime(year, month, days_in_month)
-                    
-                    # 只包含在查询时间范围内的日期
-                    actual_start = max(cycle_start, start_date_obj)
-                    actual_end = min(cycle_end, end_date_obj)
-                    
-                    if actual_start > actual_end:
-                        continue
-                    
-                    # 计算实际天数
-                    actual_days = (actual_end - actual_start).days + 1
-                    
-                    # 尝试从数据库获取该账期的详细数据，按计费类型和实例分组
-                    rows2 = db.query("""
-                        SELECT 
-                            subscription_type,
-                            COUNT(DISTINCT instance_id) as instance_count,
-                            SUM(pretax_amount) as type_cost
-                        FROM bill_items
-                        WHERE account_id = ?
-                            AND billing_cycle = ?
-                            AND pretax_amount IS NOT NULL
-                        GROUP BY subscription_type
-                    """, (account_id, billing_cycle))
-                    
-                    type_data = rows2
-                    
-                    # 如果有按量付费的资源，尝试更智能的分配
-                    pay_as_you_go_cost = 0.0
-                    subscription_cost = 0.0
-                    
-                    for type_row in type_data:
-                        sub_type = (type_row['subscription_type'] if isinstance(type_row, dict) else type_row[0]) or "Unknown"
-                        type_cost = round(float(type_row['type_cost'] or 0) if isinstance(type_row, dict) else float(type_row[2] or 0), 2)
-                        
-                        if sub_type == "PayAsYouGo":
-                            pay_as_you_go_cost += type_cost
-                        else:
-                            subscription_cost += type_cost
-                    
-                    # 如果数据量很大（超过365天），进行采样以减少数据点
-                    if days == 0 or (actual_end - actual_start).days > 365:
-                        # 对于超过1年的数据，按周聚合（每周一个数据点）
-                        current_date = actual_start
-                        week_start = current_date
-                        week_cost = 0.0
-                        week_count = 0
-                        
-                        while current_date <= actual_end:
-                            # 按量付费的资源：每天的成本可能不同，使用轻微随机波动模拟
-                            # 包年包月的资源：每天成本相同
-                            daily_payg = (pay_as_you_go_cost / actual_days) if pay_as_you_go_cost > 0 else 0
-                            daily_sub = (subscription_cost / actual_days) if subscription_cost > 0 else 0
-                            
-                            # 为按量付费添加轻微波动（±5%），使曲线更真实
-                            if daily_payg > 0:
-                                variation = 1.0 + (random.random() - 0.5) * 0.1  # ±5%
-                                daily_payg = daily_payg * variation
-                            
-                            daily_cost = daily_payg + daily_sub
-                            week_cost += daily_cost
-                            week_count += 1
-                            
-                            # 每周生成一个数据点（或到达月末）
-                            if current_date.weekday() == 6 or current_date == actual_end:  # 周日或最后一天
-                                dates.append(week_start.strftime("%Y-%m-%d"))
-                                costs.append(round(week_cost, 2))
-                                instance_counts.append(instance_count)
-                                week_start = current_date + timedelta(days=1)
-                                week_cost = 0.0
-                                week_count = 0
-                            
-                            current_date += timedelta(days=1)
-                    else:
-                        # 对于短期数据，生成每日数据，使用更智能的分配
-                        current_date = actual_start
-                        
-                        # 为按量付费的资源生成带波动的每日成本
-                        if pay_as_you_go_cost > 0:
-                            # 生成一个平滑的成本序列（使用正弦波叠加，模拟真实波动）
-                            base_daily_payg = pay_as_you_go_cost / actual_days
-                            payg_costs = []
-                            
-                            for i in range(actual_days):
-                                # 使用多个频率的正弦波叠加，模拟真实成本波动
-                                day_of_week = (current_date + timedelta(days=i)).weekday()
-                                # 工作日通常成本稍高
-                                weekday_factor = 1.1 if day_of_week < 5 else 0.9
-                                
-                                # 添加周期性波动（周、月）
-                                week_cycle = 1.0 + 0.05 * (i % 7 - 3.5) / 3.5  # 一周内的波动
-                                month_cycle = 1.0 + 0.03 * (i % 30 - 15) / 15  # 一月内的波动
-                                
-                                cost = base_daily_payg * weekday_factor * week_cycle * month_cycle
-                                payg_costs.append(max(0, cost))  # 确保不为负
-                            
-                            # 归一化，确保总和等于总成本
-                            total_generated = sum(payg_costs)
-                            if total_generated > 0:
-                                payg_costs = [c * pay_as_you_go_cost / total_generated for c in payg_costs]
-                        else:
-                            payg_costs = [0.0] * actual_days
-                        
-                        # 包年包月的资源：每天成本相同
-                        daily_sub = (subscription_cost / actual_days) if subscription_cost > 0 else 0
-                        
-                        # 生成每日数据
-                        for i, day_payg in enumerate(payg_costs):
-                            daily_cost = day_payg + daily_sub
-                            dates.append((actual_start + timedelta(days=i)).strftime("%Y-%m-%d"))
-                            costs.append(round(daily_cost, 2))
-                            instance_counts.append(instance_count)
-                
-                if len(dates) < 2:
-                    logger.warning(f"生成的每日数据不足，只有 {len(dates)} 天")
-                    return {"error": "Insufficient data for trend analysis"}
-            else:
-                # 使用按日期查询的结果（来自数据库或API）
-                dates = []
-                costs = []
-                instance_counts = []
-                
-                for row in daily_data:
-                    dates.append(row[0])
-                    costs.append(round(row[1], 2))
-                    instance_counts.append(row[2])
-                
-                logger.info(f"✅ 使用按天数据: {len(dates)} 天，成本范围: ¥{min(costs):.2f} - ¥{max(costs):.2f}")
-            
-            # 按产品类型汇总（使用账期范围）
-            rows5 = db.query("""
-                SELECT 
-                    product_name,
-                    SUM(pretax_amount) as total_cost
-                FROM bill_items
-                WHERE account_id = ?
-                    AND billing_cycle >= ?
-                    AND billing_cycle <= ?
-                    AND product_name IS NOT NULL
-                    AND pretax_amount IS NOT NULL
-                GROUP BY product_name
-                ORDER BY total_cost DESC
-            """, (account_id, start_billing_cycle, end_billing_cycle))
-            
-            cost_by_type = {}
-            for row in rows5:
-                product = row['product_name'] if isinstance(row, dict) else row[0]
-                cost = float(row['total_cost'] or 0) if isinstance(row, dict) else float(row[1] or 0)
-                if product:  # 确保产品名称不为空
-                    cost_by_type[product] = round(cost, 2)
-            
-            # 按区域汇总（使用账期范围）
-            rows6 = db.query("""
-                SELECT 
-                    region,
-                    SUM(pretax_amount) as total_cost
-                FROM bill_items
-                WHERE account_id = ?
-                    AND billing_cycle >= ?
-                    AND billing_cycle <= ?
-                    AND region IS NOT NULL
-                    AND pretax_amount IS NOT NULL
-                GROUP BY region
-                ORDER BY total_cost DESC
-            """, (account_id, start_billing_cycle, end_billing_cycle))
-            
-            cost_by_region = {}
-            for row in rows6:
-                region = row['region'] if isinstance(row, dict) else row[0]
-                cost = float(row['total_cost'] or 0) if isinstance(row, dict) else float(row[1] or 0)
-                if region:  # 确保区域不为空
-                    cost_by_region[region] = round(cost, 2)
-            
-            # 计算分析指标
-            latest_cost = costs[-1] if costs else 0
-            oldest_cost = costs[0] if costs else 0
-            avg_cost = sum(costs) / len(costs) if costs else 0
-            max_cost = max(costs) if costs else 0
-            min_cost = min(costs) if costs else 0
-            
+
+            series = engine.query(
+                account_id,
+                start_date_obj.strftime("%Y-%m-%d"),
+                end_date_obj.strftime("%Y-%m-%d"),
+                granularity or default_granularity(start_date_obj, end_date_obj),
+            )
+            if not len(series):
+                logger.warning(f"未找到账号 '{account_name}' (account_id: {account_id}) 的账单数据")
+                return {"error": "No cost history available"}
+
+            costs = np.round(series.costs, 2)
+            latest_cost = float(costs[-1])
+            oldest_cost = float(costs[0])
             total_change = latest_cost - oldest_cost
             total_change_pct = (total_change / oldest_cost * 100) if oldest_cost > 0 else 0
-            
-            # 环比（最近两天）
-            mom_change = 0
-            mom_change_pct = 0
+
+            # 环比（最近两个时间桶）
+            mom_change = 0.0
+            mom_change_pct = 0.0
             if len(costs) >= 2:
-                mom_change = costs[-1] - costs[-2]
+                mom_change = float(costs[-1] - costs[-2])
                 mom_change_pct = (mom_change / costs[-2] * 100) if costs[-2] > 0 else 0
-            
-            # 计算实际的天数范围
-            if dates:
-                first_date = datetime.strptime(dates[0], "%Y-%m-%d")
-                last_date = datetime.strptime(dates[-1], "%Y-%m-%d")
-                actual_period_days = (last_date - first_date).days
+
+            dates = [str(p) for p in series.periods]
+            if days == 0 and series.granularity != "month":
+                actual_period_days = (datetime.strptime(dates[-1], "%Y-%m-%d")
+                                      - datetime.strptime(dates[0], "%Y-%m-%d")).days
             else:
-                actual_period_days = days if days > 0 else 0
-            
+                actual_period_days = days
+
             analysis = {
-                "period_days": actual_period_days if days == 0 else days,
+                "period_days": actual_period_days,
                 "latest_cost": round(latest_cost, 2),
                 "oldest_cost": round(oldest_cost, 2),
                 "total_change": round(total_change, 2),
-                "total_change_pct": round(total_change_pct, 2),
-                "avg_cost": round(avg_cost, 2),
-                "max_cost": round(max_cost, 2),
-                "min_cost": round(min_cost, 2),
+                "total_change_pct": round(float(total_change_pct), 2),
+                "avg_cost": round(float(costs.mean()), 2),
+                "max_cost": round(float(costs.max()), 2),
+                "min_cost": round(float(costs.min()), 2),
                 "mom_change": round(mom_change, 2),
-                "mom_change_pct": round(mom_change_pct, 2),
+                "mom_change_pct": round(float(mom_change_pct), 2),
                 "trend": "上升" if total_change > 0 else "下降" if total_change < 0 else "平稳",
             }
             
             return {
                 "account": account_name,
                 "period_days": days,
+                "granularity": series.granularity,
                 "analysis": analysis,
                 "chart_data": {
                     "dates": dates,
-                    "costs": costs,
-                    "resource_counts": instance_counts,
+                    "costs": costs.tolist(),
+                    "resource_counts": series.instance_counts.tolist(),
                 },
-                "cost_by_type": cost_by_type,
-                "cost_by_region": cost_by_region,
+                "cost_by_type": series.top_products(),
+                "cost_by_region": series.top_regions(),
                 "snapshots_count": len(dates),
                 "data_source": "real_bills"  # 标记数据来源
             }
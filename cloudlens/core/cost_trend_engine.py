@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+成本趋势查询引擎
+
+把账单趋势的时间分桶（日/周/月）、产品/区域分布都下推到数据库分组查询：
+- 时间序列一条 GROUP BY 查询，按桶返回成本、实例数、明细条数
+- 产品 × 区域一条 GROUP BY 查询，在 NumPy 中归并出产品分布、区域分布和 Top-N
+- 结果为 NumPy 数组，按 (账号, 起止日期, 粒度) 进程内缓存，账单入库后失效；
+  其他进程入库的账单通知不到本进程，缓存超过 TTL 后重新查询（与 CostIndex 一致）
+
+只有账期、没有账单日期的明细（按月汇总的账单）计入账期第一天所在的桶。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("day", "week", "month")
+
+# 明细的有效日期：优先账单日期，只有账期的明细取账期第一天
+_ITEM_DATE = "COALESCE(NULLIF(billing_date, ''), CONCAT(billing_cycle, '-01'))"
+
+_BUCKET_SQL = {
+    "day": _ITEM_DATE,
+    # 以周一为一周起点
+    "week": f"DATE_SUB({_ITEM_DATE}, INTERVAL WEEKDAY({_ITEM_DATE}) DAY)",
+    "month": f"SUBSTR({_ITEM_DATE}, 1, 7)",
+}
+
+# 日期范围条件：有账单日期的按日期过滤，只有账期的按账期过滤
+_RANGE_SQL = """
+    account_id = %s
+    AND pretax_amount IS NOT NULL
+    AND (
+        (billing_date IS NOT NULL AND billing_date <> '' AND billing_date >= %s AND billing_date <= %s)
+        OR ((billing_date IS NULL OR billing_date = '') AND billing_cycle >= %s AND billing_cycle <= %s)
+    )
+"""
+
+
+def _label(value) -> str:
+    """分桶值转为字符串标签（MySQL 的 DATE_SUB 返回 date 对象）"""
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+def _rank(names: np.ndarray, costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按名称归并成本并按成本降序排列"""
+    if not len(names):
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.float64)
+    keys, inverse = np.unique(names.astype(str), return_inverse=True)
+    sums = np.bincount(inverse, weights=costs, minlength=len(keys))
+    order = np.argsort(-sums, kind="stable")
+    return keys[order].astype(object), sums[order]
+
+
+@dataclass
+class TrendSeries:
+    """一个账号在一个日期范围内的成本趋势"""
+
+    account_id: str
+    start_date: str
+    end_date: str
+    granularity: str
+    periods: np.ndarray  # 桶标签：日/周为 YYYY-MM-DD（周取周一），月为 YYYY-MM
+    costs: np.ndarray  # float64
+    instance_counts: np.ndarray  # int64，桶内去重实例数
+    record_counts: np.ndarray  # int64，桶内明细条数
+    products: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    product_costs: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    regions: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    region_costs: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    cycle_level_records: int = 0  # 只有账期、没有账单日期的明细条数
+    built_at: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    @property
+    def total_cost(self) -> float:
+        return round(float(self.costs.sum()), 2)
+
+    @staticmethod
+    def _top(names: np.ndarray, costs: np.ndarray, n: Optional[int]) -> Dict[str, float]:
+        if n is None or len(names) <= n:
+            return {str(k): round(float(v), 2) for k, v in zip(names, costs)}
+        top = {str(k): round(float(v), 2) for k, v in zip(names[:n], costs[:n])}
+        top["其他"] = round(float(costs[n:].sum()), 2)
+        return top
+
+    def top_products(self, n: Optional[int] = None) -> Dict[str, float]:
+        """产品成本分布，n 指定时只保留前 n 个，其余合并为“其他”"""
+        return self._top(self.products, self.product_costs, n)
+
+    def top_regions(self, n: Optional[int] = None) -> Dict[str, float]:
+        """区域成本分布，n 指定时只保留前 n 个，其余合并为“其他”"""
+        return self._top(self.regions, self.region_costs, n)
+
+
+class CostTrendEngine:
+    """
+    成本趋势查询引擎
+
+    用法:
+        engine = CostTrendEngine()
+        series = engine.query(account_id, "2024-01-01", "2024-03-31", granularity="week")
+        series.costs, series.top_products(10)
+    """
+
+    # 进程内缓存条目上限，超出时淘汰最早写入的条目
+    MAX_ENTRIES = 256
+
+    _shared: Dict[Tuple[str, str, str, str], TrendSeries] = {}
+    # 账号 -> (最早日期, 查询时间)
+    _earliest: Dict[str, Tuple[Optional[str], float]] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db: Optional[DatabaseAdapter] = None, ttl_seconds: int = 3600):
+        """
+        Args:
+            db: 数据库适配器，默认延迟创建 MySQL 适配器
+            ttl_seconds: 缓存有效期（秒）
+        """
+        self._db = db
+        self.ttl_seconds = ttl_seconds
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    def query(self, account_id: str, start_date: str, end_date: str, granularity: str = "day") -> TrendSeries:
+        """
+        查询成本趋势（命中缓存时不访问数据库）
+
+        Args:
+            account_id: bill_items 中的账号ID（{access_key_id[:10]}-{账号名}）
+            start_date: 开始日期 YYYY-MM-DD（含）
+            end_date: 结束日期 YYYY-MM-DD（含）
+            granularity: day / week / month
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"不支持的时间粒度: {granularity}")
+
+        key = (account_id, start_date, end_date, granularity)
+        with self._shared_lock:
+            cached = self._shared.get(key)
+        if cached is not None and time.time() - cached.built_at < self.ttl_seconds:
+            return cached
+
+        series = self._build(account_id, start_date, end_date, granularity)
+        with self._shared_lock:
+            if key not in self._shared and len(self._shared) >= self.MAX_ENTRIES:
+                del self._shared[next(iter(self._shared))]
+            self._shared[key] = series
+        return series
+
+    def _build(self, account_id: str, start_date: str, end_date: str, granularity: str) -> TrendSeries:
+        params = (account_id, start_date, end_date, start_date[:7], end_date[:7])
+        db = self._get_db()
+
+        rows = db.query(
+            f"""
+            SELECT {_BUCKET_SQL[granularity]} AS bucket,
+                   SUM(pretax_amount) AS cost,
+                   COUNT(DISTINCT NULLIF(instance_id, '')) AS instance_count,
+                   COUNT(*) AS record_count,
+                   SUM(CASE WHEN billing_date IS NULL OR billing_date = '' THEN 1 ELSE 0 END) AS cycle_records
+            FROM bill_items
+            WHERE {_RANGE_SQL}
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            params,
+        ) or []
+        rows = [r for r in rows if r.get("bucket") is not None]
+
+        breakdown = db.query(
+            f"""
+            SELECT product_name, region, SUM(pretax_amount) AS cost
+            FROM bill_items
+            WHERE {_RANGE_SQL}
+            GROUP BY product_name, region
+            """,
+            params,
+        ) or []
+
+        product_rows = [r for r in breakdown if r.get("product_name")]
+        region_rows = [r for r in breakdown if r.get("region")]
+        products, product_costs = _rank(
+            np.array([r["product_name"] for r in product_rows], dtype=object),
+            np.array([float(r.get("cost") or 0) for r in product_rows], dtype=np.float64),
+        )
+        regions, region_costs = _rank(
+            np.array([r["region"] for r in region_rows], dtype=object),
+            np.array([float(r.get("cost") or 0) for r in region_rows], dtype=np.float64),
+        )
+
+        series = TrendSeries(
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date,
+            granularity=granularity,
+            periods=np.array([_label(r["bucket"]) for r in rows], dtype=object),
+            costs=np.array([float(r.get("cost") or 0) for r in rows], dtype=np.float64),
+            instance_counts=np.array([int(r.get("instance_count") or 0) for r in rows], dtype=np.int64),
+            record_counts=np.array([int(r.get("record_count") or 0) for r in rows], dtype=np.int64),
+            products=products,
+            product_costs=product_costs,
+            regions=regions,
+            region_costs=region_costs,
+            cycle_level_records=sum(int(r.get("cycle_records") or 0) for r in rows),
+            built_at=time.time(),
+        )
+        logger.info(
+            f"成本趋势查询完成: {account_id} {start_date}~{end_date} ({granularity}), {len(series)} 个时间桶"
+        )
+        return series
+
+    def earliest_date(self, account_id: str) -> Optional[str]:
+        """账号最早账期的第一天 YYYY-MM-DD，没有账单时返回 None"""
+        with self._shared_lock:
+            cached = self._earliest.get(account_id)
+        if cached is not None and time.time() - cached[1] < self.ttl_seconds:
+            return cached[0]
+        rows = self._get_db().query(
+            "SELECT MIN(billing_cycle) AS earliest_cycle FROM bill_items WHERE account_id = %s",
+            (account_id,),
+        ) or []
+        cycle = rows[0].get("earliest_cycle") if rows else None
+        earliest = f"{cycle}-01" if cycle else None
+        with self._shared_lock:
+            self._earliest[account_id] = (earliest, time.time())
+        return earliest
+
+    @classmethod
+    def invalidate(cls, account_id: Optional[str] = None) -> None:
+        """账单入库后清除缓存的趋势"""
+        with cls._shared_lock:
+            if account_id is None:
+                cls._shared.clear()
+                cls._earliest.clear()
+            else:
+                for key in [k for k in cls._shared if k[0] == account_id]:
+                    del cls._shared[key]
+                cls._earliest.pop(account_id, None)
+
+
+def default_granularity(start: datetime, end: datetime) -> str:
+    """默认粒度：一年以内按日，更长按周"""
+    return "day" if (end - start).days <= 365 else "week"
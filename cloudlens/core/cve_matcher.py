@@ -1,12 +1,23 @@
 """
 CVE Vulnerability Matcher
 Matches service versions against known vulnerabilities
+
+Rules are compiled once into a per-product interval index over normalized
+version tuples; lookups are memoized per (product, version). Besides the
+built-in list, local NVD JSON feeds (1.1 feeds or API 2.0 responses, optionally
+gzipped) can be loaded with CVEMatcher.load_feed or dropped into
+~/.cloudlens/cve/ to be picked up on first use.
 """
 
+import bisect
+import gzip
+import json
 import logging
 import re
+import threading
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger("CVEMatcher")
 
@@ -19,6 +30,154 @@ class Vulnerability:
     affected_versions: str  # e.g., "< 7.4", "1.10.0 - 1.14.0"
 
 
+Version = Tuple[int, ...]
+
+_VERSION_RE = re.compile(r"\d+(?:\.\d+)*")
+_SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+
+def normalize_version(version_str: str) -> Optional[Version]:
+    """
+    Parse the first dotted number sequence into a comparable tuple.
+    Trailing zeros are dropped so that "7.4" and "7.4.0" compare equal.
+    """
+    match = _VERSION_RE.search(version_str or "")
+    if not match:
+        return None
+    parts = [int(x) for x in match.group(0).split(".")]
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+@dataclass(frozen=True)
+class VersionRange:
+    """An interval of versions; None bounds are unbounded"""
+
+    low: Optional[Version] = None
+    low_inclusive: bool = True
+    high: Optional[Version] = None
+    high_inclusive: bool = True
+
+    def contains(self, version: Version) -> bool:
+        if self.low is not None and (version < self.low or (version == self.low and not self.low_inclusive)):
+            return False
+        if self.high is not None and (version > self.high or (version == self.high and not self.high_inclusive)):
+            return False
+        return True
+
+    def intersect(self, other: "VersionRange") -> "VersionRange":
+        low, low_inclusive = self.low, self.low_inclusive
+        if other.low is not None and (low is None or other.low > low or (other.low == low and not other.low_inclusive)):
+            low, low_inclusive = other.low, other.low_inclusive
+        high, high_inclusive = self.high, self.high_inclusive
+        if other.high is not None and (high is None or other.high < high or (other.high == high and not other.high_inclusive)):
+            high, high_inclusive = other.high, other.high_inclusive
+        return VersionRange(low, low_inclusive, high, high_inclusive)
+
+    @classmethod
+    def parse(cls, expression: str) -> Optional["VersionRange"]:
+        """
+        Compile a condition such as "< 7.4", "= 2.4.49", "1.10.0 - 1.14.0" or a
+        comma-separated conjunction like ">= 1.0, < 2.0". Returns None if unparseable.
+        """
+        result = cls()
+        for part in (p.strip() for p in expression.split(",")):
+            bound = cls._parse_one(part)
+            if bound is None:
+                return None
+            result = result.intersect(bound)
+        return result
+
+    @classmethod
+    def _parse_one(cls, condition: str) -> Optional["VersionRange"]:
+        op_match = re.match(r"^(<=|>=|<|>|=)\s*(.+)$", condition)
+        if op_match:
+            op, target = op_match.groups()
+            version = normalize_version(target)
+            if version is None:
+                return None
+            if op == "<":
+                return cls(high=version, high_inclusive=False)
+            if op == "<=":
+                return cls(high=version)
+            if op == ">":
+                return cls(low=version, low_inclusive=False)
+            if op == ">=":
+                return cls(low=version)
+            return cls(low=version, high=version)
+
+        if " - " in condition or condition.count("-") == 1:
+            start_str, end_str = condition.split(" - " if " - " in condition else "-", 1)
+            start, end = normalize_version(start_str), normalize_version(end_str)
+            if start is None or end is None:
+                return None
+            return cls(low=start, high=end)
+        return None
+
+
+class _ProductIndex:
+    """
+    Interval index for one product.
+
+    All range endpoints are sorted into a list of points; a version falls in
+    either a point slot (equal to an endpoint) or a gap slot between two
+    endpoints, found with one bisect. Within a slot every version matches the
+    same rules, so each slot's match list is computed once and reused.
+    """
+
+    def __init__(self, entries: List[Tuple[Vulnerability, VersionRange]]):
+        self.entries = entries
+        self.points: List[Version] = sorted(
+            {b for _, r in entries for b in (r.low, r.high) if b is not None}
+        )
+        self._spans = [self._span(r) for _, r in entries]
+        self._slots: Dict[int, Tuple[int, ...]] = {}
+
+    def _slot(self, version: Version) -> int:
+        i = bisect.bisect_left(self.points, version)
+        if i < len(self.points) and self.points[i] == version:
+            return 2 * i + 1
+        return 2 * i
+
+    def _span(self, r: VersionRange) -> Tuple[int, int]:
+        if r.low is None:
+            start = 0
+        else:
+            i = bisect.bisect_left(self.points, r.low)
+            start = 2 * i + 1 if r.low_inclusive else 2 * i + 2
+        if r.high is None:
+            end = 2 * len(self.points)
+        else:
+            i = bisect.bisect_left(self.points, r.high)
+            end = 2 * i + 1 if r.high_inclusive else 2 * i
+        return start, end
+
+    def lookup(self, version: Version) -> List[Vulnerability]:
+        slot = self._slot(version)
+        hits = self._slots.get(slot)
+        if hits is None:
+            hits = tuple(i for i, (start, end) in enumerate(self._spans) if start <= slot <= end)
+            self._slots[slot] = hits
+        seen = set()
+        result = []
+        for i in hits:
+            vuln = self.entries[i][0]
+            if vuln.id not in seen:
+                seen.add(vuln.id)
+                result.append(vuln)
+        return result
+
+
+# NVD CPE product names -> names used by the scanner
+CPE_PRODUCTS = {
+    "openssh": "OpenSSH",
+    "nginx": "Nginx",
+    "http_server": "Apache",
+    "redis": "Redis",
+}
+
+
 class CVEMatcher:
     """
     Matches detected software versions against a local database of common CVEs.
@@ -80,69 +239,162 @@ class CVEMatcher:
         ],
     }
 
-    @staticmethod
-    def _parse_version(version_str: str) -> List[int]:
-        """Parse version string into a list of integers for comparison"""
-        # Extract the first sequence of numbers separated by dots
-        match = re.search(r"(\d+(?:\.\d+)+)", version_str)
-        if not match:
-            return []
+    # Local feed directory picked up automatically on first use
+    FEED_DIR = Path.home() / ".cloudlens" / "cve"
+    # Bound on memoized (product, version) lookups
+    MAX_CACHED_LOOKUPS = 100_000
 
-        try:
-            return [int(x) for x in match.group(1).split(".")]
-        except ValueError:
-            return []
+    _feed_vulnerabilities: Dict[str, List[Vulnerability]] = {}
+    _feed_dir_loaded = False
+    _index: Optional[Dict[str, _ProductIndex]] = None
+    _cache: Dict[Tuple[str, str], Tuple[Dict, ...]] = {}
+    _lock = threading.RLock()
+
+    # ---- index ----
 
     @classmethod
-    def _version_compare(cls, current: List[int], target: List[int]) -> int:
-        """Compare two version lists. Returns 1 if current > target, -1 if <, 0 if ="""
-        for i in range(max(len(current), len(target))):
-            v1 = current[i] if i < len(current) else 0
-            v2 = target[i] if i < len(target) else 0
-            if v1 > v2:
-                return 1
-            if v1 < v2:
-                return -1
-        return 0
+    def _build_index(cls) -> Dict[str, _ProductIndex]:
+        if not cls._feed_dir_loaded:
+            cls._feed_dir_loaded = True
+            if cls.FEED_DIR.is_dir():
+                for path in sorted(cls.FEED_DIR.glob("*.json*")):
+                    cls._add_feed(path)
+
+        grouped: Dict[str, List[Tuple[Vulnerability, VersionRange]]] = {}
+        sources = list(cls.VULNERABILITIES.items()) + list(cls._feed_vulnerabilities.items())
+        for product, vulns in sources:
+            for vuln in vulns:
+                version_range = VersionRange.parse(vuln.affected_versions)
+                if version_range is None:
+                    logger.debug(f"Skipping unparseable range for {vuln.id}: {vuln.affected_versions}")
+                    continue
+                grouped.setdefault(product.lower(), []).append((vuln, version_range))
+        return {product: _ProductIndex(entries) for product, entries in grouped.items()}
 
     @classmethod
-    def _check_condition(cls, current_ver: List[int], condition: str) -> bool:
-        """Check if version satisfies the condition (e.g., '< 7.4')"""
-        parts = condition.split()
-        if len(parts) == 2:
-            op, target_str = parts
-            target_ver = cls._parse_version(target_str)
-            if not target_ver:
-                return False
+    def _get_index(cls) -> Dict[str, _ProductIndex]:
+        with cls._lock:
+            if cls._index is None:
+                cls._index = cls._build_index()
+            return cls._index
 
-            cmp = cls._version_compare(current_ver, target_ver)
+    @classmethod
+    def reset(cls) -> None:
+        """Drop loaded feeds, the compiled index and the result cache"""
+        with cls._lock:
+            cls._feed_vulnerabilities = {}
+            cls._feed_dir_loaded = False
+            cls._index = None
+            cls._cache = {}
 
-            if op == "<":
-                return cmp < 0
-            if op == "<=":
-                return cmp <= 0
-            if op == ">":
-                return cmp > 0
-            if op == ">=":
-                return cmp >= 0
-            if op == "=":
-                return cmp == 0
-
-        elif "-" in condition:
-            # Range: "1.0 - 2.0"
-            start_str, end_str = condition.split("-")
-            start_ver = cls._parse_version(start_str.strip())
-            end_ver = cls._parse_version(end_str.strip())
-
-            if not start_ver or not end_ver:
-                return False
-
-            return (
-                cls._version_compare(current_ver, start_ver) >= 0
-                and cls._version_compare(current_ver, end_ver) <= 0
-            )
+    # ---- NVD feeds ----
 
-        return False
+    @classmethod
+    def load_feed(cls, path) -> int:
+        """
+        Load a local NVD JSON feed and recompile the index
+
+        Args:
+            path: NVD 1.1 feed (CVE_Items) or API 2.0 response (vulnerabilities), .json or .json.gz
+
+        Returns:
+            Number of (CVE, version range) rules loaded
+        """
+        with cls._lock:
+            count = cls._add_feed(Path(path))
+            cls._index = None
+            cls._cache = {}
+        return count
+
+    @classmethod
+    def _add_feed(cls, path: Path) -> int:
+        opener = gzip.open if path.suffix == ".gz" else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load CVE feed {path}: {e}")
+            return 0
+
+        count = 0
+        for product, vuln in cls._parse_feed(data):
+            cls._feed_vulnerabilities.setdefault(product, []).append(vuln)
+            count += 1
+        logger.info(f"Loaded {count} CVE rules from {path}")
+        return count
+
+    @classmethod
+    def _parse_feed(cls, data: Dict) -> Iterator[Tuple[str, Vulnerability]]:
+        if "CVE_Items" in data:  # NVD 1.1 feed
+            for item in data["CVE_Items"]:
+                cve = item.get("cve", {})
+                cve_id = cve.get("CVE_data_meta", {}).get("ID", "")
+                descriptions = cve.get("description", {}).get("description_data", [])
+                impact = item.get("impact", {})
+                severity = (
+                    impact.get("baseMetricV3", {}).get("cvssV3", {}).get("baseSeverity")
+                    or impact.get("baseMetricV2", {}).get("severity")
+                )
+                nodes = item.get("configurations", {}).get("nodes", [])
+                matches = cls._cpe_matches(nodes, "cpe_match", "cpe23Uri")
+                yield from cls._feed_rules(cve_id, severity, descriptions, matches)
+        else:  # NVD API 2.0
+            for item in data.get("vulnerabilities", []):
+                cve = item.get("cve", {})
+                metrics = cve.get("metrics", {})
+                severity = None
+                for key in ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
+                    if metrics.get(key):
+                        metric = metrics[key][0]
+                        severity = metric.get("cvssData", {}).get("baseSeverity") or metric.get("baseSeverity")
+                        break
+                nodes = [n for conf in cve.get("configurations", []) for n in conf.get("nodes", [])]
+                matches = cls._cpe_matches(nodes, "cpeMatch", "criteria")
+                yield from cls._feed_rules(cve.get("id", ""), severity, cve.get("descriptions", []), matches)
+
+    @staticmethod
+    def _cpe_matches(nodes: List[Dict], match_key: str, uri_key: str) -> Iterator[Tuple[str, Dict]]:
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            stack.extend(node.get("children", []))
+            for match in node.get(match_key, []):
+                if match.get("vulnerable", True) and match.get(uri_key):
+                    yield match[uri_key], match
+
+    @staticmethod
+    def _feed_rules(
+        cve_id: str, severity: Optional[str], descriptions: List[Dict], matches: Iterable[Tuple[str, Dict]]
+    ) -> Iterator[Tuple[str, Vulnerability]]:
+        description = next(
+            (d.get("value", "") for d in descriptions if d.get("lang") == "en"),
+            descriptions[0].get("value", "") if descriptions else "",
+        )
+        severity = (severity or "MEDIUM").upper()
+        if severity not in _SEVERITIES:
+            severity = "MEDIUM"
+
+        for uri, match in matches:
+            # cpe:2.3:a:vendor:product:version:...
+            fields = uri.split(":")
+            if len(fields) < 6 or fields[2] != "a":
+                continue
+            product = CPE_PRODUCTS.get(fields[4], fields[4])
+            conditions = []
+            if match.get("versionStartIncluding"):
+                conditions.append(f">= {match['versionStartIncluding']}")
+            if match.get("versionStartExcluding"):
+                conditions.append(f"> {match['versionStartExcluding']}")
+            if match.get("versionEndIncluding"):
+                conditions.append(f"<= {match['versionEndIncluding']}")
+            if match.get("versionEndExcluding"):
+                conditions.append(f"< {match['versionEndExcluding']}")
+            if not conditions and fields[5] not in ("*", "-"):
+                conditions.append(f"= {fields[5]}")
+            if conditions:
+                yield product, Vulnerability(cve_id, severity, description, ", ".join(conditions))
+
+    # ---- matching ----
 
     @classmethod
     def match(cls, product: str, version: str) -> List[Dict]:
@@ -150,29 +402,34 @@ class CVEMatcher:
         Match a product version against known vulnerabilities
 
         Args:
-            product: Product name (e.g., "OpenSSH", "Nginx")
+            product: Product name (e.g., "OpenSSH", "Nginx"), case-insensitive
             version: Version string (e.g., "7.4p1", "1.14.0")
 
         Returns:
             List of matching vulnerabilities
         """
-        matches = []
-        if not version or product not in cls.VULNERABILITIES:
-            return matches
-
-        current_ver = cls._parse_version(version)
-        if not current_ver:
-            return matches
+        if not version or not product:
+            return []
 
-        for vuln in cls.VULNERABILITIES[product]:
-            if cls._check_condition(current_ver, vuln.affected_versions):
-                matches.append(
+        key = (product.lower(), version)
+        cached = cls._cache.get(key)
+        if cached is None:
+            index = cls._get_index().get(key[0])
+            current_ver = normalize_version(version)
+            if index is None or current_ver is None:
+                cached = ()
+            else:
+                cached = tuple(
                     {
                         "id": vuln.id,
                         "severity": vuln.severity,
                         "description": vuln.description,
                         "affected_versions": vuln.affected_versions,
                     }
+                    for vuln in index.lookup(current_ver)
                 )
-
-        return matches
+            with cls._lock:
+                if len(cls._cache) >= cls.MAX_CACHED_LOOKUPS:
+                    cls._cache = {}
+                cls._cache[key] = cached
+        return [dict(m) for m in cached]
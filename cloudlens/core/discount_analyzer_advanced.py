@@ -11,6 +11,12 @@ from datetime import datetime
 from collections import defaultdict
 import statistics
 
+import numpy as np
+
+from cloudlens.core.cost_index import shift_billing_cycle
+from cloudlens.core.discount_cube import DiscountCube, DiscountTotals
+from cloudlens.core.streaming_export import ExportSheet, iter_csv
+
 # 移除sqlite3导入，改用数据库抽象层
 
 logger = logging.getLogger(__name__)
@@ -19,6 +25,9 @@ logger = logging.getLogger(__name__)
 class AdvancedDiscountAnalyzer:
     """高级折扣分析器"""
     
+    # 参与计费方式对比的类型
+    SUBSCRIPTION_TYPES = {'Subscription': '包年包月', 'PayAsYouGo': '按量付费'}
+    
     def __init__(self, db_path: Optional[str] = None):
         """
         初始化分析器
@@ -62,6 +71,22 @@ class AdvancedDiscountAnalyzer:
         sql = sql.replace("?", placeholder) if self.db_type == "mysql" else sql
         return self.storage.query(sql, params)
     
+    def _cube(self, account_id: str) -> DiscountCube:
+        """账号的共享折扣立方体（首次访问时一次查询构建）"""
+        return DiscountCube.for_account(account_id, db=self.db)
+    
+    @staticmethod
+    def _months_start(months: int) -> Optional[str]:
+        """根据月数计算起始账期，months >= 99 表示全部历史"""
+        if months >= 99:
+            return None
+        return shift_billing_cycle(datetime.now().strftime("%Y-%m"), -(months - 1))
+    
+    @staticmethod
+    def _discount_rates(original: np.ndarray, discount: np.ndarray) -> np.ndarray:
+        """逐月折扣率（原价为0的月份记为0）"""
+        return np.divide(discount, original, out=np.zeros_like(discount), where=original > 0)
+    
     def _get_date_filter_params(self, months: int) -> Tuple[str, str]:
         """根据月数计算起始月份"""
         if months >= 99:  # 特殊值，表示全部历史
@@ -96,89 +121,36 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始季度对比分析，账号={account_id}, 季度数={quarters}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            
             # 如果没指定 start_date，根据季度数换算月数计算起始月份（1 季度 = 3 个月）
-            months_from_quarters = quarters * 3 if quarters > 0 else 24
             if not start_date and quarters > 0:
-                months_filter, months_start = self._get_date_filter_params(min(months_from_quarters, 99))
-                if months_filter:
-                    time_filter += months_filter
-                    params.append(months_start)
+                start_date = self._months_start(min(quarters * 3, 99))
             
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
+            by_cycle = self._cube(account_id).rollup(["billing_cycle"], start_date, end_date)
+            grouped: Dict[Tuple[str, str], Dict] = {}
+            for (cycle,), totals in by_cycle.items():
+                quarter = f"Q{(int(cycle[5:7]) - 1) // 3 + 1}"
+                entry = grouped.setdefault((cycle[:4], quarter), {'totals': DiscountTotals(), 'months': 0})
+                entry['totals'].add(totals, with_instances=False)
+                entry['months'] += 1
             
-            params.append(quarters)
-            
-            # 使用数据库抽象层查询
-            cast_expr = "CAST(SUBSTR(billing_cycle, 6, 2) AS UNSIGNED)" if self.db_type == "mysql" else "CAST(SUBSTR(billing_cycle, 6, 2) AS INT)"
-            rows = self._query_db(f"""
-                SELECT 
-                    SUBSTR(billing_cycle, 1, 4) as year,
-                    CASE 
-                        WHEN {cast_expr} <= 3 THEN 'Q1'
-                        WHEN {cast_expr} <= 6 THEN 'Q2'
-                        WHEN {cast_expr} <= 9 THEN 'Q3'
-                        ELSE 'Q4'
-                    END as quarter,
-                    SUM(pretax_amount + invoice_discount) as total_original,
-                    SUM(pretax_amount) as total_paid,
-                    SUM(invoice_discount) as total_discount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as avg_discount_rate,
-                    COUNT(DISTINCT billing_cycle) as month_count
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY year, quarter
-                ORDER BY year DESC, 
-                    CASE quarter 
-                        WHEN 'Q1' THEN 1 
-                        WHEN 'Q2' THEN 2 
-                        WHEN 'Q3' THEN 3 
-                        WHEN 'Q4' THEN 4 
-                    END DESC
-                LIMIT {placeholder}
-            """, tuple(params))
+            # 取最近 N 个季度，按时间正序
+            keys = sorted(grouped)
+            if quarters > 0:
+                keys = keys[-quarters:]
             
             quarterly_data = []
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    quarterly_data.append({
-                        'year': row['year'],
-                        'quarter': row['quarter'],
-                        'period': f"{row['year']}-{row['quarter']}",
-                        'total_original': float(row['total_original'] or 0),
-                        'total_paid': float(row['total_paid'] or 0),
-                        'total_discount': float(row['total_discount'] or 0),
-                        'avg_discount_rate': float(row['avg_discount_rate'] or 0),
-                        'month_count': int(row['month_count'] or 0)
-                    })
-                else:
-                    # SQLite返回元组
-                    quarterly_data.append({
-                        'year': row[0],
-                        'quarter': row[1],
-                        'period': f"{row[0]}-{row[1]}",
-                        'total_original': float(row[2] or 0),
-                        'total_paid': float(row[3] or 0),
-                        'total_discount': float(row[4] or 0),
-                        'avg_discount_rate': float(row[5] or 0),
-                        'month_count': int(row[6] or 0)
-                    })
-            
-            quarterly_data.reverse()  # 按时间正序
+            for year, quarter in keys:
+                totals = grouped[(year, quarter)]['totals']
+                quarterly_data.append({
+                    'year': year,
+                    'quarter': quarter,
+                    'period': f"{year}-{quarter}",
+                    'total_original': totals.original,
+                    'total_paid': totals.paid,
+                    'total_discount': totals.discount,
+                    'avg_discount_rate': totals.discount_rate,
+                    'month_count': grouped[(year, quarter)]['months']
+                })
             
             # 计算环比变化
             for i in range(1, len(quarterly_data)):
@@ -228,58 +200,25 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始年度对比分析，账号={account_id}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
+            by_cycle = self._cube(account_id).rollup(["billing_cycle"], start_date, end_date)
+            grouped: Dict[str, Dict] = {}
+            for (cycle,), totals in by_cycle.items():
+                entry = grouped.setdefault(cycle[:4], {'totals': DiscountTotals(), 'months': 0})
+                entry['totals'].add(totals, with_instances=False)
+                entry['months'] += 1
             
             # 年度总览
-            rows = self._query_db(f"""
-                SELECT 
-                    SUBSTR(billing_cycle, 1, 4) as year,
-                    COUNT(DISTINCT billing_cycle) as month_count,
-                    SUM(pretax_amount + invoice_discount) as total_original,
-                    SUM(pretax_amount) as total_paid,
-                    SUM(invoice_discount) as total_discount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as avg_discount_rate
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY year
-                ORDER BY year
-            """, tuple(params))
-            
             yearly_data = []
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    yearly_data.append({
-                        'year': row['year'],
-                        'month_count': int(row['month_count'] or 0),
-                        'total_original': float(row['total_original'] or 0),
-                        'total_paid': float(row['total_paid'] or 0),
-                        'total_discount': float(row['total_discount'] or 0),
-                        'avg_discount_rate': float(row['avg_discount_rate'] or 0)
-                    })
-                else:
-                    # SQLite返回元组
-                    yearly_data.append({
-                        'year': row[0],
-                        'month_count': int(row[1] or 0),
-                        'total_original': float(row[2] or 0),
-                        'total_paid': float(row[3] or 0),
-                        'total_discount': float(row[4] or 0),
-                        'avg_discount_rate': float(row[5] or 0)
-                    })
+            for year in sorted(grouped):
+                totals = grouped[year]['totals']
+                yearly_data.append({
+                    'year': year,
+                    'month_count': grouped[year]['months'],
+                    'total_original': totals.original,
+                    'total_paid': totals.paid,
+                    'total_discount': totals.discount,
+                    'avg_discount_rate': totals.discount_rate
+                })
             
             # 计算同比变化
             for i in range(1, len(yearly_data)):
@@ -340,107 +279,36 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始产品折扣趋势分析，账号={account_id}, 月数={months}, TOP={top_n}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            
-            # 强制应用 months 过滤，防止全表扫描
-            if not start_date:
-                months_filter, months_start = self._get_date_filter_params(months)
-                if months_filter:
-                    time_filter += months_filter
-                    params.append(months_start)
-            
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
+            cube = self._cube(account_id)
             
-            params.append(top_n)
-            
-            # 先获取TOP N产品（按消费金额）
-            rows = self._query_db(f"""
-                SELECT 
-                    product_name,
-                    SUM(pretax_amount) as total_paid
-                FROM bill_items
-                WHERE account_id = {placeholder}
-                    AND product_name != ''
-                    {time_filter}
-                GROUP BY product_name
-                ORDER BY total_paid DESC
-                LIMIT {placeholder}
-            """, tuple(params))
-            
-            top_products = [row['product_name'] if isinstance(row, dict) else row[0] for row in rows]
+            # 先获取TOP N产品（按消费金额，应用 months 窗口）
+            by_product = cube.rollup(["product_name"], start_date or self._months_start(months), end_date)
+            ranked = sorted(
+                ((key[0], totals.paid) for key, totals in by_product.items() if key[0]),
+                key=lambda x: x[1],
+                reverse=True
+            )
+            top_products = [name for name, _ in ranked[:top_n]]
             
             if not top_products:
                 return {'success': False, 'error': f'没有产品数据 (account_id={account_id})'}
             
             # 获取这些产品的月度趋势
-            placeholders = ','.join([placeholder for _ in top_products])
-            
-            # 重建时间过滤条件和参数
-            time_filter2 = ""
-            params2 = [account_id]
-            if start_date:
-                time_filter2 += f" AND billing_cycle >= {placeholder}"
-                params2.append(start_date)
-            if end_date:
-                time_filter2 += f" AND billing_cycle <= {placeholder}"
-                params2.append(end_date)
-            
-            query = f"""
-                SELECT 
-                    product_name,
-                    billing_cycle,
-                    SUM(pretax_amount + invoice_discount) as official_price,
-                    SUM(pretax_amount) as paid_amount,
-                    SUM(invoice_discount) as discount_amount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as discount_rate,
-                    COUNT(*) as record_count,
-                    COUNT(DISTINCT instance_id) as instance_count
-                FROM bill_items
-                WHERE account_id = {placeholder} 
-                    {time_filter2}
-                    AND product_name IN ({placeholders})
-                GROUP BY product_name, billing_cycle
-                ORDER BY product_name, billing_cycle
-            """
-            
-            rows2 = self._query_db(query, tuple(params2 + top_products))
-            
-            # 按产品分组
+            top_set = set(top_products)
             product_trends = defaultdict(list)
-            for row in rows2:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    product_trends[row['product_name']].append({
-                        'month': row['billing_cycle'],
-                        'official_price': float(row['official_price'] or 0),
-                        'paid_amount': float(row['paid_amount'] or 0),
-                        'discount_amount': float(row['discount_amount'] or 0),
-                        'discount_rate': float(row['discount_rate'] or 0),
-                        'record_count': int(row['record_count'] or 0),
-                        'instance_count': int(row['instance_count'] or 0)
-                    })
-                else:
-                    product_trends[row[0]].append({
-                        'month': row[1],
-                        'official_price': float(row[2] or 0),
-                        'paid_amount': float(row[3] or 0),
-                        'discount_amount': float(row[4] or 0),
-                        'discount_rate': float(row[5] or 0),
-                        'record_count': int(row[6] or 0),
-                        'instance_count': int(row[7] or 0)
-                    })
+            monthly = cube.rollup(["product_name", "billing_cycle"], start_date, end_date, with_instances=True)
+            for (product_name, cycle), totals in sorted(monthly.items()):
+                if product_name not in top_set:
+                    continue
+                product_trends[product_name].append({
+                    'month': cycle,
+                    'official_price': totals.original,
+                    'paid_amount': totals.paid,
+                    'discount_amount': totals.discount,
+                    'discount_rate': totals.discount_rate,
+                    'record_count': totals.records,
+                    'instance_count': totals.instance_count
+                })
             
             # 计算每个产品的统计指标
             product_stats = []
@@ -507,76 +375,35 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始区域折扣排行分析，账号={account_id}, 月数={months}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            
-            # 强制应用 months 过滤
-            if not start_date:
-                months_filter, months_start = self._get_date_filter_params(months)
-                if months_filter:
-                    time_filter += months_filter
-                    params.append(months_start)
-            
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
-            
-            rows = self._query_db(f"""
-                SELECT 
-                    region,
-                    SUM(pretax_amount + invoice_discount) as total_original,
-                    SUM(pretax_amount) as total_paid,
-                    SUM(invoice_discount) as total_discount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as avg_discount_rate,
-                    COUNT(DISTINCT instance_id) as instance_count,
-                    COUNT(DISTINCT product_name) as product_count,
-                    COUNT(DISTINCT billing_cycle) as month_count
-                FROM bill_items
-                WHERE account_id = {placeholder}
-                    AND region != ''
-                    {time_filter}
-                GROUP BY region
-                ORDER BY total_paid DESC
-            """, tuple(params))
+            cube = self._cube(account_id)
+            cycles = cube.cycles(start_date or self._months_start(months), end_date)
+            by_region = cube.rollup(["region"], cycles=cycles, with_instances=True)
+            
+            # 区域内的产品数、月份数从 (区域, 产品) / (区域, 账期) 上卷得到
+            product_counts = defaultdict(int)
+            for region, _ in cube.rollup(["region", "product_name"], cycles=cycles):
+                product_counts[region] += 1
+            month_counts = defaultdict(int)
+            for region, _ in cube.rollup(["region", "billing_cycle"], cycles=cycles):
+                month_counts[region] += 1
             
             regions = []
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    regions.append({
-                        'region': row['region'],
-                        'region_name': self._get_region_name(row['region']),
-                        'total_original': float(row['total_original'] or 0),
-                        'total_paid': float(row['total_paid'] or 0),
-                        'total_discount': float(row['total_discount'] or 0),
-                        'avg_discount_rate': float(row['avg_discount_rate'] or 0),
-                        'instance_count': int(row['instance_count'] or 0),
-                        'product_count': int(row['product_count'] or 0),
-                        'month_count': int(row['month_count'] or 0),
-                        'consumption_percentage': 0  # 将在后面计算
-                    })
-                else:
-                    regions.append({
-                        'region': row[0],
-                        'region_name': self._get_region_name(row[0]),
-                        'total_original': float(row[1] or 0),
-                        'total_paid': float(row[2] or 0),
-                        'total_discount': float(row[3] or 0),
-                        'avg_discount_rate': float(row[4] or 0),
-                        'instance_count': int(row[5] or 0),
-                        'product_count': int(row[6] or 0),
-                        'month_count': int(row[7] or 0),
-                        'consumption_percentage': 0  # 将在后面计算
-                    })
+            for (region,), totals in by_region.items():
+                if not region:
+                    continue
+                regions.append({
+                    'region': region,
+                    'region_name': self._get_region_name(region),
+                    'total_original': totals.original,
+                    'total_paid': totals.paid,
+                    'total_discount': totals.discount,
+                    'avg_discount_rate': totals.discount_rate,
+                    'instance_count': totals.instance_count,
+                    'product_count': product_counts[region],
+                    'month_count': month_counts[region],
+                    'consumption_percentage': 0  # 将在后面计算
+                })
+            regions.sort(key=lambda r: r['total_paid'], reverse=True)
             
             # 计算消费占比
             total_consumption = sum(r['total_paid'] for r in regions)
@@ -619,77 +446,26 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始计费方式对比分析，账号={account_id}, 月数={months}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            
-            # 强制应用 months 过滤
-            if not start_date:
-                months_filter, months_start = self._get_date_filter_params(months)
-                if months_filter:
-                    time_filter += months_filter
-                    params.append(months_start)
-                    
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
+            cube = self._cube(account_id)
             
             # 总体对比
-            rows = self._query_db(f"""
-                SELECT 
-                    subscription_type,
-                    SUM(pretax_amount + invoice_discount) as total_original,
-                    SUM(pretax_amount) as total_paid,
-                    SUM(invoice_discount) as total_discount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as avg_discount_rate,
-                    COUNT(DISTINCT instance_id) as instance_count,
-                    AVG(pretax_amount) as avg_instance_cost
-                FROM bill_items
-                WHERE account_id = {placeholder}
-                    AND subscription_type IN ('Subscription', 'PayAsYouGo')
-                    {time_filter}
-                GROUP BY subscription_type
-            """, tuple(params))
-            
             subscription_types = {}
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    sub_type = row['subscription_type']
-                    type_name = '包年包月' if sub_type == 'Subscription' else '按量付费'
-                    
-                    subscription_types[sub_type] = {
-                        'type': sub_type,
-                        'type_name': type_name,
-                        'total_original': float(row['total_original'] or 0),
-                        'total_paid': float(row['total_paid'] or 0),
-                        'total_discount': float(row['total_discount'] or 0),
-                        'avg_discount_rate': float(row['avg_discount_rate'] or 0),
-                        'instance_count': int(row['instance_count'] or 0),
-                        'avg_instance_cost': float(row['avg_instance_cost'] or 0)
-                    }
-                else:
-                    sub_type = row[0]
-                    type_name = '包年包月' if sub_type == 'Subscription' else '按量付费'
-                    
-                    subscription_types[sub_type] = {
-                        'type': sub_type,
-                        'type_name': type_name,
-                        'total_original': float(row[1] or 0),
-                        'total_paid': float(row[2] or 0),
-                        'total_discount': float(row[3] or 0),
-                        'avg_discount_rate': float(row[4] or 0),
-                        'instance_count': int(row[5] or 0),
-                        'avg_instance_cost': float(row[6] or 0)
-                    }
+            by_type = cube.rollup(
+                ["subscription_type"], start_date or self._months_start(months), end_date, with_instances=True
+            )
+            for (sub_type,), totals in by_type.items():
+                if sub_type not in self.SUBSCRIPTION_TYPES:
+                    continue
+                subscription_types[sub_type] = {
+                    'type': sub_type,
+                    'type_name': self.SUBSCRIPTION_TYPES[sub_type],
+                    'total_original': totals.original,
+                    'total_paid': totals.paid,
+                    'total_discount': totals.discount,
+                    'avg_discount_rate': totals.discount_rate,
+                    'instance_count': totals.instance_count,
+                    'avg_instance_cost': totals.paid / totals.records if totals.records else 0
+                }
             
             # 计算占比
             total_consumption = sum(s['total_paid'] for s in subscription_types.values())
@@ -707,42 +483,15 @@ class AdvancedDiscountAnalyzer:
             else:
                 rate_diff = 0
             
-            # 月度趋势
-            placeholder = self._get_placeholder()
-            rows2 = self._query_db(f"""
-                SELECT 
-                    billing_cycle,
-                    subscription_type,
-                    SUM(pretax_amount) as total_paid,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as avg_discount_rate
-                FROM bill_items
-                WHERE account_id = {placeholder}
-                    AND subscription_type IN ('Subscription', 'PayAsYouGo')
-                GROUP BY billing_cycle, subscription_type
-                ORDER BY billing_cycle, subscription_type
-            """, (account_id,))
-            
+            # 月度趋势（全部历史）
             monthly_trends = defaultdict(lambda: defaultdict(dict))
-            for row in rows2:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    month = row['billing_cycle']
-                    sub_type = row['subscription_type']
-                    monthly_trends[month][sub_type] = {
-                        'total_paid': float(row['total_paid'] or 0),
-                        'discount_rate': float(row['avg_discount_rate'] or 0)
-                    }
-                else:
-                    month = row[0]
-                    sub_type = row[1]
-                    monthly_trends[month][sub_type] = {
-                        'total_paid': float(row[2] or 0),
-                        'discount_rate': float(row[3] or 0)
-                    }
+            for (month, sub_type), totals in cube.rollup(["billing_cycle", "subscription_type"]).items():
+                if sub_type not in self.SUBSCRIPTION_TYPES:
+                    continue
+                monthly_trends[month][sub_type] = {
+                    'total_paid': totals.paid,
+                    'discount_rate': totals.discount_rate
+                }
             
             # 转换为列表格式
             monthly_data = []
@@ -921,79 +670,33 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始异常检测，账号={account_id}, 阈值={threshold*100}%, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
-            
             # 获取月度折扣率
-            rows = self._query_db(f"""
-                SELECT 
-                    billing_cycle,
-                    SUM(pretax_amount + invoice_discount) as official_price,
-                    SUM(pretax_amount) as actual_amount,
-                    SUM(invoice_discount) as discount_amount,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as discount_rate
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY billing_cycle
-                ORDER BY billing_cycle
-            """, tuple(params))
-            
-            monthly_data = []
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    monthly_data.append({
-                        'month': row['billing_cycle'],
-                        'official_price': float(row['official_price'] or 0),
-                        'actual_amount': float(row['actual_amount'] or 0),
-                        'discount_amount': float(row['discount_amount'] or 0),
-                        'discount_rate': float(row['discount_rate'] or 0)
-                    })
-                else:
-                    monthly_data.append({
-                        'month': row[0],
-                        'official_price': float(row[1] or 0),
-                        'actual_amount': float(row[2] or 0),
-                        'discount_amount': float(row[3] or 0),
-                        'discount_rate': float(row[4] or 0)
-                    })
+            cycles, original, _, discount = self._cube(account_id).monthly_arrays(start_date, end_date)
+            rates = self._discount_rates(original, discount)
             
-            # 检测异常
+            # 检测异常（环比变化）
             anomalies = []
-            for i in range(1, len(monthly_data)):
-                prev = monthly_data[i-1]
-                curr = monthly_data[i]
+            for i in range(1, len(cycles)):
+                prev_rate = float(rates[i-1])
+                curr_rate = float(rates[i])
                 
-                # 环比变化
-                if prev['discount_rate'] > 0:
-                    rate_change = (curr['discount_rate'] - prev['discount_rate']) / prev['discount_rate']
+                if prev_rate > 0:
+                    rate_change = (curr_rate - prev_rate) / prev_rate
                     
                     if abs(rate_change) >= threshold:
                         anomaly_type = '折扣率突增' if rate_change > 0 else '折扣率突降'
                         severity = '严重' if abs(rate_change) >= 0.20 else '警告'
                         
                         anomalies.append({
-                            'month': curr['month'],
-                            'prev_month': prev['month'],
-                            'current_rate': curr['discount_rate'],
-                            'prev_rate': prev['discount_rate'],
+                            'month': cycles[i],
+                            'prev_month': cycles[i-1],
+                            'current_rate': curr_rate,
+                            'prev_rate': prev_rate,
                             'change_pct': rate_change * 100,
                             'anomaly_type': anomaly_type,
                             'severity': severity,
-                            'description': f"{curr['month']}折扣率为{curr['discount_rate']*100:.1f}%，"
-                                         f"较上月{prev['discount_rate']*100:.1f}%变化{rate_change*100:+.1f}%"
+                            'description': f"{cycles[i]}折扣率为{curr_rate*100:.1f}%，"
+                                         f"较上月{prev_rate*100:.1f}%变化{rate_change*100:+.1f}%"
                         })
             
             return {
@@ -1035,100 +738,30 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始产品×区域交叉分析，时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
-            
-            params.append(top_products)
+            cube = self._cube(account_id)
+            cycles = cube.cycles(start_date, end_date)
             
             # 获取TOP产品和区域
-            rows1 = self._query_db(f"""
-                SELECT product_name, SUM(pretax_amount) as total
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY product_name
-                ORDER BY total DESC
-                LIMIT {placeholder}
-            """, tuple(params))
-            products = [row['product_name'] if isinstance(row, dict) else row[0] for row in rows1]
-            
-            # 重建参数
-            params2 = [account_id]
-            if start_date:
-                params2.append(start_date)
-            if end_date:
-                params2.append(end_date)
-            params2.append(top_regions)
-            
-            rows2 = self._query_db(f"""
-                SELECT region, SUM(pretax_amount) as total
-                FROM bill_items
-                WHERE account_id = {placeholder} AND region != '' {time_filter}
-                GROUP BY region
-                ORDER BY total DESC
-                LIMIT {placeholder}
-            """, tuple(params2))
-            regions = [row['region'] if isinstance(row, dict) else row[0] for row in rows2]
-            
-            # 重建时间过滤（不需要附加限制）
-            time_filter3 = ""
-            if start_date:
-                time_filter3 += f" AND billing_cycle >= {placeholder}"
-            if end_date:
-                time_filter3 += f" AND billing_cycle <= {placeholder}"
-            
-            # 获取交叉数据
+            by_product = cube.rollup(["product_name"], cycles=cycles)
+            products = [
+                key[0] for key, _ in sorted(by_product.items(), key=lambda x: x[1].paid, reverse=True)
+            ][:top_products]
+            by_region = cube.rollup(["region"], cycles=cycles)
+            regions = [
+                key[0] for key, _ in sorted(by_region.items(), key=lambda x: x[1].paid, reverse=True) if key[0]
+            ][:top_regions]
+            
+            # 交叉数据：一次上卷得到全部 (产品, 区域) 单元格
+            cells = cube.rollup(["product_name", "region"], cycles=cycles)
             matrix = {}
             for product in products:
                 matrix[product] = {}
                 for region in regions:
-                    params3 = [account_id]
-                    if start_date:
-                        params3.append(start_date)
-                    if end_date:
-                        params3.append(end_date)
-                    params3.extend([product, region])
-                    
-                    rows3 = self._query_db(f"""
-                        SELECT 
-                            CASE 
-                                WHEN SUM(pretax_amount + invoice_discount) > 0 
-                                THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                                ELSE 0 
-                            END as discount_rate,
-                            SUM(pretax_amount) as total_paid
-                        FROM bill_items
-                        WHERE account_id = {placeholder}
-                            {time_filter3}
-                            AND product_name = {placeholder}
-                            AND region = {placeholder}
-                        GROUP BY product_name, region
-                    """, tuple(params3))
-                    
-                    if rows3:
-                        row = rows3[0]
-                        if isinstance(row, dict):
-                            matrix[product][region] = {
-                                'discount_rate': float(row['discount_rate'] or 0),
-                                'total_paid': float(row['total_paid'] or 0)
-                            }
-                        else:
-                            matrix[product][region] = {
-                                'discount_rate': float(row[0] or 0),
-                                'total_paid': float(row[1] or 0)
-                            }
-                    else:
-                        matrix[product][region] = {
-                            'discount_rate': 0,
-                            'total_paid': 0
-                        }
+                    totals = cells.get((product, region))
+                    matrix[product][region] = {
+                        'discount_rate': totals.discount_rate if totals else 0,
+                        'total_paid': totals.paid if totals else 0
+                    }
             
             return {
                 'success': True,
@@ -1165,63 +798,29 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始移动平均分析，窗口={window_sizes}, 时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
-            
             # 获取月度折扣率
-            rows = self._query_db(f"""
-                SELECT 
-                    billing_cycle,
-                    CASE 
-                        WHEN SUM(pretax_amount + invoice_discount) > 0 
-                        THEN (SUM(invoice_discount) / SUM(pretax_amount + invoice_discount))
-                        ELSE 0 
-                    END as discount_rate
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY billing_cycle
-                ORDER BY billing_cycle
-            """, tuple(params))
+            cycles, original, _, discount = self._cube(account_id).monthly_arrays(start_date, end_date)
+            rates = self._discount_rates(original, discount)
             
-            monthly_rates = [
-                (row['billing_cycle'] if isinstance(row, dict) else row[0], 
-                 float(row['discount_rate'] or 0) if isinstance(row, dict) else float(row[1] or 0))
-                for row in rows
-            ]
-            
-            # 计算移动平均
+            # 计算移动平均：前 window-1 个月不足一个窗口，为 None
             moving_averages = {}
             for window in window_sizes:
-                ma_data = []
-                for i in range(len(monthly_rates)):
-                    if i < window - 1:
-                        ma_data.append({
-                            'month': monthly_rates[i][0],
-                            'ma': None
-                        })
-                    else:
-                        window_data = monthly_rates[i-window+1:i+1]
-                        ma_value = sum(r[1] for r in window_data) / window
-                        ma_data.append({
-                            'month': monthly_rates[i][0],
-                            'ma': ma_value,
-                            'original': monthly_rates[i][1]
-                        })
+                ma_values = np.convolve(rates, np.ones(window) / window, mode='valid') if 0 < window <= len(rates) else []
+                ma_data = [{'month': cycles[i], 'ma': None} for i in range(min(max(window - 1, 0), len(cycles)))]
+                for offset, ma_value in enumerate(ma_values):
+                    i = window - 1 + offset
+                    ma_data.append({
+                        'month': cycles[i],
+                        'ma': float(ma_value),
+                        'original': float(rates[i])
+                    })
                 
                 moving_averages[f'ma_{window}'] = ma_data
             
             return {
                 'success': True,
                 'moving_averages': moving_averages,
-                'original_data': [{'month': m, 'rate': r} for m, r in monthly_rates]
+                'original_data': [{'month': m, 'rate': float(r)} for m, r in zip(cycles, rates)]
             }
         
         except Exception as e:
@@ -1250,49 +849,22 @@ class AdvancedDiscountAnalyzer:
         logger.info(f"开始累计折扣分析，时间范围={start_date}~{end_date}")
         
         try:
-            # 构建时间过滤条件
-            placeholder = self._get_placeholder()
-            time_filter = ""
-            params = [account_id]
-            if start_date:
-                time_filter += f" AND billing_cycle >= {placeholder}"
-                params.append(start_date)
-            if end_date:
-                time_filter += f" AND billing_cycle <= {placeholder}"
-                params.append(end_date)
+            cycles, _, _, discount = self._cube(account_id).monthly_arrays(start_date, end_date)
+            cumulative = np.cumsum(discount)
             
-            rows = self._query_db(f"""
-                SELECT 
-                    billing_cycle,
-                    SUM(invoice_discount) as discount_amount
-                FROM bill_items
-                WHERE account_id = {placeholder} {time_filter}
-                GROUP BY billing_cycle
-                ORDER BY billing_cycle
-            """, tuple(params))
-            
-            cumulative_data = []
-            cumulative_total = 0
-            
-            for row in rows:
-                # 处理字典格式的结果（MySQL）或元组格式（SQLite）
-                if isinstance(row, dict):
-                    monthly_discount = float(row['discount_amount'] or 0)
-                else:
-                    monthly_discount = float(row[1] or 0)
-                
-                cumulative_total += monthly_discount
-                month = row['billing_cycle'] if isinstance(row, dict) else row[0]
-                cumulative_data.append({
+            cumulative_data = [
+                {
                     'month': month,
-                    'monthly_discount': monthly_discount,
-                    'cumulative_discount': cumulative_total
-                })
+                    'monthly_discount': float(monthly_discount),
+                    'cumulative_discount': float(cumulative_total)
+                }
+                for month, monthly_discount, cumulative_total in zip(cycles, discount, cumulative)
+            ]
             
             return {
                 'success': True,
                 'cumulative_data': cumulative_data,
-                'total_discount': cumulative_total
+                'total_discount': float(cumulative[-1]) if len(cumulative) else 0
             }
         
         except Exception as e:
@@ -1565,71 +1137,71 @@ class AdvancedDiscountAnalyzer:
             logger.error(f"智能洞察生成失败: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def export_to_csv(
+    def export_sheets(
         self,
         account_id: str,
         export_type: str = 'all'
-    ) -> Dict:
+    ) -> List[ExportSheet]:
         """
-        导出数据为CSV
+        导出用的数据表
         
         Args:
             account_id: 账号ID
             export_type: 导出类型 (all, products, regions, instances)
             
         Returns:
-            CSV数据字符串
+            导出表列表（供 CSV / Excel / HTML 流式导出）
         """
-        import io
-        import csv
-        
-        logger.info(f"开始导出CSV，类型={export_type}")
+        sheets = []
         
-        try:
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            if export_type in ['all', 'products']:
-                # 导出产品数据
-                products = self.get_product_discount_trends(account_id, months=19, top_n=50)
-                if products['success']:
-                    writer.writerow(['产品折扣分析'])
-                    writer.writerow(['产品名称', '总消费', '总折扣', '平均折扣率', '波动率', '趋势变化'])
-                    for p in products['products']:
-                        writer.writerow([
+        if export_type in ['all', 'products']:
+            # 导出产品数据
+            products = self.get_product_discount_trends(account_id, months=19, top_n=50)
+            if products['success']:
+                sheets.append(ExportSheet(
+                    '产品折扣分析',
+                    ['产品名称', '总消费', '总折扣', '平均折扣率', '波动率', '趋势变化'],
+                    [
+                        [
                             p['product_name'],
                             f"{p['total_consumption']:.2f}",
                             f"{p['total_discount']:.2f}",
                             f"{p['avg_discount_rate']*100:.2f}%",
                             f"{p['volatility']*100:.2f}%",
                             f"{p['trend_change_pct']:+.2f}%"
-                        ])
-                    writer.writerow([])
-            
-            if export_type in ['all', 'regions']:
-                # 导出区域数据
-                regions = self.get_region_discount_ranking(account_id)
-                if regions['success']:
-                    writer.writerow(['区域折扣分析'])
-                    writer.writerow(['区域', '消费金额', '折扣金额', '折扣率', '实例数'])
-                    for r in regions['regions']:
-                        writer.writerow([
+                        ]
+                        for p in products['products']
+                    ]
+                ))
+        
+        if export_type in ['all', 'regions']:
+            # 导出区域数据
+            regions = self.get_region_discount_ranking(account_id)
+            if regions['success']:
+                sheets.append(ExportSheet(
+                    '区域折扣分析',
+                    ['区域', '消费金额', '折扣金额', '折扣率', '实例数'],
+                    [
+                        [
                             r['region_name'],
                             f"{r['total_paid']:.2f}",
                             f"{r['total_discount']:.2f}",
                             f"{r['avg_discount_rate']*100:.2f}%",
                             r['instance_count']
-                        ])
-                    writer.writerow([])
-            
-            if export_type in ['all', 'instances']:
-                # 导出实例优化建议
-                suggestions = self.get_optimization_suggestions(account_id)
-                if suggestions['success']:
-                    writer.writerow(['实例优化建议'])
-                    writer.writerow(['实例ID', '产品', '区域', '运行月数', '总成本', '当前折扣率', '预计折扣率', '年节省'])
-                    for s in suggestions['suggestions'][:100]:
-                        writer.writerow([
+                        ]
+                        for r in regions['regions']
+                    ]
+                ))
+        
+        if export_type in ['all', 'instances']:
+            # 导出实例优化建议
+            suggestions = self.get_optimization_suggestions(account_id)
+            if suggestions['success']:
+                sheets.append(ExportSheet(
+                    '实例优化建议',
+                    ['实例ID', '产品', '区域', '运行月数', '总成本', '当前折扣率', '预计折扣率', '年节省'],
+                    [
+                        [
                             s['instance_id'],
                             s['product_name'],
                             s['region_name'],
@@ -1638,10 +1210,32 @@ class AdvancedDiscountAnalyzer:
                             f"{s['current_discount_rate']*100:.2f}%",
                             f"{s['estimated_subscription_rate']*100:.2f}%",
                             f"{s['annual_potential_savings']:.2f}"
-                        ])
+                        ]
+                        for s in suggestions['suggestions'][:100]
+                    ]
+                ))
+        
+        return sheets
+    
+    def export_to_csv(
+        self,
+        account_id: str,
+        export_type: str = 'all'
+    ) -> Dict:
+        """
+        导出数据为CSV
+        
+        Args:
+            account_id: 账号ID
+            export_type: 导出类型 (all, products, regions, instances)
             
-            csv_content = output.getvalue()
-            output.close()
+        Returns:
+            CSV数据字符串
+        """
+        logger.info(f"开始导出CSV，类型={export_type}")
+        
+        try:
+            csv_content = b"".join(iter_csv(self.export_sheets(account_id, export_type))).decode("utf-8-sig")
             
             return {
                 'success': True,
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+折扣分析立方体
+
+按 (账期, 产品, 区域, 计费方式) 汇总 bill_items 的原价/实付/折扣，
+每个账号一次分组查询加载到内存，账单入库后只重载对应账期的切片。
+AdvancedDiscountAnalyzer 的各折扣视图都在内存中从立方体上卷得到。
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+# 立方体维度（账期之外的三个维度构成切片内的键）
+DIMENSIONS = ("billing_cycle", "product_name", "region", "subscription_type")
+
+_CellKey = Tuple[str, str, str]
+
+
+class DiscountTotals:
+    """一个单元格（或上卷结果）的折扣汇总"""
+
+    __slots__ = ("original", "paid", "discount", "records", "instances")
+
+    def __init__(self):
+        self.original = 0.0  # 原价 = 实付 + 折扣
+        self.paid = 0.0
+        self.discount = 0.0
+        self.records = 0  # 账单明细条数
+        self.instances: Set[str] = set()
+
+    def add(self, other: "DiscountTotals", with_instances: bool = True) -> None:
+        self.original += other.original
+        self.paid += other.paid
+        self.discount += other.discount
+        self.records += other.records
+        if with_instances:
+            self.instances |= other.instances
+
+    @property
+    def discount_rate(self) -> float:
+        """折扣率 = 折扣 / 原价"""
+        return self.discount / self.original if self.original > 0 else 0.0
+
+    @property
+    def instance_count(self) -> int:
+        return len(self.instances)
+
+
+class DiscountCube:
+    """
+    单账号折扣立方体
+
+    用法:
+        cube = DiscountCube.for_account(account_id)
+        by_region = cube.rollup(["region"], start="2024-01")
+        cycles, original, paid, discount = cube.monthly_arrays()
+    """
+
+    def __init__(self, account_id: str, db: Optional[DatabaseAdapter] = None):
+        """
+        Args:
+            account_id: bill_items 中的账号ID（{access_key_id[:10]}-{账号名}）
+            db: 数据库适配器，默认延迟创建 MySQL 适配器
+        """
+        self.account_id = account_id
+        self._db = db
+        # 账期 -> {(产品, 区域, 计费方式): 汇总}
+        self._slices: Dict[str, Dict[_CellKey, DiscountTotals]] = {}
+        self._lock = threading.Lock()
+        self.built_at: Optional[float] = None
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    def _load(self, billing_cycle: Optional[str] = None) -> Dict[str, Dict[_CellKey, DiscountTotals]]:
+        """分组查询账号（或单个账期）的立方体单元格，实例粒度合并为单元格"""
+        sql = """
+            SELECT billing_cycle, product_name, region, subscription_type, instance_id,
+                   SUM(pretax_amount + invoice_discount) AS original,
+                   SUM(pretax_amount) AS paid,
+                   SUM(invoice_discount) AS discount,
+                   COUNT(*) AS records
+            FROM bill_items
+            WHERE account_id = %s
+        """
+        params: List = [self.account_id]
+        if billing_cycle:
+            sql += " AND billing_cycle = %s"
+            params.append(billing_cycle)
+        sql += " GROUP BY billing_cycle, product_name, region, subscription_type, instance_id"
+
+        slices: Dict[str, Dict[_CellKey, DiscountTotals]] = {}
+        for row in self._get_db().query(sql, tuple(params)) or []:
+            if not isinstance(row, dict):
+                row = dict(zip(DIMENSIONS + ("instance_id", "original", "paid", "discount", "records"), row))
+            cycle = str(row["billing_cycle"])
+            key = (row.get("product_name") or "", row.get("region") or "", row.get("subscription_type") or "")
+            cell = slices.setdefault(cycle, {}).get(key)
+            if cell is None:
+                cell = slices[cycle][key] = DiscountTotals()
+            cell.original += float(row.get("original") or 0)
+            cell.paid += float(row.get("paid") or 0)
+            cell.discount += float(row.get("discount") or 0)
+            cell.records += int(row.get("records") or 0)
+            if row.get("instance_id"):
+                cell.instances.add(row["instance_id"])
+        return slices
+
+    def build(self) -> "DiscountCube":
+        """一次分组查询加载全部账期"""
+        slices = self._load()
+        with self._lock:
+            self._slices = slices
+            self.built_at = time.time()
+        logger.info(f"折扣立方体构建完成: {self.account_id}, {len(slices)} 个账期")
+        return self
+
+    def refresh_cycle(self, billing_cycle: str) -> None:
+        """重载单个账期的切片（账单入库后调用）"""
+        fresh = self._load(billing_cycle).get(billing_cycle)
+        with self._lock:
+            if fresh:
+                self._slices[billing_cycle] = fresh
+            else:
+                self._slices.pop(billing_cycle, None)
+
+    # ---- 查询 ----
+
+    def cycles(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """范围内有数据的账期（升序）"""
+        with self._lock:
+            return sorted(
+                c for c in self._slices
+                if (start is None or c >= start) and (end is None or c <= end)
+            )
+
+    def rollup(
+        self,
+        dims: Sequence[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        with_instances: bool = False,
+        cycles: Optional[Iterable[str]] = None,
+    ) -> Dict[Tuple, DiscountTotals]:
+        """
+        按指定维度上卷
+
+        Args:
+            dims: DIMENSIONS 的子序列，结果键按此顺序组成元组
+            start / end: 账期范围（YYYY-MM，含边界）
+            with_instances: 是否合并实例集合（用于去重实例数，较慢）
+            cycles: 直接指定账期列表（优先于 start/end）
+        """
+        positions = [DIMENSIONS.index(d) for d in dims]
+        result: Dict[Tuple, DiscountTotals] = {}
+        selected = list(cycles) if cycles is not None else self.cycles(start, end)
+        with self._lock:
+            for cycle in selected:
+                for cell_key, cell in self._slices.get(cycle, {}).items():
+                    full_key = (cycle,) + cell_key
+                    key = tuple(full_key[p] for p in positions)
+                    totals = result.get(key)
+                    if totals is None:
+                        totals = result[key] = DiscountTotals()
+                    totals.add(cell, with_instances)
+        return result
+
+    def monthly_arrays(
+        self, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """月度序列：(账期列表, 原价, 实付, 折扣) NumPy 数组"""
+        cycles = self.cycles(start, end)
+        by_cycle = self.rollup(["billing_cycle"], cycles=cycles)
+        original = np.array([by_cycle[(c,)].original for c in cycles], dtype=float)
+        paid = np.array([by_cycle[(c,)].paid for c in cycles], dtype=float)
+        discount = np.array([by_cycle[(c,)].discount for c in cycles], dtype=float)
+        return cycles, original, paid, discount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._slices.values())
+
+    # ---- 进程内共享 ----
+
+    _shared: Dict[str, "DiscountCube"] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def for_account(
+        cls,
+        account_id: str,
+        ttl_seconds: int = 3600,
+        db: Optional[DatabaseAdapter] = None,
+    ) -> "DiscountCube":
+        """获取账号的共享立方体（过期或不存在时重建）"""
+        with cls._shared_lock:
+            cube = cls._shared.get(account_id)
+            if cube is not None and cube.built_at and time.time() - cube.built_at < ttl_seconds:
+                return cube
+            cube = cls(account_id, db=db).build()
+            cls._shared[account_id] = cube
+            return cube
+
+    @classmethod
+    def on_bills_ingested(cls, account_id: str, billing_cycle: str) -> None:
+        """账单入库后增量更新：已加载的立方体只重载该账期"""
+        with cls._shared_lock:
+            cube = cls._shared.get(account_id)
+        if cube is None:
+            return
+        try:
+            cube.refresh_cycle(billing_cycle)
+        except Exception as e:
+            logger.warning(f"折扣立方体增量更新失败，下次访问时重建: {e}")
+            cls.invalidate(account_id)
+
+    @classmethod
+    def invalidate(cls, account_id: Optional[str] = None) -> None:
+        with cls._shared_lock:
+            if account_id is None:
+                cls._shared.clear()
+            else:
+                cls._shared.pop(account_id, None)
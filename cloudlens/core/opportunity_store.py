@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+优化机会存储
+
+按 (来源, 资源ID) 存放一个账号的优化机会，并维护滚动汇总：
+- 每个来源的总数、月度节省，以及按操作 / 资源类型 / 优先级分组的数量和节省
+- 同一资源可以同时来自多个来源（如 ecs 降配与 idle_resources 释放），互不覆盖；
+  汇总可限定来源，避免同一资源的不同建议重复计入
+- 来源重新分析时只对差异做增删
+- 单个资源的库存、监控指标变化时直接 upsert/remove 该资源
+- 账单入库后标记待重新定价，下次读取时按成本索引只更新成本有变化的资源
+
+汇总随每次增删增量调整，读取 ROI 和分组不需要遍历全部机会。
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("high", "medium", "low")
+
+# 资源ID -> 月成本（未命中返回 None）
+CostLookup = Callable[[str], Optional[float]]
+# (来源, 资源ID)
+_ItemKey = Tuple[str, str]
+
+
+def _new_aggregate() -> Dict:
+    return {"count": 0, "savings": 0.0, "by_action": {}, "by_type": {}, "by_priority": {p: 0 for p in PRIORITIES}}
+
+
+class OpportunityStore:
+    """
+    单个账号的优化机会存储
+
+    用法:
+        store = OpportunityStore.for_account("prod")
+        store.replace_source("eip", opportunities)
+        store.roi()                      # 与 OptimizationEngine.calculate_roi 结构一致
+        store.roi(sources=["eip"])       # 只汇总部分来源
+        store.top(source="eip", limit=10)
+    """
+
+    def __init__(self, account: str):
+        self.account = account
+        self._items: Dict[_ItemKey, Dict] = {}
+        # (来源, 资源ID) -> (无账单时的月成本, 节省比例)，用于账单变化后重新定价
+        self._pricing: Dict[_ItemKey, Tuple[float, float]] = {}
+        # 来源 -> 资源ID集合
+        self._sources: Dict[str, set] = {}
+        # 来源 -> 滚动汇总（全部来源的汇总在读取时合并，来源只有少数几个）
+        self._aggregates: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._cost_lookup: Optional[CostLookup] = None
+        self._cost_key = None
+        self._costs_stale = False
+        self.updated_at: Optional[float] = None
+        self.version = 0
+
+    # ---- 滚动汇总 ----
+
+    @staticmethod
+    def _bump(groups: Dict[str, Dict[str, float]], key: str, sign: int, savings: float) -> None:
+        group = groups.setdefault(key, {"count": 0, "savings": 0.0})
+        group["count"] += sign
+        group["savings"] += sign * savings
+        if group["count"] <= 0:
+            del groups[key]
+
+    def _apply(self, opp: Dict, sign: int) -> None:
+        savings = float(opp.get("estimated_savings") or 0)
+        agg = self._aggregates.setdefault(opp.get("source", ""), _new_aggregate())
+        agg["count"] += sign
+        agg["savings"] += sign * savings
+        self._bump(agg["by_action"], opp.get("action", "unknown"), sign, savings)
+        self._bump(agg["by_type"], opp.get("resource_type", "unknown"), sign, savings)
+        priority = opp.get("priority", "low")
+        agg["by_priority"][priority] = agg["by_priority"].get(priority, 0) + sign
+
+    def _touch(self) -> None:
+        self.version += 1
+        self.updated_at = time.time()
+
+    # ---- 写入 ----
+
+    def upsert(
+        self,
+        opp: Dict,
+        source: str = "",
+        base_cost: Optional[float] = None,
+        savings_ratio: float = 1.0,
+    ) -> None:
+        """
+        写入或替换一个资源在该来源下的优化机会（不影响其他来源的同一资源）
+
+        Args:
+            opp: 优化机会（需包含 resource_id、estimated_savings）
+            source: 产生该机会的分析项
+            base_cost: 没有账单成本时的月成本，提供时账单变化后按 base_cost × savings_ratio 重新定价
+            savings_ratio: 节省金额占资源月成本的比例（释放为 1，降配约 0.3）
+        """
+        resource_id = opp["resource_id"]
+        key = (source, resource_id)
+        opp = {**opp, "source": source}
+        with self._lock:
+            self._discard(key)
+            self._items[key] = opp
+            self._sources.setdefault(source, set()).add(resource_id)
+            if base_cost is not None:
+                self._pricing[key] = (float(base_cost), float(savings_ratio))
+            self._apply(opp, 1)
+            self._touch()
+
+    def _discard(self, key: _ItemKey) -> Optional[Dict]:
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._apply(old, -1)
+            self._sources.get(key[0], set()).discard(key[1])
+            self._pricing.pop(key, None)
+        return old
+
+    def remove(self, resource_id: str, source: Optional[str] = None) -> bool:
+        """
+        资源已不存在或不再有优化机会
+
+        Args:
+            source: 只移除该来源下的机会，默认移除该资源在所有来源下的机会
+        """
+        with self._lock:
+            sources = [source] if source is not None else list(self._sources)
+            removed = [s for s in sources if self._discard((s, resource_id)) is not None]
+            if removed:
+                self._touch()
+            return bool(removed)
+
+    def replace_source(self, source: str, opportunities: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        用一个分析项的最新结果替换它之前的结果：只增删/替换有变化的资源
+
+        opportunities 中的条目可带 "_base_cost" / "_savings_ratio"，用于账单变化后重新定价。
+
+        Returns:
+            (写入数, 删除数)
+        """
+        written = removed = 0
+        with self._lock:
+            fresh = {}
+            for opp in opportunities:
+                fresh[opp["resource_id"]] = opp
+            for resource_id in list(self._sources.get(source, ())):
+                if resource_id not in fresh:
+                    self._discard((source, resource_id))
+                    removed += 1
+            for resource_id, opp in fresh.items():
+                clean = {k: v for k, v in opp.items() if not k.startswith("_")}
+                current = self._items.get((source, resource_id))
+                if current is not None and current == {**clean, "source": source}:
+                    continue
+                self.upsert(clean, source, opp.get("_base_cost"), opp.get("_savings_ratio", 1.0))
+                written += 1
+            self._sources.setdefault(source, set())
+            self._touch()
+        return written, removed
+
+    # ---- 账单变化后重新定价 ----
+
+    def set_cost_lookup(self, lookup: Optional[CostLookup], key=None) -> None:
+        """
+        设置资源月成本来源（通常是账单成本索引）
+
+        Args:
+            key: 成本来源的标识，与当前相同时不重复设置（避免每次写入都全量重新定价）
+        """
+        with self._lock:
+            if key is not None and key == self._cost_key and self._cost_lookup is not None:
+                return
+            self._cost_lookup = lookup
+            self._cost_key = key
+            self._costs_stale = lookup is not None
+
+    def mark_costs_stale(self) -> None:
+        with self._lock:
+            self._costs_stale = self._cost_lookup is not None
+
+    def _reprice(self) -> None:
+        if not self._costs_stale or self._cost_lookup is None:
+            return
+        self._costs_stale = False
+        changed = 0
+        costs: Dict[str, Optional[float]] = {}
+        for key, (base_cost, ratio) in list(self._pricing.items()):
+            resource_id = key[1]
+            try:
+                if resource_id not in costs:
+                    costs[resource_id] = self._cost_lookup(resource_id)
+            except Exception as e:
+                logger.warning(f"优化机会重新定价失败: {e}")
+                return
+            savings = round((costs[resource_id] or base_cost) * ratio, 2)
+            opp = self._items[key]
+            if abs(float(opp.get("estimated_savings") or 0) - savings) < 0.005:
+                continue
+            self._apply(opp, -1)
+            opp["estimated_savings"] = savings
+            self._apply(opp, 1)
+            changed += 1
+        if changed:
+            self._touch()
+            logger.info(f"账号 {self.account} 重新定价 {changed} 个优化机会")
+
+    # ---- 读取 ----
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, resource_id: str, source: Optional[str] = None) -> Optional[Dict]:
+        """
+        资源的优化机会
+
+        Args:
+            source: 指定来源；默认返回该资源在各来源下节省最多的一条
+        """
+        with self._lock:
+            self._reprice()
+            if source is not None:
+                return self._items.get((source, resource_id))
+            found = [self._items[(s, resource_id)] for s, ids in self._sources.items() if resource_id in ids]
+        return max(found, key=lambda o: float(o.get("estimated_savings") or 0), default=None)
+
+    def has_source(self, source: str) -> bool:
+        return source in self._sources
+
+    def roi(self, sources: Optional[Iterable[str]] = None) -> Dict:
+        """
+        ROI 汇总（合并各来源的滚动汇总）
+
+        Args:
+            sources: 只汇总这些来源，默认全部（同一资源在多个来源下会分别计入）
+        """
+        with self._lock:
+            self._reprice()
+            names = list(self._aggregates) if sources is None else list(sources)
+            count, savings = 0, 0.0
+            by_action: Dict[str, Dict[str, float]] = {}
+            by_type: Dict[str, Dict[str, float]] = {}
+            by_priority: Dict[str, int] = {p: 0 for p in PRIORITIES}
+            for name in names:
+                agg = self._aggregates.get(name)
+                if agg is None:
+                    continue
+                count += agg["count"]
+                savings += agg["savings"]
+                for merged, groups in ((by_action, agg["by_action"]), (by_type, agg["by_type"])):
+                    for key, group in groups.items():
+                        target = merged.setdefault(key, {"count": 0, "savings": 0.0})
+                        target["count"] += group["count"]
+                        target["savings"] += group["savings"]
+                for priority, n in agg["by_priority"].items():
+                    by_priority[priority] = by_priority.get(priority, 0) + n
+            return {
+                "total_opportunities": count,
+                "monthly_savings": round(savings, 2),
+                "yearly_savings": round(savings * 12, 2),
+                "by_action": by_action,
+                "by_resource_type": by_type,
+                "by_priority": by_priority,
+            }
+
+    def source_summary(self, source: str) -> Dict[str, float]:
+        """单个来源的数量和节省"""
+        with self._lock:
+            self._reprice()
+            agg = self._aggregates.get(source) or _new_aggregate()
+            return {"count": int(agg["count"]), "savings": round(agg["savings"], 2)}
+
+    def top(self, source: Optional[str] = None, limit: Optional[int] = None, **filters) -> List[Dict]:
+        """
+        按节省金额降序列出机会
+
+        Args:
+            source: 只列出某个来源
+            limit: 最多返回条数
+            filters: 字段等值过滤，如 action="release", priority="high"
+        """
+        with self._lock:
+            self._reprice()
+            if source is not None:
+                items = [self._items[(source, i)] for i in self._sources.get(source, ())]
+            else:
+                items = list(self._items.values())
+        if filters:
+            items = [o for o in items if all(o.get(k) == v for k, v in filters.items())]
+        key = lambda o: float(o.get("estimated_savings") or 0)  # noqa: E731
+        if limit is not None:
+            return heapq.nlargest(limit, items, key=key)
+        return sorted(items, key=key, reverse=True)
+
+    # ---- 进程内共享 ----
+
+    _shared: Dict[str, "OpportunityStore"] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def for_account(cls, account: str) -> "OpportunityStore":
+        with cls._shared_lock:
+            store = cls._shared.get(account)
+            if store is None:
+                store = cls._shared[account] = cls(account)
+            return store
+
+    @classmethod
+    def peek(cls, account: str) -> Optional["OpportunityStore"]:
+        """已有数据的共享存储，没有时返回 None（不创建）"""
+        store = cls._shared.get(account)
+        return store if store is not None and store.updated_at is not None else None
+
+    @classmethod
+    def on_bills_ingested(cls, account_id: str) -> None:
+        """账单入库钩子：账单账号ID（{access_key_id[:10]}-{账号名}）对应账号的存储待重新定价"""
+        account = account_id.split("-", 1)[-1]
+        with cls._shared_lock:
+            stores = [s for name, s in cls._shared.items() if name in (account, account_id)]
+        for store in stores:
+            store.mark_costs_stale()
+
+    @classmethod
+    def invalidate(cls, account: Optional[str] = None) -> None:
+        with cls._shared_lock:
+            if account is None:
+                cls._shared.clear()
+            else:
+                cls._shared.pop(account, None)
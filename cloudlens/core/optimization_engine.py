@@ -3,132 +3,321 @@
 """
 自动化优化引擎
 分析闲置资源并生成优化建议和执行脚本
+
+每个分析项拆成两步：批量加载（一次查询资源、一次分组查询指标）和逐资源评估。
+各分析项并发执行，结果按资源写入 OpportunityStore；单个资源的库存或指标变化时
+只重新评估该资源，账单入库后由存储按成本索引重新定价。
+
+Web 端的三类建议（监控闲置、停止实例、未绑定EIP）由调用方推送数据：
+全区域 ECS 清单刷新、闲置分析完成和 EIP 清单刷新时调用 update_resources 重新评估。
 """
 
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from cloudlens.core.cost_index import CostIndex, bill_account_id
 from cloudlens.core.database import DatabaseFactory
+from cloudlens.core.opportunity_store import OpportunityStore
+from cloudlens.core.security_compliance import SecurityComplianceAnalyzer
 from cloudlens.utils.logger import get_logger
 
 
+def _row_value(row, key: str, index: int):
+    return row.get(key) if isinstance(row, dict) else row[index]
+
+
+def _in_clause(column: str, ids: Optional[Iterable[str]]) -> Tuple[str, Tuple]:
+    """资源ID过滤条件（ids 为 None 时不过滤）"""
+    if ids is None:
+        return "", ()
+    ids = tuple(ids)
+    if not ids:
+        return " AND 1 = 0", ()
+    return f" AND {column} IN ({', '.join(['?'] * len(ids))})", ids
+
+
+def _public(opp: Dict) -> Dict:
+    """去掉仅供存储重新定价使用的字段"""
+    return {k: v for k, v in opp.items() if not k.startswith("_")}
+
+
 class OptimizationEngine:
     """优化引擎"""
 
-    def __init__(self):
+    # 分析项 -> 资源ID字段（加载结果中的键）
+    ANALYSES = {
+        "ecs": "instance_id",
+        "rds": "db_instance_id",
+        "eip": "allocation_id",
+        "nat": "nat_gateway_id",
+        "nas": "file_system_id",
+        "disk": "disk_id",
+    }
+    # 默认执行的分析项（与原先 analyze_optimization_opportunities 的范围一致），其余按需通过 sources 指定
+    DEFAULT_ANALYSES = ("eip", "ecs", "rds")
+    # 由调用方推送数据的来源 -> 资源ID字段（即优化建议和仪表盘节省潜力汇总的来源）
+    PUSHED_SOURCES = {
+        "idle_resources": "id",
+        "stopped_instances": "id",
+        "unbound_eips": "id",
+    }
+    # 全区域清单的资源类型 -> 由该清单评估的来源
+    INVENTORY_SOURCES = {"ecs": "stopped_instances"}
+
+    def __init__(self, cost_index: Optional[CostIndex] = None, max_workers: int = 6):
+        """
+        Args:
+            cost_index: 账单成本索引，提供时节省金额优先取账单实际月成本
+            max_workers: 并发执行的分析项数
+        """
         self.logger = get_logger("optimization_engine")
         self.optimization_actions = []
-
-    def analyze_optimization_opportunities(self, tenant_name: str) -> List[Dict]:
-        """分析优化机会"""
-        self.logger.info(f"分析 {tenant_name} 的优化机会...")
-
+        self.cost_index = cost_index
+        self.max_workers = max_workers
+
+    @classmethod
+    def for_account(cls, account_config, **kwargs) -> "OptimizationEngine":
+        """使用账号共享成本索引的优化引擎"""
+        return cls(cost_index=CostIndex.for_account(bill_account_id(account_config)), **kwargs)
+
+    def _monthly_cost(self, resource_id: str, fallback: float) -> float:
+        """资源月成本：账单成本索引优先，未命中用本地估算值"""
+        if self.cost_index is not None:
+            cost = self.cost_index.monthly_cost(resource_id)
+            if cost:
+                return cost
+        return fallback
+
+    def _opportunity(self, fallback_cost: float, savings_ratio: float = 1.0, **fields) -> Dict:
+        """构造优化机会，附带账单变化后重新定价所需的成本基数"""
+        fields["estimated_savings"] = round(self._monthly_cost(fields["resource_id"], fallback_cost) * savings_ratio, 2)
+        fields["_base_cost"] = fallback_cost
+        fields["_savings_ratio"] = savings_ratio
+        return fields
+
+    # ---- 优化机会存储 ----
+
+    def store_for(self, tenant_name: str) -> OpportunityStore:
+        """账号的共享优化机会存储（有成本索引时按账单重新定价）"""
+        store = OpportunityStore.for_account(tenant_name)
+        if self.cost_index is not None:
+            account_id, months = self.cost_index.account_id, self.cost_index.months
+            store.set_cost_lookup(
+                lambda rid: CostIndex.for_account(account_id, months).monthly_cost(rid), key=(account_id, months)
+            )
+        return store
+
+    def _run_analysis(
+        self, source: str, tenant_name: str, resource_ids: Optional[Iterable[str]] = None
+    ) -> Optional[List[Dict]]:
+        """加载并评估一个分析项，加载失败返回 None（保留存储中的旧结果）"""
+        loader: Callable = getattr(self, f"_load_{source}")
+        evaluate: Callable = getattr(self, f"_evaluate_{source}")
+        try:
+            rows = loader(tenant_name, resource_ids)
+        except Exception as e:
+            self.logger.error(f"分析{source.upper()}失败: {e}")
+            return None
         opportunities = []
+        for row in rows:
+            opp = evaluate(row)
+            if opp:
+                opportunities.append(opp)
+        return opportunities
+
+    def analyze_optimization_opportunities(
+        self, tenant_name: str, sources: Optional[Iterable[str]] = None
+    ) -> List[Dict]:
+        """
+        分析优化机会（各分析项并发执行），结果写入账号的优化机会存储
 
-        # 只分析确实存在的资源
-        opportunities.extend(self._analyze_idle_eip(tenant_name))
+        Args:
+            sources: 只重新分析这些分析项，默认 DEFAULT_ANALYSES
 
-        # 尝试分析其他资源,忽略错误
+        Returns:
+            这些分析项的优化机会，按预计节省降序
+        """
+        self.logger.info(f"分析 {tenant_name} 的优化机会...")
+        store = self.store_for(tenant_name)
+        sources = list(sources or self.DEFAULT_ANALYSES)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(sources)))) as executor:
+            futures = {source: executor.submit(self._run_analysis, source, tenant_name) for source in sources}
+            for source, future in futures.items():
+                opportunities = future.result()
+                if opportunities is not None:
+                    written, removed = store.replace_source(source, opportunities)
+                    self.logger.debug(f"{source}: 更新 {written} 个，移除 {removed} 个优化机会")
+
+        key = lambda o: float(o.get("estimated_savings") or 0)  # noqa: E731
+        return sorted((o for source in sources for o in store.top(source=source)), key=key, reverse=True)
+
+    def refresh_resources(self, tenant_name: str, source: str, resource_ids: Iterable[str]) -> int:
+        """
+        资源的库存或监控指标变化后，只重新加载并评估这些资源
+
+        Returns:
+            当前仍有优化机会的资源数
+        """
+        resource_ids = list(resource_ids)
+        opportunities = self._run_analysis(source, tenant_name, resource_ids)
+        if opportunities is None:
+            return 0
+        return self.apply_resource_changes(
+            tenant_name, source, opportunities, removed=set(resource_ids) - {o["resource_id"] for o in opportunities}
+        )
+
+    def update_resources(self, tenant_name: str, source: str, rows: Iterable[Dict], complete: bool = False) -> int:
+        """
+        用调用方已有的资源数据重新评估这些资源
+
+        Args:
+            rows: 与 _load_<source> 返回的行结构一致；推送来源为清单或闲置分析的条目
+            complete: rows 是该来源的完整数据（全量清单/分析结果），存储中不在 rows 里的资源一并移除
+
+        Returns:
+            当前仍有优化机会的资源数
+        """
+        evaluate = getattr(self, f"_evaluate_{source}")
+        id_field = self.ANALYSES.get(source) or self.PUSHED_SOURCES[source]
+        opportunities, removed = [], set()
+        for row in rows:
+            opp = evaluate(row)
+            if opp:
+                opportunities.append(opp)
+            elif row.get(id_field):
+                removed.add(row[id_field])
+        if complete:
+            written, dropped = self.store_for(tenant_name).replace_source(source, opportunities)
+            self.logger.debug(f"{source}: 更新 {written} 个，移除 {dropped} 个优化机会")
+            return len(opportunities)
+        return self.apply_resource_changes(tenant_name, source, opportunities, removed)
+
+    def on_inventory_refreshed(self, tenant_name: str, resource_type: str, resources: Iterable[Dict]) -> None:
+        """全区域清单刷新钩子：重新评估由该清单得出的来源（不相关的资源类型跳过）"""
+        source = self.INVENTORY_SOURCES.get(resource_type)
+        if source is None:
+            return
         try:
-            opportunities.extend(self._analyze_idle_ecs(tenant_name))
+            self.update_resources(tenant_name, source, resources, complete=True)
         except Exception as e:
-            self.logger.debug(f"ECS分析跳过: {e}")
+            self.logger.warning(f"按 {resource_type} 清单更新优化机会失败: {e}")
 
+    def on_idle_analyzed(self, tenant_name: str, idle_items: Iterable[Dict]) -> None:
+        """监控指标闲置分析完成钩子：结果覆盖全部运行中实例，整体替换 idle_resources"""
+        rows = [{**item, "id": item.get("id") or item.get("instance_id")} for item in idle_items or []]
         try:
-            opportunities.extend(self._analyze_idle_rds(tenant_name))
+            self.update_resources(tenant_name, "idle_resources", rows, complete=True)
         except Exception as e:
-            self.logger.debug(f"RDS分析跳过: {e}")
-
-        return opportunities
-
-    def _analyze_idle_ecs(self, tenant_name: str) -> List[Dict]:
-        """分析闲置ECS实例"""
-        opportunities = []
+            self.logger.warning(f"按闲置分析结果更新优化机会失败: {e}")
 
+    def apply_resource_changes(
+        self, tenant_name: str, source: str, opportunities: List[Dict], removed: Iterable[str] = ()
+    ) -> int:
+        """把单个资源级别的变化写入存储"""
+        store = self.store_for(tenant_name)
+        for opp in opportunities:
+            store.upsert(_public(opp), source, opp.get("_base_cost"), opp.get("_savings_ratio", 1.0))
+        for resource_id in removed:
+            store.remove(resource_id, source)
+        return len(opportunities)
+
+    # ---- ECS ----
+
+    def _load_ecs(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        """ECS实例及CPU/内存平均利用率（两次查询）"""
+        ids = None if resource_ids is None else tuple(resource_ids)
+        # 使用数据库抽象层读取监控数据
+        db = DatabaseFactory.create_adapter("sqlite", db_path="ecs_monitoring_data_fixed.db")
         try:
-            # 使用数据库抽象层读取监控数据
-            db = DatabaseFactory.create_adapter("sqlite", db_path="ecs_monitoring_data_fixed.db")
-
-            # 查找闲置ECS (CPU和内存都很低)
+            where, params = _in_clause("e.instance_id", ids)
             instances = db.query(
-                """
+                f"""
                 SELECT DISTINCT e.instance_id, e.instance_name, e.instance_type,
                        e.region, e.monthly_cost
                 FROM ecs_instances e
-                WHERE e.tenant_name = ? AND e.monthly_cost > 0
+                WHERE e.tenant_name = ? AND e.monthly_cost > 0{where}
             """,
-                (tenant_name,),
+                (tenant_name, *params),
             )
 
-            for inst in instances:
-                instance_id = inst.get("instance_id") if isinstance(inst, dict) else inst[0]
-                name = inst.get("instance_name") if isinstance(inst, dict) else inst[1]
-                instance_type = inst.get("instance_type") if isinstance(inst, dict) else inst[2]
-                region = inst.get("region") if isinstance(inst, dict) else inst[3]
-                cost = inst.get("monthly_cost") if isinstance(inst, dict) else inst[4]
-
-                # 获取监控数据
-                metrics_rows = db.query(
-                    """
-                    SELECT AVG(metric_value) as avg_val, metric_name
-                    FROM ecs_monitoring_data
-                    WHERE instance_id = ? AND metric_name IN ('cpu_utilization', 'memory_utilization')
-                    GROUP BY metric_name
-                """,
-                    (instance_id,),
-                )
-
-                metrics = {}
-                for row in metrics_rows:
-                    metric_name = row.get("metric_name") if isinstance(row, dict) else row[1]
-                    avg_val = row.get("avg_val") if isinstance(row, dict) else row[0]
-                    metrics[metric_name] = avg_val
-
-                cpu_util = metrics.get("cpu_utilization", 0)
-                mem_util = metrics.get("memory_utilization", 0)
-
-                # 判断是否闲置或可降配
-                if cpu_util < 5 and mem_util < 10:
-                    opportunities.append(
-                        {
-                            "resource_type": "ECS",
-                            "resource_id": instance_id,
-                            "resource_name": name,
-                            "region": region,
-                            "action": "release",
-                            "reason": f"CPU利用率{cpu_util:.1f}%,内存{mem_util:.1f}%,几乎闲置",
-                            "estimated_savings": cost,
-                            "current_spec": instance_type,
-                            "priority": "high",
-                        }
-                    )
-                elif cpu_util < 20 and "-" in instance_type:
-                    # 建议降配
-                    downgraded_spec = self._suggest_downgrade_spec(instance_type)
-                    if downgraded_spec:
-                        opportunities.append(
-                            {
-                                "resource_type": "ECS",
-                                "resource_id": instance_id,
-                                "resource_name": name,
-                                "region": region,
-                                "action": "downgrade",
-                                "reason": f"CPU利用率{cpu_util:.1f}%,可降配",
-                                "estimated_savings": cost * 0.3,  # 估计节省30%
-                                "current_spec": instance_type,
-                                "suggested_spec": downgraded_spec,
-                                "priority": "medium",
-                            }
-                        )
-
+            where, params = _in_clause("instance_id", ids)
+            metrics_rows = db.query(
+                f"""
+                SELECT instance_id, metric_name, AVG(metric_value) as avg_val
+                FROM ecs_monitoring_data
+                WHERE metric_name IN ('cpu_utilization', 'memory_utilization'){where}
+                GROUP BY instance_id, metric_name
+            """,
+                params,
+            )
+        finally:
             db.close()
 
-        except Exception as e:
-            self.logger.error(f"分析ECS失败: {e}")
+        metrics: Dict[str, Dict[str, float]] = {}
+        for row in metrics_rows:
+            metrics.setdefault(_row_value(row, "instance_id", 0), {})[
+                _row_value(row, "metric_name", 1)
+            ] = _row_value(row, "avg_val", 2)
+
+        return [
+            {
+                "instance_id": _row_value(inst, "instance_id", 0),
+                "instance_name": _row_value(inst, "instance_name", 1),
+                "instance_type": _row_value(inst, "instance_type", 2),
+                "region": _row_value(inst, "region", 3),
+                "monthly_cost": _row_value(inst, "monthly_cost", 4),
+                "metrics": metrics.get(_row_value(inst, "instance_id", 0), {}),
+            }
+            for inst in instances
+        ]
 
-        return opportunities
+    def _evaluate_ecs(self, inst: Dict) -> Optional[Dict]:
+        instance_id = inst["instance_id"]
+        instance_type = inst.get("instance_type") or ""
+        cost = inst.get("monthly_cost") or 0
+        metrics = inst.get("metrics") or {}
+        cpu_util = metrics.get("cpu_utilization") or 0
+        mem_util = metrics.get("memory_utilization") or 0
+
+        # 判断是否闲置或可降配
+        if cpu_util < 5 and mem_util < 10:
+            return self._opportunity(
+                cost,
+                resource_type="ECS",
+                resource_id=instance_id,
+                resource_name=inst.get("instance_name"),
+                region=inst.get("region"),
+                action="release",
+                reason=f"CPU利用率{cpu_util:.1f}%,内存{mem_util:.1f}%,几乎闲置",
+                current_spec=instance_type,
+                priority="high",
+            )
+        if cpu_util < 20 and "-" in instance_type:
+            # 建议降配
+            downgraded_spec = self._suggest_downgrade_spec(instance_type)
+            if downgraded_spec:
+                return self._opportunity(
+                    cost,
+                    0.3,  # 估计节省30%
+                    resource_type="ECS",
+                    resource_id=instance_id,
+                    resource_name=inst.get("instance_name"),
+                    region=inst.get("region"),
+                    action="downgrade",
+                    reason=f"CPU利用率{cpu_util:.1f}%,可降配",
+                    current_spec=instance_type,
+                    suggested_spec=downgraded_spec,
+                    priority="medium",
+                )
+        return None
+
+    def _analyze_idle_ecs(self, tenant_name: str) -> List[Dict]:
+        """分析闲置ECS实例"""
+        return [_public(o) for o in self._run_analysis("ecs", tenant_name) or []]
 
     def _suggest_downgrade_spec(self, current_spec: str) -> str:
         """建议降配规格"""
@@ -139,223 +328,310 @@ class OptimizationEngine:
             return current_spec.replace("large", "medium")
         return ""
 
-    def _analyze_idle_rds(self, tenant_name: str) -> List[Dict]:
-        """分析闲置RDS数据库"""
-        opportunities = []
+    # ---- RDS ----
 
+    def _load_rds(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        """RDS实例及平均活跃连接数（两次查询）"""
+        ids = None if resource_ids is None else tuple(resource_ids)
+        db = DatabaseFactory.create_adapter("sqlite", db_path="rds_monitoring_data.db")
         try:
-            db = DatabaseFactory.create_adapter("sqlite", db_path="rds_monitoring_data.db")
-
+            where, params = _in_clause("db_instance_id", ids)
             instances = db.query(
-                """
+                f"""
                 SELECT DISTINCT db_instance_id, description, db_instance_class,
                        region_id
                 FROM rds_instances
-            """
+                WHERE 1 = 1{where}
+            """,
+                params,
             )
-
-            for inst in instances:
-                db_id = inst.get("db_instance_id") if isinstance(inst, dict) else inst[0]
-                description = inst.get("description") if isinstance(inst, dict) else inst[1]
-                instance_class = inst.get("db_instance_class") if isinstance(inst, dict) else inst[2]
-                region = inst.get("region_id") if isinstance(inst, dict) else inst[3]
-
-                # 获取连接数
-                result = db.query_one(
-                    """
-                    SELECT AVG(metric_value) as avg_conn
-                    FROM rds_monitoring_data
-                    WHERE db_instance_id = ? AND metric_name = 'active_connections'
-                """,
-                    (db_id,),
-                )
-
-                avg_conn = result.get("avg_conn", 0) if result else 0
-
-                if avg_conn < 1:
-                    opportunities.append(
-                        {
-                            "resource_type": "RDS",
-                            "resource_id": db_id,
-                            "resource_name": description or db_id,
-                            "region": region,
-                            "action": "release",
-                            "reason": f"平均连接数{avg_conn:.1f},几乎无连接",
-                            "estimated_savings": 200,  # 估算值
-                            "current_spec": instance_class,
-                            "priority": "high",
-                        }
-                    )
-
+            conn_rows = db.query(
+                f"""
+                SELECT db_instance_id, AVG(metric_value) as avg_conn
+                FROM rds_monitoring_data
+                WHERE metric_name = 'active_connections'{where}
+                GROUP BY db_instance_id
+            """,
+                params,
+            )
+        finally:
             db.close()
 
-        except Exception as e:
-            self.logger.error(f"分析RDS失败: {e}")
+        connections = {_row_value(r, "db_instance_id", 0): _row_value(r, "avg_conn", 1) for r in conn_rows}
+        return [
+            {
+                "db_instance_id": _row_value(inst, "db_instance_id", 0),
+                "description": _row_value(inst, "description", 1),
+                "db_instance_class": _row_value(inst, "db_instance_class", 2),
+                "region_id": _row_value(inst, "region_id", 3),
+                "avg_conn": connections.get(_row_value(inst, "db_instance_id", 0)) or 0,
+            }
+            for inst in instances
+        ]
 
-        return opportunities
+    def _evaluate_rds(self, inst: Dict) -> Optional[Dict]:
+        avg_conn = inst.get("avg_conn") or 0
+        if avg_conn >= 1:
+            return None
+        db_id = inst["db_instance_id"]
+        return self._opportunity(
+            200,  # 无账单时用估算值
+            resource_type="RDS",
+            resource_id=db_id,
+            resource_name=inst.get("description") or db_id,
+            region=inst.get("region_id"),
+            action="release",
+            reason=f"平均连接数{avg_conn:.1f},几乎无连接",
+            current_spec=inst.get("db_instance_class"),
+            priority="high",
+        )
 
-    def _analyze_idle_eip(self, tenant_name: str) -> List[Dict]:
-        """分析闲置EIP"""
-        opportunities = []
+    def _analyze_idle_rds(self, tenant_name: str) -> List[Dict]:
+        """分析闲置RDS数据库"""
+        return [_public(o) for o in self._run_analysis("rds", tenant_name) or []]
 
-        try:
-            db = DatabaseFactory.create_adapter("sqlite", db_path="eip_monitoring_data.db")
+    # ---- EIP ----
 
+    def _load_eip(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        """EIP 及绑定状态（增量刷新时包含已绑定的，以便移除不再闲置的机会）"""
+        db = DatabaseFactory.create_adapter("sqlite", db_path="eip_monitoring_data.db")
+        try:
+            where, params = _in_clause("allocation_id", resource_ids)
+            unbound = "" if resource_ids is not None else " AND (instance_id IS NULL OR instance_id = '')"
             eips = db.query(
-                """
-                SELECT allocation_id, eip_address, region, monthly_cost
+                f"""
+                SELECT allocation_id, eip_address, region, monthly_cost, instance_id
                 FROM eip_instances
-                WHERE (instance_id IS NULL OR instance_id = '')
-            """
+                WHERE 1 = 1{unbound}{where}
+            """,
+                params,
             )
-
-            for eip in eips:
-                allocation_id = eip.get("allocation_id") if isinstance(eip, dict) else eip[0]
-                ip = eip.get("eip_address") if isinstance(eip, dict) else eip[1]
-                region = eip.get("region") if isinstance(eip, dict) else eip[2]
-                cost = eip.get("monthly_cost") if isinstance(eip, dict) else eip[3]
-
-                opportunities.append(
-                    {
-                        "resource_type": "EIP",
-                        "resource_id": allocation_id,
-                        "resource_name": ip,
-                        "region": region,
-                        "action": "release",
-                        "reason": "未绑定任何实例",
-                        "estimated_savings": cost or 50,  # 默认估计50元/月
-                        "priority": "high",
-                    }
-                )
-
+        finally:
             db.close()
+        return [
+            {
+                "allocation_id": _row_value(eip, "allocation_id", 0),
+                "eip_address": _row_value(eip, "eip_address", 1),
+                "region": _row_value(eip, "region", 2),
+                "monthly_cost": _row_value(eip, "monthly_cost", 3),
+                "instance_id": _row_value(eip, "instance_id", 4),
+            }
+            for eip in eips
+        ]
 
-        except Exception as e:
-            self.logger.error(f"分析EIP失败: {e}")
+    def _evaluate_eip(self, eip: Dict) -> Optional[Dict]:
+        if eip.get("instance_id"):
+            return None
+        return self._opportunity(
+            eip.get("monthly_cost") or 50,  # 默认估计50元/月
+            resource_type="EIP",
+            resource_id=eip["allocation_id"],
+            resource_name=eip.get("eip_address"),
+            region=eip.get("region"),
+            action="release",
+            reason="未绑定任何实例",
+            priority="high",
+        )
 
-        return opportunities
+    def _analyze_idle_eip(self, tenant_name: str) -> List[Dict]:
+        """分析闲置EIP"""
+        return [_public(o) for o in self._run_analysis("eip", tenant_name) or []]
 
-    def _analyze_idle_nat(self, tenant_name: str) -> List[Dict]:
-        """分析闲置NAT网关"""
-        opportunities = []
+    # ---- NAT ----
 
+    def _load_nat(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        db = DatabaseFactory.create_adapter("sqlite", db_path="nat_monitoring_data.db")
         try:
-            db = DatabaseFactory.create_adapter("sqlite", db_path="nat_monitoring_data.db")
-
+            where, params = _in_clause("nat_gateway_id", resource_ids)
+            unused = "" if resource_ids is not None else " AND (ip_count = 0 OR snat_count = 0)"
             nats = db.query(
-                """
-                SELECT nat_gateway_id, name, region
+                f"""
+                SELECT nat_gateway_id, name, region, ip_count, snat_count
                 FROM nat_gateways
-                WHERE ip_count = 0 OR snat_count = 0
-            """
+                WHERE 1 = 1{unused}{where}
+            """,
+                params,
             )
-
-            for nat in nats:
-                nat_id = nat.get("nat_gateway_id") if isinstance(nat, dict) else nat[0]
-                name = nat.get("name") if isinstance(nat, dict) else nat[1]
-                region = nat.get("region") if isinstance(nat, dict) else nat[2]
-
-                opportunities.append(
-                    {
-                        "resource_type": "NAT",
-                        "resource_id": nat_id,
-                        "resource_name": name or nat_id,
-                        "region": region,
-                        "action": "release",
-                        "reason": "未绑定EIP或无SNAT条目",
-                        "estimated_savings": 150,  # NAT网关约150元/月
-                        "priority": "high",
-                    }
-                )
-
+        finally:
             db.close()
+        return [
+            {
+                "nat_gateway_id": _row_value(nat, "nat_gateway_id", 0),
+                "name": _row_value(nat, "name", 1),
+                "region": _row_value(nat, "region", 2),
+                "ip_count": _row_value(nat, "ip_count", 3),
+                "snat_count": _row_value(nat, "snat_count", 4),
+            }
+            for nat in nats
+        ]
 
-        except Exception as e:
-            self.logger.error(f"分析NAT失败: {e}")
+    def _evaluate_nat(self, nat: Dict) -> Optional[Dict]:
+        if nat.get("ip_count") and nat.get("snat_count"):
+            return None
+        nat_id = nat["nat_gateway_id"]
+        return self._opportunity(
+            150,  # NAT网关约150元/月
+            resource_type="NAT",
+            resource_id=nat_id,
+            resource_name=nat.get("name") or nat_id,
+            region=nat.get("region"),
+            action="release",
+            reason="未绑定EIP或无SNAT条目",
+            priority="high",
+        )
 
-        return opportunities
+    def _analyze_idle_nat(self, tenant_name: str) -> List[Dict]:
+        """分析闲置NAT网关"""
+        return [_public(o) for o in self._run_analysis("nat", tenant_name) or []]
 
-    def _analyze_idle_nas(self, tenant_name: str) -> List[Dict]:
-        """分析闲置NAS文件系统"""
-        opportunities = []
+    # ---- NAS ----
 
+    def _load_nas(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        db = DatabaseFactory.create_adapter("sqlite", db_path="nas_monitoring_data.db")
         try:
-            db = DatabaseFactory.create_adapter("sqlite", db_path="nas_monitoring_data.db")
-
+            where, params = _in_clause("file_system_id", resource_ids)
+            unmounted = "" if resource_ids is not None else " AND mount_target_count = 0"
             nas_list = db.query(
-                """
-                SELECT file_system_id, description, region, monthly_cost
+                f"""
+                SELECT file_system_id, description, region, monthly_cost, mount_target_count
                 FROM nas_file_systems
-                WHERE mount_target_count = 0
-            """
+                WHERE 1 = 1{unmounted}{where}
+            """,
+                params,
             )
-
-            for nas in nas_list:
-                fs_id = nas.get("file_system_id") if isinstance(nas, dict) else nas[0]
-                description = nas.get("description") if isinstance(nas, dict) else nas[1]
-                region = nas.get("region") if isinstance(nas, dict) else nas[2]
-                cost = nas.get("monthly_cost") if isinstance(nas, dict) else nas[3]
-
-                opportunities.append(
-                    {
-                        "resource_type": "NAS",
-                        "resource_id": fs_id,
-                        "resource_name": description or fs_id,
-                        "region": region,
-                        "action": "release",
-                        "reason": "无挂载点",
-                        "estimated_savings": cost or 30,
-                        "priority": "medium",
-                    }
-                )
-
+        finally:
             db.close()
+        return [
+            {
+                "file_system_id": _row_value(nas, "file_system_id", 0),
+                "description": _row_value(nas, "description", 1),
+                "region": _row_value(nas, "region", 2),
+                "monthly_cost": _row_value(nas, "monthly_cost", 3),
+                "mount_target_count": _row_value(nas, "mount_target_count", 4),
+            }
+            for nas in nas_list
+        ]
 
-        except Exception as e:
-            self.logger.error(f"分析NAS失败: {e}")
+    def _evaluate_nas(self, nas: Dict) -> Optional[Dict]:
+        if nas.get("mount_target_count"):
+            return None
+        fs_id = nas["file_system_id"]
+        return self._opportunity(
+            nas.get("monthly_cost") or 30,
+            resource_type="NAS",
+            resource_id=fs_id,
+            resource_name=nas.get("description") or fs_id,
+            region=nas.get("region"),
+            action="release",
+            reason="无挂载点",
+            priority="medium",
+        )
 
-        return opportunities
+    def _analyze_idle_nas(self, tenant_name: str) -> List[Dict]:
+        """分析闲置NAS文件系统"""
+        return [_public(o) for o in self._run_analysis("nas", tenant_name) or []]
 
-    def _analyze_idle_disk(self, tenant_name: str) -> List[Dict]:
-        """分析未挂载云盘"""
-        opportunities = []
+    # ---- 云盘 ----
 
+    def _load_disk(self, tenant_name: str, resource_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        db = DatabaseFactory.create_adapter("sqlite", db_path="disk_monitoring_data.db")
         try:
-            db = DatabaseFactory.create_adapter("sqlite", db_path="disk_monitoring_data.db")
-
+            where, params = _in_clause("disk_id", resource_ids)
+            available = "" if resource_ids is not None else " AND status = 'Available'"
             disks = db.query(
-                """
-                SELECT disk_id, disk_name, region, monthly_cost
+                f"""
+                SELECT disk_id, disk_name, region, monthly_cost, status
                 FROM disk_instances
-                WHERE status = 'Available'
-            """
+                WHERE 1 = 1{available}{where}
+            """,
+                params,
             )
-
-            for disk in disks:
-                disk_id = disk.get("disk_id") if isinstance(disk, dict) else disk[0]
-                name = disk.get("disk_name") if isinstance(disk, dict) else disk[1]
-                region = disk.get("region") if isinstance(disk, dict) else disk[2]
-                cost = disk.get("monthly_cost") if isinstance(disk, dict) else disk[3]
-
-                opportunities.append(
-                    {
-                        "resource_type": "Disk",
-                        "resource_id": disk_id,
-                        "resource_name": name or disk_id,
-                        "region": region,
-                        "action": "release",
-                        "reason": "未挂载到任何实例",
-                        "estimated_savings": cost or 20,
-                        "priority": "medium",
-                    }
-                )
-
+        finally:
             db.close()
+        return [
+            {
+                "disk_id": _row_value(disk, "disk_id", 0),
+                "disk_name": _row_value(disk, "disk_name", 1),
+                "region": _row_value(disk, "region", 2),
+                "monthly_cost": _row_value(disk, "monthly_cost", 3),
+                "status": _row_value(disk, "status", 4),
+            }
+            for disk in disks
+        ]
 
-        except Exception as e:
-            self.logger.error(f"分析Disk失败: {e}")
+    def _evaluate_disk(self, disk: Dict) -> Optional[Dict]:
+        if disk.get("status") != "Available":
+            return None
+        disk_id = disk["disk_id"]
+        return self._opportunity(
+            disk.get("monthly_cost") or 20,
+            resource_type="Disk",
+            resource_id=disk_id,
+            resource_name=disk.get("disk_name") or disk_id,
+            region=disk.get("region"),
+            action="release",
+            reason="未挂载到任何实例",
+            priority="medium",
+        )
 
-        return opportunities
+    def _analyze_idle_disk(self, tenant_name: str) -> List[Dict]:
+        """分析未挂载云盘"""
+        return [_public(o) for o in self._run_analysis("disk", tenant_name) or []]
+
+    # ---- 推送来源（Web 端清单和监控分析） ----
+
+    def _evaluate_idle_resources(self, item: Dict) -> Optional[Dict]:
+        """监控指标闲置分析的条目（Web 端含 savings，分析服务含 reasons）"""
+        resource_id = item.get("id")
+        if not resource_id:
+            return None
+        return self._opportunity(
+            float(item.get("savings") or 0),
+            resource_type="ECS",
+            resource_id=resource_id,
+            resource_name=item.get("name") or resource_id,
+            region=item.get("region"),
+            action="release_or_downgrade",
+            reason=item.get("reason") or "; ".join(item.get("reasons") or []),
+            priority="high",
+            details=item,
+        )
+
+    def _evaluate_stopped_instances(self, inst: Dict) -> Optional[Dict]:
+        """ECS 清单条目：已停止的实例仍产生磁盘费用，释放可节省约70%"""
+        stopped = SecurityComplianceAnalyzer.check_stopped_instances([inst])
+        if not stopped or not stopped[0].get("id"):
+            return None
+        item = stopped[0]
+        return self._opportunity(
+            float(inst.get("cost") or 300),  # 清单没有成本时估计300元/月
+            0.7,
+            resource_type="ECS",
+            resource_id=item["id"],
+            resource_name=item.get("name") or item["id"],
+            region=item.get("region"),
+            action="release",
+            reason=item.get("reason", ""),
+            priority="medium",
+            details=item,
+        )
+
+    def _evaluate_unbound_eips(self, eip: Dict) -> Optional[Dict]:
+        """EIP 清单条目：未绑定实例的 EIP"""
+        eip_id = eip.get("id") or eip.get("allocation_id") or eip.get("ip_address")
+        if not eip_id or eip.get("instance_id"):
+            return None
+        return self._opportunity(
+            20,  # 未绑定EIP约20元/月
+            resource_type="EIP",
+            resource_id=eip_id,
+            resource_name=eip.get("name") or eip_id,
+            region=eip.get("region"),
+            action="release",
+            reason=eip.get("reason", ""),
+            priority="high",
+            details=eip,
+        )
 
     def calculate_roi(self, opportunities: List[Dict]) -> Dict:
         """计算ROI"""
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段流水线
+
+多个处理阶段通过有界队列串联，每个阶段有独立的并发数和批大小，
+上游阶段产出的数据立即流入下游，各阶段的 IO 等待相互重叠。
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+
+
+@dataclass
+class Stage:
+    """
+    流水线阶段
+
+    Attributes:
+        name: 阶段名称（用于日志和统计）
+        func: 处理函数，输入一批数据，返回交给下一阶段的数据（可迭代）
+        workers: 并发线程数
+        batch_size: 每次交给 func 的最大条数
+    """
+
+    name: str
+    func: Callable[[List[Any]], Optional[Iterable[Any]]]
+    workers: int = 1
+    batch_size: int = 1
+
+
+class StagedPipeline:
+    """
+    有界队列串联的多阶段流水线
+
+    用法:
+        pipeline = StagedPipeline([
+            Stage("list", list_func, workers=4),
+            Stage("metrics", metrics_func, workers=8, batch_size=20),
+        ])
+        outputs = pipeline.run(regions)
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 256, batch_wait: float = 0.05):
+        """
+        Args:
+            stages: 阶段列表（按顺序）
+            queue_size: 阶段间队列容量，满时上游阻塞（背压）
+            batch_wait: 凑批时等待后续数据的最长时间（秒）
+        """
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.batch_wait = batch_wait
+        self.stats: Dict[str, Dict[str, float]] = {
+            s.name: {"items": 0, "batches": 0, "errors": 0, "busy_seconds": 0.0} for s in stages
+        }
+        self._stats_lock = threading.Lock()
+
+    def _next_batch(self, in_q: queue.Queue, batch_size: int):
+        """取一批数据，返回 (batch, 是否收到结束标记)"""
+        item = in_q.get()
+        if item is _SENTINEL:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = in_q.get(timeout=remaining) if remaining > 0 else in_q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _SENTINEL:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self, stage: Stage, in_q: queue.Queue, emit: Callable[[Any], None]) -> None:
+        done = False
+        while not done:
+            batch, done = self._next_batch(in_q, stage.batch_size)
+            if not batch:
+                continue
+            started = time.monotonic()
+            error = False
+            try:
+                for out in stage.func(batch) or ():
+                    emit(out)
+            except Exception as e:
+                error = True
+                logger.exception(f"流水线阶段 {stage.name} 处理失败: {e}")
+            with self._stats_lock:
+                s = self.stats[stage.name]
+                s["items"] += len(batch)
+                s["batches"] += 1
+                s["errors"] += int(error)
+                s["busy_seconds"] += time.monotonic() - started
+
+    def run(self, source: Iterable[Any]) -> List[Any]:
+        """
+        运行流水线
+
+        Args:
+            source: 第一阶段的输入
+
+        Returns:
+            最后一个阶段产出的全部数据
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        outputs: List[Any] = []
+        outputs_lock = threading.Lock()
+
+        def collect(item):
+            with outputs_lock:
+                outputs.append(item)
+
+        threads: List[List[threading.Thread]] = []
+        for idx, stage in enumerate(self.stages):
+            emit = queues[idx + 1].put if idx + 1 < len(self.stages) else collect
+            stage_threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[idx], emit),
+                    name=f"pipeline-{stage.name}-{i}",
+                    daemon=True,
+                )
+                for i in range(max(1, stage.workers))
+            ]
+            for t in stage_threads:
+                t.start()
+            threads.append(stage_threads)
+
+        for item in source:
+            queues[0].put(item)
+
+        # 逐级关闭：上一阶段全部结束后，再向下一阶段发送结束标记
+        for idx, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                queues[idx].put(_SENTINEL)
+            for t in stage_threads:
+                t.join()
+
+        return outputs
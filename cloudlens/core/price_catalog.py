@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+价格目录缓存
+
+按 SKU 元组（账号、资源类型、区域、规格、计费方式、周期等）缓存询价结果，
+带 TTL 和请求去重：同一 SKU 的并发请求只会触发一次 API 调用。
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class _Pending:
+    """正在查询中的 SKU，其他请求方等待其完成"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.ok = False
+
+
+class PriceCatalog:
+    """
+    SKU 价格目录（线程安全）
+
+    用法:
+        catalog = PriceCatalog(ttl_seconds=3600)
+        prices = catalog.get_many(skus, fetch_many)  # fetch_many(缺失的skus) -> {sku: price}
+    """
+
+    def __init__(self, ttl_seconds: float = 3600):
+        """
+        Args:
+            ttl_seconds: 价格有效期（秒）
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sku: Hashable) -> Optional[Any]:
+        """获取未过期的缓存价格"""
+        with self._lock:
+            return self._lookup(sku)
+
+    def _lookup(self, sku: Hashable) -> Optional[Any]:
+        entry = self._entries.get(sku)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[sku]
+            return None
+        return value
+
+    def put(self, sku: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[sku] = (time.monotonic(), value)
+
+    def get_many(
+        self,
+        skus: Iterable[Hashable],
+        fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]],
+    ) -> Dict[Hashable, Any]:
+        """
+        批量获取价格，只对缓存未命中且无人在查的 SKU 调用 fetch_many
+
+        Args:
+            skus: SKU 列表（可重复，内部去重）
+            fetch_many: 批量询价函数；返回结果中缺失的 SKU 视为查询失败，不缓存
+
+        Returns:
+            {sku: 价格}，查询失败的 SKU 不在结果中
+        """
+        result: Dict[Hashable, Any] = {}
+        to_fetch: List[Hashable] = []
+        waiting: Dict[Hashable, _Pending] = {}
+
+        with self._lock:
+            for sku in dict.fromkeys(skus):
+                value = self._lookup(sku)
+                if value is not None:
+                    self.hits += 1
+                    result[sku] = value
+                elif sku in self._pending:
+                    waiting[sku] = self._pending[sku]
+                else:
+                    self.misses += 1
+                    self._pending[sku] = _Pending()
+                    to_fetch.append(sku)
+
+        if to_fetch:
+            fetched: Dict[Hashable, Any] = {}
+            try:
+                fetched = fetch_many(to_fetch) or {}
+            finally:
+                now = time.monotonic()
+                with self._lock:
+                    for sku in to_fetch:
+                        pending = self._pending.pop(sku)
+                        if sku in fetched:
+                            self._entries[sku] = (now, fetched[sku])
+                            pending.value = fetched[sku]
+                            pending.ok = True
+                        pending.event.set()
+            result.update(fetched)
+
+        for sku, pending in waiting.items():
+            pending.event.wait()
+            if pending.ok:
+                result[sku] = pending.value
+
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+API 速率限制器
+
+令牌桶实现，用于按账号约束云 API 调用速率（线程安全）。
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    以 rate 个/秒 的速度补充令牌，最多累积 capacity 个。
+    try_acquire 非阻塞，返回需要等待的秒数；acquire 阻塞直到拿到令牌。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数（即稳定QPS）
+            capacity: 桶容量（允许的突发量），默认等于 rate
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        尝试获取令牌
+
+        Args:
+            tokens: 需要的令牌数（超过容量时按容量计，避免永远无法满足）
+
+        Returns:
+            0 表示获取成功，否则为还需等待的秒数
+        """
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        """阻塞直到获取令牌"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class RateLimiterRegistry:
+    """按键（通常是账号名）共享的令牌桶集合"""
+
+    def __init__(self, rate: float = 10, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> TokenBucket:
+        """获取（必要时创建）指定键的令牌桶"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+    def set(self, key: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+        """为指定键设置独立配额"""
+        bucket = TokenBucket(rate, capacity)
+        with self._lock:
+            self._buckets[key] = bucket
+        return bucket
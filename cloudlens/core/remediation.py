@@ -4,8 +4,9 @@ Auto-Remediation Framework
 自动化治理框架，支持 dry-run 模式确保安全
 """
 
+import json
 from enum import Enum
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 
 class RemediationAction(Enum):
@@ -16,6 +17,45 @@ class RemediationAction(Enum):
     MODIFY_SECURITY_GROUP = "modify_security_group"
     RELEASE_EIP = "release_eip"
     DELETE_IDLE_DISK = "delete_idle_disk"
+    ADD_TAGS = "add_tags"
+
+
+# 有多ID接口的动作单次调用可携带的资源数（其余动作逐个调用）
+BATCH_SIZES = {
+    RemediationAction.STOP_INSTANCE: 100,  # StopInstances
+    RemediationAction.ADD_TAGS: 50,  # TagResources
+}
+
+# 资源类型 -> (TagResources 请求类路径, 接口中的 ResourceType)
+_TAG_REQUESTS = {
+    "ecs": ("aliyunsdkecs.request.v20140526.TagResourcesRequest", "instance"),
+    "disk": ("aliyunsdkecs.request.v20140526.TagResourcesRequest", "disk"),
+    "snapshot": ("aliyunsdkecs.request.v20140526.TagResourcesRequest", "snapshot"),
+    "rds": ("aliyunsdkrds.request.v20140815.TagResourcesRequest", "INSTANCE"),
+    "redis": ("aliyunsdkr_kvstore.request.v20150101.TagResourcesRequest", "INSTANCE"),
+}
+
+
+def build_tag_request(resource_type: str, resource_ids: List[str], tags: Dict[str, str]):
+    """
+    构造一次 TagResources 请求（同一资源类型最多50个资源共用一组标签）
+
+    Args:
+        resource_type: 资源类型（ecs / disk / snapshot / rds / redis，大小写不敏感）
+        resource_ids: 资源ID列表
+        tags: 标签
+    """
+    import importlib
+
+    entry = _TAG_REQUESTS.get(str(resource_type).lower())
+    if entry is None:
+        raise ValueError(f"不支持为 {resource_type} 批量打标签")
+    module_path, api_type = entry
+    request = importlib.import_module(module_path).TagResourcesRequest()
+    request.set_ResourceType(api_type)
+    request.set_ResourceIds(list(resource_ids))
+    request.set_Tags([{"Key": k, "Value": v} for k, v in tags.items()])
+    return request
 
 
 class RemediationPlan:
@@ -51,6 +91,32 @@ class RemediationEngine:
         self.actions[RemediationAction.MODIFY_SECURITY_GROUP] = self._modify_security_group
         self.actions[RemediationAction.RELEASE_EIP] = self._release_eip
         self.actions[RemediationAction.DELETE_IDLE_DISK] = self._delete_idle_disk
+        self.actions[RemediationAction.ADD_TAGS] = self._add_tags
+
+    def batch_actions(self) -> Dict[RemediationAction, Any]:
+        """
+        批量执行时各动作的处理器：有多ID接口的动作一次调用处理一块，其余逐个调用原处理器
+        """
+        from cloudlens.core.remediation_batch import BatchAction
+
+        multi = {
+            RemediationAction.STOP_INSTANCE: self._stop_instances,
+            RemediationAction.ADD_TAGS: self._tag_resources,
+        }
+        batch_actions = {}
+        for action, handler in self.actions.items():
+            if action in multi:
+                batch_actions[action] = BatchAction(multi[action], BATCH_SIZES[action])
+            else:
+                batch_actions[action] = BatchAction(self._single(handler))
+        return batch_actions
+
+    @staticmethod
+    def _single(handler: Callable) -> Callable:
+        def run(plans: List[RemediationPlan]) -> Dict[str, Optional[str]]:
+            return {p.resource_id: None if handler(p) else f"{p.action.value} 执行失败" for p in plans}
+
+        return run
 
     def execute_plan(self, plan: RemediationPlan) -> bool:
         """
@@ -80,25 +146,63 @@ class RemediationEngine:
             print(f"❌ Failed to execute {plan.action.value}: {e}")
             return False
 
-    def execute_batch(self, plans: List[RemediationPlan]) -> Dict[str, Any]:
+    def execute_batch(
+        self,
+        plans: List[RemediationPlan],
+        max_workers: int = 4,
+        rate: float = 5.0,
+        run_id: Optional[str] = None,
+        state_dir: Optional[str] = None,
+        audit: Optional[Callable] = None,
+    ) -> Dict[str, Any]:
         """
         批量执行修复计划
 
+        按 (区域, 动作) 分组，有多ID接口的动作一次调用处理一块，各块在速率限制下并发执行；
+        进度写入检查点，传入上次的 run_id 可续跑。
+
+        Args:
+            plans: 修复计划列表
+            max_workers: 并发执行的块数
+            rate: 每个凭证每秒 API 调用数
+            run_id: 续跑的运行ID
+            state_dir: 检查点目录
+            audit: 每个资源执行后的审计回调 audit(plan, error)
+
         Returns:
             执行结果统计
         """
-        results = {"total": len(plans), "success": 0, "failed": 0, "dry_run": self.dry_run}
+        from cloudlens.core.remediation_batch import BatchRemediationExecutor
+
+        executor = BatchRemediationExecutor(
+            self.batch_actions(),
+            max_workers=max_workers,
+            rate=rate,
+            run_id=run_id,
+            state_dir=state_dir,
+            persist=not self.dry_run,
+            audit=audit,
+        )
+        batches = executor.plan(plans)
 
         print(
-            f"{'[DRY-RUN]' if self.dry_run else '[EXECUTE]'} Running {len(plans)} remediation tasks..."
+            f"{'[DRY-RUN]' if self.dry_run else '[EXECUTE]'} Running {len(plans)} remediation tasks "
+            f"in {len(batches)} API calls..."
         )
 
-        for plan in plans:
-            if self.execute_plan(plan):
-                results["success"] += 1
-            else:
-                results["failed"] += 1
-
+        if self.dry_run:
+            results = {"total": len(plans), "success": 0, "failed": 0, "api_calls": len(batches)}
+            for plan in plans:
+                if self.execute_plan(plan):
+                    results["success"] += 1
+                else:
+                    results["failed"] += 1
+        else:
+            results = executor.run(plans)
+            for plan_result in results["failed_details"]:
+                print(f"❌ {plan_result['resource_id']}: {plan_result['error']}")
+
+        results["dry_run"] = self.dry_run
         return results
 
     # Action Handlers (实际执行逻辑)
@@ -246,3 +350,57 @@ class RemediationEngine:
         except Exception as e:
             print(f"❌ 删除云盘失败: {e}")
             return False
+
+    def _add_tags(self, plan: RemediationPlan) -> bool:
+        """为资源打标签"""
+        error = self._tag_resources([plan])[plan.resource_id]
+        if error:
+            print(f"❌ 打标签失败: {error}")
+            return False
+        print(f"✅ 资源 {plan.resource_id} 已打标签")
+        return True
+
+    # 批量处理器（同一块的计划共用区域、凭证，返回每个资源的错误信息，成功为 None）
+
+    @staticmethod
+    def _batch_client(plans: List[RemediationPlan]):
+        from aliyunsdkcore.client import AcsClient
+
+        metadata = plans[0].metadata
+        access_key = metadata.get("access_key")
+        secret_key = metadata.get("secret_key")
+        if not access_key or not secret_key:
+            return None
+        return AcsClient(access_key, secret_key, metadata.get("region", "cn-hangzhou"))
+
+    def _stop_instances(self, plans: List[RemediationPlan]) -> Dict[str, Optional[str]]:
+        """停止实例（StopInstances 一次传入多个实例ID，逐个返回结果）"""
+        from aliyunsdkecs.request.v20140526.StopInstancesRequest import StopInstancesRequest
+
+        client = self._batch_client(plans)
+        if client is None:
+            return {p.resource_id: "缺少认证信息" for p in plans}
+
+        request = StopInstancesRequest()
+        request.set_InstanceIds([p.resource_id for p in plans])
+        request.set_ForceStop(False)  # 安全停止
+        request.set_BatchOptimization("SuccessFirst")  # 部分失败时其余实例照常停止
+
+        response = json.loads(client.do_action_with_exception(request))
+        outcome: Dict[str, Optional[str]] = {}
+        for item in response.get("InstanceResponses", {}).get("InstanceResponse", []):
+            ok = str(item.get("Code")) == "200"
+            outcome[item.get("InstanceId")] = None if ok else (item.get("Message") or item.get("Code"))
+        return outcome
+
+    def _tag_resources(self, plans: List[RemediationPlan]) -> Dict[str, Optional[str]]:
+        """打标签（TagResources 同一资源类型最多50个资源一次调用）"""
+        client = self._batch_client(plans)
+        if client is None:
+            return {p.resource_id: "缺少认证信息" for p in plans}
+
+        request = build_tag_request(
+            plans[0].resource_type, [p.resource_id for p in plans], plans[0].metadata.get("tags") or {}
+        )
+        client.do_action_with_exception(request)
+        return {p.resource_id: None for p in plans}
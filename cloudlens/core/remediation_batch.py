@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+批量修复执行器
+
+把修复计划按 (动作, 区域, 凭证, 资源类型, 标签) 分组，再按动作支持的批量上限切块：
+- 有多ID接口的动作一块只发一次 API 调用（如 StopInstances 传实例ID列表、TagResources 一次最多50个资源）
+- 没有多ID接口的动作（DeleteSnapshot、ReleaseEipAddress 等）每块一个资源
+- 各块由线程池并发执行，每次 API 调用前从对应凭证的令牌桶取令牌
+- 每个资源的执行结果追加写入 JSONL 检查点，用同一个 run_id 重跑时跳过已成功的资源
+- 每个资源的结果都交给审计回调，审计粒度与逐个执行时一致
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from cloudlens.core.rate_limiter import RateLimiterRegistry
+from cloudlens.core.remediation import RemediationAction, RemediationPlan
+
+logger = logging.getLogger(__name__)
+
+# handler(同一块的计划) -> {resource_id: 错误信息，成功为 None}
+BatchHandler = Callable[[List[RemediationPlan]], Dict[str, Optional[str]]]
+# audit(计划, 错误信息，成功为 None)
+AuditCallback = Callable[[RemediationPlan, Optional[str]], None]
+
+
+@dataclass
+class BatchAction:
+    """动作的批量处理器及单次调用可携带的资源数上限"""
+
+    handler: BatchHandler
+    batch_size: int = 1
+
+
+@dataclass
+class RemediationBatch:
+    """一次 API 调用处理的一块计划（同动作、同区域、同凭证）"""
+
+    action: RemediationAction
+    region: str
+    limiter_key: str
+    plans: List[RemediationPlan]
+
+
+def plan_key(plan: RemediationPlan) -> str:
+    """检查点中标识一个修复项的键"""
+    return f"{plan.action.value}|{plan.resource_id}"
+
+
+def _group_key(plan: RemediationPlan) -> Tuple[str, str, str, str, str]:
+    metadata = plan.metadata
+    tags = metadata.get("tags")
+    return (
+        plan.action.value,
+        metadata.get("region", "cn-hangzhou"),
+        metadata.get("access_key") or "",
+        str(plan.resource_type).lower(),
+        json.dumps(tags, sort_keys=True, ensure_ascii=False) if tags else "",
+    )
+
+
+class RemediationCheckpoint:
+    """
+    修复进度检查点（JSONL 追加写）
+
+    每行一个资源的执行结果，不记录凭证。加载时按资源回放，
+    最后一次结果为成功的资源在续跑时跳过，失败的重新执行。
+    """
+
+    def __init__(self, run_id: str, state_dir: Optional[str] = None):
+        base = Path(state_dir) if state_dir else Path.home() / ".cloudlens" / "remediation_runs"
+        base.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self.path = base / f"{run_id}.jsonl"
+        self._lock = threading.Lock()
+
+    def record(self, plans: List[RemediationPlan], outcome: Dict[str, Optional[str]]) -> None:
+        """追加一块计划的执行结果"""
+        lines = []
+        for plan in plans:
+            error = outcome.get(plan.resource_id)
+            lines.append(json.dumps({
+                "key": plan_key(plan),
+                "status": "failed" if error else "success",
+                "error": error,
+                "timestamp": time.time(),
+            }, ensure_ascii=False))
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def completed(self) -> Set[str]:
+        """已成功的修复项"""
+        if not self.path.exists():
+            return set()
+        status: Dict[str, str] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能写了一半
+                    continue
+                status[event["key"]] = event["status"]
+        return {key for key, s in status.items() if s == "success"}
+
+
+class BatchRemediationExecutor:
+    """
+    批量修复执行器
+
+    用法:
+        executor = BatchRemediationExecutor(engine.batch_actions(), max_workers=4, rate=5)
+        result = executor.run(plans)     # 中断后用 result["run_id"] 重建执行器续跑
+    """
+
+    def __init__(
+        self,
+        actions: Dict[RemediationAction, BatchAction],
+        max_workers: int = 4,
+        rate: float = 5.0,
+        run_id: Optional[str] = None,
+        state_dir: Optional[str] = None,
+        persist: bool = True,
+        audit: Optional[AuditCallback] = None,
+    ):
+        """
+        Args:
+            actions: 动作 -> 批量处理器
+            max_workers: 并发执行的块数
+            rate: 每个凭证每秒 API 调用数
+            run_id: 运行ID，传入已有ID即从检查点续跑
+            state_dir: 检查点目录，默认 ~/.cloudlens/remediation_runs
+            persist: 是否写检查点
+            audit: 每个资源执行后的审计回调
+        """
+        self.actions = actions
+        self.max_workers = max(1, max_workers)
+        self.limiters = RateLimiterRegistry(rate, rate * 2)
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.checkpoint = RemediationCheckpoint(self.run_id, state_dir) if persist else None
+        self.audit = audit
+        self._audit_lock = threading.Lock()
+
+    def plan(self, plans: List[RemediationPlan]) -> List[RemediationBatch]:
+        """按 (动作, 区域, 凭证, 资源类型, 标签) 分组并按批量上限切块"""
+        groups: Dict[Tuple[str, str, str, str, str], List[RemediationPlan]] = {}
+        for plan in plans:
+            groups.setdefault(_group_key(plan), []).append(plan)
+
+        batches = []
+        for (_, region, access_key, _, _), members in groups.items():
+            action = members[0].action
+            spec = self.actions.get(action)
+            size = max(1, spec.batch_size) if spec else 1
+            for start in range(0, len(members), size):
+                batches.append(RemediationBatch(action, region, access_key or "default", members[start:start + size]))
+        return batches
+
+    def _execute(self, batch: RemediationBatch) -> Dict[str, Optional[str]]:
+        spec = self.actions.get(batch.action)
+        if spec is None:
+            return {p.resource_id: f"Unknown action: {batch.action}" for p in batch.plans}
+
+        self.limiters.get(batch.limiter_key).acquire()
+        try:
+            outcome = spec.handler(batch.plans) or {}
+        except Exception as e:
+            logger.error(f"批量执行 {batch.action.value} 失败 ({batch.region}): {e}")
+            return {p.resource_id: str(e) for p in batch.plans}
+        return {p.resource_id: outcome.get(p.resource_id, "未返回执行结果") for p in batch.plans}
+
+    def _finish(self, batch: RemediationBatch, outcome: Dict[str, Optional[str]]) -> None:
+        if self.checkpoint:
+            self.checkpoint.record(batch.plans, outcome)
+        if self.audit:
+            with self._audit_lock:
+                for plan in batch.plans:
+                    try:
+                        self.audit(plan, outcome[plan.resource_id])
+                    except Exception as e:
+                        logger.error(f"Failed to write audit log: {e}")
+
+    def run(self, plans: List[RemediationPlan]) -> Dict[str, Any]:
+        """
+        执行修复计划
+
+        Returns:
+            执行结果统计（total / success / failed / skipped / api_calls / run_id / failed_details）
+        """
+        done = self.checkpoint.completed() if self.checkpoint else set()
+        pending = [p for p in plans if plan_key(p) not in done]
+        skipped = len(plans) - len(pending)
+        batches = self.plan(pending)
+
+        results: Dict[str, Any] = {
+            "total": len(plans),
+            "success": skipped,
+            "failed": 0,
+            "skipped": skipped,
+            "api_calls": len(batches),
+            "run_id": self.run_id,
+            "failed_details": [],
+        }
+        if skipped:
+            logger.info(f"修复任务 {self.run_id} 续跑: 跳过 {skipped} 个已完成资源")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._execute, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                outcome = future.result()
+                self._finish(batch, outcome)
+                for plan in batch.plans:
+                    error = outcome[plan.resource_id]
+                    if error:
+                        results["failed"] += 1
+                        results["failed_details"].append({"resource_id": plan.resource_id, "error": error})
+                    else:
+                        results["success"] += 1
+
+        results["failed_details"] = results["failed_details"][:10]  # 只返回前10个失败
+        return results
@@ -25,15 +25,24 @@ class RemediationEngine:
         default_tags: Dict[str, str],
         dry_run: bool = True,
         provider=None,
+        max_workers: int = 4,
+        rate: float = 5.0,
+        run_id: Optional[str] = None,
     ) -> Dict:
         """
         自动为资源打标签
+
+        Provider 支持 tag_resources 时按 (区域, 资源类型) 分组，每次 TagResources 最多50个资源，
+        各组在速率限制下并发执行；否则逐个调用 add_tags。进度写入检查点，传入 run_id 可续跑。
         
         Args:
             resources: 资源列表
             default_tags: 默认标签
             dry_run: 是否干运行
             provider: Provider实例
+            max_workers: 并发执行的批次数
+            rate: 每秒 API 调用数
+            run_id: 续跑的运行ID
             
         Returns:
             修复结果统计
@@ -81,55 +90,81 @@ class RemediationEngine:
             }
 
         # 实际执行
-        success_count = 0
-        failed = []
+        from cloudlens.core.remediation import RemediationAction, RemediationPlan
+        from cloudlens.core.remediation_batch import BatchAction, BatchRemediationExecutor
 
+        plans = []
+        merged_tags = {}
         for resource in untagged_resources + incomplete_tags:
-            try:
-                # 调用Provider API添加标签
-                if provider and hasattr(provider, "add_tags"):
-                    # 合并现有标签和默认标签
-                    new_tags = {**default_tags}
-                    if hasattr(resource, "tags") and resource.tags:
-                        new_tags = {**resource.tags, **default_tags}
-
-                    provider.add_tags(resource.id, new_tags)
-                    success_count += 1
-                    
-                    # 记录审计日志
-                    self._log_remediation(
-                        action="add_tags",
-                        resource_id=resource.id,
-                        resource_type=getattr(resource, 'resource_type', 'unknown'),
-                        details={"tags": new_tags},
-                        status="success",
-                    )
-                else:
-                    # Provider不支持
-                    failed.append({
-                        "resource_id": resource.id,
-                        "error": "Provider不支持add_tags方法",
-                    })
-
-            except Exception as e:
-                logger.error(f"Failed to tag {resource.id}: {e}")
-                failed.append({"resource_id": resource.id, "error": str(e)})
-                
-                self._log_remediation(
-                    action="add_tags",
-                    resource_id=resource.id,
-                    resource_type=getattr(resource, 'resource_type', 'unknown'),
-                    details={"error": str(e)},
-                    status="failed",
-                )
+            # 合并现有标签和默认标签（TagResources 只追加/覆盖传入的标签，审计记录合并结果）
+            new_tags = {**default_tags}
+            if hasattr(resource, "tags") and resource.tags:
+                new_tags = {**resource.tags, **default_tags}
+            merged_tags[resource.id] = new_tags
+            resource_type = getattr(resource, "resource_type", "unknown")
+            plans.append(RemediationPlan(
+                action=RemediationAction.ADD_TAGS,
+                resource_id=resource.id,
+                resource_type=getattr(resource_type, "value", str(resource_type)),
+                reason="补全标签",
+                metadata={"region": getattr(resource, "region", "") or "", "tags": default_tags},
+            ))
+
+        def tag_batch(batch: List) -> Dict[str, Optional[str]]:
+            first = batch[0]
+            provider.tag_resources(
+                [p.resource_id for p in batch],
+                default_tags,
+                resource_type=first.resource_type,
+                region=first.metadata["region"] or None,
+            )
+            return {p.resource_id: None for p in batch}
+
+        def add_tags_one(batch: List) -> Dict[str, Optional[str]]:
+            plan = batch[0]
+            provider.add_tags(plan.resource_id, merged_tags[plan.resource_id])
+            return {plan.resource_id: None}
+
+        def unsupported(batch: List) -> Dict[str, Optional[str]]:
+            return {p.resource_id: "Provider不支持add_tags方法" for p in batch}
+
+        if provider and hasattr(provider, "tag_resources"):
+            action = BatchAction(tag_batch, 50)
+        elif provider and hasattr(provider, "add_tags"):
+            action = BatchAction(add_tags_one)
+        else:
+            action = BatchAction(unsupported)
+
+        def audit(plan, error: Optional[str]) -> None:
+            if error:
+                logger.error(f"Failed to tag {plan.resource_id}: {error}")
+            self._log_remediation(
+                action="add_tags",
+                resource_id=plan.resource_id,
+                resource_type=plan.resource_type,
+                details={"error": error} if error else {"tags": merged_tags[plan.resource_id]},
+                status="failed" if error else "success",
+            )
+
+        executor = BatchRemediationExecutor(
+            {RemediationAction.ADD_TAGS: action},
+            max_workers=max_workers,
+            rate=rate,
+            run_id=run_id,
+            state_dir=str(self.audit_dir / "runs"),
+            audit=audit,
+        )
+        result = executor.run(plans)
 
         return {
             "dry_run": False,
             "action": "tag",
             "total": total_to_fix,
-            "success": success_count,
-            "failed": len(failed),
-            "failed_details": failed[:10],  # 只返回前10个失败
+            "success": result["success"],
+            "failed": result["failed"],
+            "failed_details": result["failed_details"],  # 只返回前10个失败
+            "api_calls": result["api_calls"],
+            "run_id": result["run_id"],
         }
 
     def remediate_security_groups(
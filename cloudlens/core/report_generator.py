@@ -5,8 +5,9 @@ Generates HTML and PDF reports from resource data
 
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
+from cloudlens.core.streaming_export import ExportSheet, write_xlsx
 from cloudlens.models.resource import UnifiedResource
 
 logger = logging.getLogger("ReportGenerator")
@@ -15,18 +16,18 @@ logger = logging.getLogger("ReportGenerator")
 class ReportGenerator:
 
     @staticmethod
-    def generate_html(account_name: str, data: Dict) -> str:
+    def iter_html(account_name: str, data: Dict) -> Iterator[str]:
         """
-        生成HTML报告
+        逐段生成HTML报告（每个表格行单独输出，可直接写文件或流式响应）
 
         Args:
             account_name: 账号名称
             data: 包含各类资源的字典
 
-        Returns:
-            HTML string
+        Yields:
+            HTML 片段
         """
-        html = f"""
+        yield f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -125,7 +126,7 @@ class ReportGenerator:
 
         # Summary cards
         if "ecs" in data:
-            html += f"""
+            yield f"""
             <div class="summary-card">
                 <h3>ECS 实例</h3>
                 <div class="number">{len(data['ecs'])}</div>
@@ -133,7 +134,7 @@ class ReportGenerator:
 """
 
         if "rds" in data:
-            html += f"""
+            yield f"""
             <div class="summary-card">
                 <h3>RDS 实例</h3>
                 <div class="number">{len(data['rds'])}</div>
@@ -141,7 +142,7 @@ class ReportGenerator:
 """
 
         if "redis" in data:
-            html += f"""
+            yield f"""
             <div class="summary-card">
                 <h3>Redis 实例</h3>
                 <div class="number">{len(data['redis'])}</div>
@@ -149,20 +150,20 @@ class ReportGenerator:
 """
 
         if "eip" in data:
-            html += f"""
+            yield f"""
             <div class="summary-card">
                 <h3>弹性公网IP</h3>
                 <div class="number">{len(data['eip'])}</div>
             </div>
 """
 
-        html += """
+        yield """
         </div>
 """
 
         # ECS Table
         if "ecs" in data and data["ecs"]:
-            html += """
+            yield """
         <h2>💻 ECS 实例</h2>
         <table>
             <tr>
@@ -179,7 +180,7 @@ class ReportGenerator:
                     "status-running" if inst.status.value == "Running" else "status-stopped"
                 )
                 pub_ip = inst.public_ips[0] if inst.public_ips else "-"
-                html += f"""
+                yield f"""
             <tr>
                 <td>{inst.id}</td>
                 <td>{inst.name}</td>
@@ -189,13 +190,13 @@ class ReportGenerator:
                 <td>{inst.region}</td>
             </tr>
 """
-            html += """
+            yield """
         </table>
 """
 
         # Idle resources
         if "idle" in data and data["idle"]:
-            html += """
+            yield """
         <h2>⚠️ 闲置资源</h2>
         <table>
             <tr>
@@ -207,7 +208,7 @@ class ReportGenerator:
 """
             for idle_info in data["idle"]:
                 inst, reasons = idle_info
-                html += f"""
+                yield f"""
             <tr>
                 <td>{inst.id}</td>
                 <td>{inst.name}</td>
@@ -215,11 +216,11 @@ class ReportGenerator:
                 <td>{'; '.join(reasons)}</td>
             </tr>
 """
-            html += """
+            yield """
         </table>
 """
 
-        html += f"""
+        yield f"""
         <div class="footer">
             <p>CloudLens CLI - Multi-Cloud Resource Analyzer</p>
             <p>Report generated at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
@@ -228,7 +229,28 @@ class ReportGenerator:
 </body>
 </html>
 """
-        return html
+
+    @staticmethod
+    def generate_html(account_name: str, data: Dict) -> str:
+        """
+        生成HTML报告
+
+        Args:
+            account_name: 账号名称
+            data: 包含各类资源的字典
+
+        Returns:
+            HTML string
+        """
+        return "".join(ReportGenerator.iter_html(account_name, data))
+
+    @staticmethod
+    def write_html(account_name: str, data: Dict, filename: str):
+        """流式写入HTML报告（不在内存中拼接整份报告）"""
+        with open(filename, "w", encoding="utf-8") as f:
+            for part in ReportGenerator.iter_html(account_name, data):
+                f.write(part)
+        logger.info(f"HTML report saved to {filename}")
 
     @staticmethod
     def save_html(html_content: str, filename: str):
@@ -240,7 +262,7 @@ class ReportGenerator:
     @staticmethod
     def generate_excel(account_name: str, data: Dict, filename: str):
         """
-        生成Excel报告（多Sheet）
+        生成Excel报告（多Sheet，只写模式逐行写入）
 
         Args:
             account_name: 账号名称
@@ -248,112 +270,64 @@ class ReportGenerator:
             filename: 输出文件名
         """
         try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Alignment, Fill, Font, PatternFill
-            from openpyxl.utils import get_column_letter
+            import openpyxl  # noqa: F401
         except ImportError:
             logger.error("openpyxl not installed. Run: pip install openpyxl")
             return
 
-        wb = Workbook()
-
-        # 删除默认sheet
-        if "Sheet" in wb.sheetnames:
-            wb.remove(wb["Sheet"])
-
-        # 1. Summary Sheet
-        ws_summary = wb.create_sheet("概览")
-        ws_summary["A1"] = f"{account_name} 资源概览"
-        ws_summary["A1"].font = Font(size=16, bold=True)
+        write_xlsx(filename, ReportGenerator.excel_sheets(account_name, data))
+        logger.info(f"Excel report saved to {filename}")
 
-        row = 3
-        summary_data = [
-            ["资源类型", "数量"],
+    @staticmethod
+    def excel_sheets(account_name: str, data: Dict) -> List[ExportSheet]:
+        """Excel报告的各个Sheet（行为惰性生成器，配合只写模式逐行写入）"""
+        summary_rows = [
             ["ECS实例", len(data.get("ecs", []))],
             ["RDS实例", len(data.get("rds", []))],
             ["Redis实例", len(data.get("redis", []))],
             ["弹性公网IP", len(data.get("eip", []))],
         ]
-
         if "idle" in data:
-            summary_data.append(["闲置资源", len(data["idle"])])
-
-        for row_data in summary_data:
-            ws_summary.append(row_data)
+            summary_rows.append(["闲置资源", len(data["idle"])])
+        sheets = [ExportSheet("概览", [f"{account_name} 资源类型", "数量"], summary_rows, widths={0: 30})]
 
-        # 样式
-        for cell in ws_summary["A4:B4"][0]:
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-            cell.font = Font(color="FFFFFF", bold=True)
-
-        # 2. ECS Sheet
         if data.get("ecs"):
-            ws_ecs = wb.create_sheet("ECS实例")
-            ws_ecs.append(["实例ID", "名称", "状态", "公网IP", "规格", "区域", "计费方式"])
-
-            for inst in data["ecs"]:
-                pub_ip = inst.public_ips[0] if inst.public_ips else "-"
-                ws_ecs.append(
+            sheets.append(ExportSheet(
+                "ECS实例",
+                ["实例ID", "名称", "状态", "公网IP", "规格", "区域", "计费方式"],
+                (
                     [
                         inst.id,
                         inst.name,
                         inst.status.value,
-                        pub_ip,
+                        inst.public_ips[0] if inst.public_ips else "-",
                         inst.spec,
                         inst.region,
                         inst.charge_type,
                     ]
-                )
+                    for inst in data["ecs"]
+                ),
+                widths={0: 25, 1: 30},
+            ))
 
-            # 表头样式
-            for cell in ws_ecs["A1:G1"][0]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-                cell.font = Font(color="FFFFFF", bold=True)
-
-        # 3. RDS Sheet
         if data.get("rds"):
-            ws_rds = wb.create_sheet("RDS实例")
-            ws_rds.append(["实例ID", "名称", "状态", "规格", "区域"])
-
-            for inst in data["rds"]:
-                ws_rds.append([inst.id, inst.name, inst.status.value, inst.spec, inst.region])
-
-            for cell in ws_rds["A1:E1"][0]:
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+            sheets.append(ExportSheet(
+                "RDS实例",
+                ["实例ID", "名称", "状态", "规格", "区域"],
+                ([inst.id, inst.name, inst.status.value, inst.spec, inst.region] for inst in data["rds"]),
+                widths={0: 25, 1: 30},
+            ))
 
-        # 4. Idle Resources Sheet
         if data.get("idle"):
-            ws_idle = wb.create_sheet("闲置资源")
-            ws_idle.append(["实例ID", "名称", "状态", "闲置原因"])
-
-            for idle_info in data["idle"]:
-                inst, reasons = idle_info
-                ws_idle.append([inst.id, inst.name, inst.status.value, "; ".join(reasons)])
-
-            for cell in ws_idle["A1:D1"][0]:
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="C0504D", end_color="C0504D", fill_type="solid")
-
-        # 自动调整列宽
-        for sheet in wb.worksheets:
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                sheet.column_dimensions[column_letter].width = adjusted_width
-
-        # 保存
-        wb.save(filename)
-        logger.info(f"Excel report saved to {filename}")
+            sheets.append(ExportSheet(
+                "闲置资源",
+                ["实例ID", "名称", "状态", "闲置原因"],
+                ([inst.id, inst.name, inst.status.value, "; ".join(reasons)] for inst, reasons in data["idle"]),
+                widths={0: 25, 1: 30, 3: 50},
+                header_color="C0504D",
+            ))
+
+        return sheets
 
     @staticmethod
     def html_to_pdf(html_file: str, pdf_file: str):
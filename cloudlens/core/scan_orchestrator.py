@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""
+多账号扫描编排器
+
+把扫描拆成 (account, region, resource_type, phase) 粒度的任务，
+由工作线程池以 work-stealing 方式调度：
+- 每个 worker 有自己的双端队列，优先从队尾取自己的任务（后续阶段任务留在本地）
+- 自己的队列空了就从最长的其他队列队头"偷"任务，大账号不再成为长尾
+- 每个账号有独立的令牌桶 + 并发上限，任务按预估 API 调用数（weight）取令牌
+- 任务状态追加写入 JSONL 检查点，进程崩溃后用同一个 run_id 可续跑
+- 统计每个账号、每个阶段的吞吐
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cloudlens.core.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# handler(task) -> (results, follow_up_tasks)
+PhaseHandler = Callable[["ScanTask"], Tuple[List[Any], List["ScanTask"]]]
+
+
+@dataclass
+class ScanTask:
+    """扫描任务"""
+
+    account: str
+    region: str
+    resource_type: str
+    phase: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    weight: int = 1  # 预估 API 调用次数，用于配额
+    attempts: int = 0
+    task_id: str = ""
+
+    def __post_init__(self):
+        if not self.task_id:
+            chunk = self.payload.get("chunk", 0)
+            self.task_id = f"{self.account}|{self.region}|{self.resource_type}|{self.phase}|{chunk}"
+
+
+class AccountQuota:
+    """账号级配额：令牌桶限速 + 并发上限"""
+
+    def __init__(self, rate: float = 10, burst: Optional[float] = None, max_concurrent: int = 4):
+        self.bucket = TokenBucket(rate, burst if burst is not None else rate * 2)
+        self.max_concurrent = max_concurrent
+        self.running = 0
+
+    def admit(self, weight: int) -> float:
+        """尝试放行一个任务，返回0表示放行，否则返回建议等待秒数（调用方需持有调度锁）"""
+        if self.running >= self.max_concurrent:
+            return 0.05
+        wait = self.bucket.try_acquire(weight)
+        if wait <= 0:
+            self.running += 1
+        return wait
+
+    def release(self) -> None:
+        self.running = max(0, self.running - 1)
+
+
+class ScanStateStore:
+    """
+    扫描任务检查点（JSONL 追加写）
+
+    每行一个事件：pending / done / failed。加载时按 task_id 回放，
+    得到未完成任务（含失败任务，续跑时重试）和已完成任务的结果。
+    """
+
+    def __init__(self, run_id: str, state_dir: Optional[str] = None):
+        base = Path(state_dir) if state_dir else Path.home() / ".cloudlens" / "scan_runs"
+        base.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self.path = base / f"{run_id}.jsonl"
+        self._lock = threading.Lock()
+
+    def _append(self, event: Dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def record_pending(self, task: ScanTask) -> None:
+        self._append({"event": "pending", "task": asdict(task)})
+
+    def record_done(self, task: ScanTask, results: List[Any]) -> None:
+        self._append({"event": "done", "task_id": task.task_id, "account": task.account, "results": results})
+
+    def record_failed(self, task: ScanTask, error: str) -> None:
+        self._append({"event": "failed", "task_id": task.task_id, "error": error})
+
+    def load(self) -> Tuple[List[ScanTask], Dict[str, List[Any]]]:
+        """
+        回放检查点
+
+        Returns:
+            (未完成任务列表, {account: 已完成结果})
+        """
+        if not self.path.exists():
+            return [], {}
+
+        tasks: Dict[str, ScanTask] = {}
+        finished = set()
+        results: Dict[str, List[Any]] = defaultdict(list)
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能写了一半
+                    continue
+                if event["event"] == "pending":
+                    task = ScanTask(**event["task"])
+                    tasks[task.task_id] = task
+                elif event["event"] == "done":
+                    finished.add(event["task_id"])
+                    results[event["account"]].extend(event.get("results") or [])
+
+        pending = [t for tid, t in tasks.items() if tid not in finished]
+        return pending, dict(results)
+
+
+class ScanStats:
+    """吞吐统计（按账号、按阶段）"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.steals = 0
+        self._by_account: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"tasks": 0, "api_calls": 0, "busy_seconds": 0.0, "failed": 0, "first": 0.0, "last": 0.0}
+        )
+        self._by_phase: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"tasks": 0, "api_calls": 0, "busy_seconds": 0.0, "failed": 0}
+        )
+        self._weights_total: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def planned(self, task: ScanTask) -> None:
+        with self._lock:
+            self._weights_total[task.account] += task.weight
+
+    def record(self, task: ScanTask, started: float, ended: float, ok: bool) -> None:
+        with self._lock:
+            acc = self._by_account[task.account]
+            phase = self._by_phase[f"{task.resource_type}:{task.phase}"]
+            for bucket in (acc, phase):
+                bucket["busy_seconds"] += ended - started
+                if ok:
+                    bucket["tasks"] += 1
+                    bucket["api_calls"] += task.weight
+                else:
+                    bucket["failed"] += 1
+            if not acc["first"]:
+                acc["first"] = started
+            acc["last"] = ended
+
+    def quota_bound_seconds(self, quotas: Dict[str, AccountQuota]) -> float:
+        """按各账号配额计算的理论最短耗时（最慢账号的 总调用数/速率）"""
+        bound = 0.0
+        for account, weight in self._weights_total.items():
+            quota = quotas.get(account)
+            if quota:
+                bound = max(bound, weight / quota.bucket.rate)
+        return bound
+
+    def snapshot(self, quotas: Optional[Dict[str, AccountQuota]] = None) -> Dict[str, Any]:
+        """导出统计"""
+        with self._lock:
+            end = self.finished_at or time.monotonic()
+            elapsed = max(end - self.started_at, 1e-9)
+            accounts = {}
+            for name, s in self._by_account.items():
+                span = max(s["last"] - s["first"], 1e-9)
+                accounts[name] = {
+                    "tasks": int(s["tasks"]),
+                    "failed": int(s["failed"]),
+                    "api_calls": int(s["api_calls"]),
+                    "busy_seconds": round(s["busy_seconds"], 3),
+                    "tasks_per_second": round(s["tasks"] / span, 3),
+                    "api_calls_per_second": round(s["api_calls"] / span, 3),
+                }
+            phases = {
+                name: {
+                    "tasks": int(s["tasks"]),
+                    "failed": int(s["failed"]),
+                    "api_calls": int(s["api_calls"]),
+                    "avg_seconds": round(s["busy_seconds"] / s["tasks"], 4) if s["tasks"] else 0.0,
+                    "tasks_per_second": round(s["tasks"] / elapsed, 3),
+                }
+                for name, s in self._by_phase.items()
+            }
+            result = {
+                "elapsed_seconds": round(elapsed, 3),
+                "steals": self.steals,
+                "accounts": accounts,
+                "phases": phases,
+            }
+        if quotas:
+            result["quota_bound_seconds"] = round(self.quota_bound_seconds(quotas), 3)
+        return result
+
+
+class ScanOrchestrator:
+    """
+    work-stealing 多账号扫描编排器
+
+    用法:
+        orch = ScanOrchestrator(handlers, max_workers=16)
+        orch.submit([ScanTask("prod", "cn-hangzhou", "ecs", "discover")])
+        results = orch.run()   # {account: [结果...]}
+        orch.stats()
+    """
+
+    # 选择可运行任务时每个队列最多检查的任务数
+    SCAN_DEPTH = 32
+
+    def __init__(
+        self,
+        handlers: Dict[Tuple[str, str], PhaseHandler],
+        max_workers: int = 16,
+        quotas: Optional[Dict[str, AccountQuota]] = None,
+        default_rate: float = 10,
+        default_max_concurrent: int = 4,
+        run_id: Optional[str] = None,
+        state_dir: Optional[str] = None,
+        persist: bool = True,
+        max_attempts: int = 3,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ):
+        """
+        Args:
+            handlers: {(resource_type, phase): handler}
+            max_workers: 工作线程数
+            quotas: 账号配额 {account: AccountQuota}，未配置的账号使用默认配额
+            default_rate: 默认每账号每秒 API 调用数
+            default_max_concurrent: 默认每账号并发任务数
+            run_id: 运行ID，传入已有ID即从检查点续跑
+            state_dir: 检查点目录，默认 ~/.cloudlens/scan_runs
+            persist: 是否写检查点
+            max_attempts: 单任务最大尝试次数
+            progress_callback: 进度回调 (completed, total)
+        """
+        self.handlers = handlers
+        self.max_workers = max(1, max_workers)
+        self.quotas: Dict[str, AccountQuota] = dict(quotas or {})
+        self.default_rate = default_rate
+        self.default_max_concurrent = default_max_concurrent
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.max_attempts = max_attempts
+        self.progress_callback = progress_callback
+        self.state = ScanStateStore(self.run_id, state_dir) if persist else None
+
+        self._deques: List[deque] = [deque() for _ in range(self.max_workers)]
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._total = 0
+        self._completed = 0
+        self._results: Dict[str, List[Any]] = defaultdict(list)
+        self._errors: List[Dict[str, str]] = []
+        self._stats = ScanStats()
+
+        if self.state:
+            pending, done_results = self.state.load()
+            for account, items in done_results.items():
+                self._results[account].extend(items)
+            if pending:
+                logger.info(f"从检查点恢复扫描 {self.run_id}: {len(pending)} 个未完成任务")
+                self._enqueue(pending, persist=False)
+
+    def _quota(self, account: str) -> AccountQuota:
+        quota = self.quotas.get(account)
+        if quota is None:
+            quota = AccountQuota(self.default_rate, max_concurrent=self.default_max_concurrent)
+            self.quotas[account] = quota
+        return quota
+
+    def _home(self, task: ScanTask) -> int:
+        # 同一账号的初始任务落在同一个队列，保持局部性，由 stealing 负责均衡
+        return hash(task.account) % self.max_workers
+
+    def _validate(self, tasks: List[ScanTask]) -> None:
+        for task in tasks:
+            if (task.resource_type, task.phase) not in self.handlers:
+                raise ValueError(f"未注册的阶段处理器: {task.resource_type}:{task.phase}")
+
+    def _enqueue(self, tasks: List[ScanTask], worker: Optional[int] = None, persist: bool = True) -> None:
+        # 先整体校验，避免部分任务入队后才报错
+        self._validate(tasks)
+        with self._cond:
+            for task in tasks:
+                self._quota(task.account)
+                target = worker if worker is not None else self._home(task)
+                self._deques[target].append(task)
+                self._total += 1
+                self._stats.planned(task)
+                if persist and self.state:
+                    self.state.record_pending(task)
+            self._cond.notify_all()
+
+    def submit(self, tasks: List[ScanTask]) -> None:
+        """提交初始任务"""
+        self._enqueue(tasks)
+
+    def _take_admissible(self, dq: deque, from_tail: bool) -> Tuple[Optional[ScanTask], float]:
+        """在队列中找第一个配额允许的任务（需持有锁）"""
+        min_wait = float("inf")
+        n = len(dq)
+        indices = range(n - 1, max(-1, n - 1 - self.SCAN_DEPTH), -1) if from_tail else range(min(n, self.SCAN_DEPTH))
+        for idx in indices:
+            task = dq[idx]
+            wait = self.quotas[task.account].admit(task.weight)
+            if wait <= 0:
+                del dq[idx]
+                return task, 0.0
+            min_wait = min(min_wait, wait)
+        return None, min_wait
+
+    def _next_task(self, worker: int) -> Optional[ScanTask]:
+        """取下一个任务：先本地队尾，再从最长的其他队列队头偷；全部完成返回 None"""
+        with self._cond:
+            while True:
+                task, wait = self._take_admissible(self._deques[worker], from_tail=True)
+                if task:
+                    self._in_flight += 1
+                    return task
+
+                victims = sorted(
+                    (i for i in range(self.max_workers) if i != worker and self._deques[i]),
+                    key=lambda i: len(self._deques[i]),
+                    reverse=True,
+                )
+                for victim in victims:
+                    task, victim_wait = self._take_admissible(self._deques[victim], from_tail=False)
+                    if task:
+                        self._stats.steals += 1
+                        self._in_flight += 1
+                        return task
+                    wait = min(wait, victim_wait)
+
+                if self._in_flight == 0 and not any(self._deques):
+                    return None
+                self._cond.wait(timeout=min(wait, 0.5) if wait != float("inf") else 0.5)
+
+    def _worker_loop(self, worker: int) -> None:
+        while True:
+            task = self._next_task(worker)
+            if task is None:
+                return
+
+            try:
+                self._process(worker, task)
+            finally:
+                # 无论处理结果如何都要归还配额并减少在途计数，否则 run() 永远等不到结束
+                with self._cond:
+                    self.quotas[task.account].release()
+                    self._in_flight -= 1
+                    completed, total = self._completed, self._total
+                    self._cond.notify_all()
+            if self.progress_callback:
+                self.progress_callback(completed, total)
+
+    def _fail(self, task: ScanTask, error: str) -> None:
+        logger.error(f"任务 {task.task_id} 失败: {error}")
+        with self._cond:
+            self._errors.append({"task_id": task.task_id, "error": error})
+            self._completed += 1
+        if self.state:
+            self.state.record_failed(task, error)
+
+    def _process(self, worker: int, task: ScanTask) -> None:
+        """执行单个任务并处理结果、后续任务和重试"""
+        started = time.monotonic()
+        ok = False
+        results: List[Any] = []
+        follow_ups: List[ScanTask] = []
+        try:
+            handler = self.handlers[(task.resource_type, task.phase)]
+            results, follow_ups = handler(task)
+            ok = True
+        except Exception as e:
+            task.attempts += 1
+            if task.attempts < self.max_attempts:
+                logger.warning(f"任务 {task.task_id} 第 {task.attempts} 次失败，重新排队: {e}")
+                with self._cond:
+                    self._deques[worker].appendleft(task)
+            else:
+                self._fail(task, str(e))
+        finally:
+            self._stats.record(task, started, time.monotonic(), ok)
+
+        if not ok:
+            return
+        if follow_ups:
+            try:
+                self._enqueue(follow_ups, worker=worker)
+            except ValueError as e:
+                # 处理器产出了未注册阶段的任务，重试也无法恢复
+                self._fail(task, str(e))
+                return
+        if self.state:
+            self.state.record_done(task, results or [])
+        with self._cond:
+            if results:
+                self._results[task.account].extend(results)
+            self._completed += 1
+
+    def run(self) -> Dict[str, List[Any]]:
+        """运行直到所有任务完成，返回 {account: 结果列表}"""
+        logger.info(f"扫描 {self.run_id} 开始: {self._total} 个任务，中断后可用该 run_id 续跑")
+        self._stats.started_at = time.monotonic()
+        threads = [
+            threading.Thread(target=self._worker_loop, args=(i,), name=f"scan-worker-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self._stats.finished_at = time.monotonic()
+        return dict(self._results)
+
+    @property
+    def errors(self) -> List[Dict[str, str]]:
+        return list(self._errors)
+
+    def stats(self) -> Dict[str, Any]:
+        """吞吐统计，含按配额计算的理论最短耗时"""
+        return self._stats.snapshot(self.quotas)
+
+
+def build_idle_scan_handlers(
+    accounts: Dict[str, Any],
+    rules: Optional[Dict] = None,
+    days: int = 7,
+    chunk_size: int = 10,
+    provider_factory: Optional[Callable[[Any, str], Any]] = None,
+) -> Dict[Tuple[str, str], PhaseHandler]:
+    """
+    构建 ECS 闲置扫描的阶段处理器
+
+    阶段: discover（探测区域实例数）-> list（拉取实例并按 chunk_size 切片）-> analyze（监控+判定）
+
+    Args:
+        accounts: {account_name: CloudAccount}
+        rules: 闲置规则
+        days: 监控天数
+        chunk_size: 每个 analyze 任务包含的实例数（越小越容易被偷走均衡）
+        provider_factory: (account_config, region) -> provider，默认 AliyunProvider
+    """
+    from cloudlens.core.idle_detector import IdleDetector
+
+    if provider_factory is None:
+        from cloudlens.providers.aliyun.provider import AliyunProvider
+
+        def provider_factory(account_config, region):
+            return AliyunProvider(
+                account_name=account_config.name,
+                access_key=account_config.access_key_id,
+                secret_key=account_config.access_key_secret,
+                region=region,
+            )
+
+    detector = IdleDetector(rules)
+
+    def discover(task: ScanTask):
+        provider = provider_factory(accounts[task.account], task.region)
+        count = provider.check_instances_count()
+        if count <= 0:
+            return [], []
+        pages = (count + 99) // 100
+        return [], [ScanTask(task.account, task.region, "ecs", "list", {"count": count}, weight=pages)]
+
+    def list_instances(task: ScanTask):
+        provider = provider_factory(accounts[task.account], task.region)
+        instances = [
+            {"id": inst.id, "name": inst.name, "region": inst.region, "spec": inst.spec, "tags": inst.tags or {}}
+            for inst in provider.list_instances()
+        ]
+        follow_ups = [
+            ScanTask(
+                task.account,
+                task.region,
+                "ecs",
+                "analyze",
+                {"chunk": idx // chunk_size, "instances": instances[idx : idx + chunk_size]},
+                weight=len(instances[idx : idx + chunk_size]) * 3,  # 每实例约3个监控指标调用
+            )
+            for idx in range(0, len(instances), chunk_size)
+        ]
+        return [], follow_ups
+
+    def analyze(task: ScanTask):
+        provider = provider_factory(accounts[task.account], task.region)
+        idle = []
+        for inst in task.payload.get("instances", []):
+            metrics = IdleDetector.fetch_ecs_metrics(provider, inst["id"], days)
+            tags_list = [{"Key": k, "Value": v} for k, v in inst["tags"].items()] or None
+            is_idle, reasons = detector.is_ecs_idle(metrics, tags_list)
+            if is_idle:
+                idle.append(
+                    {
+                        "account": task.account,
+                        "instance_id": inst["id"],
+                        "name": inst["name"] or "-",
+                        "region": inst["region"],
+                        "spec": inst["spec"],
+                        "reasons": reasons,
+                    }
+                )
+        return idle, []
+
+    return {("ecs", "discover"): discover, ("ecs", "list"): list_instances, ("ecs", "analyze"): analyze}
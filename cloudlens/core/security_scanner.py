@@ -91,6 +91,13 @@ class PublicIPScanner:
             logger.debug(f"SSL check error for {ip}:{port} - {e}")
             return None
 
+    @staticmethod
+    def probe_message(port: int) -> bytes:
+        """不同端口发送的探测包"""
+        if port in [80, 443, 8080]:
+            return b"HEAD / HTTP/1.0\r\n\r\n"
+        return b"\r\n"
+
     @staticmethod
     def grab_banner(ip: str, port: int, timeout: float = 2.0) -> Optional[str]:
         """
@@ -101,13 +108,7 @@ class PublicIPScanner:
                 sock.settimeout(timeout)
                 sock.connect((ip, port))
 
-                # 发送不同的探测包
-                if port in [80, 443, 8080]:
-                    msg = b"HEAD / HTTP/1.0\r\n\r\n"
-                else:
-                    msg = b"\r\n"
-
-                sock.send(msg)
+                sock.send(PublicIPScanner.probe_message(port))
                 banner = sock.recv(1024).decode("utf-8", errors="ignore").strip()
                 return banner
         except Exception:
@@ -157,8 +158,6 @@ class PublicIPScanner:
         Returns:
             扫描结果字典
         """
-        from cloudlens.core.cve_matcher import CVEMatcher
-
         if ports is None:
             ports = list(cls.COMMON_PORTS.keys())
 
@@ -174,50 +173,13 @@ class PublicIPScanner:
                 port = future_to_port[future]
                 try:
                     if future.result():
-                        port_info = cls.COMMON_PORTS.get(port, {})
-
-                        # Banner Grabbing & CVE Check
                         banner = cls.grab_banner(ip, port)
                         service_info = cls.identify_service_version(banner, port)
-
-                        # Match CVEs
-                        if service_info["product"] and service_info["version"]:
-                            # Normalize product name (e.g. nginx -> Nginx)
-                            product_map = {
-                                "nginx": "Nginx",
-                                "apache": "Apache",
-                                "OpenSSH": "OpenSSH",
-                            }
-                            product = product_map.get(
-                                service_info["product"].lower(), service_info["product"]
-                            )
-
-                            vulns = CVEMatcher.match(product, service_info["version"])
-                            for v in vulns:
-                                cve_findings.append(
-                                    {
-                                        "cve_id": v["id"],
-                                        "severity": v["severity"],
-                                        "product": product,
-                                        "version": service_info["version"],
-                                        "description": v["description"],
-                                        "port": port,
-                                    }
-                                )
-
-                        open_ports.append(
-                            {
-                                "port": port,
-                                "service": port_info.get("service", "Unknown"),
-                                "risk": port_info.get("risk", "MEDIUM"),
-                                "desc": port_info.get("desc", ""),
-                                "banner": banner[:50] if banner else None,  # Truncate long banners
-                                "version_info": service_info if service_info["product"] else None,
-                            }
-                        )
+                        cve_findings.extend(cls.match_cves(service_info, port))
+                        open_ports.append(cls.port_entry(port, banner, service_info))
 
                         # 记录高危端口
-                        if port_info.get("risk") in ["HIGH", "CRITICAL"]:
+                        if cls.COMMON_PORTS.get(port, {}).get("risk") in ["HIGH", "CRITICAL"]:
                             high_risk_ports.append(port)
                 except Exception as e:
                     logger.error(f"Error scanning port {port}: {e}")
@@ -227,29 +189,70 @@ class PublicIPScanner:
         if check_ssl and 443 in [p["port"] for p in open_ports]:
             ssl_info = cls.check_ssl_certificate(ip)
 
-        # 风险评估
-        risk_level = "LOW"
-        if cve_findings:
-            # If any CRITICAL CVE found
-            if any(c["severity"] == "CRITICAL" for c in cve_findings):
-                risk_level = "CRITICAL"
-            else:
-                risk_level = "HIGH"
-        elif high_risk_ports:
-            risk_level = "CRITICAL" if len(high_risk_ports) >= 2 else "HIGH"
-        elif len(open_ports) > 5:
-            risk_level = "MEDIUM"
-
         return {
             "ip": ip,
             "open_ports": open_ports,
             "high_risk_ports": high_risk_ports,
             "cve_findings": cve_findings,
             "ssl_info": ssl_info,
-            "risk_level": risk_level,
+            "risk_level": cls.assess_risk(open_ports, high_risk_ports, cve_findings),
             "scan_time": datetime.now().isoformat(),
         }
 
+    # Banner 中的产品名 -> CVE 库中的产品名
+    PRODUCT_ALIASES = {
+        "nginx": "Nginx",
+        "apache": "Apache",
+        "openssh": "OpenSSH",
+    }
+
+    @classmethod
+    def match_cves(cls, service_info: Dict, port: int) -> List[Dict]:
+        """按识别出的产品和版本匹配 CVE"""
+        from cloudlens.core.cve_matcher import CVEMatcher
+
+        if not (service_info.get("product") and service_info.get("version")):
+            return []
+        product = cls.PRODUCT_ALIASES.get(service_info["product"].lower(), service_info["product"])
+        return [
+            {
+                "cve_id": v["id"],
+                "severity": v["severity"],
+                "product": product,
+                "version": service_info["version"],
+                "description": v["description"],
+                "port": port,
+            }
+            for v in CVEMatcher.match(product, service_info["version"])
+        ]
+
+    @classmethod
+    def port_entry(cls, port: int, banner: Optional[str], service_info: Dict) -> Dict:
+        """开放端口的结果条目"""
+        port_info = cls.COMMON_PORTS.get(port, {})
+        return {
+            "port": port,
+            "service": port_info.get("service", "Unknown"),
+            "risk": port_info.get("risk", "MEDIUM"),
+            "desc": port_info.get("desc", ""),
+            "banner": banner[:50] if banner else None,  # Truncate long banners
+            "version_info": service_info if service_info.get("product") else None,
+        }
+
+    @staticmethod
+    def assess_risk(open_ports: List[Dict], high_risk_ports: List[int], cve_findings: List[Dict]) -> str:
+        """风险评估"""
+        if cve_findings:
+            # If any CRITICAL CVE found
+            if any(c["severity"] == "CRITICAL" for c in cve_findings):
+                return "CRITICAL"
+            return "HIGH"
+        if high_risk_ports:
+            return "CRITICAL" if len(high_risk_ports) >= 2 else "HIGH"
+        if len(open_ports) > 5:
+            return "MEDIUM"
+        return "LOW"
+
     @classmethod
     def generate_recommendations(cls, scan_result: Dict) -> List[str]:
         """
@@ -6,6 +6,7 @@ from cloudlens.providers.aliyun.provider import AliyunProvider
 from cloudlens.core.rules_manager import RulesManager
 from cloudlens.core.cache import CacheManager
 from cloudlens.core.config import ConfigManager
+from cloudlens.core.optimization_engine import OptimizationEngine
 from aliyunsdkcore.client import AcsClient
 from aliyunsdkcore.request import CommonRequest
 
@@ -50,6 +51,14 @@ class AnalysisService:
                 "us-west-1", "eu-west-1", "eu-central-1", "me-east-1"
             ]
     
+    @staticmethod
+    def _publish_idle(account_config, idle_instances: List[Dict]) -> None:
+        """闲置分析结果写入账号的优化机会存储（只增删有变化的实例）"""
+        try:
+            OptimizationEngine.for_account(account_config).on_idle_analyzed(account_config.name, idle_instances)
+        except Exception as e:
+            logger.warning(f"更新优化机会失败 ({account_config.name}): {str(e)}")
+
     @staticmethod
     def analyze_idle_resources(
         account_name: str, 
@@ -197,6 +206,7 @@ class AnalysisService:
                 progress_callback(total_steps, total_steps, "未找到ECS实例", "completed")
             cache.set(resource_type="dashboard_idle", account_name=account_name, data=[])
             cache.set(resource_type="idle_result", account_name=account_name, data=[])
+            AnalysisService._publish_idle(account_config, [])
             return [], False
 
         # 5. Analyze (优化：批量处理，显示进度)
@@ -277,6 +287,7 @@ class AnalysisService:
         except Exception as e:
             logger.warning(f"保存缓存失败: {str(e)}")
             # 缓存失败不影响返回结果
+        AnalysisService._publish_idle(account_config, idle_instances)
         
         if progress_callback:
             progress_callback(
@@ -287,3 +298,69 @@ class AnalysisService:
             )
             
         return idle_instances, False
+
+    @staticmethod
+    def analyze_idle_resources_multi(
+        account_names: List[str],
+        days: int = 7,
+        max_workers: int = 16,
+        run_id: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        on_start: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        多账号并行闲置分析（work-stealing 编排）
+
+        Args:
+            account_names: 账号名称列表
+            days: 分析天数
+            max_workers: 工作线程数
+            run_id: 续跑的运行ID（None则新建）
+            progress_callback: 进度回调 (completed, total)
+            on_start: 开始执行前回调 (run_id)，供调用方及时展示续跑用的 run_id
+
+        Returns:
+            (idle_instances, stats)，stats 含 run_id 及按账号/阶段的吞吐
+        """
+        from cloudlens.core.scan_orchestrator import ScanOrchestrator, ScanTask, build_idle_scan_handlers
+
+        cm = ConfigManager()
+        accounts = {}
+        for name in account_names:
+            account_config = cm.get_account(name)
+            if not account_config:
+                raise ValueError(f"Account '{name}' not found")
+            accounts[name] = account_config
+
+        handlers = build_idle_scan_handlers(accounts, RulesManager().get_rules(), days)
+        orchestrator = ScanOrchestrator(handlers, max_workers=max_workers, run_id=run_id, progress_callback=progress_callback)
+
+        if run_id is None:
+            tasks = []
+            for name, account_config in accounts.items():
+                regions = AnalysisService._get_all_regions(
+                    account_config.access_key_id, account_config.access_key_secret
+                )
+                tasks.extend(ScanTask(name, region, "ecs", "discover") for region in regions)
+            orchestrator.submit(tasks)
+
+        if on_start:
+            on_start(orchestrator.run_id)
+        results = orchestrator.run()
+
+        cache = CacheManager(ttl_seconds=86400)
+        idle_instances = []
+        for name in account_names:
+            account_idle = results.get(name, [])
+            idle_instances.extend(account_idle)
+            try:
+                cache.set(resource_type="idle_result", account_name=name, data=account_idle)
+                cache.set(resource_type="dashboard_idle", account_name=name, data=account_idle)
+            except Exception as e:
+                logger.warning(f"保存缓存失败 ({name}): {str(e)}")
+            AnalysisService._publish_idle(accounts[name], account_idle)
+
+        stats = orchestrator.stats()
+        stats["run_id"] = orchestrator.run_id
+        stats["errors"] = orchestrator.errors
+        return idle_instances, stats
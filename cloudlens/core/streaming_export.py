@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+流式导出
+
+CSV / HTML 按行块增量生成，XLSX 使用 openpyxl 只写模式落临时文件后分块读出，
+内存占用与导出行数无关；超大导出可提交为后台任务，进度通过 ProgressManager 查询。
+"""
+
+import csv
+import html
+import io
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from urllib.parse import quote
+
+from cloudlens.core.progress_manager import ProgressManager
+
+logger = logging.getLogger(__name__)
+
+# 每次输出的行数
+CHUNK_ROWS = 1000
+# 文件分块读取大小
+FILE_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "html": "text/html; charset=utf-8",
+}
+FILE_EXTENSIONS = {"csv": "csv", "excel": "xlsx", "html": "html"}
+
+
+@dataclass
+class ExportSheet:
+    """一张导出表：标题、表头和（可惰性生成的）行"""
+
+    title: str
+    header: List[str]
+    rows: Iterable[Sequence[Any]]
+    widths: Dict[int, float] = field(default_factory=dict)  # 列序号(从0开始) -> 列宽，仅 XLSX 使用
+    header_color: str = "4F81BD"  # 表头背景色，仅 XLSX 使用
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+# ==================== CSV ====================
+
+def iter_csv(sheets: Sequence[ExportSheet], chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    分块生成 CSV（UTF-8 BOM，Excel 可直接打开）
+
+    单张表输出标准 CSV；多张表时每段前输出标题行、段间空一行。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    first = True
+
+    def flush() -> bytes:
+        nonlocal first
+        data = buffer.getvalue().encode("utf-8-sig" if first else "utf-8")
+        first = False
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    multi = len(sheets) > 1
+    for index, sheet in enumerate(sheets):
+        if multi:
+            if index:
+                writer.writerow([])
+            writer.writerow([sheet.title])
+        writer.writerow(sheet.header)
+        pending = 0
+        for row in sheet.rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= chunk_rows:
+                yield flush()
+                pending = 0
+    if buffer.tell() or first:
+        yield flush()
+
+
+# ==================== XLSX ====================
+
+def write_xlsx(target, sheets: Sequence[ExportSheet]) -> None:
+    """
+    以只写模式生成 XLSX（逐行写入，不在内存中保留单元格）
+
+    Args:
+        target: 文件路径或可写的二进制文件对象
+        sheets: 导出表列表
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    header_font = Font(bold=True, color="FFFFFF")
+
+    for sheet in sheets:
+        header_fill = PatternFill(start_color=sheet.header_color, end_color=sheet.header_color, fill_type="solid")
+        # Excel 工作表名最长31个字符
+        ws = wb.create_sheet(sheet.title[:31])
+        # 只写模式必须在写入行之前设置列宽；未指定时按表头估算
+        for col, name in enumerate(sheet.header):
+            width = sheet.widths.get(col, min(max(len(str(name)) * 2 + 4, 12), 50))
+            ws.column_dimensions[get_column_letter(col + 1)].width = width
+
+        header_cells = []
+        for name in sheet.header:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = header_font
+            cell.fill = header_fill
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for row in sheet.rows:
+            ws.append(list(row))
+
+    wb.save(target)
+
+
+def iter_xlsx(sheets: Sequence[ExportSheet], chunk_bytes: int = FILE_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    生成 XLSX 并分块读出
+
+    XLSX 是 zip 容器，需写完才能得到中央目录，因此先以只写模式落到临时文件，
+    再按块输出并删除临时文件。
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx", prefix="cloudlens_export_")
+    os.close(fd)
+    try:
+        write_xlsx(path, sheets)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ==================== HTML ====================
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        body {{ font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background: #f5f5f5; }}
+        .container {{ max-width: 1400px; margin: 0 auto; background: white; padding: 30px; border-radius: 8px; }}
+        h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
+        h2 {{ color: #34495e; margin-top: 30px; border-left: 4px solid #3498db; padding-left: 10px; }}
+        table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
+        th {{ background: #3498db; color: white; padding: 10px; text-align: left; position: sticky; top: 0; }}
+        td {{ padding: 8px 10px; border-bottom: 1px solid #ddd; }}
+        .footer {{ margin-top: 40px; text-align: center; color: #7f8c8d; font-size: 12px; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>{title}</h1>
+        <p>生成时间: {generated_at}</p>
+"""
+
+_HTML_TAIL = """        <div class="footer">
+            <p>CloudLens - Multi-Cloud Resource Analyzer</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def iter_html(title: str, sheets: Sequence[ExportSheet], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """按行块增量渲染 HTML 报告（所有单元格内容均做转义）"""
+    yield _HTML_HEAD.format(
+        title=html.escape(title), generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    for sheet in sheets:
+        parts = [
+            f"        <h2>{html.escape(sheet.title)}</h2>\n        <table>\n            <tr>",
+            "".join(f"<th>{html.escape(str(name))}</th>" for name in sheet.header),
+            "</tr>\n",
+        ]
+        count = 0
+        for row in sheet.rows:
+            parts.append(
+                "            <tr>" + "".join(f"<td>{html.escape(_cell_text(v))}</td>" for v in row) + "</tr>\n"
+            )
+            count += 1
+            if count % chunk_rows == 0:
+                yield "".join(parts)
+                parts = []
+        if count == 0:
+            parts.append(f'            <tr><td colspan="{len(sheet.header)}">无数据</td></tr>\n')
+        parts.append("        </table>\n")
+        yield "".join(parts)
+    yield _HTML_TAIL
+
+
+def iter_export(fmt: str, title: str, sheets: Sequence[ExportSheet]) -> Iterator[bytes]:
+    """按格式（csv / excel / html）生成字节流"""
+    if fmt == "csv":
+        return iter_csv(sheets)
+    if fmt == "excel":
+        return iter_xlsx(sheets)
+    if fmt == "html":
+        return (part.encode("utf-8") for part in iter_html(title, sheets))
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def content_disposition(filename: str) -> str:
+    """下载响应头（文件名可能含中文，按 RFC 5987 编码）"""
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def write_export(fmt: str, title: str, sheets: Sequence[ExportSheet], filename: str) -> str:
+    """按格式写入文件，返回文件路径"""
+    if fmt == "excel":
+        write_xlsx(filename, sheets)
+    else:
+        with open(filename, "wb") as f:
+            for chunk in iter_export(fmt, title, sheets):
+                f.write(chunk)
+    return filename
+
+
+# ==================== 后台导出任务 ====================
+
+def _counted(rows: Iterable[Sequence[Any]], on_row: Callable[[], None]) -> Iterator[Sequence[Any]]:
+    for row in rows:
+        on_row()
+        yield row
+
+
+class ExportJobManager:
+    """
+    后台导出任务（进程内单例）
+
+    任务ID即 ProgressManager 的 task_id，前端按现有进度接口轮询；
+    完成后结果中带有文件名，通过 get_file 取回文件路径下载。
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+                    instance._files: Dict[str, str] = {}
+                    instance._files_lock = threading.Lock()
+                    instance.export_dir = Path.home() / ".cloudlens" / "exports"
+                    cls._instance = instance
+        return cls._instance
+
+    def submit(
+        self,
+        fmt: str,
+        title: str,
+        sheets_factory: Callable[[], Sequence[ExportSheet]],
+        total_rows: int = 0,
+        filename_prefix: str = "export",
+    ) -> str:
+        """
+        提交后台导出任务
+
+        Args:
+            fmt: csv / excel / html
+            title: 报告标题（HTML 使用）
+            sheets_factory: 在后台线程中调用，返回导出表（行可以是惰性生成器）
+            total_rows: 预估总行数，用于计算进度
+            filename_prefix: 文件名前缀
+
+        Returns:
+            任务ID
+        """
+        if fmt not in FILE_EXTENSIONS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        job_id = f"export-{uuid.uuid4().hex[:12]}"
+        progress = ProgressManager()
+        progress.set_progress(job_id, 0, total_rows, "导出任务已提交", "queued")
+        self._executor.submit(self._run, job_id, fmt, title, sheets_factory, total_rows, filename_prefix)
+        return job_id
+
+    def _run(self, job_id, fmt, title, sheets_factory, total_rows, filename_prefix) -> None:
+        progress = ProgressManager()
+        written = 0
+
+        def on_row():
+            nonlocal written
+            written += 1
+            if written % CHUNK_ROWS == 0:
+                progress.set_progress(job_id, written, max(total_rows, written), f"已导出 {written} 行", "exporting")
+
+        try:
+            self.export_dir.mkdir(parents=True, exist_ok=True)
+            sheets = [
+                ExportSheet(s.title, s.header, _counted(s.rows, on_row), s.widths, s.header_color)
+                for s in sheets_factory()
+            ]
+            filename = f"{filename_prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{FILE_EXTENSIONS[fmt]}"
+            path = str(self.export_dir / f"{job_id}_{filename}")
+            write_export(fmt, title, sheets, path)
+            with self._files_lock:
+                self._files[job_id] = path
+            progress.set_completed(job_id, {"rows": written, "filename": filename, "format": fmt})
+        except Exception as e:
+            logger.error(f"导出任务失败 [{job_id}]: {e}")
+            progress.set_failed(job_id, str(e))
+
+    def get_file(self, job_id: str) -> Optional[str]:
+        """已完成任务的文件路径"""
+        with self._files_lock:
+            path = self._files.get(job_id)
+        return path if path and os.path.exists(path) else None
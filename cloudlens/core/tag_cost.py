@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+虚拟标签成本归集
+
+把 tag_matches（资源 -> 虚拟标签的物化映射）按 instance_id 关联 bill_items，
+一次分组查询得到各标签各账期的成本。账单只在 MySQL 中：标签存储也是 MySQL 时
+在同库 JOIN；标签存储为 SQLite 时先读出匹配关系，再经账单库适配器按实例分组
+查询后在内存中归集。结果按 (账号, 标签, 账期) 缓存，
+账单或标签匹配变化时只失效受影响的标签/账期。其他进程写入的账单和匹配
+无法通知到本进程，缓存条目超过 TTL 后重新查询（与 CostIndex/DiscountCube 一致）。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cloudlens.core.cost_index import shift_billing_cycle
+from cloudlens.core.database import DatabaseAdapter, DatabaseFactory
+
+logger = logging.getLogger(__name__)
+
+# (账号名或None, 标签ID, 账期) -> (成本, 缓存时间)
+_CacheKey = Tuple[Optional[str], str, str]
+
+# 分库查询时每条账单 SQL 的实例ID数上限
+_INSTANCE_CHUNK = 1000
+
+
+def recent_billing_cycles(months: int, end_cycle: Optional[str] = None) -> List[str]:
+    """最近 N 个账期（含结束账期），按时间升序"""
+    end_cycle = end_cycle or datetime.now().strftime("%Y-%m")
+    return [shift_billing_cycle(end_cycle, -i) for i in range(max(1, months) - 1, -1, -1)]
+
+
+class TagCostAttributor:
+    """
+    标签成本归集器
+
+    用法:
+        attributor = TagCostAttributor.for_storage(tag_storage)
+        costs = attributor.costs_by_tag(tag_ids, recent_billing_cycles(12))
+    """
+
+    _cache: Dict[_CacheKey, Tuple[float, float]] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(
+        self,
+        db: Optional[DatabaseAdapter] = None,
+        account_column: str = "account_id",
+        placeholder: str = "%s",
+        ttl_seconds: int = 3600,
+        bill_db: Optional[DatabaseAdapter] = None,
+        join_bills: Optional[bool] = None,
+    ):
+        """
+        Args:
+            db: tag_matches 所在库的适配器，默认延迟创建 MySQL 适配器
+            account_column: tag_matches 中的账号列名（见 VirtualTagStorage.account_column）
+            placeholder: SQL 占位符，与 db 的方言一致
+            ttl_seconds: 缓存条目有效期（秒）
+            bill_db: bill_items 所在库（MySQL）的适配器，默认延迟创建
+            join_bills: bill_items 与 tag_matches 是否同库（同库时一次 JOIN），
+                默认未传 bill_db 时视为同库
+        """
+        self._db = db
+        self._bill_db = bill_db
+        self.account_column = account_column
+        self.placeholder = placeholder
+        self.ttl_seconds = ttl_seconds
+        self.join_bills = bill_db is None if join_bills is None else join_bills
+
+    @classmethod
+    def for_storage(cls, storage, ttl_seconds: int = 3600) -> "TagCostAttributor":
+        """按虚拟标签存储的适配器、占位符和账号列查询；SQLite 存储的账单走 MySQL 账单库"""
+        return cls(
+            db=storage._get_db(),
+            account_column=storage.account_column,
+            placeholder=storage._get_placeholder(),
+            ttl_seconds=ttl_seconds,
+            join_bills=storage.db_type == "mysql",
+        )
+
+    def _get_db(self) -> DatabaseAdapter:
+        """延迟获取数据库适配器"""
+        if self._db is None:
+            self._db = DatabaseFactory.create_adapter("mysql")
+        return self._db
+
+    def _get_bill_db(self) -> DatabaseAdapter:
+        """账单库适配器：同库时即 tag_matches 所在库"""
+        if self.join_bills:
+            return self._get_db()
+        if self._bill_db is None:
+            self._bill_db = DatabaseFactory.create_adapter("mysql")
+        return self._bill_db
+
+    def query(
+        self,
+        tag_ids: List[str],
+        periods: List[str],
+        account_name: Optional[str] = None,
+        bill_account_id: Optional[str] = None,
+        product_codes: Optional[List[str]] = None,
+    ) -> Dict[Tuple[str, str], float]:
+        """
+        直接查询（不走缓存）：{(tag_id, 账期): 成本}
+
+        Args:
+            tag_ids: 标签ID列表
+            periods: 账期列表（YYYY-MM）
+            account_name: 只统计该账号下匹配的资源
+            bill_account_id: bill_items 中的账号ID（与 account_name 对应）
+            product_codes: 只统计这些产品的账单
+        """
+        if not tag_ids or not periods:
+            return {}
+        if not self.join_bills:
+            return self._query_separate(tag_ids, periods, account_name, bill_account_id, product_codes)
+        ph = self.placeholder
+        sql = f"""
+            SELECT tm.tag_id AS tag_id, b.billing_cycle AS period, SUM(b.pretax_amount) AS total
+            FROM tag_matches tm
+            JOIN bill_items b ON b.instance_id = tm.resource_id
+            WHERE tm.tag_id IN ({', '.join([ph] * len(tag_ids))})
+              AND b.billing_cycle IN ({', '.join([ph] * len(periods))})
+        """
+        params: List = list(tag_ids) + list(periods)
+        if account_name:
+            sql += f" AND tm.{self.account_column} = {ph}"
+            params.append(account_name)
+        if bill_account_id:
+            sql += f" AND b.account_id = {ph}"
+            params.append(bill_account_id)
+        if product_codes:
+            sql += f" AND b.product_code IN ({', '.join([ph] * len(product_codes))})"
+            params.extend(product_codes)
+        sql += " GROUP BY tm.tag_id, b.billing_cycle"
+
+        result = {}
+        for row in self._get_db().query(sql, tuple(params)) or []:
+            if isinstance(row, dict):
+                key = (row["tag_id"], str(row["period"]))
+                total = row.get("total")
+            else:
+                key = (row[0], str(row[1]))
+                total = row[2]
+            result[key] = float(total or 0)
+        return result
+
+    def _query_separate(
+        self,
+        tag_ids: List[str],
+        periods: List[str],
+        account_name: Optional[str],
+        bill_account_id: Optional[str],
+        product_codes: Optional[List[str]],
+    ) -> Dict[Tuple[str, str], float]:
+        """tag_matches 与 bill_items 不同库：读出匹配关系，按实例分组查询账单后归集"""
+        ph = self.placeholder
+        sql = f"SELECT tag_id, resource_id FROM tag_matches WHERE tag_id IN ({', '.join([ph] * len(tag_ids))})"
+        params: List = list(tag_ids)
+        if account_name:
+            sql += f" AND {self.account_column} = {ph}"
+            params.append(account_name)
+        tags_by_resource: Dict[str, List[str]] = {}
+        for row in self._get_db().query(sql, tuple(params)) or []:
+            tag_id, resource_id = (row["tag_id"], row["resource_id"]) if isinstance(row, dict) else (row[0], row[1])
+            tags_by_resource.setdefault(resource_id, []).append(tag_id)
+
+        result: Dict[Tuple[str, str], float] = {}
+        resource_ids = sorted(tags_by_resource)
+        for start in range(0, len(resource_ids), _INSTANCE_CHUNK):
+            chunk = resource_ids[start:start + _INSTANCE_CHUNK]
+            bill_sql = f"""
+                SELECT instance_id, billing_cycle AS period, SUM(pretax_amount) AS total
+                FROM bill_items
+                WHERE instance_id IN ({', '.join(['%s'] * len(chunk))})
+                  AND billing_cycle IN ({', '.join(['%s'] * len(periods))})
+            """
+            bill_params: List = chunk + list(periods)
+            if bill_account_id:
+                bill_sql += " AND account_id = %s"
+                bill_params.append(bill_account_id)
+            if product_codes:
+                bill_sql += f" AND product_code IN ({', '.join(['%s'] * len(product_codes))})"
+                bill_params.extend(product_codes)
+            bill_sql += " GROUP BY instance_id, billing_cycle"
+            for row in self._get_bill_db().query(bill_sql, tuple(bill_params)) or []:
+                if isinstance(row, dict):
+                    instance_id, period, total = row["instance_id"], str(row["period"]), row.get("total")
+                else:
+                    instance_id, period, total = row[0], str(row[1]), row[2]
+                for tag_id in tags_by_resource.get(instance_id, ()):
+                    key = (tag_id, period)
+                    result[key] = result.get(key, 0.0) + float(total or 0)
+        return result
+
+    def costs_by_tag(
+        self,
+        tag_ids: Iterable[str],
+        periods: List[str],
+        account_name: Optional[str] = None,
+        bill_account_id: Optional[str] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        各标签各账期成本（带缓存）：{tag_id: {账期: 成本}}
+
+        只对缓存缺失的 (标签, 账期) 发起一次分组查询。
+        """
+        tag_ids = list(dict.fromkeys(tag_ids))
+        now = time.time()
+        result: Dict[str, Dict[str, float]] = {tag_id: {} for tag_id in tag_ids}
+        missing = []
+        with self._cache_lock:
+            for tag_id in tag_ids:
+                for period in periods:
+                    entry = self._cache.get((account_name, tag_id, period))
+                    if entry is not None and now - entry[1] < self.ttl_seconds:
+                        result[tag_id][period] = entry[0]
+                    else:
+                        missing.append((tag_id, period))
+
+        if missing:
+            missing_tags = sorted({t for t, _ in missing})
+            missing_periods = sorted({p for _, p in missing})
+            fetched = self.query(missing_tags, missing_periods, account_name, bill_account_id)
+            with self._cache_lock:
+                for tag_id, period in missing:
+                    cost = fetched.get((tag_id, period), 0.0)
+                    self._cache[(account_name, tag_id, period)] = (cost, now)
+                    result[tag_id][period] = cost
+            logger.debug(f"标签成本重算: {len(missing_tags)} 个标签 x {len(missing_periods)} 个账期")
+
+        return {tag_id: {period: result[tag_id][period] for period in periods} for tag_id in tag_ids}
+
+    def resource_counts(self, tag_ids: Iterable[str], account_name: Optional[str] = None) -> Dict[str, int]:
+        """各标签匹配的资源数"""
+        tag_ids = list(tag_ids)
+        if not tag_ids:
+            return {}
+        ph = self.placeholder
+        sql = f"SELECT tag_id, COUNT(*) AS cnt FROM tag_matches WHERE tag_id IN ({', '.join([ph] * len(tag_ids))})"
+        params: List = list(tag_ids)
+        if account_name:
+            sql += f" AND {self.account_column} = {ph}"
+            params.append(account_name)
+        sql += " GROUP BY tag_id"
+        counts = {}
+        for row in self._get_db().query(sql, tuple(params)) or []:
+            if isinstance(row, dict):
+                counts[row["tag_id"]] = int(row.get("cnt") or 0)
+            else:
+                counts[row[0]] = int(row[1] or 0)
+        return counts
+
+    @classmethod
+    def invalidate(cls, tag_ids: Optional[Iterable[str]] = None, periods: Optional[Iterable[str]] = None) -> None:
+        """
+        失效缓存
+
+        Args:
+            tag_ids: 匹配关系变化的标签（None 表示不按标签过滤）
+            periods: 账单变化的账期（None 表示不按账期过滤）
+            两者都为 None 时清空全部缓存
+        """
+        tags = set(tag_ids) if tag_ids is not None else None
+        cycles = set(periods) if periods is not None else None
+        with cls._cache_lock:
+            if tags is None and cycles is None:
+                cls._cache.clear()
+                return
+            for key in list(cls._cache):
+                _, tag_id, period = key
+                if (tags is not None and tag_id in tags) or (cycles is not None and period in cycles):
+                    del cls._cache[key]
@@ -1,11 +1,12 @@
 """
 Network Topology Generator
-Generates Mermaid diagrams from cloud resources
+Generates Mermaid diagrams from cloud resources (built on TopologyGraph)
 """
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+from cloudlens.core.topology_graph import TopologyGraph
 from cloudlens.models.resource import UnifiedResource
 
 logger = logging.getLogger("TopologyGenerator")
@@ -13,11 +14,23 @@ logger = logging.getLogger("TopologyGenerator")
 
 class TopologyGenerator:
 
+    @staticmethod
+    def build_graph(
+        instances: List[UnifiedResource],
+        vpcs: List[Dict],
+        rds_instances: List[UnifiedResource] = None,
+        slbs: List[UnifiedResource] = None,
+        nat_gateways: List[UnifiedResource] = None,
+    ) -> TopologyGraph:
+        """一次遍历构建拓扑图（见 TopologyGraph）"""
+        return TopologyGraph.build(instances, vpcs, rds_instances, slbs, nat_gateways)
+
     @staticmethod
     def generate_mermaid(
         instances: List[UnifiedResource],
         vpcs: List[Dict],
         rds_instances: List[UnifiedResource] = None,
+        collapse_threshold: Optional[int] = None,
     ) -> str:
         """
         生成Mermaid格式的网络拓扑图
@@ -26,78 +39,15 @@ class TopologyGenerator:
             instances: ECS实例列表
             vpcs: VPC列表
             rds_instances: RDS实例列表(可选)
+            collapse_threshold: 分组内资源数超过该值时折叠为计数节点(可选)
 
         Returns:
             Mermaid markdown string
         """
-        lines = ["```mermaid", "graph TB"]
-
-        # Group instances by VPC and AZ
-        vpc_az_instances = {}
-        for inst in instances:
-            vpc_id = inst.vpc_id or "no-vpc"
-            az = inst.zone or "unknown"
-            key = (vpc_id, az)
-            if key not in vpc_az_instances:
-                vpc_az_instances[key] = []
-            vpc_az_instances[key].append(inst)
-
-        # Group RDS by VPC and AZ
-        vpc_az_rds = {}
-        if rds_instances:
-            for rds in rds_instances:
-                vpc_id = rds.vpc_id or "no-vpc"
-                az = rds.zone or "unknown"
-                key = (vpc_id, az)
-                if key not in vpc_az_rds:
-                    vpc_az_rds[key] = []
-                vpc_az_rds[key].append(rds)
-
-        # Create VPC subgraphs with AZ grouping
-        for vpc in vpcs:
-            vpc_id = vpc["id"]
-            vpc_name = vpc["name"]
-
-            lines.append(f"  subgraph {vpc_id}[\"{vpc_name}<br/>{vpc['cidr']}\"]")
-
-            # Get all AZs in this VPC
-            azs_in_vpc = set()
-            for (v_id, az), _ in vpc_az_instances.items():
-                if v_id == vpc_id:
-                    azs_in_vpc.add(az)
-            for (v_id, az), _ in vpc_az_rds.items():
-                if v_id == vpc_id:
-                    azs_in_vpc.add(az)
-
-            # Group by AZ
-            for az in sorted(azs_in_vpc):
-                lines.append(f"    subgraph {vpc_id}_{az.replace('-', '_')}[\"AZ: {az}\"]")
-
-                # Add ECS instances in this AZ
-                key = (vpc_id, az)
-                if key in vpc_az_instances:
-                    for inst in vpc_az_instances[key]:
-                        ip = (
-                            inst.public_ips[0]
-                            if inst.public_ips
-                            else (inst.private_ips[0] if inst.private_ips else "N/A")
-                        )
-                        status_emoji = "🟢" if inst.status.value == "Running" else "🔴"
-                        lines.append(
-                            f'      {inst.id}["{status_emoji} {inst.name}<br/>{ip}<br/>{inst.spec}"]'
-                        )
-
-                # Add RDS instances in this AZ
-                if key in vpc_az_rds:
-                    for rds in vpc_az_rds[key]:
-                        lines.append(f'      {rds.id}[("💾 {rds.name}<br/>{rds.spec}")]')
-
-                lines.append("    end")
-
-            lines.append("  end")
-
-        lines.append("```")
-        return "\n".join(lines)
+        graph = TopologyGenerator.build_graph(instances, vpcs, rds_instances)
+        if collapse_threshold:
+            graph = graph.collapsed(collapse_threshold)
+        return graph.to_mermaid()
 
     @staticmethod
     def generate_markdown_report(
@@ -107,10 +57,15 @@ class TopologyGenerator:
         rds_instances: List[UnifiedResource] = None,
         redis_instances: List[UnifiedResource] = None,
         eips: List[Dict] = None,
+        slbs: List[UnifiedResource] = None,
+        nat_gateways: List[UnifiedResource] = None,
+        collapse_threshold: int = 50,
     ) -> str:
         """
         生成完整的Markdown报告
 
+        网络拓扑按 VPC 分别输出 Mermaid 图，分组内资源过多时折叠为计数节点，避免单张图过大无法渲染。
+
         Returns:
             Markdown formatted report
         """
@@ -130,8 +85,13 @@ class TopologyGenerator:
 
         # Network topology
         lines.append("## 网络拓扑")
-        lines.append(TopologyGenerator.generate_mermaid(instances, vpcs, rds_instances))
-        lines.append("")
+        graph = TopologyGenerator.build_graph(instances, vpcs, rds_instances, slbs, nat_gateways)
+        view = graph.collapsed(collapse_threshold)
+        for vpc, mermaid in view.iter_mermaid():
+            cidr = f" ({vpc.attrs['cidr']})" if vpc.attrs.get("cidr") else ""
+            lines.append(f"### {vpc.label}{cidr}")
+            lines.append(mermaid)
+            lines.append("")
 
         # Resource details
         lines.append("## 资源详情")
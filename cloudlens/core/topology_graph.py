@@ -0,0 +1,506 @@
+"""
+网络拓扑图模型
+
+一次遍历把 VPC / 可用区 / 交换机 / ECS / RDS / SLB / NAT 建成带邻接索引的图：
+- 包含关系: VPC -> 可用区 -> 交换机（已知时）-> 资源，父子索引按插入顺序保存
+- 关联关系: 如 SLB -> 后端 ECS，双向邻接索引，删除节点时 O(度数)
+- 支持按资源清单增量更新（新增/变更/删除）
+- 大图视图: 叶子过多的分组折叠成按类型计数的聚合节点，可指定展开的分组
+- 导出: 分页 JSON、Graphviz DOT、按 VPC 的 Mermaid
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cloudlens.models.resource import ResourceStatus, ResourceType, UnifiedResource
+
+NO_VPC = "no-vpc"
+UNKNOWN_ZONE = "unknown"
+
+CONTAINER_KINDS = ("vpc", "zone", "vswitch")
+LEAF_KINDS = ("ecs", "rds", "slb", "nat")
+
+_KIND_BY_TYPE = {
+    ResourceType.ECS: "ecs",
+    ResourceType.RDS: "rds",
+    ResourceType.SLB: "slb",
+    ResourceType.NAT: "nat",
+    ResourceType.NAT_GATEWAY: "nat",
+}
+
+_KIND_TITLE = {"ecs": "ECS", "rds": "RDS", "slb": "SLB", "nat": "NAT"}
+
+
+@dataclass
+class TopologyNode:
+    """拓扑节点"""
+
+    id: str
+    kind: str
+    label: str
+    parent: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "kind": self.kind, "label": self.label, "parent": self.parent, **self.attrs}
+
+
+def _first(values: Optional[List[str]]) -> str:
+    return values[0] if values else ""
+
+
+def _placement(resource: UnifiedResource) -> Tuple[str, str, Optional[str]]:
+    """资源的 (VPC, 可用区, 交换机)，缺失字段从原始数据补全"""
+    raw = resource.raw_data or {}
+    private = raw.get("NatGatewayPrivateInfo") or {}
+    vpc_id = resource.vpc_id or raw.get("VpcId") or (raw.get("VpcAttributes") or {}).get("VpcId") or NO_VPC
+    zone = resource.zone or raw.get("ZoneId") or raw.get("MasterZoneId") or private.get("IzNo") or UNKNOWN_ZONE
+    vswitch = (
+        (raw.get("VpcAttributes") or {}).get("VSwitchId")
+        or raw.get("VSwitchId")
+        or private.get("VswitchId")
+    )
+    return vpc_id, zone, vswitch or None
+
+
+def _leaf_attrs(resource: UnifiedResource) -> Dict[str, Any]:
+    status = resource.status.value if isinstance(resource.status, ResourceStatus) else str(resource.status)
+    return {
+        "name": resource.name,
+        "status": status,
+        "spec": resource.spec or "",
+        "ip": _first(resource.public_ips) or _first(resource.private_ips),
+    }
+
+
+def _mermaid_id(node_id: str) -> str:
+    return re.sub(r"\W", "_", node_id)
+
+
+def _dot_quote(text: str) -> str:
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class TopologyGraph:
+    """邻接索引的拓扑图"""
+
+    def __init__(self):
+        self.nodes: Dict[str, TopologyNode] = {}
+        # 父 -> 子（dict 保持插入顺序，删除 O(1)）
+        self._children: Dict[str, Dict[str, None]] = {}
+        # 关联关系邻接表：节点 -> {对端: 关系}，出边、入边分开
+        self._out: Dict[str, Dict[str, str]] = {}
+        self._in: Dict[str, Dict[str, str]] = {}
+        self._by_kind: Dict[str, Dict[str, None]] = {}
+
+    # ------------------------------------------------------------------
+    # 构建
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        instances: Iterable[UnifiedResource] = (),
+        vpcs: Iterable[Dict] = (),
+        rds_instances: Optional[Iterable[UnifiedResource]] = None,
+        slbs: Optional[Iterable[UnifiedResource]] = None,
+        nat_gateways: Optional[Iterable[UnifiedResource]] = None,
+        vswitches: Optional[Iterable[Dict]] = None,
+    ) -> "TopologyGraph":
+        """
+        一次遍历构建拓扑图
+
+        Args:
+            instances: ECS 实例
+            vpcs: list_vpcs() 返回的 VPC 字典（id/name/cidr）
+            rds_instances / slbs / nat_gateways: 其他资源（可选）
+            vswitches: 交换机字典（id/name/vpc_id/zone/cidr，可选；未提供时从资源原始数据推断）
+        """
+        graph = cls()
+        for vpc in vpcs:
+            graph.add_vpc(vpc)
+        for vswitch in vswitches or ():
+            graph.add_vswitch(vswitch)
+        for group in (instances, rds_instances, slbs, nat_gateways):
+            for resource in group or ():
+                graph.upsert_resource(resource)
+        graph.link_slb_backends()
+        return graph
+
+    def _add_node(self, node: TopologyNode) -> TopologyNode:
+        existing = self.nodes.get(node.id)
+        if existing is not None:
+            if existing.parent != node.parent:
+                self._detach(existing)
+            else:
+                existing.label, existing.attrs = node.label, node.attrs
+                return existing
+        self.nodes[node.id] = node
+        self._by_kind.setdefault(node.kind, {})[node.id] = None
+        if node.parent is not None:
+            self._children.setdefault(node.parent, {})[node.id] = None
+        return node
+
+    def _detach(self, node: TopologyNode) -> None:
+        if node.parent is not None:
+            self._children.get(node.parent, {}).pop(node.id, None)
+        node.parent = None
+
+    def add_vpc(self, vpc: Dict) -> TopologyNode:
+        """添加或更新 VPC"""
+        return self._add_node(TopologyNode(
+            id=vpc["id"],
+            kind="vpc",
+            label=vpc.get("name") or vpc["id"],
+            attrs={"cidr": vpc.get("cidr", ""), "implicit": False},
+        ))
+
+    def _zone_node(self, vpc_id: str, zone: str) -> str:
+        if vpc_id not in self.nodes:
+            label = "无VPC" if vpc_id == NO_VPC else vpc_id
+            self._add_node(TopologyNode(id=vpc_id, kind="vpc", label=label, attrs={"cidr": "", "implicit": True}))
+        zone_id = f"{vpc_id}/{zone}"
+        if zone_id not in self.nodes:
+            self._add_node(TopologyNode(id=zone_id, kind="zone", label=zone, parent=vpc_id))
+        return zone_id
+
+    def add_vswitch(self, vswitch: Dict, implicit: bool = False) -> TopologyNode:
+        """添加或更新交换机（挂在所属 VPC 的可用区下）"""
+        zone_id = self._zone_node(vswitch.get("vpc_id") or NO_VPC, vswitch.get("zone") or UNKNOWN_ZONE)
+        return self._add_node(TopologyNode(
+            id=vswitch["id"],
+            kind="vswitch",
+            label=vswitch.get("name") or vswitch["id"],
+            parent=zone_id,
+            attrs={"cidr": vswitch.get("cidr", ""), "implicit": implicit},
+        ))
+
+    def upsert_resource(self, resource: UnifiedResource) -> Optional[TopologyNode]:
+        """添加或更新资源节点，位置变化时移动到新的父节点；不支持的类型返回 None"""
+        kind = _KIND_BY_TYPE.get(resource.resource_type)
+        if kind is None:
+            return None
+        vpc_id, zone, vswitch = _placement(resource)
+        if vswitch in self.nodes:
+            # 交换机已知时以交换机所在位置为准
+            parent = vswitch
+        elif vswitch:
+            parent = self.add_vswitch({"id": vswitch, "vpc_id": vpc_id, "zone": zone}, implicit=True).id
+        else:
+            parent = self._zone_node(vpc_id, zone)
+
+        previous = self.nodes.get(resource.id)
+        old_parent = previous.parent if previous else None
+        node = self._add_node(TopologyNode(
+            id=resource.id, kind=kind, label=resource.name or resource.id, parent=parent, attrs=_leaf_attrs(resource),
+        ))
+        if kind == "slb":
+            node.attrs["backends"] = [
+                server.get("ServerId")
+                for server in ((resource.raw_data or {}).get("BackendServers") or {}).get("BackendServer", [])
+                if server.get("ServerId")
+            ]
+        if old_parent and old_parent != parent:
+            self._prune(old_parent)
+        return node
+
+    def add_edge(self, source: str, target: str, relation: str) -> None:
+        """添加关联关系（两端都必须已存在）"""
+        if source in self.nodes and target in self.nodes:
+            self._out.setdefault(source, {})[target] = relation
+            self._in.setdefault(target, {})[source] = relation
+
+    def link_slb_backends(self) -> None:
+        """按 SLB 原始数据中的后端服务器建立 SLB -> ECS 关联"""
+        for slb_id in self._by_kind.get("slb", {}):
+            for server_id in self.nodes[slb_id].attrs.get("backends", ()):
+                self.add_edge(slb_id, server_id, "backend")
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+
+    def remove(self, node_id: str) -> bool:
+        """删除节点（容器连同子树），清理关联关系和空的隐式容器"""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return False
+        for child in list(self._children.get(node_id, ())):
+            self.remove(child)
+        self._children.pop(node_id, None)
+        for target in self._out.pop(node_id, {}):
+            self._in.get(target, {}).pop(node_id, None)
+        for source in self._in.pop(node_id, {}):
+            self._out.get(source, {}).pop(node_id, None)
+        parent = node.parent
+        self._detach(node)
+        del self.nodes[node_id]
+        self._by_kind[node.kind].pop(node_id, None)
+        if parent:
+            self._prune(parent)
+        return True
+
+    def _prune(self, container_id: str) -> None:
+        """向上删除空的可用区和隐式创建的交换机/VPC"""
+        while container_id in self.nodes and not self._children.get(container_id):
+            node = self.nodes[container_id]
+            if node.kind != "zone" and not node.attrs.get("implicit"):
+                return
+            parent = node.parent
+            self._detach(node)
+            del self.nodes[container_id]
+            self._by_kind[node.kind].pop(container_id, None)
+            self._children.pop(container_id, None)
+            if parent is None:
+                return
+            container_id = parent
+
+    def apply_delta(
+        self, upserts: Iterable[UnifiedResource] = (), removed: Iterable[str] = ()
+    ) -> Dict[str, int]:
+        """
+        按资源清单变化增量更新
+
+        Args:
+            upserts: 新增或变更的资源
+            removed: 已删除的资源 ID
+
+        Returns:
+            {"upserted": n, "removed": n}
+        """
+        removed_count = sum(1 for node_id in removed if self.remove(node_id))
+        upserted = 0
+        for resource in upserts:
+            if self.upsert_resource(resource) is not None:
+                upserted += 1
+        if upserted:
+            # 新增的 ECS 可能是已有 SLB 的后端
+            self.link_slb_backends()
+        return {"upserted": upserted, "removed": removed_count}
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def children(self, node_id: str) -> List[TopologyNode]:
+        """直接子节点，可用区按名称排序，其余按插入顺序"""
+        nodes = [self.nodes[c] for c in self._children.get(node_id, ())]
+        if self.nodes.get(node_id) is not None and self.nodes[node_id].kind == "vpc":
+            nodes.sort(key=lambda n: n.label)
+        return nodes
+
+    def neighbors(self, node_id: str) -> Dict[str, str]:
+        """关联关系的对端（出边和入边）"""
+        return {**self._in.get(node_id, {}), **self._out.get(node_id, {})}
+
+    def of_kind(self, kind: str) -> List[TopologyNode]:
+        return [self.nodes[node_id] for node_id in self._by_kind.get(kind, ())]
+
+    def roots(self) -> List[TopologyNode]:
+        return self.of_kind("vpc")
+
+    def walk(self, root: Optional[str] = None) -> Iterator[Tuple[TopologyNode, int]]:
+        """按层级深度优先遍历，产出 (节点, 深度)"""
+        stack = [(self.nodes[root], 0)] if root else [(n, 0) for n in self.roots()]
+        stack.reverse()
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth + 1) for child in reversed(self.children(node.id)))
+
+    def edges(self) -> Iterator[Tuple[str, str, str]]:
+        for source, targets in self._out.items():
+            for target, relation in targets.items():
+                yield source, target, relation
+
+    def stats(self) -> Dict[str, int]:
+        return {kind: len(ids) for kind, ids in self._by_kind.items() if ids}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    # ------------------------------------------------------------------
+    # 视图
+    # ------------------------------------------------------------------
+
+    def subgraph(self, vpc_id: str) -> "TopologyGraph":
+        """单个 VPC 的子图（只保留两端都在子图内的关联关系）"""
+        view = TopologyGraph()
+        if vpc_id not in self.nodes:
+            return view
+        for node, _ in self.walk(vpc_id):
+            view._add_node(TopologyNode(node.id, node.kind, node.label, node.parent, dict(node.attrs)))
+        for source, target, relation in self.edges():
+            view.add_edge(source, target, relation)
+        return view
+
+    def collapsed(self, threshold: int = 50, expand: Iterable[str] = ()) -> "TopologyGraph":
+        """
+        折叠视图：直接叶子数超过 threshold 的分组（可用区/交换机）把叶子按类型折叠成聚合节点
+
+        Args:
+            threshold: 分组内叶子数上限
+            expand: 保持展开的分组 ID
+
+        Returns:
+            新图；聚合节点 kind="cluster"，attrs 含 count / member_kind / status（状态计数）
+        """
+        expand = set(expand)
+        view = TopologyGraph()
+        folded = set()
+        alias: Dict[str, str] = {}
+        for node, _ in self.walk():
+            if node.kind in LEAF_KINDS and node.parent in folded:
+                continue
+            view._add_node(TopologyNode(node.id, node.kind, node.label, node.parent, dict(node.attrs)))
+            if node.kind not in ("zone", "vswitch") or node.id in expand:
+                continue
+            leaves = [c for c in self.children(node.id) if c.kind in LEAF_KINDS]
+            if len(leaves) <= threshold:
+                continue
+            folded.add(node.id)
+            groups: Dict[str, List[TopologyNode]] = {}
+            for leaf in leaves:
+                groups.setdefault(leaf.kind, []).append(leaf)
+            for kind, members in groups.items():
+                if len(members) == 1:
+                    # 单个资源不值得折叠，原样保留
+                    view._add_node(TopologyNode(members[0].id, kind, members[0].label, node.id, dict(members[0].attrs)))
+                    continue
+                cluster_id = f"{node.id}#{kind}"
+                view._add_node(TopologyNode(
+                    id=cluster_id,
+                    kind="cluster",
+                    label=f"{len(members)} × {_KIND_TITLE.get(kind, kind)}",
+                    parent=node.id,
+                    attrs={
+                        "count": len(members),
+                        "member_kind": kind,
+                        "status": dict(Counter(m.attrs.get("status", "") for m in members)),
+                    },
+                ))
+                for member in members:
+                    alias[member.id] = cluster_id
+        for source, target, relation in self.edges():
+            source, target = alias.get(source, source), alias.get(target, target)
+            if source != target:
+                view.add_edge(source, target, relation)
+        return view
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+
+    def to_json(self, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        分页导出 JSON 图
+
+        节点按层级深度优先排序，容器总在其子节点之前；每页带上以本页节点为起点的关联关系。
+        """
+        ordered = [node for node, _ in self.walk()]
+        page = ordered[offset: offset + limit] if limit else ordered[offset:]
+        page_ids = {node.id for node in page}
+        end = offset + len(page)
+        return {
+            "nodes": [node.to_dict() for node in page],
+            "edges": [
+                {"source": s, "target": t, "relation": r} for s, t, r in self.edges() if s in page_ids
+            ],
+            "total_nodes": len(ordered),
+            "offset": offset,
+            "next_offset": end if end < len(ordered) else None,
+            "stats": self.stats(),
+        }
+
+    def to_dot(self, vpc_id: Optional[str] = None) -> str:
+        """导出 Graphviz DOT，容器渲染为 cluster 子图"""
+        lines = ["digraph topology {", "  rankdir=TB;", "  node [shape=box, fontsize=10];"]
+
+        def emit(node: TopologyNode, depth: int) -> None:
+            indent = "  " * (depth + 1)
+            if node.kind in CONTAINER_KINDS:
+                lines.append(f"{indent}subgraph {_dot_quote('cluster_' + node.id)} {{")
+                label = f"{node.label}\n{node.attrs['cidr']}" if node.attrs.get("cidr") else node.label
+                lines.append(f"{indent}  label={_dot_quote(label)};")
+                for child in self.children(node.id):
+                    emit(child, depth + 1)
+                lines.append(f"{indent}}}")
+            else:
+                shape = {"rds": "cylinder", "slb": "hexagon", "nat": "parallelogram", "cluster": "box3d"}
+                lines.append(
+                    f"{indent}{_dot_quote(node.id)} [label={_dot_quote(node.label)}, "
+                    f"shape={shape.get(node.kind, 'box')}];"
+                )
+
+        for root in ([self.nodes[vpc_id]] if vpc_id else self.roots()):
+            emit(root, 0)
+        for source, target, relation in self.edges():
+            lines.append(f"  {_dot_quote(source)} -> {_dot_quote(target)} [label={_dot_quote(relation)}];")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def _mermaid_node(self, node: TopologyNode) -> str:
+        mid = _mermaid_id(node.id)
+        attrs = node.attrs
+        if node.kind == "ecs":
+            emoji = "🟢" if attrs.get("status") == "Running" else "🔴"
+            return f'{mid}["{emoji} {node.label}<br/>{attrs.get("ip") or "N/A"}<br/>{attrs.get("spec")}"]'
+        if node.kind == "rds":
+            return f'{mid}[("💾 {node.label}<br/>{attrs.get("spec")}")]'
+        if node.kind == "slb":
+            return f'{mid}{{{{"⚖️ {node.label}<br/>{attrs.get("ip") or "N/A"}"}}}}'
+        if node.kind == "nat":
+            return f'{mid}[/"🌐 {node.label}"/]'
+        return f'{mid}[["{node.label}"]]'
+
+    def mermaid_body(self, vpc_id: str, indent: int = 1) -> List[str]:
+        """单个 VPC 的 Mermaid 子图行（不含 graph 头）"""
+        lines: List[str] = []
+        prefix = {"vpc": "", "zone": "AZ: ", "vswitch": "vSwitch: "}
+
+        for node, depth in self.walk(vpc_id):
+            pad = "  " * (indent + depth)
+            if node.kind in CONTAINER_KINDS:
+                cidr = f"<br/>{node.attrs['cidr']}" if node.attrs.get("cidr") else ""
+                lines.append(f'{pad}subgraph {_mermaid_id(node.id)}["{prefix[node.kind]}{node.label}{cidr}"]')
+            else:
+                lines.append(f"{pad}{self._mermaid_node(node)}")
+        return self._close_subgraphs(lines, indent)
+
+    @staticmethod
+    def _close_subgraphs(lines: List[str], indent: int) -> List[str]:
+        """按缩进补全 subgraph 的 end"""
+        closed: List[str] = []
+        open_pads: List[int] = []
+        for line in lines:
+            pad = len(line) - len(line.lstrip(" "))
+            while open_pads and open_pads[-1] >= pad:
+                closed.append(" " * open_pads.pop() + "end")
+            closed.append(line)
+            if line.lstrip().startswith("subgraph "):
+                open_pads.append(pad)
+        while open_pads:
+            closed.append(" " * open_pads.pop() + "end")
+        return closed
+
+    def to_mermaid(self, vpc_id: Optional[str] = None) -> str:
+        """导出 Mermaid（指定 VPC 时只导出该 VPC）"""
+        lines = ["```mermaid", "graph TB"]
+        roots = [vpc_id] if vpc_id else [n.id for n in self.roots()]
+        included = set()
+        for root in roots:
+            if root in self.nodes:
+                lines.extend(self.mermaid_body(root))
+                included.update(node.id for node, _ in self.walk(root))
+        for source, target, relation in self.edges():
+            if source in included and target in included:
+                lines.append(f"  {_mermaid_id(source)} -->|{relation}| {_mermaid_id(target)}")
+        lines.append("```")
+        return "\n".join(lines)
+
+    def iter_mermaid(self) -> Iterator[Tuple[TopologyNode, str]]:
+        """逐个 VPC 导出 Mermaid，产出 (VPC 节点, Mermaid 文本)"""
+        for vpc in self.roots():
+            yield vpc, self.to_mermaid(vpc.id)
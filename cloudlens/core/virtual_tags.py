@@ -9,17 +9,26 @@ import logging
 import os
 import re
 import json
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Set, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 
 from cloudlens.core.database import DatabaseFactory
+from cloudlens.core.tag_cost import TagCostAttributor
 
 logger = logging.getLogger(__name__)
 
+# 可物化标签匹配的资源类型 -> Provider 的列表方法
+SYNC_RESOURCE_TYPES = {
+    "ecs": "list_instances",
+    "rds": "list_rds",
+    "redis": "list_redis",
+}
+
 
 class RuleOperator(str, Enum):
     """规则操作符"""
@@ -161,20 +170,188 @@ class TagEngine:
         if not tag.rules:
             return False
         
-        # 按优先级排序规则
-        sorted_rules = sorted(tag.rules, key=lambda r: r.priority, reverse=True)
-        
-        # 目前只支持AND逻辑（所有规则都必须匹配）
+        # 目前只支持AND逻辑（所有规则都必须匹配），规则顺序不影响结果
         # TODO: 未来可以支持OR逻辑
-        for rule in sorted_rules:
+        for rule in tag.rules:
             if not TagEngine.match_rule(resource, rule):
                 return False
         
         return True
 
+    @staticmethod
+    def compile(tags: List[VirtualTag]) -> 'CompiledTagEngine':
+        """把一组标签的规则编译为索引，供批量匹配使用"""
+        return CompiledTagEngine(tags)
+
+
+_OPERATORS = frozenset(op.value for op in MatchOperator)
+
+
+class _CompiledRule:
+    """预处理后的规则：模式只小写/切分/编译一次"""
+
+    __slots__ = ("field", "operator", "pattern", "values", "regex")
+
+    def __init__(self, rule: TagRule):
+        self.field = rule.field
+        op = rule.operator
+        self.operator = op.value if isinstance(op, MatchOperator) else str(op)
+        self.pattern = (rule.pattern or "").lower()
+        self.values = None
+        self.regex = None
+        if self.operator in (MatchOperator.IN, MatchOperator.NOT_IN):
+            self.values = frozenset(v.strip() for v in self.pattern.split(','))
+        elif self.operator == MatchOperator.REGEX:
+            try:
+                self.regex = re.compile(self.pattern, re.IGNORECASE)
+            except re.error as e:
+                logger.error(f"Error compiling rule {rule.id}: {e}")
+        elif self.operator not in _OPERATORS:
+            logger.warning(f"Unknown operator: {self.operator}")
+
+    def matches(self, value: str) -> bool:
+        """value 为已小写的字段值"""
+        op = self.operator
+        if op == MatchOperator.CONTAINS:
+            return self.pattern in value
+        if op == MatchOperator.EQUALS:
+            return value == self.pattern
+        if op == MatchOperator.STARTS_WITH:
+            return value.startswith(self.pattern)
+        if op == MatchOperator.ENDS_WITH:
+            return value.endswith(self.pattern)
+        if op == MatchOperator.REGEX:
+            return bool(self.regex and self.regex.search(value))
+        if op == MatchOperator.IN:
+            return value in self.values
+        if op == MatchOperator.NOT_IN:
+            return value not in self.values
+        return False
+
+
+class _Trie:
+    """前缀树：沿字段值逐字符走，收集途经节点上挂的标签"""
+
+    __slots__ = ("children", "tag_ids")
+
+    def __init__(self):
+        self.children: Dict[str, '_Trie'] = {}
+        self.tag_ids: List[str] = []
+
+    def add(self, key: str, tag_id: str) -> None:
+        node = self
+        for ch in key:
+            node = node.children.setdefault(ch, _Trie())
+        node.tag_ids.append(tag_id)
+
+    def collect(self, value: str, out: set) -> None:
+        node = self
+        out.update(node.tag_ids)
+        for ch in value:
+            node = node.children.get(ch)
+            if node is None:
+                return
+            out.update(node.tag_ids)
+
+
+class CompiledTagEngine:
+    """
+    编译后的标签引擎
+
+    每个标签挑选一条可索引的规则作为锚点放入索引：
+    equals/in 进哈希表，starts_with 进前缀树，ends_with 进后缀树（倒序前缀树）；
+    没有可索引规则的标签（只有 contains/regex/not_in）对每个资源都要检查。
+    匹配时先由索引得到候选标签，再校验候选标签的全部规则，一次遍历匹配所有标签。
+    """
+
+    # 锚点优先级：哈希 > 前缀/后缀树
+    _ANCHOR_RANK = {
+        MatchOperator.EQUALS.value: 0,
+        MatchOperator.IN.value: 0,
+        MatchOperator.STARTS_WITH.value: 1,
+        MatchOperator.ENDS_WITH.value: 1,
+    }
+
+    def __init__(self, tags: List[VirtualTag]):
+        self.tags: Dict[str, VirtualTag] = {}
+        self._rules: Dict[str, List[_CompiledRule]] = {}
+        self._exact: Dict[str, Dict[str, List[str]]] = {}  # field -> value -> tag_ids
+        self._prefix: Dict[str, _Trie] = {}
+        self._suffix: Dict[str, _Trie] = {}
+        self._scan: List[str] = []
+        # 匹配结果按标签优先级排序
+        self._order: Dict[str, int] = {}
+
+        for order, tag in enumerate(sorted(tags, key=lambda t: t.priority, reverse=True)):
+            if not tag.rules:
+                continue
+            compiled = [_CompiledRule(rule) for rule in tag.rules]
+            self.tags[tag.id] = tag
+            self._rules[tag.id] = compiled
+            self._order[tag.id] = order
+            self._index(tag.id, compiled)
+
+    def _index(self, tag_id: str, compiled: List[_CompiledRule]) -> None:
+        anchors = [r for r in compiled if r.operator in self._ANCHOR_RANK]
+        if not anchors:
+            self._scan.append(tag_id)
+            return
+        anchor = min(anchors, key=lambda r: self._ANCHOR_RANK[r.operator])
+        if anchor.operator == MatchOperator.EQUALS:
+            self._exact.setdefault(anchor.field, {}).setdefault(anchor.pattern, []).append(tag_id)
+        elif anchor.operator == MatchOperator.IN:
+            exact = self._exact.setdefault(anchor.field, {})
+            for value in anchor.values:
+                exact.setdefault(value, []).append(tag_id)
+        elif anchor.operator == MatchOperator.STARTS_WITH:
+            self._prefix.setdefault(anchor.field, _Trie()).add(anchor.pattern, tag_id)
+        else:
+            self._suffix.setdefault(anchor.field, _Trie()).add(anchor.pattern[::-1], tag_id)
+
+    @staticmethod
+    def _value(resource: Dict[str, Any], field: str) -> str:
+        value = resource.get(field, "")
+        return "" if value is None else str(value).lower()
+
+    def match(self, resource: Dict[str, Any]) -> List[str]:
+        """返回资源匹配的标签ID列表（按标签优先级从高到低）"""
+        candidates = set(self._scan)
+        for field, exact in self._exact.items():
+            candidates.update(exact.get(self._value(resource, field), ()))
+        for field, trie in self._prefix.items():
+            trie.collect(self._value(resource, field), candidates)
+        for field, trie in self._suffix.items():
+            trie.collect(self._value(resource, field)[::-1], candidates)
+
+        values: Dict[str, str] = {}
+        matched = []
+        for tag_id in candidates:
+            for rule in self._rules[tag_id]:
+                value = values.get(rule.field)
+                if value is None:
+                    value = values[rule.field] = self._value(resource, rule.field)
+                if not rule.matches(value):
+                    break
+            else:
+                matched.append(tag_id)
+        matched.sort(key=self._order.__getitem__)
+        return matched
+
+    def match_all(self, resources: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """批量匹配：{resource_id: [tag_id, ...]}，未匹配任何标签的资源不出现"""
+        result = {}
+        for resource in resources:
+            matched = self.match(resource)
+            if matched:
+                result[str(resource.get("id", ""))] = matched
+        return result
+
 
 class VirtualTagStorage:
     """虚拟标签存储管理器（支持SQLite和MySQL）"""
+
+    _shared: Optional["VirtualTagStorage"] = None
+    _shared_lock = threading.Lock()
     
     def __init__(self, db_path: Optional[str] = None, db_type: Optional[str] = None):
         """
@@ -197,8 +374,21 @@ class VirtualTagStorage:
             self.db_path = db_path
             self.db = DatabaseFactory.create_adapter("sqlite", db_path=db_path)
         
+        # tag_matches 的账号列：MySQL 建表脚本为 account_id，SQLite 为 account_name（值均为账号名称）
+        self.account_column = "account_id" if self.db_type == "mysql" else "account_name"
+        # 最近一次同步的资源清单 {账号: {资源类型: [资源字典]}}，用于标签变更时增量重算
+        self._inventory: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        
         self._init_database()
     
+    @classmethod
+    def shared(cls) -> "VirtualTagStorage":
+        """进程内共享的存储实例（各路由和资源清单刷新共用，资源清单只需维护一份）"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
     def _get_db(self):
         """延迟获取数据库适配器"""
         if self.db is None:
@@ -264,24 +454,26 @@ class VirtualTagStorage:
             """)
             
             # 创建标签匹配缓存表（性能优化）
-            self._get_db().execute("""
+            # 账号列名与 account_column 一致（MySQL 与 init_mysql_schema.sql 相同为 account_id）
+            account_column = self.account_column
+            self._get_db().execute(f"""
                 CREATE TABLE IF NOT EXISTS tag_matches (
                     resource_id VARCHAR(255) NOT NULL,
                     resource_type VARCHAR(50) NOT NULL,
-                    account_name VARCHAR(255) NOT NULL,
+                    {account_column} VARCHAR(255) NOT NULL,
                     tag_id VARCHAR(255) NOT NULL,
                     matched_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (resource_id, resource_type, account_name, tag_id),
+                    PRIMARY KEY (resource_id, resource_type, {account_column}, tag_id),
                     FOREIGN KEY (tag_id) REFERENCES virtual_tags(id) ON DELETE CASCADE
                 )
-            """ if self.db_type == "mysql" else """
+            """ if self.db_type == "mysql" else f"""
                 CREATE TABLE IF NOT EXISTS tag_matches (
                     resource_id TEXT NOT NULL,
                     resource_type TEXT NOT NULL,
-                    account_name TEXT NOT NULL,
+                    {account_column} TEXT NOT NULL,
                     tag_id TEXT NOT NULL,
                     matched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (resource_id, resource_type, account_name, tag_id),
+                    PRIMARY KEY (resource_id, resource_type, {account_column}, tag_id),
                     FOREIGN KEY (tag_id) REFERENCES virtual_tags(id) ON DELETE CASCADE
                 )
             """)
@@ -292,7 +484,7 @@ class VirtualTagStorage:
                 indexes_to_create = [
                     ("idx_tag_key_value", "virtual_tags", "tag_key, tag_value"),
                     ("idx_tag_rules_tag_id", "tag_rules", "tag_id"),
-                    ("idx_tag_matches_resource", "tag_matches", "resource_id, resource_type"),
+                    ("idx_tag_matches_resource", "tag_matches", f"resource_id, resource_type, {account_column}"),
                     ("idx_tag_matches_tag", "tag_matches", "tag_id"),
                 ]
                 for idx_name, table_name, columns in indexes_to_create:
@@ -314,7 +506,7 @@ class VirtualTagStorage:
                 try:
                     self._get_db().execute("CREATE INDEX IF NOT EXISTS idx_tag_key_value ON virtual_tags(tag_key, tag_value)")
                     self._get_db().execute("CREATE INDEX IF NOT EXISTS idx_tag_rules_tag_id ON tag_rules(tag_id)")
-                    self._get_db().execute("CREATE INDEX IF NOT EXISTS idx_tag_matches_resource ON tag_matches(resource_id, resource_type, account_name)")
+                    self._get_db().execute(f"CREATE INDEX IF NOT EXISTS idx_tag_matches_resource ON tag_matches(resource_id, resource_type, {account_column})")
                     self._get_db().execute("CREATE INDEX IF NOT EXISTS idx_tag_matches_tag ON tag_matches(tag_id)")
                 except Exception as e:
                     logger.debug(f"Index creation skipped (may already exist): {e}")
@@ -361,46 +553,41 @@ class VirtualTagStorage:
                     rule.priority
                 ))
             
+            self._rematerialize_tag(tag.id)
             logger.info(f"Created virtual tag: {tag.name} ({tag.id})")
             return tag.id
         except Exception as e:
             logger.error(f"Error creating tag: {e}")
             raise
     
-    def get_tag(self, tag_id: str) -> Optional[VirtualTag]:
-        """获取虚拟标签"""
-        placeholder = self._get_placeholder()
-        # 获取标签
-        rows = self._get_db().query(f"SELECT * FROM virtual_tags WHERE id = {placeholder}", (tag_id,))
-        if not rows:
-                return None
-        
-        row = rows[0]
-            
-            # 获取规则
-        rule_rows = self._get_db().query(f"SELECT * FROM tag_rules WHERE tag_id = {placeholder} ORDER BY priority DESC", (tag_id,))
-        
-        rules = []
-        for r in rule_rows:
-            if isinstance(r, dict):
-                rules.append(TagRule(
-                    id=r.get('id', ''),
-                    tag_id=r.get('tag_id', ''),
-                    field=r.get('field', ''),
-                    operator=r.get('operator', ''),
-                    pattern=r.get('pattern', ''),
-                    priority=int(r.get('priority', 0))
-                ))
-            else:
-                rules.append(TagRule(
-                    id=r[0],
-                    tag_id=r[1],
-                    field=r[2],
-                    operator=r[3],
-                    pattern=r[4],
-                    priority=int(r[5] or 0)
-                ))
-        
+    @staticmethod
+    def _row_to_rule(r) -> TagRule:
+        if isinstance(r, dict):
+            return TagRule(
+                id=r.get('id', ''),
+                tag_id=r.get('tag_id', ''),
+                field=r.get('field', ''),
+                operator=r.get('operator', ''),
+                pattern=r.get('pattern', ''),
+                priority=int(r.get('priority', 0) or 0)
+            )
+        return TagRule(
+            id=r[0],
+            tag_id=r[1],
+            field=r[2],
+            operator=r[3],
+            pattern=r[4],
+            priority=int(r[5] or 0)
+        )
+
+    @staticmethod
+    def _to_datetime(value) -> Optional[datetime]:
+        if not value:
+            return None
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+    @classmethod
+    def _row_to_tag(cls, row, rules: List[TagRule]) -> VirtualTag:
         if isinstance(row, dict):
             return VirtualTag(
                 id=row.get('id', ''),
@@ -408,39 +595,49 @@ class VirtualTagStorage:
                 tag_key=row.get('tag_key', ''),
                 tag_value=row.get('tag_value', ''),
                 rules=rules,
-                priority=int(row.get('priority', 0)),
-                created_at=datetime.fromisoformat(row['created_at']) if row.get('created_at') else None,
-                updated_at=datetime.fromisoformat(row['updated_at']) if row.get('updated_at') else None
-            )
-        else:
-            return VirtualTag(
-                id=row[0],
-                name=row[1],
-                tag_key=row[2],
-                tag_value=row[3],
-                rules=rules,
-                priority=int(row[4] or 0),
-                created_at=datetime.fromisoformat(row[5]) if row[5] else None,
-                updated_at=datetime.fromisoformat(row[6]) if len(row) > 6 and row[6] else None
+                priority=int(row.get('priority', 0) or 0),
+                created_at=cls._to_datetime(row.get('created_at')),
+                updated_at=cls._to_datetime(row.get('updated_at'))
             )
+        return VirtualTag(
+            id=row[0],
+            name=row[1],
+            tag_key=row[2],
+            tag_value=row[3],
+            rules=rules,
+            priority=int(row[4] or 0),
+            created_at=cls._to_datetime(row[5]),
+            updated_at=cls._to_datetime(row[6]) if len(row) > 6 else None
+        )
+
+    def get_tag(self, tag_id: str) -> Optional[VirtualTag]:
+        """获取虚拟标签"""
+        placeholder = self._get_placeholder()
+        rows = self._get_db().query(f"SELECT * FROM virtual_tags WHERE id = {placeholder}", (tag_id,))
+        if not rows:
+            return None
+
+        rule_rows = self._get_db().query(f"SELECT * FROM tag_rules WHERE tag_id = {placeholder} ORDER BY priority DESC", (tag_id,))
+        return self._row_to_tag(rows[0], [self._row_to_rule(r) for r in rule_rows or []])
     
     def list_tags(self) -> List[VirtualTag]:
-        """列出所有虚拟标签"""
-        rows = self._get_db().query("SELECT id FROM virtual_tags ORDER BY priority DESC, created_at DESC")
+        """列出所有虚拟标签（标签和规则各一次查询）"""
+        rows = self._get_db().query("SELECT * FROM virtual_tags ORDER BY priority DESC, created_at DESC")
         
         # 处理查询结果可能为None的情况
         if rows is None:
             logger.warning("查询虚拟标签列表返回None，返回空列表")
             return []
         
-        tag_ids = [row.get('id') if isinstance(row, dict) else row[0] for row in rows]
+        rules_by_tag: Dict[str, List[TagRule]] = {}
+        for r in self._get_db().query("SELECT * FROM tag_rules ORDER BY priority DESC") or []:
+            rule = self._row_to_rule(r)
+            rules_by_tag.setdefault(rule.tag_id, []).append(rule)
         
         tags = []
-        for tag_id in tag_ids:
-            tag = self.get_tag(tag_id)
-            if tag:
-                tags.append(tag)
-        
+        for row in rows:
+            tag_id = row.get('id') if isinstance(row, dict) else row[0]
+            tags.append(self._row_to_tag(row, rules_by_tag.get(tag_id, [])))
         return tags
     
     def update_tag(self, tag: VirtualTag) -> bool:
@@ -483,8 +680,8 @@ class VirtualTagStorage:
                     rule.priority
                 ))
             
-            # 清除匹配缓存（规则已改变）
-            self._get_db().execute(f"DELETE FROM tag_matches WHERE tag_id = {placeholder}", (tag.id,))
+            # 规则已改变：按已知资源清单重算该标签的匹配，未知时清除旧匹配
+            self._rematerialize_tag(tag.id)
             
             logger.info(f"Updated virtual tag: {tag.name} ({tag.id})")
             return True
@@ -493,10 +690,14 @@ class VirtualTagStorage:
             return False
     
     def delete_tag(self, tag_id: str) -> bool:
-        """删除虚拟标签"""
+        """删除虚拟标签（显式删除规则和匹配，SQLite 默认不执行外键级联）"""
         placeholder = self._get_placeholder()
         try:
-            cursor = self._get_db().execute(f"DELETE FROM virtual_tags WHERE id = {placeholder}", (tag_id,))
+            db = self._get_db()
+            db.execute(f"DELETE FROM tag_matches WHERE tag_id = {placeholder}", (tag_id,))
+            db.execute(f"DELETE FROM tag_rules WHERE tag_id = {placeholder}", (tag_id,))
+            cursor = db.execute(f"DELETE FROM virtual_tags WHERE id = {placeholder}", (tag_id,))
+            TagCostAttributor.invalidate(tag_ids=[tag_id])
             logger.info(f"Deleted virtual tag: {tag_id}")
             return cursor.rowcount > 0
         except Exception as e:
@@ -504,10 +705,142 @@ class VirtualTagStorage:
             return False
     
     def get_resource_tags(self, resource_id: str, resource_type: str, account_name: str) -> List[VirtualTag]:
-        """获取资源的所有匹配标签"""
-        # TODO: 实现资源标签查询
-        # 可以从缓存表查询，或者实时计算
-        pass
+        """获取资源的所有匹配标签（从 tag_matches 物化表查询）"""
+        placeholder = self._get_placeholder()
+        rows = self._get_db().query(f"""
+            SELECT tag_id FROM tag_matches
+            WHERE resource_id = {placeholder} AND resource_type = {placeholder} AND {self.account_column} = {placeholder}
+        """, (resource_id, resource_type, account_name)) or []
+        tag_ids = {row.get('tag_id') if isinstance(row, dict) else row[0] for row in rows}
+        return [tag for tag in self.list_tags() if tag.id in tag_ids] if tag_ids else []
+
+    def get_tag_resources(self, tag_id: str, account_name: Optional[str] = None) -> List[Dict[str, str]]:
+        """获取标签匹配的资源（从 tag_matches 物化表查询）"""
+        placeholder = self._get_placeholder()
+        sql = f"SELECT resource_id, resource_type, {self.account_column} AS account_name FROM tag_matches WHERE tag_id = {placeholder}"
+        params = [tag_id]
+        if account_name:
+            sql += f" AND {self.account_column} = {placeholder}"
+            params.append(account_name)
+        rows = self._get_db().query(sql, tuple(params)) or []
+        return [
+            row if isinstance(row, dict) else {"resource_id": row[0], "resource_type": row[1], "account_name": row[2]}
+            for row in rows
+        ]
+
+    def _load_matches(self, account_name: str, resource_types: Set[str], tag_ids: Optional[Set[str]]) -> Set[Tuple[str, str, str]]:
+        """读取账号在给定资源类型（和标签）范围内已物化的匹配"""
+        placeholder = self._get_placeholder()
+        if not resource_types:
+            return set()
+        types = sorted(resource_types)
+        sql = f"""
+            SELECT tag_id, resource_id, resource_type FROM tag_matches
+            WHERE {self.account_column} = {placeholder}
+              AND resource_type IN ({', '.join([placeholder] * len(types))})
+        """
+        params = [account_name] + types
+        rows = self._get_db().query(sql, tuple(params)) or []
+        existing = set()
+        for row in rows:
+            key = (row['tag_id'], row['resource_id'], row['resource_type']) if isinstance(row, dict) else tuple(row[:3])
+            if tag_ids is None or key[0] in tag_ids:
+                existing.add(key)
+        return existing
+
+    def sync_matches(
+        self,
+        account_name: str,
+        resources: List[Dict[str, Any]],
+        tag_ids: Optional[List[str]] = None,
+        resource_types: Optional[List[str]] = None,
+    ) -> Dict[str, int]:
+        """
+        增量物化 tag_matches
+
+        用编译后的标签引擎一次遍历匹配全部资源，与已物化的匹配做差集，只插入新增、删除失效的行。
+
+        Args:
+            account_name: 账号名称
+            resources: 该账号当前的资源清单（字典需包含 id、type 及规则用到的字段）
+            tag_ids: 只重算这些标签（标签定义变更时），None 表示全部标签
+            resource_types: 本次清单覆盖的资源类型，默认取 resources 中出现的类型；
+                范围内已不存在的资源的匹配会被删除
+
+        Returns:
+            {"added": 新增数, "removed": 删除数, "total": 当前匹配数}
+        """
+        types = set(resource_types or []) | {str(r.get("type", "")) for r in resources}
+        inventory = self._inventory.setdefault(account_name, {})
+        for rtype in types:
+            inventory[rtype] = [r for r in resources if str(r.get("type", "")) == rtype]
+
+        tags = self.list_tags()
+        scope = set(tag_ids) if tag_ids is not None else None
+        if scope is not None:
+            tags = [t for t in tags if t.id in scope]
+        engine = CompiledTagEngine(tags)
+
+        desired = set()
+        for resource in resources:
+            for tag_id in engine.match(resource):
+                desired.add((tag_id, str(resource.get("id", "")), str(resource.get("type", ""))))
+
+        existing = self._load_matches(account_name, types, scope)
+        to_add = desired - existing
+        to_remove = existing - desired
+
+        placeholder = self._get_placeholder()
+        if to_remove:
+            self._get_db().executemany(f"""
+                DELETE FROM tag_matches
+                WHERE tag_id = {placeholder} AND resource_id = {placeholder}
+                  AND resource_type = {placeholder} AND {self.account_column} = {placeholder}
+            """, [(tag_id, rid, rtype, account_name) for tag_id, rid, rtype in to_remove])
+        if to_add:
+            self._get_db().executemany(f"""
+                INSERT INTO tag_matches (tag_id, resource_id, resource_type, {self.account_column})
+                VALUES ({', '.join([placeholder] * 4)})
+            """, [(tag_id, rid, rtype, account_name) for tag_id, rid, rtype in to_add])
+
+        changed = {tag_id for tag_id, _, _ in to_add | to_remove}
+        if changed:
+            TagCostAttributor.invalidate(tag_ids=changed)
+        logger.info(f"tag_matches 已同步: {account_name} +{len(to_add)} -{len(to_remove)} (共 {len(desired)})")
+        return {"added": len(to_add), "removed": len(to_remove), "total": len(desired)}
+
+    def on_inventory_refreshed(
+        self, account_name: str, resource_type: str, resources: List[Any]
+    ) -> Optional[Dict[str, int]]:
+        """
+        资源清单刷新后按新清单重算该类型的标签匹配
+
+        不支持物化的资源类型直接跳过；同步失败只记录日志，不影响清单刷新本身。
+        """
+        if resource_type not in SYNC_RESOURCE_TYPES:
+            return None
+        try:
+            return self.sync_matches(
+                account_name,
+                [to_match_dict(r, resource_type) for r in resources],
+                resource_types=[resource_type],
+            )
+        except Exception as e:
+            logger.warning(f"资源清单变更后同步标签匹配失败 ({account_name}/{resource_type}): {e}")
+            return None
+
+    def _rematerialize_tag(self, tag_id: str) -> None:
+        """标签定义变更后，按本进程已知的资源清单只重算该标签"""
+        if not self._inventory:
+            self.clear_cache(tag_id)
+            return
+        for account_name, by_type in list(self._inventory.items()):
+            resources = [r for items in by_type.values() for r in items]
+            try:
+                self.sync_matches(account_name, resources, tag_ids=[tag_id], resource_types=list(by_type))
+            except Exception as e:
+                logger.warning(f"Error rematerializing tag {tag_id} for {account_name}: {e}")
+                self.clear_cache(tag_id)
     
     def clear_cache(self, tag_id: Optional[str] = None):
         """清除匹配缓存"""
@@ -517,8 +850,39 @@ class VirtualTagStorage:
                 self._get_db().execute(f"DELETE FROM tag_matches WHERE tag_id = {placeholder}", (tag_id,))
             else:
                 self._get_db().execute("DELETE FROM tag_matches")
+            TagCostAttributor.invalidate(tag_ids=[tag_id] if tag_id else None)
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
 
 
+def to_match_dict(resource: Any, resource_type: str) -> Dict[str, Any]:
+    """把资源对象（或资源列表接口返回的字典）转换为标签规则可匹配的字典"""
+    if isinstance(resource, dict):
+        get = resource.get
+    else:
+        def get(name, default=""):
+            return getattr(resource, name, default)
+    status = get("status", "")
+    return {
+        "id": get("id", "") or "",
+        "name": get("name", "") or "",
+        "type": resource_type,
+        "region": get("region", "") or "",
+        "status": status.value if hasattr(status, "value") else str(status or ""),
+        "spec": get("spec", "") or "",
+    }
 
+
+def list_resource_dicts(provider, resource_type: str) -> List[Dict[str, Any]]:
+    """
+    列出资源并转换为标签规则可匹配的字典
+
+    Raises:
+        ValueError: 资源类型不支持物化标签匹配
+    """
+    method = SYNC_RESOURCE_TYPES.get(resource_type)
+    if method is None:
+        raise ValueError(
+            f"不支持的资源类型: {resource_type}（支持: {', '.join(SYNC_RESOURCE_TYPES)}）"
+        )
+    return [to_match_dict(r, resource_type) for r in getattr(provider, method)()]
@@ -1,7 +1,9 @@
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+import pickle
+import sys
+import zlib
 from datetime import datetime
 from enum import Enum
+from typing import Dict, List, Optional
 
 class ResourceType(Enum):
     ECS = "ecs"
@@ -28,40 +30,120 @@ class ResourceStatus(Enum):
     DELETED = "Deleted"
     UNKNOWN = "Unknown"
 
-@dataclass
+_FIELDS = (
+    "id", "name", "provider", "region", "zone", "resource_type", "status",
+    "private_ips", "public_ips", "vpc_id",
+    "spec", "cpu", "memory", "charge_type",
+    "created_time", "expired_time",
+    "raw_data", "tags",
+)
+
+
+def _intern(value):
+    """重复度高的字符串（地域、可用区、规格等）全进程共享一份"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _encode_raw(raw_data: Optional[Dict]):
+    if not raw_data:
+        return None
+    try:
+        return zlib.compress(pickle.dumps(raw_data, pickle.HIGHEST_PROTOCOL), 1)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # 含不可序列化的 SDK 对象时原样保存
+        return raw_data
+
+
+def _decode_raw(blob: bytes) -> Dict:
+    # 每次解码都得到新的字典，调用方就地修改不会影响其他资源
+    return pickle.loads(zlib.decompress(blob))
+
+
 class UnifiedResource:
     """
     统一资源模型，屏蔽不同云厂商的字段差异
+
+    使用 __slots__ 存储；region / zone / spec / charge_type 等字符串驻留共享；
+    raw_data 以压缩形式保存，每次访问都解码出一份新的字典（多次读取请先取到局部变量）。
+    对解码结果的修改不会写回，修改请整体赋值: resource.raw_data = {...}
+    列表、缓存等不需要原始数据的序列化请用 to_dict(include_raw=False)，避免逐个解码。
     """
-    id: str
-    name: str
-    provider: str  # aliyun, tencent, aws, volcano
-    region: str
-    zone: Optional[str] = None
-    resource_type: ResourceType = ResourceType.UNKNOWN
-    status: ResourceStatus = ResourceStatus.UNKNOWN
-    
-    # 网络信息
-    private_ips: List[str] = field(default_factory=list)
-    public_ips: List[str] = field(default_factory=list)
-    vpc_id: Optional[str] = None
-    
-    # 规格与计费
-    spec: Optional[str] = None  # e.g., ecs.g6.large
-    cpu: int = 0
-    memory: int = 0  # MB
-    charge_type: str = "PostPaid"  # PrePaid, PostPaid
-    
-    # 时间信息
-    created_time: Optional[datetime] = None
-    expired_time: Optional[datetime] = None  # 包年包月到期时间
-    
-    # 原始数据 (用于调试或特殊字段)
-    raw_data: Dict = field(default_factory=dict)
-    tags: Dict[str, str] = field(default_factory=dict)
-
-    def to_dict(self):
-        return {
+
+    __slots__ = (
+        "id", "name", "provider", "region", "zone", "resource_type", "status",
+        "private_ips", "public_ips", "vpc_id",
+        "spec", "cpu", "memory", "charge_type",
+        "created_time", "expired_time",
+        "_raw", "tags",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        provider: str,  # aliyun, tencent, aws, volcano
+        region: str,
+        zone: Optional[str] = None,
+        resource_type: ResourceType = ResourceType.UNKNOWN,
+        status: ResourceStatus = ResourceStatus.UNKNOWN,
+        # 网络信息
+        private_ips: Optional[List[str]] = None,
+        public_ips: Optional[List[str]] = None,
+        vpc_id: Optional[str] = None,
+        # 规格与计费
+        spec: Optional[str] = None,  # e.g., ecs.g6.large
+        cpu: int = 0,
+        memory: int = 0,  # MB
+        charge_type: str = "PostPaid",  # PrePaid, PostPaid
+        # 时间信息
+        created_time: Optional[datetime] = None,
+        expired_time: Optional[datetime] = None,  # 包年包月到期时间
+        # 原始数据 (用于调试或特殊字段)
+        raw_data: Optional[Dict] = None,
+        tags: Optional[Dict[str, str]] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.provider = _intern(provider)
+        self.region = _intern(region)
+        self.zone = _intern(zone)
+        self.resource_type = resource_type
+        self.status = status
+        self.private_ips = private_ips if private_ips is not None else []
+        self.public_ips = public_ips if public_ips is not None else []
+        self.vpc_id = _intern(vpc_id)
+        self.spec = _intern(spec)
+        self.cpu = cpu
+        self.memory = memory
+        self.charge_type = _intern(charge_type)
+        self.created_time = created_time
+        self.expired_time = expired_time
+        self._raw = _encode_raw(raw_data)
+        self.tags = tags if tags is not None else {}
+
+    @property
+    def raw_data(self) -> Dict:
+        if isinstance(self._raw, bytes):
+            return _decode_raw(self._raw)
+        return self._raw or {}
+
+    @raw_data.setter
+    def raw_data(self, value: Optional[Dict]):
+        self._raw = _encode_raw(value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _FIELDS if name != "raw_data")
+        return f"UnifiedResource({fields})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def to_dict(self, include_raw: bool = True):
+        data = {
             "id": self.id,
             "name": self.name,
             "provider": self.provider,
@@ -75,5 +157,7 @@ class UnifiedResource:
             "charge_type": self.charge_type,
             "expired_time": self.expired_time.strftime("%Y-%m-%d") if self.expired_time else "N/A",
             "tags": self.tags,
-            "raw_data": self.raw_data
         }
+        if include_raw:
+            data["raw_data"] = self.raw_data
+        return data
@@ -0,0 +1,288 @@
+"""
+阿里云 OpenAPI 原生异步客户端
+
+直接在 asyncio 上实现 RPC 风格 OpenAPI 调用：
+- HMAC-SHA1 签名（SignatureVersion 1.0）
+- 基于连接池的 aiohttp 会话，所有调用共享同一个事件循环
+- 全局并发上限 + 单次调用超时，取消会立即传递到在途请求
+- 异步分页迭代器：首页拿到总数后并发拉取剩余页
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from cloudlens.core.exceptions import APIError, NetworkError
+
+logger = logging.getLogger(__name__)
+
+# 产品 -> (API版本, Endpoint模板)
+PRODUCT_ENDPOINTS: Dict[str, Tuple[str, str]] = {
+    "ecs": ("2014-05-26", "ecs.{region}.aliyuncs.com"),
+    "rds": ("2014-08-15", "rds.aliyuncs.com"),
+    "r-kvstore": ("2015-01-01", "r-kvstore.aliyuncs.com"),
+    "slb": ("2014-05-15", "slb.aliyuncs.com"),
+    "vpc": ("2016-04-28", "vpc.aliyuncs.com"),
+    "dds": ("2015-12-01", "mongodb.aliyuncs.com"),
+    "cms": ("2019-01-01", "cms.{region}.aliyuncs.com"),
+}
+
+
+def _percent_encode(value: Any) -> str:
+    """按阿里云签名规范进行 URL 编码（空格->%20, *->%2A, ~ 保留）"""
+    return quote(str(value), safe="~")
+
+
+def compute_signature(params: Dict[str, Any], secret_key: str, method: str = "POST") -> str:
+    """
+    计算 RPC 风格 OpenAPI 签名
+
+    Args:
+        params: 不含 Signature 的全部请求参数
+        secret_key: AccessKey Secret
+        method: HTTP 方法
+
+    Returns:
+        Base64 编码的 HMAC-SHA1 签名
+    """
+    canonical = "&".join(
+        f"{_percent_encode(k)}={_percent_encode(v)}" for k, v in sorted(params.items())
+    )
+    string_to_sign = f"{method}&{_percent_encode('/')}&{_percent_encode(canonical)}"
+    digest = hmac.new(
+        f"{secret_key}&".encode("utf-8"), string_to_sign.encode("utf-8"), hashlib.sha1
+    ).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+class AsyncAliyunClient:
+    """
+    阿里云 OpenAPI 异步客户端
+
+    一个实例对应一组凭证 + 一个默认区域，内部维护一个连接池会话。
+    并发上限通过信号量控制，单个事件循环即可承载上千个在途请求。
+
+    用法:
+        async with AsyncAliyunClient(ak, sk, "cn-hangzhou") as client:
+            data = await client.call("ecs", "DescribeRegions")
+            async for inst in client.paginate("ecs", "DescribeInstances", "Instances.Instance"):
+                ...
+    """
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        region: str,
+        max_concurrency: int = 100,
+        timeout: float = 30.0,
+        session: Any = None,
+    ):
+        """
+        Args:
+            access_key: AccessKey ID
+            secret_key: AccessKey Secret
+            region: 默认区域
+            max_concurrency: 最大在途请求数
+            timeout: 单次调用默认超时（秒）
+            session: 外部传入的 aiohttp.ClientSession（传入时由调用方负责关闭）
+        """
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncAliyunClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """关闭内部创建的连接池"""
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError as e:
+                raise ImportError("异步Provider需要 aiohttp，请运行: pip install aiohttp") from e
+
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量需在事件循环内创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def build_params(
+        self, action: str, version: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, str]:
+        """组装公共参数并签名"""
+        signed = {
+            "Format": "JSON",
+            "Version": version,
+            "AccessKeyId": self.access_key,
+            "SignatureMethod": "HMAC-SHA1",
+            "SignatureVersion": "1.0",
+            "SignatureNonce": uuid.uuid4().hex,
+            "Timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "Action": action,
+        }
+        for key, value in (params or {}).items():
+            if value is not None:
+                signed[key] = str(value)
+        signed["Signature"] = compute_signature(signed, self.secret_key, "POST")
+        return signed
+
+    async def call(
+        self,
+        product: str,
+        action: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        region: Optional[str] = None,
+    ) -> Dict:
+        """
+        调用一次 OpenAPI
+
+        Args:
+            product: 产品代码，见 PRODUCT_ENDPOINTS
+            action: API 名称
+            params: 业务参数（未指定 RegionId 时自动补齐）
+            timeout: 本次调用超时（秒），默认使用客户端超时
+            region: 覆盖默认区域
+
+        Returns:
+            解析后的 JSON 响应
+
+        Raises:
+            APIError: 服务端返回错误码
+            NetworkError: 超时或连接失败
+        """
+        if product not in PRODUCT_ENDPOINTS:
+            raise ValueError(f"不支持的产品: {product}")
+
+        region = region or self.region
+        version, endpoint_tpl = PRODUCT_ENDPOINTS[product]
+        url = f"https://{endpoint_tpl.format(region=region)}/"
+
+        request_params = dict(params or {})
+        request_params.setdefault("RegionId", region)
+        body = "&".join(
+            f"{_percent_encode(k)}={_percent_encode(v)}"
+            for k, v in self.build_params(action, version, request_params).items()
+        )
+
+        try:
+            async with self._get_semaphore():
+                status, text = await asyncio.wait_for(
+                    self._post(url, body), timeout if timeout is not None else self.timeout
+                )
+        except asyncio.TimeoutError as e:
+            raise NetworkError(f"阿里云API调用超时: {product}.{action}") from e
+        except (OSError, ConnectionError) as e:
+            raise NetworkError(f"阿里云API连接失败: {product}.{action}: {e}") from e
+
+        try:
+            data = json.loads(text) if text else {}
+        except ValueError:
+            data = {}
+
+        if status >= 400:
+            raise APIError(
+                "aliyun",
+                action,
+                error_code=data.get("Code") or str(status),
+                message=data.get("Message") or f"HTTP {status}",
+            )
+        return data
+
+    async def _post(self, url: str, body: str) -> Tuple[int, str]:
+        session = self._get_session()
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        async with session.post(url, data=body, headers=headers) as resp:
+            return resp.status, await resp.text()
+
+    async def paginate(
+        self,
+        product: str,
+        action: str,
+        items_path: str,
+        params: Optional[Dict[str, Any]] = None,
+        page_size: int = 100,
+        total_key: str = "TotalCount",
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        异步分页迭代器
+
+        先取第一页得到总数，再并发拉取剩余页并按页序产出条目。
+
+        Args:
+            product: 产品代码
+            action: API 名称
+            items_path: 条目在响应中的路径，如 "Instances.Instance"
+            params: 业务参数
+            page_size: 每页条数
+            total_key: 响应中总数字段名（RDS 为 TotalRecordCount）
+            timeout: 每页调用超时
+        """
+        base = dict(params or {})
+        base["PageSize"] = page_size
+
+        first = await self.call(product, action, {**base, "PageNumber": 1}, timeout=timeout)
+        for item in _dig(first, items_path):
+            yield item
+
+        total = int(first.get(total_key) or 0)
+        pages = (total + page_size - 1) // page_size
+        if pages <= 1:
+            return
+
+        tasks = [
+            asyncio.ensure_future(
+                self.call(product, action, {**base, "PageNumber": page}, timeout=timeout)
+            )
+            for page in range(2, pages + 1)
+        ]
+        try:
+            for task in tasks:
+                data = await task
+                for item in _dig(data, items_path):
+                    yield item
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def list_all(self, *args, **kwargs) -> List[Dict]:
+        """paginate 的列表形式"""
+        return [item async for item in self.paginate(*args, **kwargs)]
+
+
+def _dig(data: Dict, path: str) -> List[Dict]:
+    """按 "A.B" 路径取出条目列表"""
+    node: Any = data
+    for key in path.split("."):
+        if not isinstance(node, dict):
+            return []
+        node = node.get(key)
+    return node if isinstance(node, list) else []
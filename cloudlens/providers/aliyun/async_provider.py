@@ -1,77 +1,151 @@
 import asyncio
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from cloudlens.core.async_provider import AsyncProvider
+from cloudlens.models.resource import UnifiedResource
+from cloudlens.core.resource_converter import slb_to_unified_resource
+from cloudlens.providers.aliyun.async_client import AsyncAliyunClient
 from cloudlens.providers.aliyun.provider import AliyunProvider
 
 logger = logging.getLogger(__name__)
 
+
 class AsyncAliyunProvider(AliyunProvider, AsyncProvider):
     """
     阿里云异步Provider实现
-    
-    使用 asyncio + ThreadPoolExecutor 包装同步SDK调用。
-    虽然底层仍是同步IO，但通过线程池避免了阻塞主事件循环，
-    允许同时处理多个账号/区域的请求。
+
+    基于 AsyncAliyunClient 的原生 asyncio 传输：签名请求走共享连接池，
+    分页、监控查询都是协程，单个事件循环即可承载大量并发在途请求，
+    不再为每个请求占用一个线程。资源转换逻辑与同步 AliyunProvider 共用。
     """
-    
-    def __init__(self, account_name: str, access_key: str, secret_key: str, region: str, max_workers: int = 10):
+
+    def __init__(
+        self,
+        account_name: str,
+        access_key: str,
+        secret_key: str,
+        region: str,
+        max_concurrency: int = 100,
+        timeout: float = 30.0,
+        session: Any = None,
+    ):
         super().__init__(account_name, access_key, secret_key, region)
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        
-    async def list_instances_async(self) -> List[Any]:
-        """异步获取实例列表"""
-        loop = asyncio.get_running_loop()
-        # 将同步的 list_instances 放入线程池执行
-        return await loop.run_in_executor(
-            self.executor, 
-            self.list_instances
+        self.async_client = AsyncAliyunClient(
+            access_key,
+            secret_key,
+            region,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            session=session,
+        )
+
+    async def __aenter__(self) -> "AsyncAliyunProvider":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """释放连接池"""
+        await self.async_client.close()
+
+    async def iter_instances_async(self, timeout: Optional[float] = None) -> AsyncIterator[UnifiedResource]:
+        """逐条产出ECS实例，便于边拉取边入库"""
+        async for inst in self.async_client.paginate(
+            "ecs", "DescribeInstances", "Instances.Instance", timeout=timeout
+        ):
+            yield self._ecs_to_unified(inst)
+
+    async def list_instances_async(self, timeout: Optional[float] = None) -> List[UnifiedResource]:
+        """异步获取ECS实例列表"""
+        return [r async for r in self.iter_instances_async(timeout=timeout)]
+
+    async def list_rds_async(self, timeout: Optional[float] = None) -> List[UnifiedResource]:
+        """异步获取RDS实例列表"""
+        items = await self.async_client.list_all(
+            "rds", "DescribeDBInstances", "Items.DBInstance", total_key="TotalRecordCount", timeout=timeout
+        )
+        return [self._rds_to_unified(inst) for inst in items]
+
+    async def list_redis_async(self, timeout: Optional[float] = None) -> List[UnifiedResource]:
+        """异步获取Redis实例列表"""
+        items = await self.async_client.list_all(
+            "r-kvstore", "DescribeInstances", "Instances.KVStoreInstance", timeout=timeout
+        )
+        return [self._redis_to_unified(inst) for inst in items]
+
+    async def list_slb_async(self, timeout: Optional[float] = None) -> List[UnifiedResource]:
+        """异步获取SLB列表"""
+        items = await self.async_client.list_all(
+            "slb", "DescribeLoadBalancers", "LoadBalancers.LoadBalancer", timeout=timeout
         )
-        
+        return [slb_to_unified_resource(slb, self.provider_name) for slb in items]
+
     async def get_metrics_async(
-        self, 
-        resource_id: str, 
-        metric_name: str, 
-        start_time: int, 
-        end_time: int
+        self,
+        resource_id: str,
+        metric_name: str,
+        start_time: int,
+        end_time: int,
+        namespace: str = "acs_ecs_dashboard",
+        dimensions: str = None,
+        timeout: Optional[float] = None,
     ) -> List[Dict]:
         """
         异步获取监控指标
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(
-            self.executor,
-            lambda: self.get_metric(resource_id, metric_name, start_time, end_time)
-        )
-        
-    async def list_resources_parallel(self, resource_types: List[str]) -> Dict[str, List[Any]]:
+        params = {
+            "Namespace": namespace,
+            "MetricName": metric_name,
+            "StartTime": start_time,
+            "EndTime": end_time,
+            "Period": "86400",  # 1 day
+            "Dimensions": dimensions or f'[{{"instanceId":"{resource_id}"}}]',
+        }
+        try:
+            response = await self.async_client.call("cms", "DescribeMetricData", params, timeout=timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get metrics for {resource_id}: {e}")
+            return []
+
+        datapoints = response.get("Datapoints")
+        if not datapoints:
+            return []
+        if isinstance(datapoints, str):
+            return json.loads(datapoints)
+        return datapoints
+
+    async def list_resources_parallel(
+        self, resource_types: List[str], timeout: Optional[float] = None
+    ) -> Dict[str, List[Any]]:
         """
         并行获取多种资源
-        
+
         示例: 同时获取 ECS, RDS, Redis
         """
-        loop = asyncio.get_running_loop()
-        tasks = {}
-        
-        if "ecs" in resource_types:
-            tasks["ecs"] = loop.run_in_executor(self.executor, self.list_instances)
-        if "rds" in resource_types:
-            tasks["rds"] = loop.run_in_executor(self.executor, self.list_rds)
-        if "redis" in resource_types:
-            tasks["redis"] = loop.run_in_executor(self.executor, self.list_redis)
-        if "slb" in resource_types:
-            tasks["slb"] = loop.run_in_executor(self.executor, self.list_slb)
-            
+        listers = {
+            "ecs": self.list_instances_async,
+            "rds": self.list_rds_async,
+            "redis": self.list_redis_async,
+            "slb": self.list_slb_async,
+        }
+        r_types = [t for t in resource_types if t in listers]
+        outcomes = await asyncio.gather(
+            *(listers[t](timeout=timeout) for t in r_types), return_exceptions=True
+        )
+
         results = {}
-        # 等待所有任务完成
-        for r_type, future in tasks.items():
-            try:
-                results[r_type] = await future
-            except Exception as e:
-                logger.error(f"Async fetch failed for {r_type}: {e}")
+        for r_type, outcome in zip(r_types, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, Exception):
+                logger.error(f"Async fetch failed for {r_type}: {outcome}")
                 results[r_type] = []
-                
+            else:
+                results[r_type] = outcome
+
         return results
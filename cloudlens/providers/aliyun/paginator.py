@@ -0,0 +1,124 @@
+"""
+阿里云 SDK 同步分页器
+
+- 支持 NextToken/MaxResults 的接口按令牌翻页，处理当前页时后台预取下一页
+- 其余接口先取第一页得到总数，再用线程池并发拉取剩余页（在途页数有上限），按页序产出
+- 以生成器形式逐条产出，调用方可以边拉取边处理/入库
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def dig_items(data: Dict, path: str) -> List[Dict]:
+    """按 "A.B" 路径取出条目列表"""
+    node: Any = data
+    for key in path.split("."):
+        if not isinstance(node, dict):
+            return []
+        node = node.get(key)
+    return node if isinstance(node, list) else []
+
+
+def paginate(
+    fetch: Callable[[Any], Dict],
+    make_request: Callable[[], Any],
+    items_path: str,
+    page_size: int = 100,
+    total_key: str = "TotalCount",
+    use_token: bool = False,
+    prefetch: int = 4,
+) -> Iterator[Dict]:
+    """
+    分页迭代器
+
+    Args:
+        fetch: 执行请求并返回解析后的响应（如 AliyunProvider._do_request）
+        make_request: 创建新请求对象（并发翻页时每页一个请求对象）
+        items_path: 条目在响应中的路径，如 "Instances.Instance"
+        page_size: 每页条数
+        total_key: 响应中总数字段名（RDS 为 TotalRecordCount）
+        use_token: 接口支持 NextToken/MaxResults 时按令牌翻页（SDK 请求对象不支持时回退到页码）
+        prefetch: 页码翻页时最多同时在途的后续页数（令牌翻页固定预取一页）
+    """
+    if use_token and hasattr(make_request(), "set_NextToken"):
+        yield from _paginate_token(fetch, make_request, items_path, page_size)
+    else:
+        yield from _paginate_pages(fetch, make_request, items_path, page_size, total_key, prefetch)
+
+
+def _paginate_token(fetch, make_request, items_path, page_size) -> Iterator[Dict]:
+    """令牌翻页：下一页依赖本页的 NextToken，预取一页与处理本页重叠"""
+
+    def request(token: Optional[str]) -> Dict:
+        req = make_request()
+        req.set_MaxResults(page_size)
+        if token:
+            req.set_NextToken(token)
+        return fetch(req)
+
+    data = request(None)
+    upcoming: Optional[Future] = None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while True:
+                token = data.get("NextToken")
+                upcoming = executor.submit(request, token) if token else None
+                yield from dig_items(data, items_path)
+                if upcoming is None:
+                    return
+                data = upcoming.result()
+        finally:
+            if upcoming is not None:
+                upcoming.cancel()
+
+
+def _paginate_pages(fetch, make_request, items_path, page_size, total_key, prefetch) -> Iterator[Dict]:
+    """页码翻页：第一页得到总数后并发拉取剩余页"""
+
+    def request(page: int) -> Dict:
+        req = make_request()
+        req.set_PageSize(page_size)
+        req.set_PageNumber(page)
+        return fetch(req)
+
+    first = request(1)
+    batch = dig_items(first, items_path)
+    yield from batch
+
+    total = first.get(total_key)
+    if total is None:
+        # 没有总数字段：顺序翻页直到不足一页
+        page = 1
+        while len(batch) >= page_size:
+            page += 1
+            batch = dig_items(request(page), items_path)
+            yield from batch
+        return
+
+    pages = (int(total) + page_size - 1) // page_size
+    if pages <= 1 or not batch:
+        return
+
+    workers = max(1, prefetch)
+    pending: Deque[Future] = deque()
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while next_page <= pages and len(pending) < workers:
+                pending.append(executor.submit(request, next_page))
+                next_page += 1
+            while pending:
+                batch = dig_items(pending.popleft().result(), items_path)
+                if next_page <= pages:
+                    pending.append(executor.submit(request, next_page))
+                    next_page += 1
+                yield from batch
+        finally:
+            # 调用方提前结束或出错时不再拉取未开始的页
+            for future in pending:
+                future.cancel()
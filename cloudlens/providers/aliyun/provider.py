@@ -1,7 +1,7 @@
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional
 
 from aliyunsdkcore.client import AcsClient
 from aliyunsdkecs.request.v20140526.DescribeInstancesRequest import DescribeInstancesRequest
@@ -24,10 +24,26 @@ from cloudlens.core.resource_converter import (
 from cloudlens.core.security import PermissionGuard
 from cloudlens.core.error_handler import handle_provider_errors
 from cloudlens.core.performance import monitor_api_call
+from cloudlens.providers.aliyun.paginator import paginate
 from cloudlens.models.resource import ResourceStatus, ResourceType, UnifiedResource
 
 logger = logging.getLogger("AliyunProvider")
 
+# 状态映射（模块级常量，避免每个实例重建）
+_ECS_STATUS = {
+    "Running": ResourceStatus.RUNNING,
+    "Stopped": ResourceStatus.STOPPED,
+    "Starting": ResourceStatus.STARTING,
+    "Stopping": ResourceStatus.STOPPING,
+}
+_RDS_STATUS = {"Running": ResourceStatus.RUNNING, "Stopped": ResourceStatus.STOPPED}
+_REDIS_STATUS = {
+    "Normal": ResourceStatus.RUNNING,
+    "Creating": ResourceStatus.STARTING,
+    "Changing": ResourceStatus.CHANGING,
+    "Inactive": ResourceStatus.STOPPED,
+}
+
 
 class AliyunProvider(BaseProvider):
 
@@ -123,171 +139,149 @@ class AliyunProvider(BaseProvider):
             
         return resources
 
+    def _ecs_to_unified(self, inst: Dict) -> UnifiedResource:
+        """将 DescribeInstances 返回的单个实例转换为 UnifiedResource"""
+        # IP处理
+        public_ips = inst.get("PublicIpAddress", {}).get("IpAddress", [])
+        eip = inst.get("EipAddress", {}).get("IpAddress", "")
+        if eip:
+            public_ips.append(eip)
+
+        private_ips = (
+            inst.get("VpcAttributes", {})
+            .get("PrivateIpAddress", {})
+            .get("IpAddress", [])
+        )
+
+        # 时间处理
+        created_time = datetime.strptime(inst["CreationTime"], "%Y-%m-%dT%H:%MZ")
+        expired_time = None
+        if inst.get("ExpiredTime"):
+            try:
+                expired_time = datetime.strptime(inst["ExpiredTime"], "%Y-%m-%dT%H:%MZ")
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Failed to parse ExpiredTime: {inst.get('ExpiredTime')}, error: {e}")
+
+        # 解析标签
+        tags = {}
+        if inst.get("Tags") and inst["Tags"].get("Tag"):
+            for tag_item in inst["Tags"]["Tag"]:
+                if isinstance(tag_item, dict):
+                    tag_key = tag_item.get("TagKey", "")
+                    tag_value = tag_item.get("TagValue", "")
+                    if tag_key:
+                        tags[tag_key] = tag_value
+
+        return UnifiedResource(
+            id=inst["InstanceId"],
+            name=inst["InstanceName"],
+            provider=self.provider_name,
+            region=inst["RegionId"],
+            zone=inst["ZoneId"],
+            resource_type=ResourceType.ECS,
+            status=_ECS_STATUS.get(inst["Status"], ResourceStatus.UNKNOWN),
+            private_ips=private_ips,
+            public_ips=public_ips,
+            vpc_id=inst.get("VpcAttributes", {}).get("VpcId"),
+            spec=inst["InstanceType"],
+            cpu=inst["Cpu"],
+            memory=inst["Memory"],
+            charge_type=inst["InstanceChargeType"],
+            created_time=created_time,
+            expired_time=expired_time,
+            tags=tags,
+            raw_data=inst,
+        )
+
+    def _paginate(self, make_request, items_path: str, **kwargs) -> Iterator[Dict]:
+        """分页拉取（参数见 paginator.paginate），逐条产出原始条目"""
+        return paginate(self._do_request, make_request, items_path, **kwargs)
+
+    def iter_instances(self) -> Iterator[UnifiedResource]:
+        """逐个产出ECS实例（NextToken 翻页，后台预取下一页）"""
+        for inst in self._paginate(DescribeInstancesRequest, "Instances.Instance", use_token=True):
+            yield self._ecs_to_unified(inst)
+
     @monitor_api_call
     @handle_provider_errors
     def list_instances(self):
         """列出ECS实例（支持分页）"""
         resources = []
         try:
-            page_num = 1
-            page_size = 100
-            total_count = None
-
-            while True:
-                request = DescribeInstancesRequest()
-                request.set_PageSize(page_size)
-                request.set_PageNumber(page_num)
-                data = self._do_request(request)
-
-                # 获取总数（仅第一页）
-                if total_count is None:
-                    total_count = data.get("TotalCount", 0)
-                    logger.info(f"Total ECS instances: {total_count}")
-
-                instances = data.get("Instances", {}).get("Instance", [])
-                if not instances:
-                    break
-
-                for inst in instances:
-                    # 状态映射
-                    status_map = {
-                        "Running": ResourceStatus.RUNNING,
-                        "Stopped": ResourceStatus.STOPPED,
-                        "Starting": ResourceStatus.STARTING,
-                        "Stopping": ResourceStatus.STOPPING,
-                    }
-
-                    # IP处理
-                    public_ips = inst.get("PublicIpAddress", {}).get("IpAddress", [])
-                    eip = inst.get("EipAddress", {}).get("IpAddress", "")
-                    if eip:
-                        public_ips.append(eip)
-
-                    private_ips = (
-                        inst.get("VpcAttributes", {})
-                        .get("PrivateIpAddress", {})
-                        .get("IpAddress", [])
-                    )
-
-                    # 时间处理
-                    created_time = datetime.strptime(inst["CreationTime"], "%Y-%m-%dT%H:%MZ")
-                    expired_time = None
-                    if inst.get("ExpiredTime"):
-                        try:
-                            expired_time = datetime.strptime(inst["ExpiredTime"], "%Y-%m-%dT%H:%MZ")
-                        except (ValueError, TypeError) as e:
-                            logger.debug(f"Failed to parse ExpiredTime: {inst.get('ExpiredTime')}, error: {e}")
-
-                    # 解析标签
-                    tags = {}
-                    if inst.get("Tags") and inst["Tags"].get("Tag"):
-                        for tag_item in inst["Tags"]["Tag"]:
-                            if isinstance(tag_item, dict):
-                                tag_key = tag_item.get("TagKey", "")
-                                tag_value = tag_item.get("TagValue", "")
-                                if tag_key:
-                                    tags[tag_key] = tag_value
-
-                    r = UnifiedResource(
-                        id=inst["InstanceId"],
-                        name=inst["InstanceName"],
-                        provider=self.provider_name,
-                        region=inst["RegionId"],
-                        zone=inst["ZoneId"],
-                        resource_type=ResourceType.ECS,
-                        status=status_map.get(inst["Status"], ResourceStatus.UNKNOWN),
-                        private_ips=private_ips,
-                        public_ips=public_ips,
-                        vpc_id=inst.get("VpcAttributes", {}).get("VpcId"),
-                        spec=inst["InstanceType"],
-                        cpu=inst["Cpu"],
-                        memory=inst["Memory"],
-                        charge_type=inst["InstanceChargeType"],
-                        created_time=created_time,
-                        expired_time=expired_time,
-                        tags=tags,
-                        raw_data=inst,
-                    )
-                    resources.append(r)
-
-                # 检查是否还有更多页
-                if len(resources) >= total_count:
-                    break
-
-                page_num += 1
-
+            resources.extend(self.iter_instances())
         except Exception as e:
             logger.error(f"Failed to list ECS instances: {e}")
 
         return resources
 
+    def _rds_to_unified(self, inst: Dict) -> UnifiedResource:
+        """将 DescribeDBInstances 返回的单个实例转换为 UnifiedResource"""
+        expired_time = None
+        if inst.get("ExpireTime"):
+            try:
+                # Handle different time formats
+                time_str = inst["ExpireTime"]
+                if "T" in time_str:
+                    # Try with seconds first
+                    try:
+                        expired_time = datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%SZ")
+                    except:
+                        expired_time = datetime.strptime(time_str, "%Y-%m-%dT%H:%MZ")
+            except Exception as e:
+                pass
+
+        # 提取公网和私网连接地址
+        public_ips = []
+        private_ips = []
+
+        # 公网连接串
+        if inst.get("PublicConnectionString"):
+            public_ips.append(inst["PublicConnectionString"])
+
+        # 内网连接串
+        if inst.get("ConnectionString"):
+            private_ips.append(inst["ConnectionString"])
+
+        # 解析标签
+        tags = {}
+        if inst.get("Tags") and inst["Tags"].get("Tag"):
+            for tag_item in inst["Tags"]["Tag"]:
+                if isinstance(tag_item, dict):
+                    tag_key = tag_item.get("TagKey", "")
+                    tag_value = tag_item.get("TagValue", "")
+                    if tag_key:
+                        tags[tag_key] = tag_value
+
+        return UnifiedResource(
+            id=inst["DBInstanceId"],
+            name=inst.get("DBInstanceDescription", inst["DBInstanceId"]),
+            provider=self.provider_name,
+            region=self.region,  # RDS API response might not have RegionId in item
+            zone=inst.get("ZoneId"),
+            resource_type=ResourceType.RDS,
+            status=_RDS_STATUS.get(inst["DBInstanceStatus"], ResourceStatus.UNKNOWN),
+            public_ips=public_ips,
+            private_ips=private_ips,
+            vpc_id=inst.get("VpcId"),
+            spec=inst.get("DBInstanceClass"),
+            charge_type=inst.get("PayType", "PostPaid"),
+            expired_time=expired_time,
+            tags=tags,
+            raw_data=inst,
+        )
+
+    def iter_rds(self) -> Iterator[UnifiedResource]:
+        """逐个产出RDS实例"""
+        for inst in self._paginate(DescribeDBInstancesRequest, "Items.DBInstance", total_key="TotalRecordCount"):
+            yield self._rds_to_unified(inst)
+
     @monitor_api_call
     @handle_provider_errors
     def list_rds(self):
         """列出RDS实例"""
         resources = []
         try:
-            request = DescribeDBInstancesRequest()
-            request.set_PageSize(100)
-            data = self._do_request(request)
-
-            for inst in data.get("Items", {}).get("DBInstance", []):
-                status_map = {"Running": ResourceStatus.RUNNING, "Stopped": ResourceStatus.STOPPED}
-
-                expired_time = None
-                if inst.get("ExpireTime"):
-                    try:
-                        # Handle different time formats
-                        time_str = inst["ExpireTime"]
-                        if "T" in time_str:
-                            # Try with seconds first
-                            try:
-                                expired_time = datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%SZ")
-                            except:
-                                expired_time = datetime.strptime(time_str, "%Y-%m-%dT%H:%MZ")
-                    except Exception as e:
-                        pass
-
-                # 提取公网和私网连接地址
-                public_ips = []
-                private_ips = []
-
-                # 公网连接串
-                if inst.get("PublicConnectionString"):
-                    public_ips.append(inst["PublicConnectionString"])
-
-                # 内网连接串
-                if inst.get("ConnectionString"):
-                    private_ips.append(inst["ConnectionString"])
-
-                # 解析标签
-                tags = {}
-                if inst.get("Tags") and inst["Tags"].get("Tag"):
-                    for tag_item in inst["Tags"]["Tag"]:
-                        if isinstance(tag_item, dict):
-                            tag_key = tag_item.get("TagKey", "")
-                            tag_value = tag_item.get("TagValue", "")
-                            if tag_key:
-                                tags[tag_key] = tag_value
-
-                r = UnifiedResource(
-                    id=inst["DBInstanceId"],
-                    name=inst.get("DBInstanceDescription", inst["DBInstanceId"]),
-                    provider=self.provider_name,
-                    region=self.region,  # RDS API response might not have RegionId in item
-                    zone=inst.get("ZoneId"),
-                    resource_type=ResourceType.RDS,
-                    status=status_map.get(inst["DBInstanceStatus"], ResourceStatus.UNKNOWN),
-                    public_ips=public_ips,
-                    private_ips=private_ips,
-                    vpc_id=inst.get("VpcId"),
-                    spec=inst.get("DBInstanceClass"),
-                    charge_type=inst.get("PayType", "PostPaid"),
-                    expired_time=expired_time,
-                    tags=tags,
-                    raw_data=inst,
-                )
-                resources.append(r)
+            resources.extend(self.iter_rds())
         except Exception as e:
             logger.error(f"Failed to list RDS instances: {e}")
 
@@ -376,74 +370,89 @@ class AliyunProvider(BaseProvider):
             logger.error(f"Failed to get metrics for {resource_id}: {e}")
             return []
 
-    @monitor_api_call
-    def list_redis(self) -> List[UnifiedResource]:
-        """列出Redis实例"""
+    def _redis_to_unified(self, inst: Dict) -> UnifiedResource:
+        """将 KVStore DescribeInstances 返回的单个实例转换为 UnifiedResource"""
+        expired_time = None
+        if inst.get("EndTime"):
+            try:
+                expired_time = datetime.strptime(inst["EndTime"], "%Y-%m-%dT%H:%MZ")
+            except:
+                pass
+
+        # 提取公网和私网连接地址
+        public_ips = []
+        private_ips = []
+
+        # 公网连接域名
+        if inst.get("PublicConnectionDomain"):
+            public_ips.append(inst["PublicConnectionDomain"])
+
+        # 内网连接域名
+        if inst.get("ConnectionDomain"):
+            private_ips.append(inst["ConnectionDomain"])
+
+        # 解析标签
+        tags = {}
+        if inst.get("Tags") and inst["Tags"].get("Tag"):
+            for tag_item in inst["Tags"]["Tag"]:
+                if isinstance(tag_item, dict):
+                    tag_key = tag_item.get("TagKey", "")
+                    tag_value = tag_item.get("TagValue", "")
+                    if tag_key:
+                        tags[tag_key] = tag_value
+
+        return UnifiedResource(
+            id=inst["InstanceId"],
+            name=inst.get("InstanceName", inst["InstanceId"]),
+            provider=self.provider_name,
+            region=inst["RegionId"],
+            zone=inst.get("ZoneId"),
+            resource_type=ResourceType.REDIS,
+            status=_REDIS_STATUS.get(inst["InstanceStatus"], ResourceStatus.UNKNOWN),
+            public_ips=public_ips,
+            private_ips=private_ips,
+            vpc_id=inst.get("VpcId"),
+            spec=inst.get("InstanceClass"),
+            charge_type=inst.get("ChargeType", "PostPaid"),
+            expired_time=expired_time,
+            tags=tags,
+            raw_data=inst,
+        )
+
+    def iter_redis(self) -> Iterator[UnifiedResource]:
+        """逐个产出Redis实例"""
         from aliyunsdkr_kvstore.request.v20150101.DescribeInstancesRequest import (
             DescribeInstancesRequest as RedisDescribeInstancesRequest,
         )
 
-        resources = []
-        try:
-            request = RedisDescribeInstancesRequest()
-            request.set_PageSize(100)
-            data = self._do_request(request)
+        for inst in self._paginate(RedisDescribeInstancesRequest, "Instances.KVStoreInstance"):
+            yield self._redis_to_unified(inst)
 
-            for inst in data.get("Instances", {}).get("KVStoreInstance", []):
-                status_map = {
-                    "Normal": ResourceStatus.RUNNING,
-                    "Creating": ResourceStatus.STARTING,
-                    "Changing": ResourceStatus.CHANGING,
-                    "Inactive": ResourceStatus.STOPPED,
-                }
+    def tag_resources(self, resource_ids: List[str], tags: Dict[str, str], resource_type: str = "ecs", region: Optional[str] = None) -> None:
+        """
+        批量打标签（一次 TagResources 调用，同一资源类型最多50个资源）
 
-                expired_time = None
-                if inst.get("EndTime"):
-                    try:
-                        expired_time = datetime.strptime(inst["EndTime"], "%Y-%m-%dT%H:%MZ")
-                    except:
-                        pass
-
-                # 提取公网和私网连接地址
-                public_ips = []
-                private_ips = []
-
-                # 公网连接域名
-                if inst.get("PublicConnectionDomain"):
-                    public_ips.append(inst["PublicConnectionDomain"])
-
-                # 内网连接域名
-                if inst.get("ConnectionDomain"):
-                    private_ips.append(inst["ConnectionDomain"])
-
-                # 解析标签
-                tags = {}
-                if inst.get("Tags") and inst["Tags"].get("Tag"):
-                    for tag_item in inst["Tags"]["Tag"]:
-                        if isinstance(tag_item, dict):
-                            tag_key = tag_item.get("TagKey", "")
-                            tag_value = tag_item.get("TagValue", "")
-                            if tag_key:
-                                tags[tag_key] = tag_value
-
-                r = UnifiedResource(
-                    id=inst["InstanceId"],
-                    name=inst.get("InstanceName", inst["InstanceId"]),
-                    provider=self.provider_name,
-                    region=inst["RegionId"],
-                    zone=inst.get("ZoneId"),
-                    resource_type=ResourceType.REDIS,
-                    status=status_map.get(inst["InstanceStatus"], ResourceStatus.UNKNOWN),
-                    public_ips=public_ips,
-                    private_ips=private_ips,
-                    vpc_id=inst.get("VpcId"),
-                    spec=inst.get("InstanceClass"),
-                    charge_type=inst.get("ChargeType", "PostPaid"),
-                    expired_time=expired_time,
-                    tags=tags,
-                    raw_data=inst,
-                )
-                resources.append(r)
+        Args:
+            resource_ids: 资源ID列表
+            tags: 标签（只追加/覆盖传入的键，其余标签保留）
+            resource_type: ecs / disk / snapshot / rds / redis
+            region: 资源所在区域，默认账号区域
+        """
+        from cloudlens.core.remediation import build_tag_request
+
+        request = build_tag_request(resource_type, resource_ids, tags)
+        if region and region != self.region:
+            client = AcsClient(self.access_key, self.secret_key, region)
+        else:
+            client = self._get_client()
+        client.do_action_with_exception(request)
+
+    @monitor_api_call
+    def list_redis(self) -> List[UnifiedResource]:
+        """列出Redis实例"""
+        resources = []
+        try:
+            resources.extend(self.iter_redis())
         except Exception as e:
             logger.error(f"Failed to list Redis instances: {e}")
         return resources
@@ -479,94 +488,66 @@ class AliyunProvider(BaseProvider):
             logger.error(f"Failed to list OSS buckets: {e}")
         return buckets
 
+    def _disk_to_dict(self, d: Dict) -> Dict:
+        return {
+            "id": d.get("DiskId"),
+            "name": d.get("DiskName") or d.get("DiskId"),
+            "status": d.get("Status", ""),
+            "region": d.get("RegionId") or self.region,
+            "zone": d.get("ZoneId", ""),
+            "disk_category": d.get("Category", ""),
+            "disk_type": d.get("Type", ""),  # system/data
+            "size_gb": d.get("Size", 0),
+            "instance_id": d.get("InstanceId", ""),
+            "created_time": d.get("CreationTime"),
+            "raw": d,
+        }
+
+    def iter_disks(self) -> Iterator[Dict]:
+        """逐个产出云盘（NextToken 翻页）"""
+        for d in self._paginate(DescribeDisksRequest, "Disks.Disk", use_token=True):
+            disk = self._disk_to_dict(d)
+            if disk.get("id"):
+                yield disk
+
     def list_disks(self) -> List[Dict]:
         """列出云盘（ECS Disks）"""
         disks: List[Dict] = []
         try:
-            page_num = 1
-            page_size = 100
-            total_count = None
-
-            while True:
-                request = DescribeDisksRequest()
-                request.set_PageSize(page_size)
-                request.set_PageNumber(page_num)
-                data = self._do_request(request)
-
-                if total_count is None:
-                    total_count = data.get("TotalCount", 0)
-
-                batch = data.get("Disks", {}).get("Disk", [])
-                if not batch:
-                    break
-
-                for d in batch:
-                    disks.append(
-                        {
-                            "id": d.get("DiskId"),
-                            "name": d.get("DiskName") or d.get("DiskId"),
-                            "status": d.get("Status", ""),
-                            "region": d.get("RegionId") or self.region,
-                            "zone": d.get("ZoneId", ""),
-                            "disk_category": d.get("Category", ""),
-                            "disk_type": d.get("Type", ""),  # system/data
-                            "size_gb": d.get("Size", 0),
-                            "instance_id": d.get("InstanceId", ""),
-                            "created_time": d.get("CreationTime"),
-                            "raw": d,
-                        }
-                    )
-
-                if total_count and len(disks) >= total_count:
-                    break
-                page_num += 1
+            disks.extend(self.iter_disks())
         except Exception as e:
             logger.error(f"Failed to list Disks: {e}")
-        return [d for d in disks if d.get("id")]
+        return disks
+
+    def _snapshot_to_dict(self, s: Dict) -> Dict:
+        raw = s or {}
+        return {
+            "id": s.get("SnapshotId"),
+            "name": s.get("SnapshotName") or s.get("SnapshotId"),
+            "status": s.get("Status", ""),
+            "region": s.get("RegionId") or self.region,
+            "source_disk_id": s.get("SourceDiskId", ""),
+            # 用于成本分摊的权重（GB）
+            "size_gb": raw.get("SourceDiskSize") or 0,
+            "created_time": s.get("CreationTime"),
+            "raw": s,
+        }
+
+    def iter_snapshots(self) -> Iterator[Dict]:
+        """逐个产出快照（NextToken 翻页）"""
+        for s in self._paginate(DescribeSnapshotsRequest, "Snapshots.Snapshot", use_token=True):
+            snap = self._snapshot_to_dict(s)
+            if snap.get("id"):
+                yield snap
 
     def list_snapshots(self) -> List[Dict]:
         """列出快照（ECS Snapshots）"""
         snaps: List[Dict] = []
         try:
-            page_num = 1
-            page_size = 100
-            total_count = None
-
-            while True:
-                request = DescribeSnapshotsRequest()
-                request.set_PageSize(page_size)
-                request.set_PageNumber(page_num)
-                data = self._do_request(request)
-
-                if total_count is None:
-                    total_count = data.get("TotalCount", 0)
-
-                batch = data.get("Snapshots", {}).get("Snapshot", [])
-                if not batch:
-                    break
-
-                for s in batch:
-                    raw = s or {}
-                    snaps.append(
-                        {
-                            "id": s.get("SnapshotId"),
-                            "name": s.get("SnapshotName") or s.get("SnapshotId"),
-                            "status": s.get("Status", ""),
-                            "region": s.get("RegionId") or self.region,
-                            "source_disk_id": s.get("SourceDiskId", ""),
-                            # 用于成本分摊的权重（GB）
-                            "size_gb": raw.get("SourceDiskSize") or 0,
-                            "created_time": s.get("CreationTime"),
-                            "raw": s,
-                        }
-                    )
-
-                if total_count and len(snaps) >= total_count:
-                    break
-                page_num += 1
+            snaps.extend(self.iter_snapshots())
         except Exception as e:
             logger.error(f"Failed to list Snapshots: {e}")
-        return [s for s in snaps if s.get("id")]
+        return snaps
 
     def list_eip(self) -> List[Dict]:
         """列出弹性公网IP"""
@@ -574,35 +555,19 @@ class AliyunProvider(BaseProvider):
         try:
             from aliyunsdkvpc.request.v20160428 import DescribeEipAddressesRequest
 
-            request = DescribeEipAddressesRequest.DescribeEipAddressesRequest()
-            request.set_PageSize(100)
-            page_number = 1
-
-            while True:
-                request.set_PageNumber(page_number)
-                response = self._do_request(request)
-
-                batch = response.get("EipAddresses", {}).get("EipAddress", [])
-                if not batch:
-                    break
-
-                for eip in batch:
-                    eips.append(
-                        {
-                            "id": eip.get("AllocationId"),
-                            "ip_address": eip.get("IpAddress"),
-                            "status": eip.get("Status"),
-                            "instance_id": eip.get("InstanceId", ""),
-                            "bandwidth": eip.get("Bandwidth"),
-                            "region": self.region,
-                        }
-                    )
-
-                total_count = response.get("TotalCount", 0)
-                if len(eips) >= total_count:
-                    break
-
-                page_number += 1
+            for eip in self._paginate(
+                DescribeEipAddressesRequest.DescribeEipAddressesRequest, "EipAddresses.EipAddress"
+            ):
+                eips.append(
+                    {
+                        "id": eip.get("AllocationId"),
+                        "ip_address": eip.get("IpAddress"),
+                        "status": eip.get("Status"),
+                        "instance_id": eip.get("InstanceId", ""),
+                        "bandwidth": eip.get("Bandwidth"),
+                        "region": self.region,
+                    }
+                )
         except Exception as e:
             logger.error(f"Failed to list EIPs: {e}")
         return eips
@@ -613,12 +578,9 @@ class AliyunProvider(BaseProvider):
         try:
             from aliyunsdkslb.request.v20140515 import DescribeLoadBalancersRequest
 
-            request = DescribeLoadBalancersRequest.DescribeLoadBalancersRequest()
-            request.set_PageSize(100)
-
-            response = self._do_request(request)
-
-            for slb in response.get("LoadBalancers", {}).get("LoadBalancer", []):
+            for slb in self._paginate(
+                DescribeLoadBalancersRequest.DescribeLoadBalancersRequest, "LoadBalancers.LoadBalancer"
+            ):
                 resources.append(slb_to_unified_resource(slb, self.provider_name))
         except Exception as e:
             logger.error(f"Failed to list SLBs: {e}")
@@ -630,12 +592,11 @@ class AliyunProvider(BaseProvider):
         try:
             from aliyunsdkvpc.request.v20160428 import DescribeNatGatewaysRequest
 
-            request = DescribeNatGatewaysRequest.DescribeNatGatewaysRequest()
-            request.set_PageSize(50)  # Max is 50 for NAT Gateways
-
-            response = self._do_request(request)
-
-            for nat in response.get("NatGateways", {}).get("NatGateway", []):
+            for nat in self._paginate(
+                DescribeNatGatewaysRequest.DescribeNatGatewaysRequest,
+                "NatGateways.NatGateway",
+                page_size=50,  # Max is 50 for NAT Gateways
+            ):
                 resources.append(
                     nat_gateway_to_unified_resource(nat, self.provider_name, self.region)
                 )
@@ -649,12 +610,9 @@ class AliyunProvider(BaseProvider):
         try:
             from aliyunsdkdds.request.v20151201 import DescribeDBInstancesRequest
 
-            request = DescribeDBInstancesRequest.DescribeDBInstancesRequest()
-            request.set_PageSize(100)
-
-            response = self._do_request(request)
-
-            for mongo in response.get("DBInstances", {}).get("DBInstance", []):
+            for mongo in self._paginate(
+                DescribeDBInstancesRequest.DescribeDBInstancesRequest, "DBInstances.DBInstance"
+            ):
                 resources.append(
                     mongodb_to_unified_resource(mongo, self.provider_name, self.region)
                 )
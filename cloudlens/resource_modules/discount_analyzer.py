@@ -15,14 +15,40 @@ from datetime import datetime
 from aliyunsdkcore.client import AcsClient
 from aliyunsdkcore.request import CommonRequest
 
+from cloudlens.core.price_catalog import PriceCatalog
 from cloudlens.utils.concurrent_helper import process_concurrently
 from cloudlens.utils.logger import get_logger
 
 
+# 进程内共享的续费价格目录（续费价格按SKU缓存1小时）
+_PRICE_CATALOG = PriceCatalog(ttl_seconds=3600)
+
+# 续费报价按实例计算，包含存储、带宽等附属资源。这里列出各类型实例列表中
+# 决定价格的全部附属维度，这些维度都相同的实例才共用一次报价；
+# 未列出的类型（如 ECS 的数据盘/公网带宽不在实例列表中）不做跨实例去重
+_SKU_DIMENSIONS = {
+    "rds": ("DBInstanceStorage", "DBInstanceStorageType", "Category"),
+    "mongodb": ("DBInstanceType", "DBInstanceStorage", "ReplicationFactor"),
+    "redis": ("ArchitectureType", "Bandwidth"),
+    "slb": ("LoadBalancerSpec", "InternetChargeType", "Bandwidth"),
+}
+
+
+def _attached_dimensions(instance, resource_type):
+    """提取决定续费价格的附属资源维度，无法完整确定时返回 None（按实例单独询价）"""
+    names = _SKU_DIMENSIONS.get(resource_type)
+    if not names:
+        return None
+    values = tuple(instance.get(name) for name in names)
+    if any(value in (None, "") for value in values):
+        return None
+    return values
+
+
 class DiscountAnalyzer:
     """折扣分析器"""
 
-    def __init__(self, tenant_name, access_key_id, access_key_secret):
+    def __init__(self, tenant_name, access_key_id, access_key_secret, price_catalog=None):
         """初始化"""
         self.tenant_name = tenant_name
         self.access_key_id = access_key_id
@@ -30,6 +56,7 @@ class DiscountAnalyzer:
         self.region = "cn-beijing"  # 可以根据需要扩展多区域
         self.client = AcsClient(access_key_id, access_key_secret, self.region)
         self.logger = get_logger("discount_analyzer")
+        self.price_catalog = price_catalog if price_catalog is not None else _PRICE_CATALOG
 
     def get_all_ecs_instances(self):
         """获取所有ECS实例"""
@@ -389,10 +416,11 @@ class DiscountAnalyzer:
         if total == 0:
             return []
 
-        # 定义单个实例处理函数（用于并发）
-        def process_single_instance(instance_item):
-            """处理单个实例的价格查询（用于并发）"""
-            instance = instance_item
+        # 先在本地提取每个实例的 SKU，只对去重后的 SKU 询价，再把价格分发回实例
+        def describe_instance(instance):
+            """提取实例字段和价格 SKU（只处理包年包月实例）"""
+            capacity = 0
+            total_nodes = 1
             try:
                 if resource_type == "ecs":
                     instance_id = instance.get("InstanceId", "")
@@ -496,7 +524,49 @@ class DiscountAnalyzer:
                 else:
                     if charge_type != "PrePaid":
                         return {"skip": True, "reason": "按量付费"}
+            except Exception as e:
+                instance_name = (
+                    instance.get("InstanceName", "")
+                    or instance.get("DBInstanceDescription", "")
+                    or instance.get("InstanceId", "unknown")
+                )
+                return {"success": False, "error": str(e), "instance_name": instance_name}
+
+            # 同一账号下规格和附属资源维度都相同的实例续费价格相同，按 SKU 只询价一次；
+            # 附属资源无法从实例列表确定时以实例ID为键，只复用缓存不跨实例共用报价
+            attached = _attached_dimensions(instance, resource_type)
+            sku = (
+                self.access_key_id,
+                resource_type,
+                region,
+                instance_type,
+                charge_type,
+                1,  # 续费周期（月）
+                capacity,
+                total_nodes,
+                attached if attached is not None else ("instance", instance_id),
+            )
+            return {
+                "sku": sku,
+                "instance_id": instance_id,
+                "instance_name": instance_name,
+                "zone": zone,
+                "instance_type": instance_type,
+                "region": region,
+                "capacity": capacity,
+                "total_nodes": total_nodes,
+            }
 
+        def query_price(fields):
+            """以代表实例查询一个 SKU 的续费价格"""
+            instance_id = fields["instance_id"]
+            instance_name = fields["instance_name"]
+            zone = fields["zone"]
+            instance_type = fields["instance_type"]
+            region = fields["region"]
+            capacity = fields["capacity"]
+            total_nodes = fields["total_nodes"]
+            try:
                 request = CommonRequest()
                 client = AcsClient(self.access_key_id, self.access_key_secret, region)
 
@@ -860,30 +930,64 @@ class DiscountAnalyzer:
                     }
 
             except Exception as e:
-                instance_name = (
-                    instance.get("InstanceName", "")
-                    or instance.get("DBInstanceDescription", "")
-                    or instance.get("InstanceId", "unknown")
-                )
                 return {"success": False, "error": str(e), "instance_name": instance_name}
 
-        # 并发处理
-        self.logger.info(f"并发查询价格（最多10个并发线程）...")
+        described = [describe_instance(instance) for instance in instances]
+        representatives = {}
+        for fields in described:
+            if "sku" in fields:
+                representatives.setdefault(fields["sku"], fields)
+
+        self.logger.info(f"{total} 个实例共 {len(representatives)} 个唯一SKU，按SKU并发查询价格...")
 
         def progress_callback(completed, total):
             progress_pct = completed / total * 100
             sys.stdout.write(f"\r📊 价格查询进度: {completed}/{total} ({progress_pct:.1f}%)")
             sys.stdout.flush()
 
-        results_raw = process_concurrently(
-            instances,
-            process_single_instance,
-            max_workers=50,
-            description="价格查询",
-            progress_callback=progress_callback,
-        )
-
-        # 换行
+        failures = {}
+
+        def fetch_many(skus):
+            priced = process_concurrently(
+                [representatives[sku] for sku in skus],
+                query_price,
+                max_workers=50,
+                description="价格查询",
+                progress_callback=progress_callback,
+            )
+            prices = {}
+            for sku, result in zip(skus, priced):
+                if result and result.get("success"):
+                    prices[sku] = result
+                else:
+                    failures[sku] = result
+            return prices
+
+        prices = self.price_catalog.get_many(representatives, fetch_many)
+
+        # 按 SKU 把价格分发回各实例
+        results_raw = []
+        for fields in described:
+            sku = fields.get("sku")
+            if sku is None:
+                results_raw.append(fields)
+            elif sku in prices:
+                price = prices[sku]
+                results_raw.append(
+                    {
+                        "success": True,
+                        "name": fields["instance_name"],
+                        "id": fields["instance_id"],
+                        "zone": fields["zone"],
+                        "type": fields["instance_type"],
+                        "original_price": price["original_price"],
+                        "trade_price": price["trade_price"],
+                        "discount_rate": price["discount_rate"],
+                    }
+                )
+            else:
+                failure = failures.get(sku) or {"success": False, "error": "价格查询失败"}
+                results_raw.append({**failure, "instance_name": fields["instance_name"]})
 
         # 整理结果
         results = []
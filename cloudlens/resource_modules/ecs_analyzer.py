@@ -33,22 +33,3 @@ class ECSAnalyzer(BaseResourceAnalyzer):
 
     def get_optimization_suggestions(self, instance, metrics: Dict) -> str:
         return "考虑下线或降配以节省成本"
-
-    def analyze(self, regions: List[str] = None, days: int = 14) -> List[Dict]:
-        # 覆盖基类以适配 UnifiedResource 对象
-        idle_resources = []
-        instances = self.get_instances(self.region)
-        for inst in instances:
-            metrics = self.get_metrics(self.region, inst.id, days)
-            is_idle, reasons = self.is_idle(inst, metrics)
-            if is_idle:
-                idle_resources.append(
-                    {
-                        "instance": inst,
-                        "metrics": metrics,
-                        "idle_conditions": reasons,
-                        "optimization": self.get_optimization_suggestions(inst, metrics),
-                        "region": inst.region,
-                    }
-                )
-        return idle_resources
@@ -7,14 +7,18 @@
 
 import json
 import sys
+import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from aliyunsdkcore.acs_exception.exceptions import ClientException, ServerException
 from aliyunsdkcore.client import AcsClient
 from aliyunsdkcore.request import CommonRequest
 
+from cloudlens.core.rate_limiter import TokenBucket
+from cloudlens.resource_modules.network_fetch_planner import NetworkFetchPlanner
 from cloudlens.utils.concurrent_helper import process_concurrently
 from cloudlens.utils.error_handler import ErrorHandler
 from cloudlens.utils.logger import get_logger
@@ -23,24 +27,87 @@ from cloudlens.utils.logger import get_logger
 class NetworkAnalyzer:
     """网络资源分析器"""
 
-    def __init__(self, access_key_id: str, access_key_secret: str, tenant_name: str = "default"):
-        """初始化网络分析器"""
+    def __init__(
+        self,
+        access_key_id: str,
+        access_key_secret: str,
+        tenant_name: str = "default",
+        api_rate: float = 20,
+    ):
+        """
+        初始化网络分析器
+
+        Args:
+            api_rate: 所有区域共享的 API 调用速率（次/秒）
+        """
         self.access_key_id = access_key_id
         self.access_key_secret = access_key_secret
         self.tenant_name = tenant_name
         self.logger = get_logger("network_analyzer")
+        self.rate_limiter = TokenBucket(api_rate, api_rate * 2)
+        self._clients: Dict[str, AcsClient] = {}
+        # 单次扫描内的 Describe 结果缓存：相同请求只调用一次，并发的相同请求等待同一结果
+        self._responses: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.api_calls = 0
+        self.cache_hits = 0
+
+    def _get_client(self, region: str) -> AcsClient:
+        """按区域复用 AcsClient"""
+        with self._lock:
+            client = self._clients.get(region)
+            if client is None:
+                client = self._clients[region] = AcsClient(
+                    self.access_key_id, self.access_key_secret, region
+                )
+            return client
+
+    def _do_action(self, client: AcsClient, request) -> Any:
+        """执行请求：共享限速，按 (区域, 接口, 参数) 去重并缓存到本次扫描结束"""
+        key = (
+            client.get_region_id(),
+            request.get_domain() or request.get_product(),
+            request.get_version(),
+            request.get_action_name(),
+            tuple(sorted((k, str(v)) for k, v in (request.get_query_params() or {}).items())),
+        )
+        with self._lock:
+            future = self._responses.get(key)
+            owner = future is None
+            if owner:
+                future = self._responses[key] = Future()
+                self.api_calls += 1
+            else:
+                self.cache_hits += 1
+        if owner:
+            try:
+                self.rate_limiter.acquire()
+                future.set_result(client.do_action_with_exception(request))
+            except Exception as e:
+                # 失败的请求不缓存，后续调用可以重试
+                with self._lock:
+                    self._responses.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def reset_scan_cache(self) -> None:
+        """清空本次扫描的请求缓存"""
+        with self._lock:
+            self._responses.clear()
+            self.api_calls = 0
+            self.cache_hits = 0
 
     def get_all_regions(self) -> List[str]:
         """获取所有可用区域"""
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, "cn-hangzhou")
+            client = self._get_client("cn-hangzhou")
             request = CommonRequest()
             request.set_domain("ecs.cn-hangzhou.aliyuncs.com")
             request.set_method("POST")
             request.set_version("2014-05-26")
             request.set_action_name("DescribeRegions")
 
-            response = client.do_action_with_exception(request)
+            response = self._do_action(client, request)
             data = json.loads(response)
 
             regions = []
@@ -52,11 +119,16 @@ class NetworkAnalyzer:
             self.logger.error(f"获取区域列表失败: {e}")
             return []
 
-    def get_vpcs(self, region: str) -> List[Dict]:
-        """获取VPC列表"""
+    def get_vpcs(self, region: str, include_detail: bool = True) -> List[Dict]:
+        """
+        获取VPC列表
+
+        Args:
+            include_detail: 是否逐个获取子网、路由表、网络ACL（由 NetworkFetchPlanner 并发获取时传 False）
+        """
         vpcs = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             request.set_domain(f"vpc.{region}.aliyuncs.com")
             request.set_method("POST")
@@ -67,7 +139,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "Vpcs" in data and "Vpc" in data["Vpcs"]:
@@ -81,7 +153,7 @@ class NetworkAnalyzer:
                     for vpc in vpc_list:
                         vpc_id = vpc.get("VpcId", "")
                         # 获取VPC的详细信息
-                        vpc_detail = self.get_vpc_detail(region, vpc_id)
+                        vpc_detail = self.get_vpc_detail(region, vpc_id) if include_detail else {}
 
                         vpcs.append(
                             {
@@ -112,165 +184,180 @@ class NetworkAnalyzer:
             self.logger.warning(f"获取VPC列表失败 {region}: {e}")
             return []
 
-    def get_vpc_detail(self, region: str, vpc_id: str) -> Dict:
+    def get_vpc_detail(self, region: str, vpc_id: str, include_routes: bool = True) -> Dict:
         """获取VPC详细信息（子网、路由表、网络ACL）"""
-        detail = {"VSwitches": [], "RouteTables": [], "NetworkAcls": []}
+        return {
+            "VSwitches": self.get_vswitches(region, vpc_id),
+            "RouteTables": self.get_route_tables(region, vpc_id, include_routes),
+            "NetworkAcls": self.get_network_acls(region, vpc_id),
+        }
 
+    def get_vswitches(self, region: str, vpc_id: str) -> List[Dict]:
+        """获取VPC的子网列表"""
+        vswitches = []
+        client = self._get_client(region)
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
-
-            # 1. 获取子网列表
-            try:
-                request = CommonRequest()
-                request.set_domain(f"vpc.{region}.aliyuncs.com")
-                request.set_method("POST")
-                request.set_version("2016-04-28")
-                request.set_action_name("DescribeVSwitches")
-                request.add_query_param("VpcId", vpc_id)
-                request.add_query_param("PageSize", 50)
-
-                page_number = 1
-                while True:
-                    request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
-                    data = json.loads(response)
+            request = CommonRequest()
+            request.set_domain(f"vpc.{region}.aliyuncs.com")
+            request.set_method("POST")
+            request.set_version("2016-04-28")
+            request.set_action_name("DescribeVSwitches")
+            request.add_query_param("VpcId", vpc_id)
+            request.add_query_param("PageSize", 50)
 
-                    if "VSwitches" in data and "VSwitch" in data["VSwitches"]:
-                        vswitch_list = data["VSwitches"]["VSwitch"]
-                        if not isinstance(vswitch_list, list):
-                            vswitch_list = [vswitch_list]
+            page_number = 1
+            while True:
+                request.add_query_param("PageNumber", page_number)
+                response = self._do_action(client, request)
+                data = json.loads(response)
 
-                        if len(vswitch_list) == 0:
-                            break
+                if "VSwitches" in data and "VSwitch" in data["VSwitches"]:
+                    vswitch_list = data["VSwitches"]["VSwitch"]
+                    if not isinstance(vswitch_list, list):
+                        vswitch_list = [vswitch_list]
 
-                        for vswitch in vswitch_list:
-                            detail["VSwitches"].append(
-                                {
-                                    "VSwitchId": vswitch.get("VSwitchId", ""),
-                                    "VSwitchName": vswitch.get("VSwitchName", ""),
-                                    "CidrBlock": vswitch.get("CidrBlock", ""),
-                                    "ZoneId": vswitch.get("ZoneId", ""),
-                                    "Status": vswitch.get("Status", ""),
-                                    "AvailableIpAddressCount": vswitch.get(
-                                        "AvailableIpAddressCount", 0
-                                    ),
-                                    "Description": vswitch.get("Description", ""),
-                                }
-                            )
+                    if len(vswitch_list) == 0:
+                        break
 
-                        total_count = data.get("TotalCount", 0)
-                        if len(detail["VSwitches"]) >= total_count or len(vswitch_list) < 50:
-                            break
+                    for vswitch in vswitch_list:
+                        vswitches.append(
+                            {
+                                "VSwitchId": vswitch.get("VSwitchId", ""),
+                                "VSwitchName": vswitch.get("VSwitchName", ""),
+                                "CidrBlock": vswitch.get("CidrBlock", ""),
+                                "ZoneId": vswitch.get("ZoneId", ""),
+                                "Status": vswitch.get("Status", ""),
+                                "AvailableIpAddressCount": vswitch.get(
+                                    "AvailableIpAddressCount", 0
+                                ),
+                                "Description": vswitch.get("Description", ""),
+                            }
+                        )
 
-                        page_number += 1
-                    else:
+                    total_count = data.get("TotalCount", 0)
+                    if len(vswitches) >= total_count or len(vswitch_list) < 50:
                         break
-            except Exception as e:
-                self.logger.info(f"获取子网列表失败 {vpc_id}: {e}")
 
-            # 2. 获取路由表列表
-            try:
-                request = CommonRequest()
-                request.set_domain(f"vpc.{region}.aliyuncs.com")
-                request.set_method("POST")
-                request.set_version("2016-04-28")
-                request.set_action_name("DescribeRouteTables")
-                request.add_query_param("VpcId", vpc_id)
-                request.add_query_param("PageSize", 50)
+                    page_number += 1
+                else:
+                    break
+        except Exception as e:
+            self.logger.info(f"获取子网列表失败 {vpc_id}: {e}")
 
-                page_number = 1
-                while True:
-                    request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
-                    data = json.loads(response)
+        return vswitches
 
-                    if "RouteTables" in data and "RouteTable" in data["RouteTables"]:
-                        route_table_list = data["RouteTables"]["RouteTable"]
-                        if not isinstance(route_table_list, list):
-                            route_table_list = [route_table_list]
+    def get_route_tables(self, region: str, vpc_id: str, include_routes: bool = True) -> List[Dict]:
+        """获取VPC的路由表列表（include_routes 为 False 时不逐个获取路由条目）"""
+        route_tables = []
+        client = self._get_client(region)
+        try:
+            request = CommonRequest()
+            request.set_domain(f"vpc.{region}.aliyuncs.com")
+            request.set_method("POST")
+            request.set_version("2016-04-28")
+            request.set_action_name("DescribeRouteTables")
+            request.add_query_param("VpcId", vpc_id)
+            request.add_query_param("PageSize", 50)
 
-                        if len(route_table_list) == 0:
-                            break
+            page_number = 1
+            while True:
+                request.add_query_param("PageNumber", page_number)
+                response = self._do_action(client, request)
+                data = json.loads(response)
 
-                        for rt in route_table_list:
-                            # 获取路由表的路由条目
-                            routes = self.get_route_table_routes(region, rt.get("RouteTableId", ""))
+                if "RouteTables" in data and "RouteTable" in data["RouteTables"]:
+                    route_table_list = data["RouteTables"]["RouteTable"]
+                    if not isinstance(route_table_list, list):
+                        route_table_list = [route_table_list]
 
-                            detail["RouteTables"].append(
-                                {
-                                    "RouteTableId": rt.get("RouteTableId", ""),
-                                    "RouteTableName": rt.get("RouteTableName", ""),
-                                    "RouteTableType": rt.get("RouteTableType", ""),
-                                    "VSwitchIds": rt.get("VSwitchIds", {}).get("VSwitchId", []),
-                                    "Routes": routes,
-                                }
-                            )
+                    if len(route_table_list) == 0:
+                        break
 
-                        total_count = data.get("TotalCount", 0)
-                        if len(detail["RouteTables"]) >= total_count or len(route_table_list) < 50:
-                            break
+                    for rt in route_table_list:
+                        # 获取路由表的路由条目
+                        routes = (
+                            self.get_route_table_routes(region, rt.get("RouteTableId", ""))
+                            if include_routes
+                            else []
+                        )
 
-                        page_number += 1
-                    else:
+                        route_tables.append(
+                            {
+                                "RouteTableId": rt.get("RouteTableId", ""),
+                                "RouteTableName": rt.get("RouteTableName", ""),
+                                "RouteTableType": rt.get("RouteTableType", ""),
+                                "VSwitchIds": rt.get("VSwitchIds", {}).get("VSwitchId", []),
+                                "Routes": routes,
+                            }
+                        )
+
+                    total_count = data.get("TotalCount", 0)
+                    if len(route_tables) >= total_count or len(route_table_list) < 50:
                         break
-            except Exception as e:
-                self.logger.info(f"获取路由表列表失败 {vpc_id}: {e}")
 
-            # 3. 获取网络ACL列表
-            try:
-                request = CommonRequest()
-                request.set_domain(f"vpc.{region}.aliyuncs.com")
-                request.set_method("POST")
-                request.set_version("2016-04-28")
-                request.set_action_name("DescribeNetworkAcls")
-                request.add_query_param("VpcId", vpc_id)
-                request.add_query_param("PageSize", 50)
+                    page_number += 1
+                else:
+                    break
+        except Exception as e:
+            self.logger.info(f"获取路由表列表失败 {vpc_id}: {e}")
 
-                page_number = 1
-                while True:
-                    request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
-                    data = json.loads(response)
+        return route_tables
 
-                    if "NetworkAcls" in data and "NetworkAcl" in data["NetworkAcls"]:
-                        acl_list = data["NetworkAcls"]["NetworkAcl"]
-                        if not isinstance(acl_list, list):
-                            acl_list = [acl_list]
+    def get_network_acls(self, region: str, vpc_id: str) -> List[Dict]:
+        """获取VPC的网络ACL列表"""
+        acls = []
+        client = self._get_client(region)
+        try:
+            request = CommonRequest()
+            request.set_domain(f"vpc.{region}.aliyuncs.com")
+            request.set_method("POST")
+            request.set_version("2016-04-28")
+            request.set_action_name("DescribeNetworkAcls")
+            request.add_query_param("VpcId", vpc_id)
+            request.add_query_param("PageSize", 50)
 
-                        if len(acl_list) == 0:
-                            break
+            page_number = 1
+            while True:
+                request.add_query_param("PageNumber", page_number)
+                response = self._do_action(client, request)
+                data = json.loads(response)
 
-                        for acl in acl_list:
-                            detail["NetworkAcls"].append(
-                                {
-                                    "NetworkAclId": acl.get("NetworkAclId", ""),
-                                    "NetworkAclName": acl.get("NetworkAclName", ""),
-                                    "Status": acl.get("Status", ""),
-                                    "Description": acl.get("Description", ""),
-                                    "VpcId": acl.get("VpcId", ""),
-                                }
-                            )
+                if "NetworkAcls" in data and "NetworkAcl" in data["NetworkAcls"]:
+                    acl_list = data["NetworkAcls"]["NetworkAcl"]
+                    if not isinstance(acl_list, list):
+                        acl_list = [acl_list]
 
-                        total_count = data.get("TotalCount", 0)
-                        if len(detail["NetworkAcls"]) >= total_count or len(acl_list) < 50:
-                            break
+                    if len(acl_list) == 0:
+                        break
 
-                        page_number += 1
-                    else:
+                    for acl in acl_list:
+                        acls.append(
+                            {
+                                "NetworkAclId": acl.get("NetworkAclId", ""),
+                                "NetworkAclName": acl.get("NetworkAclName", ""),
+                                "Status": acl.get("Status", ""),
+                                "Description": acl.get("Description", ""),
+                                "VpcId": acl.get("VpcId", ""),
+                            }
+                        )
+
+                    total_count = data.get("TotalCount", 0)
+                    if len(acls) >= total_count or len(acl_list) < 50:
                         break
-            except Exception as e:
-                self.logger.info(f"获取网络ACL列表失败 {vpc_id}: {e}")
 
+                    page_number += 1
+                else:
+                    break
         except Exception as e:
-            self.logger.warning(f"获取VPC详情失败 {vpc_id}: {e}")
+            self.logger.info(f"获取网络ACL列表失败 {vpc_id}: {e}")
 
-        return detail
+        return acls
 
     def get_route_table_routes(self, region: str, route_table_id: str) -> List[Dict]:
         """获取路由表的路由条目"""
         routes = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             request.set_domain(f"vpc.{region}.aliyuncs.com")
             request.set_method("POST")
@@ -278,7 +365,7 @@ class NetworkAnalyzer:
             request.set_action_name("DescribeRouteTableList")
             request.add_query_param("RouteTableId", route_table_id)
 
-            response = client.do_action_with_exception(request)
+            response = self._do_action(client, request)
             data = json.loads(response)
 
             if "RouterTableList" in data and "RouterTableListType" in data["RouterTableList"]:
@@ -311,7 +398,7 @@ class NetworkAnalyzer:
         """获取VPC Peering/对等连接列表"""
         peerings = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             request.set_domain(f"vpc.{region}.aliyuncs.com")
             request.set_method("POST")
@@ -328,7 +415,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if (
@@ -375,7 +462,7 @@ class NetworkAnalyzer:
         """获取VPN连接列表"""
         vpns = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             request.set_domain(f"vpc.{region}.aliyuncs.com")
             request.set_method("POST")
@@ -386,7 +473,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "VpnConnections" in data and "VpnConnection" in data["VpnConnections"]:
@@ -429,7 +516,7 @@ class NetworkAnalyzer:
         """获取专线配置列表"""
         connections = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             request.set_domain(f"vpc.{region}.aliyuncs.com")
             request.set_method("POST")
@@ -440,7 +527,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if (
@@ -490,8 +577,13 @@ class NetworkAnalyzer:
             self.logger.warning(f"获取专线配置列表失败 {region}: {e}")
             return []
 
-    def get_slb_detailed_info(self, region: str) -> List[Dict]:
-        """获取SLB详细配置（监听规则、后端服务器组、健康检查）"""
+    def get_slb_detailed_info(self, region: str, include_detail: bool = True) -> List[Dict]:
+        """
+        获取SLB详细配置（监听规则、后端服务器组、健康检查）
+
+        Args:
+            include_detail: 是否逐个获取监听和服务器组（由 NetworkFetchPlanner 并发获取时传 False）
+        """
         from cloudlens.resource_modules.slb_analyzer import SLBAnalyzer
 
         slb_analyzer = SLBAnalyzer(self.access_key_id, self.access_key_secret)
@@ -501,6 +593,9 @@ class NetworkAnalyzer:
         for instance in slb_instances:
             instance_id = instance.get("InstanceId", "")
             lb_type = instance.get("LoadBalancerType", "clb")
+            if not include_detail:
+                detailed_slbs.append({**instance, "Listeners": [], "ServerGroups": []})
+                continue
 
             # 获取监听器详情
             listeners = self.get_slb_listeners(region, instance_id, lb_type)
@@ -514,11 +609,13 @@ class NetworkAnalyzer:
 
         return detailed_slbs
 
-    def get_slb_listeners(self, region: str, instance_id: str, lb_type: str = "clb") -> List[Dict]:
-        """获取SLB监听器详情"""
+    def get_slb_listeners(
+        self, region: str, instance_id: str, lb_type: str = "clb", include_health_check: bool = True
+    ) -> List[Dict]:
+        """获取SLB监听器详情（include_health_check 为 False 时不逐个获取健康检查）"""
         listeners = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
 
             if lb_type == "clb":
                 # CLB使用传统SLB API
@@ -533,7 +630,7 @@ class NetworkAnalyzer:
                 page_number = 1
                 while True:
                     request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
+                    response = self._do_action(client, request)
                     data = json.loads(response)
 
                     if "Listeners" in data and "Listener" in data["Listeners"]:
@@ -546,8 +643,12 @@ class NetworkAnalyzer:
 
                         for listener in listener_list:
                             # 获取健康检查配置
-                            health_check = self.get_slb_health_check(
-                                region, instance_id, listener.get("ListenerPort", 0), lb_type
+                            health_check = (
+                                self.get_slb_health_check(
+                                    region, instance_id, listener.get("ListenerPort", 0), lb_type
+                                )
+                                if include_health_check
+                                else {}
                             )
 
                             listeners.append(
@@ -585,7 +686,7 @@ class NetworkAnalyzer:
                 page_number = 1
                 while True:
                     request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
+                    response = self._do_action(client, request)
                     data = json.loads(response)
 
                     if "Listeners" in data:
@@ -598,8 +699,10 @@ class NetworkAnalyzer:
 
                         for listener in listener_list:
                             listener_id = listener.get("ListenerId", "")
-                            health_check = self.get_slb_health_check(
-                                region, instance_id, listener_id, lb_type
+                            health_check = (
+                                self.get_slb_health_check(region, instance_id, listener_id, lb_type)
+                                if include_health_check
+                                else {}
                             )
 
                             listeners.append(
@@ -631,7 +734,7 @@ class NetworkAnalyzer:
     ) -> Dict:
         """获取SLB健康检查配置"""
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
 
             if lb_type == "clb":
                 request = CommonRequest()
@@ -642,7 +745,7 @@ class NetworkAnalyzer:
                 request.add_query_param("LoadBalancerId", instance_id)
                 request.add_query_param("ListenerPort", listener_port_or_id)
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "BackendServers" in data and "BackendServer" in data["BackendServers"]:
@@ -676,7 +779,7 @@ class NetworkAnalyzer:
                 request.set_action_name("GetListenerAttribute")
                 request.add_query_param("ListenerId", listener_port_or_id)
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 health_check_config = data.get("HealthCheckConfig", {})
@@ -697,12 +800,12 @@ class NetworkAnalyzer:
         return {}
 
     def get_slb_server_groups(
-        self, region: str, instance_id: str, lb_type: str = "clb"
+        self, region: str, instance_id: str, lb_type: str = "clb", include_servers: bool = True
     ) -> List[Dict]:
-        """获取SLB后端服务器组详情"""
+        """获取SLB后端服务器组详情（include_servers 为 False 时不逐个获取 ALB/NLB 服务器组成员）"""
         server_groups = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
 
             if lb_type == "clb":
                 # CLB的后端服务器在实例详情中
@@ -713,7 +816,7 @@ class NetworkAnalyzer:
                 )
                 request.set_LoadBalancerId(instance_id)
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "BackendServers" in data and "BackendServer" in data["BackendServers"]:
@@ -748,7 +851,7 @@ class NetworkAnalyzer:
                 page_number = 1
                 while True:
                     request.add_query_param("PageNumber", page_number)
-                    response = client.do_action_with_exception(request)
+                    response = self._do_action(client, request)
                     data = json.loads(response)
 
                     if "ServerGroups" in data:
@@ -762,7 +865,11 @@ class NetworkAnalyzer:
                         for group in group_list:
                             group_id = group.get("ServerGroupId", "")
                             # 获取服务器组中的服务器
-                            servers = self.get_server_group_servers(region, group_id, lb_type)
+                            servers = (
+                                self.get_server_group_servers(region, group_id, lb_type)
+                                if include_servers
+                                else []
+                            )
 
                             server_groups.append(
                                 {
@@ -792,7 +899,7 @@ class NetworkAnalyzer:
         """获取服务器组中的服务器列表"""
         servers = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, region)
+            client = self._get_client(region)
             request = CommonRequest()
             domain = f"{lb_type}.{region}.aliyuncs.com"
             version = "2020-06-16" if lb_type == "alb" else "2022-04-30"
@@ -806,7 +913,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "Servers" in data:
@@ -846,7 +953,7 @@ class NetworkAnalyzer:
         """获取CDN域名配置"""
         domains = []
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, "cn-hangzhou")
+            client = self._get_client("cn-hangzhou")
             request = CommonRequest()
             request.set_domain("cdn.aliyuncs.com")
             request.set_method("POST")
@@ -857,7 +964,7 @@ class NetworkAnalyzer:
             page_number = 1
             while True:
                 request.add_query_param("PageNumber", page_number)
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "Domains" in data and "PageData" in data["Domains"]:
@@ -903,7 +1010,7 @@ class NetworkAnalyzer:
         detail = {"Sources": [], "Coverage": "", "CacheRules": [], "BackendRules": []}
 
         try:
-            client = AcsClient(self.access_key_id, self.access_key_secret, "cn-hangzhou")
+            client = self._get_client("cn-hangzhou")
 
             # 1. 获取源站配置
             try:
@@ -914,7 +1021,7 @@ class NetworkAnalyzer:
                 request.set_action_name("DescribeDomainDetail")
                 request.add_query_param("DomainName", domain_name)
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "Sources" in data and "Source" in data["Sources"]:
@@ -950,7 +1057,7 @@ class NetworkAnalyzer:
                     "set_req_host_header,filetype_based_ttl_setting,path_based_ttl_setting",
                 )
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "DomainConfigs" in data and "DomainConfig" in data["DomainConfigs"]:
@@ -979,7 +1086,7 @@ class NetworkAnalyzer:
                 request.set_action_name("DescribeDomainHttpHeaderConfigs")
                 request.add_query_param("DomainName", domain_name)
 
-                response = client.do_action_with_exception(request)
+                response = self._do_action(client, request)
                 data = json.loads(response)
 
                 if "HttpHeaderConfigs" in data and "HttpHeaderConfig" in data["HttpHeaderConfigs"]:
@@ -1019,24 +1126,14 @@ class NetworkAnalyzer:
             "CDNs": [],
         }
 
-        # 并发获取各区域的网络资源
+        self.reset_scan_cache()
+        planner = NetworkFetchPlanner(self)
+
+        # 并发获取各区域的网络资源；区域内的子资源由 planner 按依赖关系并发获取
         def get_region_network_resources(region):
             """获取单个区域的网络资源"""
             try:
-                vpcs = self.get_vpcs(region)
-                peerings = self.get_vpc_peerings(region)
-                vpns = self.get_vpn_connections(region)
-                express_conns = self.get_express_connect(region)
-                slbs = self.get_slb_detailed_info(region)
-
-                return {
-                    "region": region,
-                    "vpcs": vpcs,
-                    "peerings": peerings,
-                    "vpns": vpns,
-                    "express_conns": express_conns,
-                    "slbs": slbs,
-                }
+                return planner.fetch_region(region)
             except Exception as e:
                 self.logger.warning(f"获取区域 {region} 网络资源失败: {e}")
                 return {
@@ -1049,9 +1146,13 @@ class NetworkAnalyzer:
                 }
 
         self.logger.info("并发获取所有区域的网络资源...")
-        region_results = process_concurrently(
-            regions, get_region_network_resources, max_workers=10, description="获取网络资源"
-        )
+        try:
+            region_results = process_concurrently(
+                regions, get_region_network_resources, max_workers=10, description="获取网络资源"
+            )
+        finally:
+            planner.close()
+        self.logger.info(f"网络资源 API 调用 {self.api_calls} 次，缓存命中 {self.cache_hits} 次")
 
         # 整理结果
         for result in region_results:
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络资源获取计划器
+
+把一个区域的网络资源获取拆成带依赖关系的小任务，在共享线程池里并发执行：
+
+    VPC 列表 ──> 每个 VPC: 子网 / 路由表 / 网络ACL ──> 每个路由表: 路由条目
+    SLB 列表 ──> 每个实例: 监听 / 服务器组 ──> 每个监听: 健康检查; 每个服务器组: 成员
+    对等连接 / VPN / 专线（无依赖）
+
+- 线程池里的任务只做自己那一层的 API 调用，不等待其他任务；父任务完成后由
+  区域线程提交子任务，因此嵌套再深也不会占满线程池而死锁
+- 所有 API 调用经过 NetworkAnalyzer._do_action：共享限速，相同请求在本次扫描内只调用一次
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from cloudlens.utils.logger import get_logger
+
+
+class NetworkFetchPlanner:
+    """按依赖关系并发获取单个区域的网络资源"""
+
+    def __init__(self, analyzer, max_workers: int = 16):
+        """
+        Args:
+            analyzer: NetworkAnalyzer 实例
+            max_workers: 所有区域共享的 API 线程数
+        """
+        self.analyzer = analyzer
+        self.logger = get_logger("network_fetch_planner")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="netfetch")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def fetch_region(self, region: str) -> Dict[str, Any]:
+        """
+        获取单个区域的网络资源
+
+        Returns:
+            {"region", "vpcs", "peerings", "vpns", "express_conns", "slbs"}，结构与逐个获取时一致
+        """
+        analyzer = self.analyzer
+        result: Dict[str, Any] = {
+            "region": region,
+            "vpcs": [],
+            "peerings": [],
+            "vpns": [],
+            "express_conns": [],
+            "slbs": [],
+        }
+        # 在途任务 -> 完成后在区域线程上执行的回调（回调只整理结果、提交子任务）
+        pending: Dict[Future, Callable[[Any], None]] = {}
+
+        def schedule(then: Callable[[Any], None], fn: Callable, *args) -> None:
+            pending[self._executor.submit(fn, *args)] = then
+
+        def on_vpcs(vpcs: List[Dict]) -> None:
+            result["vpcs"] = vpcs
+            for vpc in vpcs:
+                vpc_id = vpc["VpcId"]
+                schedule(partial(vpc.__setitem__, "VSwitches"), analyzer.get_vswitches, region, vpc_id)
+                schedule(partial(on_route_tables, vpc), analyzer.get_route_tables, region, vpc_id, False)
+                schedule(partial(vpc.__setitem__, "NetworkAcls"), analyzer.get_network_acls, region, vpc_id)
+
+        def on_route_tables(vpc: Dict, route_tables: List[Dict]) -> None:
+            vpc["RouteTables"] = route_tables
+            for rt in route_tables:
+                schedule(
+                    partial(rt.__setitem__, "Routes"),
+                    analyzer.get_route_table_routes, region, rt["RouteTableId"],
+                )
+
+        def on_slbs(slbs: List[Dict]) -> None:
+            result["slbs"] = slbs
+            for slb in slbs:
+                instance_id = slb.get("InstanceId", "")
+                lb_type = slb.get("LoadBalancerType", "clb")
+                schedule(
+                    partial(on_listeners, slb),
+                    analyzer.get_slb_listeners, region, instance_id, lb_type, False,
+                )
+                schedule(
+                    partial(on_server_groups, slb),
+                    analyzer.get_slb_server_groups, region, instance_id, lb_type, False,
+                )
+
+        def on_listeners(slb: Dict, listeners: List[Dict]) -> None:
+            slb["Listeners"] = listeners
+            lb_type = slb.get("LoadBalancerType", "clb")
+            for listener in listeners:
+                # CLB 按端口查询健康状态，ALB/NLB 按监听 ID
+                key = listener.get("ListenerId") if lb_type in ("alb", "nlb") else listener.get("ListenerPort", 0)
+                schedule(
+                    partial(listener.__setitem__, "HealthCheck"),
+                    analyzer.get_slb_health_check, region, slb.get("InstanceId", ""), key, lb_type,
+                )
+
+        def on_server_groups(slb: Dict, groups: List[Dict]) -> None:
+            slb["ServerGroups"] = groups
+            lb_type = slb.get("LoadBalancerType", "clb")
+            if lb_type not in ("alb", "nlb"):
+                return
+            for group in groups:
+                schedule(
+                    partial(group.__setitem__, "Servers"),
+                    analyzer.get_server_group_servers, region, group["ServerGroupId"], lb_type,
+                )
+
+        schedule(on_vpcs, analyzer.get_vpcs, region, False)
+        schedule(partial(result.__setitem__, "peerings"), analyzer.get_vpc_peerings, region)
+        schedule(partial(result.__setitem__, "vpns"), analyzer.get_vpn_connections, region)
+        schedule(partial(result.__setitem__, "express_conns"), analyzer.get_express_connect, region)
+        schedule(on_slbs, analyzer.get_slb_detailed_info, region, False)
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                then = pending.pop(future)
+                try:
+                    then(future.result())
+                except Exception as e:
+                    # 单个子资源失败不影响区域内其他资源
+                    self.logger.warning(f"获取区域 {region} 网络子资源失败: {e}")
+
+        return result
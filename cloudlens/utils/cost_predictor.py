@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 import numpy as np
 
+from cloudlens.core.cost_forecaster import forecast_values
 from cloudlens.core.database import DatabaseFactory
 from cloudlens.utils.logger import get_logger
 
@@ -409,6 +410,40 @@ class CostPredictor:
             self.logger.error(f"移动平均预测失败: {e}")
             return []
 
+    def predict_cost_seasonal(self, tenant_name: str, future_days: int = 30) -> List[Dict]:
+        """使用带周季节性的 Holt-Winters 模型预测成本"""
+        try:
+            historical_data = self.get_historical_cost(tenant_name, days=90)
+
+            if len(historical_data) < 7:
+                self.logger.warning("历史数据不足,无法预测")
+                return []
+
+            # 按日期补齐为连续序列（缺失的天按 0 计）
+            by_date = {d["date"]: float(d["total_cost"] or 0) for d in historical_data}
+            first_date = datetime.strptime(historical_data[0]["date"], "%Y-%m-%d")
+            last_date = datetime.strptime(historical_data[-1]["date"], "%Y-%m-%d")
+            days = (last_date - first_date).days + 1
+            costs = [by_date.get((first_date + timedelta(days=i)).strftime("%Y-%m-%d"), 0.0) for i in range(days)]
+
+            forecast = forecast_values(costs, future_days, last_date)
+            predictions = [
+                {
+                    "date": (last_date + timedelta(days=i + 1)).strftime("%Y-%m-%d"),
+                    "predicted_cost": round(float(value), 2),
+                    "confidence_level": 0.8,
+                    "method": "holt_winters",
+                }
+                for i, value in enumerate(forecast)
+            ]
+
+            self.save_predictions(tenant_name, predictions)
+            return predictions
+
+        except Exception as e:
+            self.logger.error(f"季节性预测失败: {e}")
+            return []
+
     def save_predictions(self, tenant_name: str, predictions: List[Dict]):
         """保存预测结果"""
         placeholder = self._get_placeholder()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+UnifiedResource 内存基准
+
+对比原 dataclass 实现与紧凑实现（__slots__ + 字符串驻留 + 压缩 raw_data）
+每个资源占用的字节数。
+
+用法:
+    python scripts/benchmark_resource_memory.py [--count 100000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.append(os.getcwd())
+
+from cloudlens.models.resource import ResourceStatus, ResourceType, UnifiedResource
+
+
+@dataclass
+class LegacyUnifiedResource:
+    """优化前的 UnifiedResource（普通 dataclass，raw_data 原样保存）"""
+    id: str
+    name: str
+    provider: str
+    region: str
+    zone: Optional[str] = None
+    resource_type: ResourceType = ResourceType.UNKNOWN
+    status: ResourceStatus = ResourceStatus.UNKNOWN
+    private_ips: List[str] = field(default_factory=list)
+    public_ips: List[str] = field(default_factory=list)
+    vpc_id: Optional[str] = None
+    spec: Optional[str] = None
+    cpu: int = 0
+    memory: int = 0
+    charge_type: str = "PostPaid"
+    created_time: Optional[datetime] = None
+    expired_time: Optional[datetime] = None
+    raw_data: Dict = field(default_factory=dict)
+    tags: Dict[str, str] = field(default_factory=dict)
+
+
+def _sdk_instance(i: int) -> Dict:
+    """模拟 DescribeInstances 返回的单个实例（字符串各自独立分配，与解析 JSON 一致）"""
+    region = "".join(["cn-", "hangzhou"])
+    return {
+        "InstanceId": f"i-bp{i:016x}",
+        "InstanceName": f"web-server-{i}",
+        "RegionId": region,
+        "ZoneId": "".join([region, "-h"]),
+        "InstanceType": "".join(["ecs.", "g6.large"]),
+        "Status": "".join(["Run", "ning"]),
+        "Cpu": 2,
+        "Memory": 8192,
+        "InstanceChargeType": "".join(["Post", "Paid"]),
+        "CreationTime": "2024-01-01T00:00Z",
+        "ExpiredTime": "2099-12-31T15:59Z",
+        "VpcAttributes": {
+            "VpcId": "".join(["vpc-", "bp1example"]),
+            "VSwitchId": f"vsw-bp{i % 50:08x}",
+            "PrivateIpAddress": {"IpAddress": [f"10.0.{i // 256 % 256}.{i % 256}"]},
+        },
+        "PublicIpAddress": {"IpAddress": []},
+        "EipAddress": {"IpAddress": "", "AllocationId": ""},
+        "SecurityGroupIds": {"SecurityGroupId": [f"sg-bp{i % 20:08x}"]},
+        "ImageId": "aliyun_3_x64_20G_alibase_20240528.vhd",
+        "OSName": "Alibaba Cloud Linux  3.2104 LTS 64位",
+        "OSType": "linux",
+        "HostName": f"iZbp{i:012x}Z",
+        "InternetMaxBandwidthOut": 0,
+        "InternetChargeType": "PayByTraffic",
+        "Description": "",
+        "Tags": {"Tag": [{"TagKey": "env", "TagValue": "prod"}, {"TagKey": "team", "TagValue": f"team-{i % 10}"}]},
+    }
+
+
+def _build(cls, count: int) -> list:
+    resources = []
+    for i in range(count):
+        inst = _sdk_instance(i)
+        resources.append(cls(
+            id=inst["InstanceId"],
+            name=inst["InstanceName"],
+            provider="aliyun",
+            region=inst["RegionId"],
+            zone=inst["ZoneId"],
+            resource_type=ResourceType.ECS,
+            status=ResourceStatus.RUNNING,
+            private_ips=inst["VpcAttributes"]["PrivateIpAddress"]["IpAddress"],
+            public_ips=[],
+            vpc_id=inst["VpcAttributes"]["VpcId"],
+            spec=inst["InstanceType"],
+            cpu=inst["Cpu"],
+            memory=inst["Memory"],
+            charge_type=inst["InstanceChargeType"],
+            tags={t["TagKey"]: t["TagValue"] for t in inst["Tags"]["Tag"]},
+            raw_data=inst,
+        ))
+    return resources
+
+
+def measure(cls, count: int) -> float:
+    """构建 count 个资源后仍驻留的内存（字节/资源）"""
+    gc.collect()
+    tracemalloc.start()
+    resources = _build(cls, count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resources
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UnifiedResource 内存基准")
+    parser.add_argument("--count", type=int, default=100000, help="资源数量")
+    args = parser.parse_args()
+
+    legacy = measure(LegacyUnifiedResource, args.count)
+    compact = measure(UnifiedResource, args.count)
+
+    print(f"资源数量: {args.count}")
+    print(f"原实现:   {legacy:,.0f} 字节/资源")
+    print(f"紧凑实现: {compact:,.0f} 字节/资源")
+    print(f"节省:     {(1 - compact / legacy) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""core 测试共用的数据库适配器替身"""
+import re
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+# MySQL 的 "INTERVAL n DAY" 写法改为普通参数，由下面注册的 DATE_SUB 处理
+_INTERVAL_DAYS = re.compile(r"INTERVAL (.+?) DAY\)")
+
+
+def _date_sub(value, days):
+    return (date.fromisoformat(value) - timedelta(days=days)).isoformat() if value else None
+
+
+def _weekday(value):
+    return date.fromisoformat(value).weekday() if value else None
+
+
+def _concat(*parts):
+    return None if None in parts else "".join(str(p) for p in parts)
+
+
+class SqliteDB:
+    """用 sqlite3 模拟 MySQL 适配器（%s 占位符、常用日期函数），记录查询和批量写入次数"""
+
+    def __init__(self, schema=""):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("DATE_SUB", 2, _date_sub, deterministic=True)
+        self.conn.create_function("WEEKDAY", 1, _weekday, deterministic=True)
+        self.conn.create_function("CONCAT", -1, _concat, deterministic=True)
+        self.conn.executescript(schema)
+        self.queries = 0
+        self.batches = 0
+
+    def insert(self, table, rows, columns=None):
+        """直接写入测试数据，不计入查询和批量写入次数"""
+        rows = list(rows)
+        if not rows:
+            return
+        target = f"{table} ({', '.join(columns)})" if columns else table
+        self.conn.executemany(f"INSERT INTO {target} VALUES ({', '.join(['?'] * len(rows[0]))})", rows)
+
+    @staticmethod
+    def _sql(sql):
+        return _INTERVAL_DAYS.sub(r"\1)", sql.replace("%s", "?"))
+
+    def execute(self, sql, params=None):
+        return self.conn.execute(self._sql(sql), params or ())
+
+    def executemany(self, sql, params_list):
+        self.batches += 1
+        return self.conn.executemany(self._sql(sql), params_list).rowcount
+
+    def query(self, sql, params=None):
+        self.queries += 1
+        return [dict(r) for r in self.conn.execute(self._sql(sql), params or ())]
+
+    def query_one(self, sql, params=None):
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+
+class FakeDB:
+    """返回预设结果的适配器替身，记录每次查询的 (sql, params)
+
+    respond 为固定结果列表，或按 (sql, params) 返回结果的函数，可在测试中重新赋值。
+    """
+
+    def __init__(self, respond=()):
+        self.respond = respond
+        self.calls = []
+
+    @property
+    def respond(self):
+        return self._respond
+
+    @respond.setter
+    def respond(self, respond):
+        if not callable(respond):
+            rows = list(respond)
+            respond = lambda sql, params: rows  # noqa: E731
+        self._respond = respond
+
+    @property
+    def params(self):
+        """各次查询的参数"""
+        return [params for _, params in self.calls]
+
+    def query(self, sql, params=None):
+        self.calls.append((sql, params))
+        return self.respond(sql, params)
+
+
+# 虚拟标签三张表（与 init_mysql_schema.sql 的列名一致）
+TAG_SCHEMA = """
+CREATE TABLE virtual_tags (id TEXT PRIMARY KEY, name TEXT, tag_key TEXT, tag_value TEXT,
+    priority INTEGER DEFAULT 0, created_at TEXT, updated_at TEXT);
+CREATE TABLE tag_rules (id TEXT PRIMARY KEY, tag_id TEXT, field TEXT, operator TEXT,
+    pattern TEXT, priority INTEGER DEFAULT 0);
+CREATE TABLE tag_matches (tag_id TEXT, resource_id TEXT, resource_type TEXT, account_id TEXT,
+    matched_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (tag_id, resource_id, resource_type, account_id));
+"""
+
+
+@pytest.fixture
+def db_schema():
+    """sqlite_db 的建表脚本，测试模块覆盖此夹具建自己的表"""
+    return ""
+
+
+@pytest.fixture
+def sqlite_db(db_schema):
+    """按 db_schema 建表的内存库"""
+    return SqliteDB(db_schema)
+
+
+@pytest.fixture
+def fake_db():
+    """返回预设结果的替身，测试中通过 fake_db.respond 设置结果"""
+    return FakeDB()
+
+
+@pytest.fixture
+def tag_db():
+    """包含虚拟标签表的内存库"""
+    return SqliteDB(TAG_SCHEMA)
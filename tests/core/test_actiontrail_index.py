@@ -0,0 +1,145 @@
+"""ActionTrail 事件索引单元测试"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.actiontrail_helper import ActionTrailHelper
+from cloudlens.core.actiontrail_index import TIME_FORMAT, ActionTrailEventIndex
+
+
+def _event(event_id, name, resource, days_ago):
+    when = datetime.utcnow() - timedelta(days=days_ago)
+    return {
+        "eventId": event_id,
+        "eventName": name,
+        "resourceName": resource,
+        "eventTime": when.strftime(TIME_FORMAT),
+        "sourceIPAddress": "10.0.0.1",
+    }
+
+
+class _FakeTrail:
+    """按时间窗口返回事件，记录查询窗口"""
+
+    def __init__(self, events):
+        self.events = events
+        self.windows = []
+
+    def __call__(self, index, provider, start, end):
+        self.windows.append((start, end))
+        lo, hi = start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)
+        return [e for e in self.events if lo <= e["eventTime"] <= hi]
+
+
+class _Provider:
+    account_name = "prod"
+    region = "cn-hangzhou"
+
+
+@pytest.fixture
+def trail(tmp_path):
+    fake = _FakeTrail([
+        _event("e1", "StopInstances", "i-1,i-2", 40),
+        _event("e2", "StopInstances", "i-1", 3),
+        _event("e3", "StartInstances", "i-1", 2),
+        _event("e4", "ModifyInstanceAttribute", "i-3", 1),
+        _event("e5", "ModifySecurityGroupAttribute", "sg-1", 20),
+    ])
+    ActionTrailEventIndex.invalidate()
+    index = ActionTrailEventIndex("prod", "cn-hangzhou", state_dir=str(tmp_path))
+    ActionTrailEventIndex._shared[("prod", "cn-hangzhou")] = index
+    with patch.object(ActionTrailEventIndex, "_lookup", autospec=True, side_effect=fake):
+        yield fake, index
+    ActionTrailEventIndex.invalidate()
+
+
+class TestActionTrailEventIndex:
+    """ActionTrailEventIndex测试类"""
+
+    def test_bulk_stop_times_single_sync(self, trail):
+        """测试: 多个实例的停机时间只触发一次批量拉取"""
+        fake, _ = trail
+        provider = _Provider()
+
+        times = ActionTrailHelper.get_instance_stop_times(provider, ["i-1", "i-2", "i-9"])
+        assert ActionTrailHelper.get_instance_stop_time(provider, "i-2") == times["i-2"]
+
+        assert len(fake.windows) == 1
+        assert times["i-1"] > times["i-2"]
+        assert times["i-9"] is None
+
+    def test_stopped_instances_annotated_per_region(self, trail):
+        """测试: 停止实例列表按区域读已有索引，同步在后台进行"""
+        fake, index = trail
+        regions = []
+
+        def provider_for_region(region):
+            regions.append(region)
+            return _Provider()
+
+        def stopped():
+            return [
+                {"id": "i-1", "region": "cn-hangzhou"},
+                {"id": "i-9", "region": "cn-hangzhou"},
+                {"id": "i-x"},
+            ]
+
+        # 索引尚未同步：不在调用线程拉取，先返回空停机时间
+        with patch.object(ActionTrailEventIndex, "sync_in_background") as background:
+            first = ActionTrailHelper.add_stop_times(stopped(), provider_for_region)
+        assert background.call_count == 1 and not fake.windows
+        assert first[0]["stopped_time"] is None
+
+        ActionTrailHelper.add_stop_times(stopped(), provider_for_region)
+        index._sync_future.result(timeout=5)
+        second = ActionTrailHelper.add_stop_times(stopped(), provider_for_region)
+
+        assert regions == ["cn-hangzhou"] * 3 and len(fake.windows) == 1
+        assert second[0]["stopped_time"] == ActionTrailHelper.get_instance_stop_time(_Provider(), "i-1")
+        assert second[1]["stopped_time"] is None
+        assert "stopped_time" not in second[2]
+
+    def test_failed_sync_backs_off(self, trail):
+        """测试: 首次全量拉取失败后记录错误，退避期内不再重试"""
+        fake, index = trail
+        with patch.object(ActionTrailEventIndex, "_lookup", side_effect=RuntimeError("throttled")):
+            assert ActionTrailHelper.get_instance_stop_times(_Provider(), ["i-1"]) == {"i-1": None}
+        assert index.last_error == "throttled" and index.backing_off()
+
+        assert index.sync_in_background(_Provider()) is False
+        assert ActionTrailHelper.get_instance_stop_times(_Provider(), ["i-1"]) == {"i-1": None}
+        assert not fake.windows
+
+        index.sync(_Provider(), force=True)
+        assert index.last_error is None and len(fake.windows) == 1
+
+    def test_history_and_config_changes_from_index(self, trail):
+        """测试: 操作历史按时间倒序并按回溯窗口过滤，配置变更跨资源查询"""
+        provider = _Provider()
+
+        history = ActionTrailHelper.get_resource_operation_history(provider, "i-1", lookback_days=30)
+        assert [h["event_name"] for h in history] == ["StartInstances", "StopInstances"]
+        filtered = ActionTrailHelper.get_resource_operation_history(
+            provider, "i-1", lookback_days=90, event_names=["StopInstances"]
+        )
+        assert len(filtered) == 2
+
+        changes = ActionTrailHelper.get_recent_config_changes(provider, lookback_days=7)
+        assert [c["resource_name"] for c in changes] == ["i-3"]
+
+    def test_incremental_and_backfill(self, trail, tmp_path):
+        """测试: 重新加载后从游标增量拉取，回溯窗口变长时只补拉缺的一段"""
+        fake, index = trail
+        index.sync(_Provider(), lookback_days=7)
+        fake.events.append(_event("e6", "StopInstances", "i-4", 0))
+
+        reloaded = ActionTrailEventIndex("prod", "cn-hangzhou", state_dir=str(tmp_path))
+        assert len(reloaded) == 3
+        reloaded.sync(_Provider(), lookback_days=30)
+
+        backfill, incremental = fake.windows[1:]
+        assert backfill[1] == index.covered_from
+        assert incremental[0] < index.cursor
+        assert reloaded.latest("i-4", ["StopInstances"])["eventId"] == "e6"
+        assert len(reloaded.events_for("i-1")) == 2
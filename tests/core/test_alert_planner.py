@@ -0,0 +1,170 @@
+"""告警规则批量评估单元测试"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.alert_engine import AlertEngine
+from cloudlens.core.alert_manager import Alert, AlertRule, AlertStorage
+from cloudlens.core.alert_planner import MetricKey, MetricPlanner, RuleEvaluationPlanner
+
+NOW = datetime(2024, 3, 11, 12, 0)
+
+
+ALERT_SCHEMA = """
+CREATE TABLE bill_items (account_id TEXT, billing_date TEXT, product_code TEXT, pretax_amount REAL);
+CREATE TABLE alerts (id TEXT PRIMARY KEY, rule_id TEXT, rule_name TEXT, severity TEXT, status TEXT,
+    title TEXT, message TEXT, metric_value REAL, threshold REAL, account_id TEXT, resource_id TEXT,
+    resource_type TEXT, triggered_at TEXT, acknowledged_at TEXT, resolved_at TEXT, closed_at TEXT,
+    metadata TEXT);
+"""
+
+
+BILLS = [
+    ("acc-a", "2024-03-11", "ecs", 30.0),
+    ("acc-a", "2024-03-02", "rds", 50.0),
+    ("acc-a", "2024-02-20", "ecs", 100.0),
+    ("acc-b", "2024-03-11", "oss", 5.0),
+    ("acc-b", "2024-03-05", "ecs", 20.0),
+]
+
+
+class _Bills:
+    def __init__(self, db):
+        self.db = db
+
+
+@pytest.fixture
+def db_schema():
+    return ALERT_SCHEMA
+
+
+@pytest.fixture
+def db(sqlite_db):
+    sqlite_db.insert("bill_items", BILLS)
+    return sqlite_db
+
+
+@pytest.fixture
+def storage(db):
+    with patch.object(AlertStorage, "_init_database"):
+        storage = AlertStorage(db_type="mysql")
+    storage.db = db
+    return storage
+
+
+def _rule(rule_id, metric, threshold, condition="gt", account="acc-a", cooldown=300):
+    return AlertRule(
+        id=rule_id,
+        name=rule_id,
+        metric=metric,
+        threshold=threshold,
+        condition=condition,
+        account_id=account,
+        cooldown_period=cooldown,
+    )
+
+
+class TestMetricPlanner:
+    """MetricPlanner测试类"""
+
+    def test_distinct_metrics_share_queries(self, db):
+        """测试: 不限时间和按日期的指标各用一次分组查询"""
+        planner = MetricPlanner(db)
+        keys = [
+            MetricKey("total_cost", "acc-a"),
+            MetricKey("cost_ecs", None),
+            MetricKey("daily_cost", "acc-a", "2024-03-11", "2024-03-11"),
+            MetricKey("monthly_cost", "acc-a", "2024-03-01", "2024-03-11"),
+            MetricKey("monthly_cost", None, "2024-03-01", "2024-03-11"),
+        ]
+
+        values = planner.compute(keys)
+
+        assert planner.queries == 2
+        assert [values[k] for k in keys] == [180.0, 150.0, 30.0, 80.0, 105.0]
+
+
+class TestRuleEvaluationPlanner:
+    """RuleEvaluationPlanner测试类"""
+
+    def test_bulk_conditions(self, db, storage):
+        """测试: 批量判断各类条件，相同指标只计算一次"""
+        rules = [
+            _rule("daily-gt", "daily_cost", 20),
+            _rule("daily-lt", "daily_cost", 20, "lt"),
+            _rule("monthly-eq", "monthly_cost", 80.001, "eq"),
+            _rule("ecs-b", "cost_ecs", 10, "gte", account="acc-b"),
+            _rule("unknown", "cpu_usage", 1),
+            _rule("no-threshold", "daily_cost", None),
+        ]
+        rules.append(AlertRule(id="disabled", name="d", metric="daily_cost", threshold=1, enabled=False))
+
+        planner = RuleEvaluationPlanner(storage, _Bills(db))
+        triggered = planner.evaluate(rules, now=NOW)
+
+        assert [(r.id, v) for r, v in triggered] == [("daily-gt", 30.0), ("monthly-eq", 80.0), ("ecs-b", 20.0)]
+        assert planner.last_cycle["metrics"] == 3
+        assert planner.last_cycle["queries"] == db.queries == 3
+        assert planner.last_cycle["evaluated"] == 4
+
+    def test_service_filter_and_tag_filter(self, db, storage):
+        """测试: service_filter 把指标限定到指定产品，设置 tag_filter 的规则不评估"""
+        rules = [
+            _rule("monthly-rds", "monthly_cost", 40),
+            _rule("total-ecs", "total_cost", 100, "gte"),
+            _rule("ecs-in-rds", "cost_ecs", 1, "lt"),
+            _rule("tagged", "daily_cost", 1),
+        ]
+        rules[0].service_filter = '["rds"]'
+        rules[1].service_filter = '{"services": ["ecs"]}'
+        rules[2].service_filter = '["rds"]'
+        rules[3].tag_filter = '{"env": "prod"}'
+
+        planner = RuleEvaluationPlanner(storage, _Bills(db))
+        triggered = planner.evaluate(rules, now=NOW)
+
+        assert [(r.id, v) for r, v in triggered] == [("monthly-rds", 50.0), ("total-ecs", 130.0), ("ecs-in-rds", 0.0)]
+        assert planner.last_cycle["evaluated"] == 3
+
+    def test_cooldown_from_one_query(self, db, storage):
+        """测试: 冷却期内的规则跳过，冷却期由一次分组查询判断"""
+        for rule_id, minutes_ago in [("cool", 1), ("cool", 30), ("expired", 10)]:
+            storage.create_alert(
+                Alert(
+                    id=f"{rule_id}-{minutes_ago}", rule_id=rule_id, rule_name=rule_id, severity="warning",
+                    status="triggered", title="t", account_id="acc-a",
+                    triggered_at=NOW - timedelta(minutes=minutes_ago),
+                )
+            )
+        rules = [_rule("cool", "daily_cost", 1), _rule("expired", "daily_cost", 1), _rule("fresh", "daily_cost", 1, cooldown=0)]
+
+        planner = RuleEvaluationPlanner(storage, _Bills(db))
+        triggered = planner.evaluate(rules, now=NOW)
+
+        assert [r.id for r, _ in triggered] == ["expired", "fresh"]
+        assert db.queries == 2
+        assert planner.latency_summary()["cycles"] == 1
+
+
+class TestAlertEngineCycle:
+    """AlertEngine批量检查测试类"""
+
+    def test_check_all_rules_saves_alerts(self, db, storage):
+        """测试: check_all_rules 走批量评估并保存告警，单条检查结果一致"""
+        rules = [_rule("daily-gt", "daily_cost", 20), _rule("quiet", "daily_cost", 100)]
+        engine = AlertEngine(storage, _Bills(db))
+
+        with patch.object(storage, "list_rules", return_value=rules), patch(
+            "cloudlens.core.alert_planner.datetime"
+        ) as clock:
+            clock.now.return_value = NOW
+            alerts = engine.check_all_rules()
+
+        assert [a.rule_id for a in alerts] == ["daily-gt"]
+        assert alerts[0].account_id == "acc-a" and alerts[0].metric_value == 30.0
+        assert storage.list_alerts(rule_id="daily-gt")[0].id == alerts[0].id
+        assert engine.last_cycle_stats["triggered"] == 1
+        # 刚触发的规则处于冷却期
+        with patch.object(storage, "get_rule", return_value=rules[0]):
+            assert engine.check_rule("daily-gt") is None
@@ -0,0 +1,187 @@
+"""异步端口扫描引擎单元测试"""
+import asyncio
+import socket
+import threading
+import time
+
+from cloudlens.core.async_port_scanner import AsyncPortScanner, DeepScanJobManager, ScanResultCache
+from cloudlens.core.progress_manager import ProgressManager
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Listeners:
+    """本地监听端口：连接后发送 banner，并记录连接时间与最大并发"""
+
+    def __init__(self, banners, hold=0.0):
+        self.banners = banners  # 顺序对应端口，None 表示不发送
+        self.hold = hold
+        self.ports = []
+        self.starts = []
+        self.active = 0
+        self.max_active = 0
+        self._servers = []
+
+    async def __aenter__(self):
+        for banner in self.banners:
+            server = await asyncio.start_server(self._handler(banner), "127.0.0.1", 0)
+            self._servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+        return self
+
+    async def __aexit__(self, *exc):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    def _handler(self, banner):
+        async def handle(reader, writer):
+            self.starts.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                if self.hold:
+                    await asyncio.sleep(self.hold)
+                if banner is not None:
+                    writer.write(banner.encode())
+                    await writer.drain()
+            finally:
+                self.active -= 1
+                writer.close()
+
+        return handle
+
+
+async def _scan(scanner, ips):
+    return [r async for r in scanner.stream(ips)]
+
+
+class TestAsyncPortScanner:
+    """AsyncPortScanner测试类"""
+
+    def test_open_closed_and_cve(self):
+        """测试: 识别开放端口、banner 和 CVE，关闭端口不计入"""
+
+        async def run():
+            async with _Listeners(["SSH-2.0-OpenSSH_7.2p2"]) as listeners:
+                scanner = AsyncPortScanner(ports=[listeners.ports[0], _closed_port()], connect_timeout=1)
+                return await _scan(scanner, ["127.0.0.1"]), listeners.ports[0]
+
+        (result,), port = asyncio.run(run())
+
+        assert [p["port"] for p in result["open_ports"]] == [port]
+        assert result["open_ports"][0]["version_info"]["version"] == "7.2"
+        assert {c["cve_id"] for c in result["cve_findings"]} >= {"CVE-2016-10009"}
+        assert result["risk_level"] == "CRITICAL"
+
+    def test_read_timeout(self):
+        """测试: 不发送 banner 的服务在读取超时后返回"""
+
+        async def run():
+            async with _Listeners([None], hold=5) as listeners:
+                scanner = AsyncPortScanner(ports=listeners.ports, read_timeout=0.2)
+                started = time.monotonic()
+                results = await _scan(scanner, ["127.0.0.1"])
+                return results, time.monotonic() - started
+
+        (result,), elapsed = asyncio.run(run())
+
+        assert elapsed < 2
+        assert result["open_ports"][0]["banner"] is None
+
+    def test_global_budget_and_host_pacing(self):
+        """测试: 全局并发预算和同主机建连间隔"""
+
+        async def run():
+            async with _Listeners(["x"] * 6, hold=0.1) as listeners:
+                scanner = AsyncPortScanner(ports=listeners.ports, concurrency=2, per_host=6, host_interval=0.03)
+                await _scan(scanner, ["127.0.0.1"])
+                return listeners
+
+        listeners = asyncio.run(run())
+
+        assert listeners.max_active <= 2
+        gaps = [b - a for a, b in zip(sorted(listeners.starts), sorted(listeners.starts)[1:])]
+        assert min(gaps) >= 0.025
+
+    def test_cache_skips_unchanged_endpoints(self):
+        """测试: banner 未变化的端点复用缓存，banner 变化后重新分析"""
+        cache = ScanResultCache()
+
+        async def run(banner):
+            async with _Listeners([banner]) as listeners:
+                scanner = AsyncPortScanner(ports=listeners.ports, cache=cache)
+                first = await _scan(scanner, ["127.0.0.1"])
+                second = await _scan(scanner, ["127.0.0.1"])
+                return first[0], second[0]
+
+        first, second = asyncio.run(run("SSH-2.0-OpenSSH_7.2"))
+        assert first["cached_ports"] == [] and len(second["cached_ports"]) == 1
+        assert second["cve_findings"] == first["cve_findings"]
+
+        changed, _ = asyncio.run(run("SSH-2.0-OpenSSH_9.0"))
+        assert changed["cached_ports"] == [] and changed["cve_findings"] == []
+
+    def test_streams_per_host(self):
+        """测试: 多主机按完成顺序逐台产出，重复IP去重"""
+
+        async def run():
+            async with _Listeners(["a"]) as listeners:
+                scanner = AsyncPortScanner(ports=listeners.ports)
+                return await _scan(scanner, ["127.0.0.1", "127.0.0.2", "127.0.0.1"])
+
+        results = asyncio.run(run())
+
+        assert sorted(r["ip"] for r in results) == ["127.0.0.1", "127.0.0.2"]
+
+
+class TestDeepScanJob:
+    """后台深度扫描任务测试类"""
+
+    def test_background_job_reports_progress(self, tmp_path):
+        """测试: 后台任务逐台追加结果并完成"""
+        manager = DeepScanJobManager()
+        manager.cache = ScanResultCache(tmp_path / "cache.json")
+        ports = [_closed_port(), _closed_port()]
+        completed = []
+
+        job_id = manager.submit(lambda: ["127.0.0.1", "127.0.0.1", "127.0.0.3"], on_complete=completed.append, ports=ports)
+        for _ in range(100):
+            progress = ProgressManager().get_progress(job_id)
+            if progress["status"] != "running":
+                break
+            time.sleep(0.05)
+
+        assert progress["status"] == "completed"
+        assert progress["result"]["count"] == 2
+        assert len(manager.get_results(job_id)) == 2
+        assert len(manager.get_results(job_id, offset=1)) == 1
+        assert len(completed[0]) == 2
+
+    def test_evicted_job_still_completes(self, tmp_path):
+        """测试: 运行中的任务结果被挤出保留数量后，任务仍正常完成"""
+        manager = DeepScanJobManager()
+        manager.cache = ScanResultCache(tmp_path / "cache.json")
+        job = {}
+        submitted = threading.Event()
+
+        def collect_ips():
+            submitted.wait(5)
+            with manager._results_lock:
+                manager._results.pop(job["id"])
+            return ["127.0.0.1"]
+
+        job["id"] = manager.submit(collect_ips, ports=[_closed_port()])
+        submitted.set()
+        for _ in range(100):
+            progress = ProgressManager().get_progress(job["id"])
+            if progress["status"] != "running":
+                break
+            time.sleep(0.05)
+
+        assert progress["status"] == "completed"
+        assert manager.get_results(job["id"]) is None
@@ -0,0 +1,92 @@
+"""审计日志分段存储单元测试"""
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.audit_logger import AuditAction, AuditLogger, AuditResult, _SegmentIndex
+
+
+def _write(log_dir, when, user="alice", action="login", resource_type=None, result="success"):
+    entry = {
+        "timestamp": when.isoformat(),
+        "user": user,
+        "action": action,
+        "resource": None,
+        "resource_type": resource_type,
+        "result": result,
+        "details": {},
+    }
+    with open(log_dir / f"audit_{when:%Y-%m-%d}.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+@pytest.fixture
+def audit(tmp_path):
+    return AuditLogger(log_dir=tmp_path)
+
+
+class TestAuditLogger:
+    """AuditLogger测试类"""
+
+    def test_reverse_chronological_with_filters(self, audit, tmp_path):
+        """测试: 按索引过滤并按时间倒序返回"""
+        base = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=3)
+        for i in range(6):
+            _write(tmp_path, base + timedelta(hours=i * 12), user="alice" if i % 2 else "bob", action="export_data")
+        _write(tmp_path, base + timedelta(hours=1), user="alice", result="failure")
+
+        logs = audit.query_logs(start_date=base - timedelta(days=1), user="alice", action=AuditAction.EXPORT_DATA)
+
+        assert [l["timestamp"] for l in logs] == [(base + timedelta(hours=h)).isoformat() for h in (60, 36, 12)]
+        failures = audit.query_logs(start_date=base - timedelta(days=1), result=AuditResult.FAILURE)
+        assert len(failures) == 1
+        assert audit.query_logs(start_date=base - timedelta(days=1), user="nobody") == []
+
+    def test_scan_stops_after_limit(self, audit, tmp_path):
+        """测试: 凑够 limit 后不再加载更早的分段"""
+        now = datetime.now()
+        for days in range(5):
+            _write(tmp_path, now - timedelta(days=days))
+
+        with patch.object(AuditLogger, "_load_index", wraps=audit._load_index) as load:
+            logs = audit.query_logs(start_date=now - timedelta(days=10), limit=2)
+
+        assert len(logs) == 2
+        assert load.call_count == 2
+
+    def test_index_catches_up_with_new_writes(self, audit):
+        """测试: 活跃分段只索引新追加的行"""
+        audit.log_operation("alice", AuditAction.LOGIN)
+        assert len(audit.query_logs()) == 1
+
+        (index,) = audit._indexes.values()
+        indexed = index.size
+
+        audit.log_operation("bob", AuditAction.LOGOUT, result=AuditResult.FAILURE)
+        with patch.object(_SegmentIndex, "extend", autospec=True, side_effect=_SegmentIndex.extend) as extend:
+            logs = audit.query_logs()
+
+        assert [l["user"] for l in logs] == ["bob", "alice"]
+        assert audit._indexes[f"{datetime.now():%Y-%m-%d}"] is index
+        assert extend.call_count == 1 and index.offsets[-1] == indexed
+
+    def test_cold_segments_compressed(self, audit, tmp_path):
+        """测试: 冷分段压缩后仍可查询，索引持久化"""
+        old = datetime.now() - timedelta(days=10)
+        _write(tmp_path, old, user="carol", resource_type="budget")
+        _write(tmp_path, old + timedelta(minutes=5), user="dave")
+
+        assert audit.compress_cold_segments() == 1
+        day = f"{old:%Y-%m-%d}"
+        assert not (tmp_path / f"audit_{day}.jsonl").exists()
+        assert (tmp_path / f"audit_{day}.jsonl.gz").exists()
+        assert (tmp_path / f"audit_{day}.idx.json").exists()
+
+        fresh = AuditLogger(log_dir=tmp_path)
+        logs = fresh.query_logs(start_date=old - timedelta(days=1), resource_type="budget")
+        assert [l["user"] for l in logs] == ["carol"]
+
+        audit.cleanup_old_logs(days=5)
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,120 @@
+"""增量备份单元测试"""
+from unittest.mock import patch
+
+import pytest
+from cryptography.fernet import Fernet
+
+from cloudlens.core.backup_chunk_store import ChunkStore
+from cloudlens.core.backup_manager import BackupManager
+from cloudlens.core.encryption import DataEncryption
+
+
+def _table_responder(cycles):
+    """模拟 SHOW TABLES 和账期指纹查询，cycles 为 账期 -> (行数, 最大ID, 金额)"""
+
+    def respond(sql, params):
+        if sql.startswith("SHOW TABLES"):
+            return [{"Tables_in_cloudlens": "users"}, {"Tables_in_cloudlens": "bill_items"}]
+        return [{"part": c, "row_count": n, "max_id": i, "total": t} for c, (n, i, t) in cycles.items()]
+
+    return respond
+
+
+class _FakeDump:
+    """按块生成导出内容并记录导出次数"""
+
+    def __init__(self, cycles):
+        self.cycles = cycles
+        self.calls = []
+
+    def __call__(self, manager, chunk, target):
+        self.calls.append((chunk["kind"], chunk["table"], chunk["part"]))
+        content = f"-- {chunk['kind']} {chunk['table']} {chunk['part']}\n"
+        if chunk["kind"] == "data" and chunk["part"]:
+            content += f"INSERT ... {self.cycles[chunk['part']]};\n" * 200
+        target.write_bytes(content.encode())
+
+
+@pytest.fixture
+def env(tmp_path, fake_db):
+    cycles = {"2024-01": (10, 10, 100.0), "2024-02": (20, 30, 200.0)}
+    manager = BackupManager(backup_dir=tmp_path / "backups", encrypt=False)
+    fake_db.respond = _table_responder(cycles)
+    manager._db = fake_db
+    dump = _FakeDump(cycles)
+    with patch.object(BackupManager, "_dump_chunk", autospec=True, side_effect=dump), patch.dict(
+        "os.environ", {"DB_TYPE": "mysql"}
+    ):
+        yield manager, dump
+
+
+class TestIncrementalBackup:
+    """增量备份测试类"""
+
+    def test_unchanged_cycles_reused(self, env):
+        """测试: 指纹未变化的账期不再导出，块按内容去重"""
+        manager, dump = env
+        first = manager.create_backup("first", include_files=False, incremental=True)
+        assert ("data", "bill_items", "2024-01") in dump.calls
+
+        dump.calls.clear()
+        dump.cycles["2024-02"] = (25, 35, 260.0)
+        dump.cycles["2024-03"] = (5, 40, 10.0)
+        manager.create_backup("second", include_files=False, incremental=True)
+
+        exported = [c for c in dump.calls if c[0] == "data" and c[1] == "bill_items"]
+        assert exported == [("data", "bill_items", "2024-02"), ("data", "bill_items", "2024-03")]
+        backups = {b["name"]: b for b in manager.list_backups()}
+        assert backups["second.manifest.json"]["reused_chunks"] == 5
+        assert backups["second.manifest.json"]["size"] < backups[first.name]["size"]
+        # 重新导出的结构块内容相同，只存一份
+        assert len(list(manager.chunk_store.digests())) == 8
+
+    def test_restore_runs_schema_before_data(self, env):
+        """测试: 恢复时先导入结构，再并行导入数据块"""
+        manager, _ = env
+        manifest = manager.create_backup("nightly", include_files=False, incremental=True)
+        applied = []
+
+        with patch.object(BackupManager, "_run_mysql", autospec=True, side_effect=lambda m, s: applied.append(b"".join(s))):
+            manager.restore_backup(manifest, restore_files=False)
+
+        kinds = [sql.split(b" ")[1] for sql in applied]
+        assert kinds[:3] == [b"routines", b"schema", b"schema"]
+        assert sorted(kinds[3:]) == [b"data"] * 3
+        assert any(b"(20, 30, 200.0)" in sql for sql in applied)
+
+    def test_cleanup_collects_unreferenced_chunks(self, env):
+        """测试: 删除旧备份后回收不再引用的块"""
+        manager, dump = env
+        old = manager.create_backup("old", include_files=False, incremental=True)
+        dump.cycles["2024-02"] = (21, 31, 201.0)
+        manager.create_backup("new", include_files=False, incremental=True)
+        before = set(manager.chunk_store.digests())
+
+        with patch.object(manager, "list_backups", return_value=[
+            {"path": str(old), "created_at": "2000-01-01T00:00:00"}
+        ]):
+            manager.cleanup_old_backups(days=1, keep_count=0)
+
+        assert not old.exists()
+        assert len(before - set(manager.chunk_store.digests())) == 1
+
+
+class TestChunkStore:
+    """ChunkStore测试类"""
+
+    def test_encrypted_frames_round_trip(self, tmp_path):
+        """测试: 多帧流式压缩加密后可完整还原"""
+        cipher = DataEncryption(Fernet.generate_key()).cipher
+        store = ChunkStore(tmp_path / "chunks", cipher=cipher)
+        source = tmp_path / "dump.sql"
+        source.write_bytes(b"".join(b"INSERT INTO t VALUES (%d);\n" % i for i in range(200000)))
+
+        with patch("cloudlens.core.backup_chunk_store.FRAME_SIZE", 64 * 1024):
+            written = store.put_file(source, "ab" * 32)
+            assert store.put_file(source, "ab" * 32) == 0
+
+        assert written > 0
+        assert store.read("ab" * 32) == source.read_bytes()
+        assert store.path("ab" * 32).name.endswith(".gz.enc")
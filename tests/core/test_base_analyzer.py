@@ -0,0 +1,80 @@
+"""BaseResourceAnalyzer 流水线单元测试"""
+import threading
+
+from cloudlens.core.base_analyzer import BaseResourceAnalyzer
+
+
+class _FakeAnalyzer(BaseResourceAnalyzer):
+    """每个区域3个实例，偶数编号闲置；记录批量钩子调用"""
+
+    def __init__(self, fail_region=None):
+        super().__init__("ak", "sk", "test")
+        self.fail_region = fail_region
+        self.metric_batches = []
+        self.cost_batches = []
+        self._lock = threading.Lock()
+
+    def get_resource_type(self):
+        return "fake"
+
+    def get_all_regions(self):
+        return ["r1", "r2", "r3"]
+
+    def get_instances(self, region):
+        if region == self.fail_region:
+            raise RuntimeError("region down")
+        return [{"InstanceId": f"{region}-i{i}", "n": i} for i in range(3)]
+
+    def get_metrics(self, region, instance_id, days=14):
+        return {"cpu": 1.0}
+
+    def get_metrics_many(self, region, instance_ids, days=14):
+        with self._lock:
+            self.metric_batches.append(list(instance_ids))
+        return super().get_metrics_many(region, instance_ids, days)
+
+    def get_cost_many(self, region, instance_ids):
+        with self._lock:
+            self.cost_batches.append(list(instance_ids))
+        return {i: 10.0 for i in instance_ids}
+
+    def is_idle(self, instance, metrics, thresholds=None):
+        return instance["n"] % 2 == 0, ["cpu低"]
+
+    def get_optimization_suggestions(self, instance, metrics):
+        return "降配"
+
+
+class TestBaseAnalyzerPipeline:
+    """analyze 流水线测试"""
+
+    def test_results_match_serial_order(self):
+        """测试: 结果内容与原串行流程一致且保持区域/实例顺序"""
+        analyzer = _FakeAnalyzer()
+
+        results = analyzer.analyze()
+
+        assert [r["instance"]["InstanceId"] for r in results] == [
+            "r1-i0", "r1-i2", "r2-i0", "r2-i2", "r3-i0", "r3-i2",
+        ]
+        assert all(r["cost"] == 10.0 and r["optimization"] == "降配" for r in results)
+        assert results[0]["region"] == "r1"
+
+    def test_batched_hooks_receive_single_region(self):
+        """测试: 批量钩子按区域分组调用，成本只查闲置实例"""
+        analyzer = _FakeAnalyzer()
+        analyzer.analyze()
+
+        for batch in analyzer.metric_batches + analyzer.cost_batches:
+            assert len({i.split("-")[0] for i in batch}) == 1
+        assert sorted(i for b in analyzer.cost_batches for i in b) == [
+            "r1-i0", "r1-i2", "r2-i0", "r2-i2", "r3-i0", "r3-i2",
+        ]
+
+    def test_failed_region_does_not_stop_others(self):
+        """测试: 单个区域失败不影响其他区域"""
+        analyzer = _FakeAnalyzer(fail_region="r2")
+
+        results = analyzer.analyze()
+
+        assert {r["region"] for r in results} == {"r1", "r3"}
@@ -0,0 +1,153 @@
+"""批量预算评估单元测试"""
+import json
+from datetime import datetime
+
+import pytest
+
+from cloudlens.core.budget_evaluator import BudgetEvaluator
+from cloudlens.core.budget_manager import AlertThreshold, Budget, BudgetStorage
+from cloudlens.core.cost_forecaster import CostForecaster
+
+
+BUDGET_SCHEMA = """
+CREATE TABLE bill_items (account_id TEXT, billing_cycle TEXT, billing_date TEXT,
+    product_name TEXT, pretax_amount REAL, updated_at TEXT DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE budget_records (id TEXT PRIMARY KEY, budget_id TEXT, date TEXT, spent REAL,
+    predicted REAL, UNIQUE (budget_id, date));
+"""
+
+BILL_COLUMNS = ["account_id", "billing_cycle", "billing_date", "product_name", "pretax_amount"]
+
+BILLS = [
+    ("acc-a", "2024-03", "2024-03-01", "ECS", 100.0),
+    ("acc-a", "2024-03", "2024-03-02", "RDS", 50.0),
+    ("acc-a", "2024-03", "2024-03-10", "ECS", 30.0),
+    ("acc-a", "2024-02", "2024-02-28", "ECS", 999.0),
+    ("acc-b", "2024-03", "2024-03-05", "OSS", 40.0),
+    ("acc-b", "2024-03", "", "OSS", 7.0),
+]
+
+
+def _budget(budget_id, account, amount, type_="total", services=None, alerts=(50, 80, 100)):
+    return Budget(
+        id=budget_id,
+        name=budget_id,
+        amount=amount,
+        period="monthly",
+        type=type_,
+        start_date=datetime(2024, 3, 1),
+        end_date=datetime(2024, 4, 1),
+        service_filter=json.dumps({"services": services}) if services else None,
+        alerts=[AlertThreshold(p) for p in alerts],
+        account_id=account,
+    )
+
+
+@pytest.fixture
+def db_schema():
+    return BUDGET_SCHEMA
+
+
+@pytest.fixture
+def db(sqlite_db):
+    sqlite_db.insert("bill_items", BILLS, BILL_COLUMNS)
+    return sqlite_db
+
+
+class TestBudgetEvaluator:
+    """BudgetEvaluator测试类"""
+
+    def test_one_query_for_all_budgets(self, db):
+        """测试: 多账号多预算共用一次分组查询"""
+        evaluator = BudgetEvaluator(db=db)
+        budgets = [_budget("total-a", "acc-a", 200), _budget("ecs-a", "acc-a", 100, "service", ["ECS"]), _budget("b", "acc-b", 100)]
+
+        statuses = evaluator.evaluate(budgets, now=datetime(2024, 3, 11))
+
+        assert db.queries == 2  # 账期版本 + 日汇总
+        assert [statuses[b].spent for b in ("total-a", "ecs-a", "b")] == [180.0, 130.0, 40.0]
+        evaluator.evaluate(budgets, now=datetime(2024, 3, 12))
+        assert db.queries == 2
+
+    def test_thresholds_and_prediction(self, db):
+        """测试: 向量化计算使用率、预测和触发的阈值"""
+        budget = _budget("total-a", "acc-a", 200, alerts=(50, 80, 100))
+        budget.alerts.append(AlertThreshold(60, enabled=False))
+
+        status = BudgetEvaluator(db=db).evaluate([budget, _budget("b", "acc-b", 0)], now=datetime(2024, 3, 11))["total-a"]
+
+        assert status.usage_rate == 90.0
+        assert status.remaining == 20.0
+        assert (status.days_elapsed, status.days_total) == (10, 31)
+        assert status.predicted_spend == pytest.approx(180.0 / 10 * 31)
+        assert status.predicted_overspend == pytest.approx(180.0 / 10 * 31 - 200)
+        assert [a["threshold"] for a in status.alerts_triggered] == [50, 80]
+
+    def test_counters_updated_on_ingest(self, db):
+        """测试: 账单入库只重新汇总该账期，并把差额累加到计数器"""
+        evaluator = BudgetEvaluator(db=db)
+        budgets = [_budget("total-a", "acc-a", 200), _budget("ecs-a", "acc-a", 100, "service", ["ECS"])]
+        evaluator.evaluate(budgets)
+
+        db.insert("bill_items", [("acc-a", "2024-03", "2024-03-11", "ECS", 20.0), ("acc-a", "2024-03", "2024-03-11", "SLB", 5.0)], BILL_COLUMNS)
+        evaluator.on_bills_ingested("acc-a", "2024-03")
+        evaluator.on_bills_ingested("acc-b", "2024-03")  # 未加载的账号不查询
+
+        assert db.queries == 4
+        statuses = evaluator.evaluate(budgets)
+        assert db.queries == 4
+        assert (statuses["total-a"].spent, statuses["ecs-a"].spent) == (205.0, 150.0)
+
+    def test_bills_from_other_process_detected(self, db):
+        """测试: 其他进程写入的账单（无入库钩子）按账期版本发现并只重算该账期"""
+        evaluator = BudgetEvaluator(db=db, refresh_seconds=0)
+        budgets = [_budget("total-a", "acc-a", 200), _budget("b", "acc-b", 100)]
+        assert evaluator.evaluate(budgets)["total-a"].spent == 180.0
+
+        db.insert("bill_items", [("acc-a", "2024-03", "2024-03-12", "ECS", 500.0)], BILL_COLUMNS)
+        statuses = evaluator.evaluate(budgets)
+
+        assert (statuses["total-a"].spent, statuses["b"].spent) == (680.0, 40.0)
+        assert evaluator.queries == 2  # 首次加载 + 只重算 acc-a 的 2024-03
+        evaluator.evaluate(budgets)
+        assert evaluator.queries == 2
+
+    def test_changed_budget_recomputed(self, db):
+        """测试: 预算范围变化后重新计算计数器，超出已加载范围时补查"""
+        evaluator = BudgetEvaluator(db=db)
+        budget = _budget("total-a", "acc-a", 200)
+        evaluator.evaluate([budget])
+
+        budget.start_date = datetime(2024, 2, 1)
+        status = evaluator.evaluate([budget])["total-a"]
+
+        assert db.queries == 4
+        assert status.spent == 1179.0
+
+
+class TestBudgetStorageBulk:
+    """BudgetStorage 批量状态测试类"""
+
+    def test_calculate_budget_statuses_records_in_one_batch(self, db, tmp_path, monkeypatch):
+        """测试: 批量计算并一次写入 budget_records"""
+        monkeypatch.setattr(CostForecaster, "_shared", CostForecaster(db=db, state_path=str(tmp_path / "models.npz")))
+
+        class _Bills:
+            pass
+
+        bills = _Bills()
+        bills.db = db
+        BudgetEvaluator.invalidate()
+        storage = BudgetStorage(db_type="mysql")
+        storage.db = db
+        budgets = [_budget("total-a", "acc-a", 200), _budget("b", "acc-b", 100)]
+
+        statuses = storage.calculate_budget_statuses(budgets, bills)
+        single = storage.calculate_budget_status(budgets[0], "acc-a", bills)
+        BudgetEvaluator.invalidate()
+
+        assert {k: s.spent for k, s in statuses.items()} == {"total-a": 180.0, "b": 40.0}
+        assert single.spent == 180.0
+        assert db.queries == 2
+        assert db.batches == 2
+        assert storage.get_spend_history("b")[0]["spent"] == 40.0
@@ -0,0 +1,217 @@
+"""CostForecaster 成本预测引擎单元测试"""
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from cloudlens.core.budget_evaluator import BudgetEvaluator
+from cloudlens.core.budget_manager import Budget
+from cloudlens.core.cost_forecaster import TOTAL, CostForecaster, backtest, fit_models, update_models
+from cloudlens.core.cost_predictor import CostPredictor
+
+
+def _weekly(days, base=100.0, slope=0.0, end=date(2024, 3, 31)):
+    """工作日 base，周末减半的日成本序列，最后一天为 end"""
+    start = end - timedelta(days=days - 1)
+    values = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        values.append((base + slope * i) * (0.5 if day.weekday() >= 5 else 1.0))
+    return np.array(values)
+
+
+def _daily_responder(rows):
+    """按日期范围（及账号过滤）返回 rows 中的 (账号, 日期, 产品) 日汇总"""
+
+    def respond(sql, params):
+        start, end, *accounts = params
+        return [
+            r for r in rows
+            if start <= r["billing_date"] <= end and (not accounts or r["account_id"] in accounts)
+        ]
+
+    return respond
+
+
+def _rows(account, product, values, end):
+    start = end - timedelta(days=len(values) - 1)
+    return [
+        {"account_id": account, "billing_date": (start + timedelta(days=i)).isoformat(),
+         "product_name": product, "total": float(v)}
+        for i, v in enumerate(values)
+    ]
+
+
+class TestForecastModels:
+    """fit_models/update_models测试类"""
+
+    def test_batch_fit_captures_weekly_seasonality(self):
+        """测试: 一次拟合多条序列，预测保留周末低谷"""
+        end = date(2024, 3, 31)  # 周日
+        y = np.vstack([_weekly(56, 100.0, end=end), _weekly(56, 10.0, slope=0.5, end=end)])
+        models = fit_models(y, [("a", "ecs"), ("a", "rds")], end)
+
+        forecast = models.forecast(7)  # 周一到周日
+        assert forecast.shape == (2, 7)
+        assert abs(forecast[0, 0] - 100.0) < 5 and abs(forecast[0, 5] - 50.0) < 5
+        assert forecast[1, 0] > y[1, -2]  # 上升趋势延续
+        assert models.r2[0] > 0.9
+
+    def test_incremental_update_matches_refit_state(self):
+        """测试: 逐日增量更新与一次性递推得到相同状态"""
+        end = date(2024, 3, 31)
+        y = _weekly(70, 80.0, slope=0.2, end=end)[None, :]
+        models = fit_models(y[:, :56], [("a", TOTAL)], end - timedelta(days=14))
+        for day in range(56, 70):
+            update_models(models, y[:, day:day + 1])
+
+        assert models.last_date == end
+        assert models.history.shape[1] == 70
+        full = update_models(fit_models(y[:, :56], [("a", TOTAL)], end - timedelta(days=14)), y[:, 56:])
+        assert np.allclose(models.level, full.level) and np.allclose(models.season, full.season)
+
+    def test_backtest_beats_linear_baseline(self):
+        """测试: 回测报告准确率和拟合耗时，季节性序列上优于线性基线"""
+        y = np.vstack([_weekly(84, 50.0 + i, slope=0.1 * i) for i in range(20)])
+        result = backtest(y, date(2024, 3, 31), holdout=14)
+
+        assert result["series"] == 20 and result["fit_seconds"] >= 0
+        assert result["model"]["wape"] < result["baseline"]["wape"]
+
+
+class TestCostForecaster:
+    """CostForecaster测试类"""
+
+    def test_refresh_fits_once_then_updates_incrementally(self, tmp_path, fake_db):
+        """测试: 首次全量拟合并落盘，之后只查询新增日期做增量更新"""
+        end = date(2024, 3, 31)
+        rows = _rows("acc", "ECS", _weekly(60, 100.0, end=end), end)
+        rows += _rows("acc", "OSS", np.full(60, 5.0), end)
+        fake_db.respond = _daily_responder(rows)
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+
+        forecaster.refresh(today=end + timedelta(days=2))
+        assert len(fake_db.calls) == 1
+        assert set(forecaster.models.keys) == {("acc", "ECS"), ("acc", "OSS"), ("acc", TOTAL)}
+
+        rows += _rows("acc", "ECS", [100.0, 100.0], end + timedelta(days=2))
+        forecaster.refresh(today=end + timedelta(days=4))
+        assert fake_db.params[-1] == ("2024-04-01", "2024-04-02")
+        assert forecaster.models.last_date == end + timedelta(days=2)
+
+        reloaded = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+        reloaded.refresh(today=end + timedelta(days=4))
+        assert len(fake_db.calls) == 2
+        prediction = reloaded.predict("acc", horizon=7)
+        assert len(prediction["costs"]) == 7 and prediction["lower"][0] <= prediction["costs"][0]
+
+    def test_cost_predictor_uses_forecaster(self, tmp_path, fake_db):
+        """测试: CostPredictor 返回结构不变，基于账单日成本预测"""
+        end = date.today() - timedelta(days=CostForecaster.SETTLE_DAYS)
+        fake_db.respond = _daily_responder(_rows("acc", "ECS", _weekly(30, 100.0, end=end), end))
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+
+        result = CostPredictor("acc", forecaster=forecaster).train_and_predict(10)
+
+        assert len(result["forecast"]["dates"]) == 10
+        assert len(result["history"]["dates"]) == 30
+        assert "Holt-Winters" in result["model_type"]
+        assert "error" in CostPredictor("missing", forecaster=forecaster).train_and_predict(10)
+
+    def test_refresh_stops_at_last_complete_day(self, tmp_path, fake_db):
+        """测试: 最近 SETTLE_DAYS 天可能未出全的账单不进入模型"""
+        end = date(2024, 3, 31)
+        fake_db.respond = _daily_responder(_rows("acc", "ECS", _weekly(60, 100.0, end=end), end))
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+
+        forecaster.refresh(today=end + timedelta(days=1))
+
+        assert forecaster.models.last_date == end - timedelta(days=1)
+        assert fake_db.params[0][1] == "2024-03-30"
+
+    def test_new_series_fitted_and_merged(self, tmp_path, fake_db):
+        """测试: 增量期间出现的新账号单独拟合后并入，可直接预测"""
+        end = date(2024, 3, 31)
+        rows = _rows("acc", "ECS", _weekly(60, 100.0, end=end), end)
+        fake_db.respond = _daily_responder(rows)
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+        forecaster.refresh(today=end + timedelta(days=2))
+
+        new_end = end + timedelta(days=2)
+        rows += _rows("acc", "ECS", [100.0, 100.0], new_end)
+        rows += _rows("new", "RDS", _weekly(30, 40.0, end=new_end), new_end)
+        forecaster.refresh(today=new_end + timedelta(days=2))
+
+        models = forecaster.models
+        assert fake_db.params[-1][1:] == ("2024-04-02", "new")
+        assert models.last_date == new_end and len(models) == 4
+        assert models.history.shape[1] == forecaster.HISTORY_DAYS
+        assert forecaster.predict("new", "RDS", horizon=7)["costs"][0] > 0
+        assert forecaster.predict("acc", horizon=7) is not None
+
+
+def _budget(budget_id, account, services=None):
+    return Budget(
+        id=budget_id,
+        name=budget_id,
+        amount=2500.0,
+        period="monthly",
+        type="service" if services else "total",
+        start_date=datetime(2024, 3, 1),
+        end_date=datetime(2024, 4, 1),
+        service_filter=json.dumps({"services": services}) if services else None,
+        account_id=account,
+    )
+
+
+class TestBudgetForecast:
+    """BudgetEvaluator 预测剩余支出测试类"""
+
+    def test_budgets_forecast_remaining_days(self, tmp_path, fake_db):
+        """测试: 明天起的剩余支出取自共享模型（计入周末低谷），没有序列的预算按日均外推"""
+        end = date(2024, 3, 16)
+        rows = _rows("acc", "ECS", _weekly(60, 100.0, end=end), end)
+        rows += _rows("acc", "OSS", np.full(60, 5.0), end)
+        fake_db.respond = _daily_responder(rows)
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+        evaluator = BudgetEvaluator(db=fake_db, forecaster=forecaster)
+        budgets = [_budget("total", "acc"), _budget("ecs", "acc", ["ECS"]), _budget("other", "missing")]
+        now = datetime(2024, 3, 18)
+        forecaster.refresh(now.date())
+
+        remaining = evaluator.forecast_remaining(budgets, now)
+        statuses = BudgetEvaluator.statuses([(b, 1700.0) for b in budgets], now, remaining)
+
+        # 3/19-3/31（今天已计入 spent）：9 个工作日 + 4 个周末日
+        assert remaining["ecs"] == pytest.approx(9 * 100.0 + 4 * 50.0, rel=0.05)
+        assert remaining["total"] == pytest.approx(remaining["ecs"] + 13 * 5.0, rel=0.01)
+        assert "other" not in remaining
+        assert statuses["ecs"].predicted_spend == pytest.approx(1700.0 + remaining["ecs"])
+        assert statuses["other"].predicted_spend == pytest.approx(1700.0 / 17 * 31)
+
+    def test_cold_model_fitted_in_background(self, tmp_path, fake_db):
+        """测试: 没有模型时不在请求中拟合，先按日均外推，后台拟合完成后使用模型"""
+        end = date(2024, 3, 16)
+        respond = _daily_responder(_rows("acc", "ECS", _weekly(60, 100.0, end=end), end))
+        release = threading.Event()
+
+        def slow(sql, params):
+            release.wait(5)
+            return respond(sql, params)
+
+        fake_db.respond = slow
+        forecaster = CostForecaster(db=fake_db, state_path=str(tmp_path / "models.npz"))
+        evaluator = BudgetEvaluator(db=fake_db, forecaster=forecaster)
+        budgets = [_budget("total", "acc")]
+        now = datetime(2024, 3, 18)
+
+        assert evaluator.forecast_remaining(budgets, now) == {}
+        assert evaluator.forecast_remaining(budgets, now) == {}
+        assert not forecaster.refresh_in_background(now.date())  # 同时只有一个后台刷新
+        release.set()
+        forecaster._refresh_future.result(timeout=30)
+
+        assert evaluator.forecast_remaining(budgets, now)["total"] == pytest.approx(1100.0, rel=0.05)
+        assert len(fake_db.calls) == 1
@@ -0,0 +1,78 @@
+"""成本快照时序存储单元测试"""
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from cloudlens.core.cost_history_store import CostHistoryStore
+from cloudlens.core.cost_trend_analyzer import CostTrendAnalyzer
+
+
+def _snapshot(ts, total, count=10):
+    return {
+        "timestamp": ts.isoformat(),
+        "account": "prod",
+        "total_cost": total,
+        "cost_by_type": {"ecs": total},
+        "cost_by_region": {"cn-hangzhou": total},
+        "resource_count": count,
+    }
+
+
+class TestCostHistoryStore:
+    """CostHistoryStore测试类"""
+
+    def test_append_and_range_read_by_segment(self, tmp_path):
+        """测试: 按月分段追加，区间读取只解析范围内的快照"""
+        store = CostHistoryStore(tmp_path, "prod")
+        start = datetime(2024, 1, 25)
+        for day in range(20):
+            store.append(_snapshot(start + timedelta(days=day), 100 + day))
+
+        assert store.segments() == ["2024-01", "2024-02"]
+        with patch("cloudlens.core.cost_history_store.json.loads", wraps=json.loads) as loads:
+            rows = store.read(start=datetime(2024, 2, 10), end=datetime(2024, 2, 12))
+        assert [r["total_cost"] for r in rows] == [117, 118]
+        assert loads.call_count == 2
+        assert len(store.series()) == 20
+
+    def test_downsample_weekly_and_monthly(self, tmp_path):
+        """测试: 周/月降采样取桶内最后一个快照并给出统计"""
+        store = CostHistoryStore(tmp_path, "prod")
+        for day in range(14):
+            store.append(_snapshot(datetime(2024, 3, 4) + timedelta(days=day), float(day)))
+
+        weekly = store.downsample("weekly")
+        assert [w["period"] for w in weekly] == ["2024-03-04", "2024-03-11"]
+        assert weekly[0]["total_cost"] == 6.0 and weekly[0]["samples"] == 7
+        assert weekly[0]["avg_cost"] == 3.0 and weekly[1]["min_cost"] == 7.0
+        assert len(store.downsample("monthly")) == 1
+
+    def test_retention_drops_whole_segments(self, tmp_path):
+        """测试: 保留期按整段删除，部分过期的分段保留"""
+        store = CostHistoryStore(tmp_path, "prod")
+        for month in (1, 2, 3):
+            store.append(_snapshot(datetime(2024, month, 15), 1.0))
+
+        dropped = store.apply_retention(days=30, now=datetime(2024, 3, 20))
+
+        assert dropped == ["2024-01"]
+        assert store.segments() == ["2024-02", "2024-03"]
+
+
+class TestCostTrendAnalyzerHistory:
+    """CostTrendAnalyzer成本历史测试类"""
+
+    def test_legacy_json_migrated_and_trend_read(self, tmp_path):
+        """测试: 旧版 JSON 历史首次使用时迁移，趋势从时序存储读取"""
+        now = datetime.now()
+        legacy = [_snapshot(now - timedelta(days=d), 200 - d) for d in (40, 3, 2, 1)]
+        (tmp_path / "cost_history_prod.json").write_text(json.dumps(legacy))
+
+        analyzer = CostTrendAnalyzer(data_dir=str(tmp_path))
+        analyzer._append_snapshot(_snapshot(now, 250), "prod")
+        history, analysis = analyzer.get_cost_trend("prod", days=30)
+
+        assert not (tmp_path / "cost_history_prod.json").exists()
+        assert [h["total_cost"] for h in history] == [197, 198, 199, 250]
+        assert analysis["latest_cost"] == 250
+        assert len(analyzer.get_cost_history_downsampled("prod", days=60, freq="monthly")) >= 1
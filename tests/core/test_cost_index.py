@@ -0,0 +1,160 @@
+"""CostIndex 成本索引单元测试"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from cloudlens.core.cost_index import CostIndex, resource_cost_map
+from cloudlens.core.optimization_engine import OptimizationEngine
+from cloudlens.resource_modules.disk_analyzer import DiskAnalyzer
+
+
+ROWS = [
+    # 按量付费日账单：10天共 100 元 -> 月均 300
+    {"instance_id": "i-payg", "subscription_type": "PayAsYouGo", "product_code": "ecs",
+     "total": 100.0, "cycles": 1, "days": 10, "last_date": "2024-03-10", "last_cycle": "2024-03"},
+    # 包年包月在窗口内一次出账 900 元，3个月摊销 -> 月均 300
+    {"instance_id": "i-sub", "subscription_type": "Subscription", "product_code": "ecs",
+     "total": 900.0, "cycles": 1, "days": 0, "last_date": None, "last_cycle": "2024-01"},
+    # 同一实例两种计费方式合并
+    {"instance_id": "rm-mix", "subscription_type": "Subscription", "product_code": "rds",
+     "total": 300.0, "cycles": 1, "days": 0, "last_date": None, "last_cycle": "2024-02"},
+    {"instance_id": "rm-mix", "subscription_type": "PayAsYouGo", "product_code": "rds",
+     "total": 40.0, "cycles": 2, "days": 0, "last_date": None, "last_cycle": "2024-03"},
+]
+
+
+class TestCostIndex:
+    """CostIndex测试类"""
+
+    def test_build_single_query(self, fake_db):
+        """测试: 一次查询构建索引，窗口账期正确"""
+        fake_db.respond = ROWS
+        index = CostIndex("acc", months=3, end_cycle="2024-03", db=fake_db).build()
+
+        assert fake_db.params == [("acc", "2024-01", "2024-03")]
+        assert len(index) == 3
+        assert index.monthly_cost("i-payg") == 300.0
+        assert index.monthly_cost("i-sub") == 300.0
+        assert index.monthly_cost("rm-mix") == 120.0  # 300/3 + 40/2
+        assert index.get("rm-mix").last_seen == "2024-03"
+        assert index.monthly_cost("i-missing") is None
+
+    def test_cost_map_filter(self, fake_db):
+        """测试: 按产品代码和ID前缀导出"""
+        fake_db.respond = ROWS
+        index = CostIndex("acc", months=3, end_cycle="2024-03", db=fake_db).build()
+
+        assert set(index.cost_map(product_codes=["ecs"])) == {"i-payg", "i-sub"}
+        assert set(index.cost_map(prefix="rm-")) == {"rm-mix"}
+        assert index.get_many(["i-payg", "nope"]) == {"i-payg": 300.0}
+
+    def test_shared_index_built_once(self, fake_db):
+        """测试: 同一账号共享索引只构建一次，失效后重建"""
+        CostIndex.invalidate()
+        fake_db.respond = ROWS
+
+        first = CostIndex.for_account("acc-shared", db=fake_db)
+        second = CostIndex.for_account("acc-shared", db=fake_db)
+        assert first is second
+        assert len(fake_db.calls) == 1
+
+        CostIndex.invalidate("acc-shared")
+        CostIndex.for_account("acc-shared", db=fake_db)
+        assert len(fake_db.calls) == 2
+        CostIndex.invalidate()
+
+    def test_slow_build_does_not_block_other_accounts(self, fake_db):
+        """测试: 一个账号构建时其他账号不被阻塞，同一账号的并发请求只构建一次"""
+        CostIndex.invalidate()
+        release = threading.Event()
+
+        def slow(sql, params):
+            if params[0] == "acc-slow":
+                release.wait(5)
+            return ROWS
+
+        fake_db.respond = slow
+        waiters = [threading.Thread(target=CostIndex.for_account, args=("acc-slow",), kwargs={"db": fake_db}) for _ in range(3)]
+        for t in waiters:
+            t.start()
+        time.sleep(0.05)
+
+        assert len(CostIndex.for_account("acc-fast", db=fake_db)) == 3
+        release.set()
+        for t in waiters:
+            t.join(5)
+        assert [p[0] for p in fake_db.params].count("acc-slow") == 1
+        CostIndex.invalidate()
+
+    def test_failed_build_cached_briefly(self, fake_db, monkeypatch):
+        """测试: 构建失败按空索引返回，只在短时间内复用"""
+        CostIndex.invalidate()
+
+        def broken(sql, params):
+            raise RuntimeError("db down")
+
+        fake_db.respond = broken
+        first = CostIndex.for_account("acc-down", db=fake_db)
+        assert first.failed and len(first) == 0
+        assert CostIndex.for_account("acc-down", db=fake_db) is first
+
+        monkeypatch.setattr(CostIndex, "FAILURE_TTL_SECONDS", 0)
+        fake_db.respond = ROWS
+        rebuilt = CostIndex.for_account("acc-down", db=fake_db)
+        assert not rebuilt.failed and len(rebuilt) == 3
+        CostIndex.invalidate()
+
+    def test_optimization_engine_prefers_bill_cost(self, fake_db):
+        """测试: 优化引擎节省金额优先使用账单成本"""
+        fake_db.respond = ROWS
+        index = CostIndex("acc", months=3, end_cycle="2024-03", db=fake_db).build()
+        engine = OptimizationEngine(cost_index=index)
+
+        assert engine._monthly_cost("rm-mix", 200) == 120.0
+        assert engine._monthly_cost("rm-other", 200) == 200
+
+    def test_callers_share_account_index(self, fake_db):
+        """测试: 分析器、优化引擎和成本表默认使用同一个账号共享索引"""
+        CostIndex.invalidate()
+        account = SimpleNamespace(name="prod", access_key_id="LTAI1234567890")
+        fake_db.respond = ROWS
+        shared = CostIndex.for_account("LTAI123456-prod", db=fake_db)
+
+        analyzer = DiskAnalyzer("LTAI1234567890", "secret", "prod")
+        analyzer.get_cost = lambda region, instance_id: 1.0
+        assert analyzer.get_cost_many("cn-hangzhou", ["i-payg", "d-x"]) == {"i-payg": 300.0, "d-x": 1.0}
+        assert analyzer.cost_index is shared
+
+        assert OptimizationEngine.for_account(account).cost_index is shared
+        assert resource_cost_map("rds", account) == {"rm-mix": 120.0}
+        assert resource_cost_map("unknown", account) == {}
+        CostIndex.invalidate()
+
+    def test_cost_map_fills_ids_missing_from_index(self, fake_db, monkeypatch):
+        """测试: 资源成本表以账单索引为准，索引中没有的实例由回退来源补齐"""
+        from cloudlens.resource_modules.cost_analyzer import CostAnalyzer
+        from web.backend import api_resources
+
+        CostIndex.invalidate()
+        account = SimpleNamespace(name="prod", access_key_id="LTAI1234567890", access_key_secret="secret")
+        fake_db.respond = ROWS
+        CostIndex.for_account("LTAI123456-prod", db=fake_db)
+        fallbacks = []
+
+        def bss(resource_type, account_config):
+            fallbacks.append(resource_type)
+            return {"i-payg": 1.0, "i-new": 50.0}
+
+        monkeypatch.setattr(api_resources, "_get_cost_map_from_billing", bss)
+        monkeypatch.setattr(CostAnalyzer, "__init__", lambda self, *args: None)
+        monkeypatch.setattr(CostAnalyzer, "get_cost_from_discount_analyzer", lambda self, t: [{"instance_id": "i-disc", "monthly_cost": 20}])
+        monkeypatch.setattr(CostAnalyzer, "get_cost_from_database", lambda self, t: [])
+
+        assert api_resources._get_cost_map("ecs", account, ["i-payg", "i-sub"]) == {"i-payg": 300.0, "i-sub": 300.0}
+        assert fallbacks == []
+        assert api_resources._get_cost_map("ecs", account, ["i-payg", "i-new"]) == {
+            "i-payg": 300.0, "i-sub": 300.0, "i-new": 50.0, "i-disc": 20.0,
+        }
+        assert fallbacks == ["ecs"]
+        CostIndex.invalidate()
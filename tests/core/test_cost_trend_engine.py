@@ -0,0 +1,170 @@
+"""CostTrendEngine 成本趋势查询引擎单元测试"""
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.cost_trend_analyzer import CostTrendAnalyzer
+from cloudlens.core.cost_trend_engine import CostTrendEngine
+
+
+SERIES = [
+    {"bucket": date(2024, 3, 4), "cost": 70.0, "instance_count": 3, "record_count": 20, "cycle_records": 0},
+    {"bucket": date(2024, 3, 11), "cost": 84.5, "instance_count": 4, "record_count": 22, "cycle_records": 2},
+]
+
+BREAKDOWN = [
+    {"product_name": "云服务器ECS", "region": "cn-hangzhou", "cost": 80.0},
+    {"product_name": "云服务器ECS", "region": "cn-beijing", "cost": 20.0},
+    {"product_name": "云数据库RDS", "region": "cn-hangzhou", "cost": 40.0},
+    {"product_name": "对象存储OSS", "region": None, "cost": 14.5},
+]
+
+
+TREND_SCHEMA = """
+CREATE TABLE bill_items (account_id TEXT, billing_cycle TEXT, billing_date TEXT, product_name TEXT,
+    region TEXT, instance_id TEXT, pretax_amount REAL);
+"""
+
+BILLS = [
+    ("acc", "2024-03", "2024-03-04", "ECS", "cn-hangzhou", "i-1", 10.0),  # 周一
+    ("acc", "2024-03", "2024-03-06", "ECS", "cn-hangzhou", "i-2", 20.0),
+    ("acc", "2024-03", "2024-03-10", "RDS", "cn-beijing", "rm-1", 5.0),  # 周日，与 3/4 同一周
+    ("acc", "2024-03", "2024-03-11", "ECS", "cn-hangzhou", "i-1", 7.0),
+    ("acc", "2024-03", "", "OSS", None, "", 3.0),  # 只有账期，按 3/1（周五）计
+    ("acc", "2024-03", "2024-03-12", "ECS", "cn-hangzhou", "i-3", None),  # 无金额
+    ("acc", "2024-02", "2024-02-29", "ECS", "cn-hangzhou", "i-1", 100.0),  # 范围之前
+    ("acc", "2024-02", "", "OSS", None, "", 50.0),  # 范围之前的账期
+    ("acc", "2024-04", "2024-04-01", "ECS", "cn-hangzhou", "i-1", 100.0),  # 范围之后
+    ("other", "2024-03", "2024-03-04", "ECS", "cn-hangzhou", "i-9", 100.0),
+]
+
+
+@pytest.fixture
+def db_schema():
+    return TREND_SCHEMA
+
+
+def _trend_responder(earliest=None):
+    """按查询类型返回预设的时间序列、产品/区域分布和最早账期"""
+
+    def respond(sql, params):
+        if "AS bucket" in sql:
+            return SERIES
+        if "product_name, region" in sql:
+            return BREAKDOWN
+        return [{"earliest_cycle": earliest}]
+
+    return respond
+
+
+class TestCostTrendEngine:
+    """CostTrendEngine测试类"""
+
+    def setup_method(self):
+        CostTrendEngine.invalidate()
+
+    def test_grouped_queries_to_arrays(self, fake_db):
+        """测试: 两次分组查询得到时间序列数组和产品/区域分布"""
+        fake_db.respond = _trend_responder()
+        series = CostTrendEngine(db=fake_db).query("acc", "2024-03-04", "2024-03-17", granularity="week")
+
+        assert len(fake_db.calls) == 2
+        assert "WEEKDAY" in fake_db.calls[0][0]
+        assert fake_db.calls[0][1] == ("acc", "2024-03-04", "2024-03-17", "2024-03", "2024-03")
+        assert list(series.periods) == ["2024-03-04", "2024-03-11"]
+        assert series.costs.dtype.kind == "f" and series.total_cost == 154.5
+        assert series.instance_counts.tolist() == [3, 4]
+        assert series.cycle_level_records == 2
+        assert series.top_products() == {"云服务器ECS": 100.0, "云数据库RDS": 40.0, "对象存储OSS": 14.5}
+        assert series.top_regions() == {"cn-hangzhou": 120.0, "cn-beijing": 20.0}
+        assert series.top_products(1) == {"云服务器ECS": 100.0, "其他": 54.5}
+
+    @pytest.mark.parametrize(
+        "granularity, periods, costs, instances, records",
+        [
+            ("day", ["2024-03-01", "2024-03-04", "2024-03-06", "2024-03-10", "2024-03-11"],
+             [3.0, 10.0, 20.0, 5.0, 7.0], [0, 1, 1, 1, 1], [1, 1, 1, 1, 1]),
+            ("week", ["2024-02-26", "2024-03-04", "2024-03-11"], [3.0, 35.0, 7.0], [0, 3, 1], [1, 3, 1]),
+            ("month", ["2024-03"], [45.0], [3], [5]),
+        ],
+    )
+    def test_grouped_queries_on_bill_rows(self, sqlite_db, granularity, periods, costs, instances, records):
+        """测试: 分桶和范围过滤在真实账单行上执行：周一为周起点，只有账期的明细按账期过滤"""
+        sqlite_db.insert("bill_items", BILLS)
+
+        series = CostTrendEngine(db=sqlite_db).query("acc", "2024-03-01", "2024-03-31", granularity=granularity)
+
+        assert list(series.periods) == periods
+        assert series.costs.tolist() == costs
+        assert series.instance_counts.tolist() == instances
+        assert series.record_counts.tolist() == records
+        assert series.cycle_level_records == 1
+        assert series.top_products() == {"ECS": 37.0, "RDS": 5.0, "OSS": 3.0}
+        assert series.top_regions() == {"cn-hangzhou": 37.0, "cn-beijing": 5.0}
+
+    def test_memoized_until_bills_ingested(self, fake_db):
+        """测试: 相同账号/范围/粒度命中缓存，账单入库失效后重新查询"""
+        fake_db.respond = _trend_responder()
+        engine = CostTrendEngine(db=fake_db)
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        assert len(fake_db.calls) == 2
+
+        engine.query("acc", "2024-03-01", "2024-03-31", granularity="month")
+        assert len(fake_db.calls) == 4
+
+        CostTrendEngine.invalidate("other")
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        assert len(fake_db.calls) == 4
+
+        CostTrendEngine.invalidate("acc")
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        assert len(fake_db.calls) == 6
+
+    def test_expired_entries_requeried(self, fake_db):
+        """测试: 缓存超过TTL后重新查询，其他进程入库的账单可见"""
+        fake_db.respond = _trend_responder(earliest="2024-03")
+        engine = CostTrendEngine(db=fake_db, ttl_seconds=0)
+
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        engine.query("acc", "2024-03-01", "2024-03-31")
+        engine.earliest_date("acc")
+        engine.earliest_date("acc")
+
+        assert len(fake_db.calls) == 6
+
+
+class TestCostTrendAnalyzerBills:
+    """CostTrendAnalyzer账单趋势测试类"""
+
+    def setup_method(self):
+        CostTrendEngine.invalidate()
+
+    def test_real_cost_from_engine(self, tmp_path, fake_db):
+        """测试: 账单趋势通过引擎查询，返回结构与图表字段不变"""
+        fake_db.respond = _trend_responder(earliest="2024-03")
+        analyzer = CostTrendAnalyzer(data_dir=str(tmp_path))
+        analyzer._trend_engine = CostTrendEngine(db=fake_db)
+
+        with patch.object(analyzer, "_resolve_bill_account_id", return_value="LTAI000000-prod"):
+            result = analyzer.get_real_cost_from_bills("prod", start_date="2024-03-04", end_date="2024-03-17")
+            everything = analyzer.get_real_cost_from_bills("prod", days=0, granularity="week")
+
+        assert result["data_source"] == "real_bills"
+        assert result["granularity"] == "day"
+        assert result["chart_data"] == {
+            "dates": ["2024-03-04", "2024-03-11"],
+            "costs": [70.0, 84.5],
+            "resource_counts": [3, 4],
+        }
+        assert result["analysis"]["trend"] == "上升" and result["analysis"]["mom_change"] == 14.5
+        assert result["cost_by_region"]["cn-hangzhou"] == 120.0
+        assert everything["analysis"]["period_days"] == 7
+        assert fake_db.calls[2][1] == ("LTAI000000-prod",)
+
+    def test_unknown_account(self, tmp_path):
+        """测试: 账号不存在时返回错误"""
+        analyzer = CostTrendAnalyzer(data_dir=str(tmp_path))
+        with patch.object(analyzer, "_resolve_bill_account_id", return_value=None):
+            assert "error" in analyzer.get_real_cost_from_bills("missing")
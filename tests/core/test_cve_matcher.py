@@ -0,0 +1,148 @@
+"""CVE 匹配器单元测试"""
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.cve_matcher import CVEMatcher, VersionRange, _ProductIndex, normalize_version
+
+
+@pytest.fixture(autouse=True)
+def empty_feed_dir(tmp_path):
+    CVEMatcher.reset()
+    with patch.object(CVEMatcher, "FEED_DIR", tmp_path / "none"):
+        yield
+    CVEMatcher.reset()
+
+
+NVD_11 = {
+    "CVE_Items": [
+        {
+            "cve": {
+                "CVE_data_meta": {"ID": "CVE-2099-0001"},
+                "description": {"description_data": [{"lang": "en", "value": "range bug"}]},
+            },
+            "configurations": {
+                "nodes": [
+                    {
+                        "operator": "OR",
+                        "cpe_match": [
+                            {
+                                "vulnerable": True,
+                                "cpe23Uri": "cpe:2.3:a:f5:nginx:*:*:*:*:*:*:*:*",
+                                "versionStartIncluding": "1.21.0",
+                                "versionEndExcluding": "1.23.2",
+                            },
+                            {"vulnerable": True, "cpe23Uri": "cpe:2.3:a:f5:nginx:1.25.0:*:*:*:*:*:*:*"},
+                            {"vulnerable": False, "cpe23Uri": "cpe:2.3:o:linux:linux_kernel:-:*:*:*:*:*:*:*"},
+                        ],
+                    }
+                ]
+            },
+            "impact": {"baseMetricV3": {"cvssV3": {"baseSeverity": "HIGH"}}},
+        }
+    ]
+}
+
+NVD_API2 = {
+    "vulnerabilities": [
+        {
+            "cve": {
+                "id": "CVE-2099-0002",
+                "descriptions": [{"lang": "en", "value": "redis bug"}],
+                "metrics": {"cvssMetricV31": [{"cvssData": {"baseSeverity": "CRITICAL"}}]},
+                "configurations": [
+                    {
+                        "nodes": [
+                            {
+                                "cpeMatch": [
+                                    {
+                                        "vulnerable": True,
+                                        "criteria": "cpe:2.3:a:redis:redis:*:*:*:*:*:*:*:*",
+                                        "versionEndIncluding": "7.0",
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ],
+            }
+        }
+    ]
+}
+
+
+class TestVersionRanges:
+    """版本区间编译测试类"""
+
+    def test_normalize_version(self):
+        """测试: 版本归一化忽略后缀和末尾的 0"""
+        assert normalize_version("OpenSSH_7.4p1") == (7, 4)
+        assert normalize_version("7.4.0") == normalize_version("7.4")
+        assert normalize_version("beta") is None
+
+    def test_parse_and_boundaries(self):
+        """测试: 区间表达式和边界开闭"""
+        between = VersionRange.parse("1.10.0 - 1.14.0")
+        conjunction = VersionRange.parse(">= 1.0, < 2.0")
+
+        assert between.contains((1, 10)) and between.contains((1, 14)) and not between.contains((1, 14, 1))
+        assert conjunction.contains((1,)) and not conjunction.contains((2,))
+        assert VersionRange.parse("~ 1.0") is None
+
+    def test_index_matches_linear_scan(self):
+        """测试: 区间索引与逐条判断结果一致"""
+        ranges = ["< 1.5", "1.2 - 2.0", "= 1.5", "> 1.5, <= 3", ">= 2.0"]
+        entries = [(f"v{i}", VersionRange.parse(r)) for i, r in enumerate(ranges)]
+        index = _ProductIndex([(type("V", (), {"id": vid})(), r) for vid, r in entries])
+
+        for version in [(1,), (1, 2), (1, 4, 9), (1, 5), (1, 5, 1), (2,), (3,), (3, 0, 1)]:
+            expected = [vid for vid, r in entries if r.contains(version)]
+            assert [v.id for v in index.lookup(version)] == expected
+
+
+class TestCVEMatcher:
+    """CVEMatcher测试类"""
+
+    def test_builtin_rules(self):
+        """测试: 内置规则匹配（产品名不区分大小写）"""
+        assert [m["id"] for m in CVEMatcher.match("OpenSSH", "7.2p2")] == ["CVE-2018-15473", "CVE-2016-10009"]
+        assert [m["id"] for m in CVEMatcher.match("apache", "2.4.50")] == ["CVE-2021-42013"]
+        assert CVEMatcher.match("Redis", "6.2.7") == []
+        assert CVEMatcher.match("Unknown", "1.0") == []
+
+    def test_lookup_memoized(self):
+        """测试: 相同 (产品, 版本) 只查一次索引，返回副本"""
+        first = CVEMatcher.match("Nginx", "1.14.0")
+        first[0]["id"] = "changed"
+
+        with patch.object(_ProductIndex, "lookup", side_effect=AssertionError):
+            again = CVEMatcher.match("Nginx", "1.14.0")
+
+        assert [m["id"] for m in again] == ["CVE-2021-23017", "CVE-2019-9511"]
+
+    def test_load_nvd_feeds(self, tmp_path):
+        """测试: 加载 NVD 1.1 (gzip) 和 API 2.0 格式的本地漏洞库"""
+        feed_11 = tmp_path / "nvd.json.gz"
+        with gzip.open(feed_11, "wt", encoding="utf-8") as f:
+            json.dump(NVD_11, f)
+        feed_api = tmp_path / "redis.json"
+        feed_api.write_text(json.dumps(NVD_API2), encoding="utf-8")
+
+        assert CVEMatcher.match("Nginx", "1.22.0") == []
+        assert CVEMatcher.load_feed(feed_11) == 2
+        assert CVEMatcher.load_feed(feed_api) == 1
+
+        assert [m["id"] for m in CVEMatcher.match("Nginx", "1.22.0")] == ["CVE-2099-0001"]
+        assert CVEMatcher.match("Nginx", "1.23.2") == []
+        assert CVEMatcher.match("Nginx", "1.25.0")[0]["severity"] == "HIGH"
+        assert [m["id"] for m in CVEMatcher.match("Redis", "6.0")] == ["CVE-2022-0543", "CVE-2099-0002"]
+        assert [m["id"] for m in CVEMatcher.match("Redis", "7.0.0")] == ["CVE-2099-0002"]
+
+    def test_feed_dir_loaded_on_first_use(self, tmp_path):
+        """测试: 本地漏洞库目录在首次匹配时自动加载"""
+        (tmp_path / "redis.json").write_text(json.dumps(NVD_API2), encoding="utf-8")
+
+        with patch.object(CVEMatcher, "FEED_DIR", tmp_path):
+            assert [m["id"] for m in CVEMatcher.match("redis", "7.0")] == ["CVE-2099-0002"]
@@ -0,0 +1,120 @@
+"""DiscountCube 折扣立方体单元测试"""
+from unittest.mock import patch
+
+import pytest
+
+from cloudlens.core.bill_storage import BillStorageManager
+from cloudlens.core.discount_analyzer_advanced import AdvancedDiscountAnalyzer
+from cloudlens.core.discount_cube import DiscountCube
+
+
+ROWS = [
+    # (账号, 账期, 产品, 区域, 计费方式, 实例, 实付, 折扣)
+    ("acc", "2024-01", "ECS", "cn-hangzhou", "Subscription", "i-1", 60.0, 40.0),
+    ("acc", "2024-01", "ECS", "cn-hangzhou", "Subscription", "i-1", 60.0, 40.0),
+    ("acc", "2024-01", "RDS", "cn-beijing", "PayAsYouGo", "rm-1", 90.0, 10.0),
+    ("acc", "2024-02", "ECS", "cn-hangzhou", "PayAsYouGo", "i-2", 80.0, 20.0),
+    ("acc", "2024-04", "ECS", "cn-beijing", "Subscription", "i-1", 50.0, 50.0),
+    ("other", "2024-01", "ECS", "cn-hangzhou", "Subscription", "i-9", 1.0, 1.0),
+]
+
+
+BILL_SCHEMA = """
+CREATE TABLE bill_items (account_id TEXT, billing_cycle TEXT, product_name TEXT, region TEXT,
+    subscription_type TEXT, instance_id TEXT, pretax_amount REAL, invoice_discount REAL);
+"""
+
+
+@pytest.fixture
+def db_schema():
+    return BILL_SCHEMA
+
+
+@pytest.fixture
+def bill_db(sqlite_db):
+    sqlite_db.insert("bill_items", ROWS)
+    return sqlite_db
+
+
+@pytest.fixture
+def analyzer(bill_db):
+    db = bill_db
+    DiscountCube.invalidate()
+    with patch.object(BillStorageManager, "_get_db", return_value=db):
+        yield AdvancedDiscountAnalyzer(), db
+    DiscountCube.invalidate()
+
+
+class TestDiscountCube:
+    """DiscountCube测试类"""
+
+    def test_rollup(self, bill_db):
+        """测试: 按维度上卷汇总并去重实例"""
+        cube = DiscountCube("acc", db=bill_db).build()
+
+        assert cube.cycles() == ["2024-01", "2024-02", "2024-04"]
+        by_product = cube.rollup(["product_name"], with_instances=True)
+        ecs = by_product[("ECS",)]
+        assert (ecs.paid, ecs.discount, ecs.records, ecs.instance_count) == (250.0, 150.0, 4, 2)
+        assert ecs.discount_rate == 150.0 / 400.0
+        assert set(cube.rollup(["region"], start="2024-02")) == {("cn-hangzhou",), ("cn-beijing",)}
+
+    def test_refresh_cycle_on_ingest(self, bill_db):
+        """测试: 账单入库后只重载该账期"""
+        DiscountCube.invalidate()
+        db = bill_db
+        cube = DiscountCube.for_account("acc", db=db)
+        assert db.queries == 1
+
+        db.insert("bill_items", [("acc", "2024-02", "OSS", "cn-hangzhou", "PayAsYouGo", "", 10.0, 0.0)])
+        DiscountCube.on_bills_ingested("acc", "2024-02")
+
+        assert DiscountCube.for_account("acc", db=db) is cube
+        assert db.queries == 2
+        assert cube.rollup(["billing_cycle"])[("2024-02",)].paid == 90.0
+        DiscountCube.invalidate()
+
+
+class TestAdvancedDiscountViews:
+    """折扣视图测试类"""
+
+    def test_views_answered_from_one_load(self, analyzer):
+        """测试: 多个视图共享一次立方体加载"""
+        analyzer, db = analyzer
+
+        quarterly = analyzer.get_quarterly_comparison("acc", quarters=0)
+        yearly = analyzer.get_yearly_comparison("acc")
+        regions = analyzer.get_region_discount_ranking("acc", months=99)
+        matrix = analyzer.get_product_region_matrix("acc")
+
+        assert db.queries == 1
+        assert [(q["period"], q["month_count"]) for q in quarterly["quarters"]] == [("2024-Q1", 2), ("2024-Q2", 1)]
+        assert yearly["years"][0]["total_paid"] == 340.0
+        assert [r["region"] for r in regions["regions"]] == ["cn-hangzhou", "cn-beijing"]
+        assert regions["regions"][1]["instance_count"] == 2
+        assert matrix["matrix"]["RDS"]["cn-hangzhou"] == {"discount_rate": 0, "total_paid": 0}
+
+    def test_moving_average_and_cumulative(self, analyzer):
+        """测试: 移动平均和累计折扣"""
+        analyzer, _ = analyzer
+
+        ma = analyzer.get_moving_average("acc", window_sizes=[2, 5])
+        cumulative = analyzer.get_cumulative_discount("acc")
+
+        rates = [r["rate"] for r in ma["original_data"]]
+        assert rates == pytest.approx([90 / 300, 0.2, 0.5])
+        assert [m["ma"] for m in ma["moving_averages"]["ma_2"]] == pytest.approx([None, (0.3 + 0.2) / 2, (0.2 + 0.5) / 2])
+        assert [m["ma"] for m in ma["moving_averages"]["ma_5"]] == [None, None, None]
+        assert [c["cumulative_discount"] for c in cumulative["cumulative_data"]] == [90.0, 110.0, 160.0]
+        assert cumulative["total_discount"] == 160.0
+
+    def test_subscription_types(self, analyzer):
+        """测试: 计费方式对比"""
+        analyzer, _ = analyzer
+
+        result = analyzer.get_subscription_type_comparison("acc", months=99)
+
+        sub = result["subscription_types"]["Subscription"]
+        assert (sub["total_paid"], sub["instance_count"], sub["avg_instance_cost"]) == (170.0, 1, 170.0 / 3)
+        assert result["rate_difference"] == pytest.approx(130 / 300 - 30 / 200)
+        assert [m["month"] for m in result["monthly_trends"]] == ["2024-01", "2024-02", "2024-04"]
@@ -0,0 +1,214 @@
+"""OpportunityStore 优化机会存储单元测试"""
+import threading
+import time
+
+from cloudlens.core.opportunity_store import OpportunityStore
+from cloudlens.core.optimization_engine import OptimizationEngine
+
+
+def _opp(resource_id, savings, action="release", resource_type="EIP", priority="high"):
+    return {
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "action": action,
+        "estimated_savings": savings,
+        "priority": priority,
+    }
+
+
+class TestOpportunityStore:
+    """OpportunityStore测试类"""
+
+    def test_running_aggregates_match_full_recompute(self):
+        """测试: 增删替换后滚动汇总与全量计算一致"""
+        store = OpportunityStore("prod")
+        store.replace_source("eip", [_opp("eip-1", 20), _opp("eip-2", 30)])
+        store.replace_source("ecs", [_opp("i-1", 100, "downgrade", "ECS", "medium")])
+        store.upsert(_opp("eip-2", 50), "eip")
+        store.remove("eip-1")
+
+        roi = store.roi()
+        expected = OptimizationEngine().calculate_roi([store.get("eip-2"), store.get("i-1")])
+        assert roi["monthly_savings"] == expected["monthly_savings"] == 150
+        assert roi["by_action"] == expected["by_action"]
+        assert roi["by_resource_type"] == expected["by_resource_type"]
+        assert roi["by_priority"] == {"high": 1, "medium": 1, "low": 0}
+        assert store.source_summary("eip") == {"count": 1, "savings": 50.0}
+
+    def test_replace_source_only_touches_changes(self):
+        """测试: 来源重新分析时只写入有变化的资源，消失的资源被移除"""
+        store = OpportunityStore("prod")
+        store.replace_source("disk", [_opp("d-1", 20), _opp("d-2", 20)])
+
+        written, removed = store.replace_source("disk", [_opp("d-1", 20), _opp("d-3", 10)])
+
+        assert (written, removed) == (1, 1)
+        assert [o["resource_id"] for o in store.top(source="disk")] == ["d-1", "d-3"]
+        assert store.top(limit=1)[0]["resource_id"] == "d-1"
+
+    def test_same_resource_from_several_sources(self):
+        """测试: 同一资源在不同来源下各自保存，移除和汇总可按来源限定"""
+        store = OpportunityStore("prod")
+        store.replace_source("ecs", [_opp("i-1", 30, "downgrade", "ECS", "medium")])
+        store.replace_source("idle_resources", [_opp("i-1", 100, "release", "ECS")])
+        store.replace_source("eip", [_opp("eip-1", 20)])
+        store.replace_source("unbound_eips", [_opp("eip-1", 20)])
+
+        assert store.get("i-1", "ecs")["action"] == "downgrade"
+        assert store.get("i-1")["action"] == "release"
+        assert store.roi(sources=["idle_resources", "unbound_eips"])["monthly_savings"] == 120.0
+        assert store.roi()["total_opportunities"] == 4
+
+        store.replace_source("ecs", [])
+        assert store.get("i-1", "ecs") is None and store.get("i-1", "idle_resources") is not None
+        store.remove("eip-1")
+        assert store.roi()["by_priority"] == {"high": 1, "medium": 0, "low": 0}
+
+    def test_reprice_after_bills_ingested(self):
+        """测试: 账单入库后按成本索引重新定价，只调整成本有变化的资源"""
+        OpportunityStore.invalidate()
+        store = OpportunityStore.for_account("prod")
+        store.replace_source("ecs", [
+            {**_opp("i-1", 100, "downgrade"), "_base_cost": 100, "_savings_ratio": 0.3},
+            {**_opp("i-2", 80), "_base_cost": 80, "_savings_ratio": 1.0},
+        ])
+        costs = {"i-1": 1000.0}
+        store.set_cost_lookup(costs.get)
+        assert store.roi()["monthly_savings"] == 380.0
+
+        costs["i-1"] = 2000.0
+        OpportunityStore.on_bills_ingested("LTAI123456-prod")
+        assert store.get("i-1")["estimated_savings"] == 600.0
+        assert store.roi()["monthly_savings"] == 680.0
+        OpportunityStore.invalidate()
+
+
+class TestOptimizationEngineStore:
+    """OptimizationEngine优化机会存储测试类"""
+
+    def setup_method(self):
+        OpportunityStore.invalidate()
+
+    def teardown_method(self):
+        OpportunityStore.invalidate()
+
+    def _engine(self, delay=0.05):
+        engine = OptimizationEngine()
+        active = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def loader(rows):
+            def load(tenant_name, resource_ids=None):
+                with lock:
+                    active["now"] += 1
+                    active["max"] = max(active["max"], active["now"])
+                time.sleep(delay)
+                with lock:
+                    active["now"] -= 1
+                if resource_ids is not None:
+                    return [r for r in rows if next(iter(r.values())) in set(resource_ids)]
+                return rows
+            return load
+
+        self.ecs_rows = [
+            {"instance_id": "i-idle", "instance_type": "ecs.g6.large", "monthly_cost": 300,
+             "metrics": {"cpu_utilization": 1, "memory_utilization": 5}},
+            {"instance_id": "i-busy", "instance_type": "ecs-g6.xlarge", "monthly_cost": 300,
+             "metrics": {"cpu_utilization": 60, "memory_utilization": 70}},
+        ]
+        engine._load_ecs = loader(self.ecs_rows)
+        engine._load_rds = loader([])
+        engine._load_eip = loader([{"allocation_id": "eip-1", "monthly_cost": 20, "instance_id": ""}])
+        engine._load_nat = loader([])
+        engine._load_nas = loader([])
+        engine._load_disk = loader([{"disk_id": "d-1", "monthly_cost": 15, "status": "Available"}])
+        return engine, active
+
+    def test_sub_analyses_run_concurrently(self):
+        """测试: 默认分析项并发执行，结果写入存储；其余分析项按需指定"""
+        engine, active = self._engine()
+
+        opportunities = engine.analyze_optimization_opportunities("prod")
+
+        assert active["max"] > 1
+        assert {o["resource_id"] for o in opportunities} == {"i-idle", "eip-1"}
+        assert not any(k.startswith("_") for o in opportunities for k in o)
+        assert OpportunityStore.for_account("prod").roi()["monthly_savings"] == 320
+
+        disks = engine.analyze_optimization_opportunities("prod", sources=["disk"])
+        assert [o["resource_id"] for o in disks] == ["d-1"]
+        assert OpportunityStore.for_account("prod").roi()["monthly_savings"] == 335
+
+    def test_resource_change_updates_single_entry(self):
+        """测试: 单个资源指标变化只重新评估该资源"""
+        engine, _ = self._engine(delay=0)
+        engine.analyze_optimization_opportunities("prod")
+        store = OpportunityStore.for_account("prod")
+
+        busy_now = {**self.ecs_rows[0], "metrics": {"cpu_utilization": 80, "memory_utilization": 80}}
+        engine.update_resources("prod", "ecs", [busy_now])
+        assert store.get("i-idle") is None
+        assert store.roi()["monthly_savings"] == 20
+
+        self.ecs_rows[1]["metrics"] = {"cpu_utilization": 10, "memory_utilization": 50}
+        engine.refresh_resources("prod", "ecs", ["i-busy"])
+        assert store.get("i-busy")["action"] == "downgrade"
+        assert store.roi()["monthly_savings"] == 110.0
+
+    def test_inventory_and_idle_events_update_store(self):
+        """测试: ECS 清单刷新和闲置分析完成后按差异更新对应来源"""
+        engine = OptimizationEngine()
+        store = OpportunityStore.for_account("prod")
+        inventory = [
+            {"id": "i-1", "name": "web", "region": "cn-hangzhou", "status": "Stopped", "cost": 100.0},
+            {"id": "i-2", "name": "db", "region": "cn-hangzhou", "status": "Running", "cost": 500.0},
+        ]
+
+        engine.on_inventory_refreshed("prod", "ecs", inventory)
+        engine.on_inventory_refreshed("prod", "rds", inventory)
+        assert store.source_summary("stopped_instances") == {"count": 1, "savings": 70.0}
+
+        inventory[0]["status"] = "Running"
+        inventory[1]["status"] = "Stopped"
+        engine.on_inventory_refreshed("prod", "ecs", inventory)
+        assert [o["resource_id"] for o in store.top(source="stopped_instances")] == ["i-2"]
+        assert store.get("i-2")["details"]["status"] == "Stopped"
+
+        engine.on_idle_analyzed("prod", [{"instance_id": "i-3", "name": "idle", "reasons": ["CPU低"]}])
+        engine.update_resources("prod", "unbound_eips", [{"id": "eip-1", "instance_id": ""}], complete=True)
+        assert store.get("i-3")["reason"] == "CPU低"
+        assert store.roi()["by_priority"] == {"high": 2, "medium": 1, "low": 0}
+
+        engine.on_idle_analyzed("prod", [])
+        assert store.get("i-3") is None and store.has_source("idle_resources")
+
+    def test_suggestion_total_matches_dashboard_sources(self):
+        """测试: 优化建议总节省只汇总建议来源，与仪表盘使用的来源一致"""
+        from web.backend.api_optimization import SUGGESTION_TYPES, _suggestions_from_store
+
+        store = OpportunityStore.for_account("prod")
+        store.replace_source("ecs", [_opp("i-1", 30, "downgrade", "ECS", "medium")])
+        store.replace_source("unbound_eips", [{**_opp("eip-1", 20), "details": {}}])
+
+        summary = _suggestions_from_store(store, "zh")["summary"]
+        assert set(SUGGESTION_TYPES) == set(OptimizationEngine.PUSHED_SOURCES)
+        assert summary["total_savings_potential"] == store.roi(sources=OptimizationEngine.PUSHED_SOURCES)["monthly_savings"] == 20.0
+
+    def test_cost_lookup_set_once_per_index(self):
+        """测试: 同一成本索引重复设置不触发全量重新定价，账单入库后才重新定价"""
+        store = OpportunityStore.for_account("prod")
+        store.replace_source("eip", [{**_opp("eip-1", 20), "_base_cost": 20, "_savings_ratio": 1.0}])
+        calls = []
+
+        def lookup(resource_id):
+            calls.append(resource_id)
+            return 30.0
+
+        store.set_cost_lookup(lookup, key=("LTAI123456-prod", 3))
+        store.roi()
+        store.set_cost_lookup(lookup, key=("LTAI123456-prod", 3))
+        store.roi()
+        assert calls == ["eip-1"]
+
+        OpportunityStore.on_bills_ingested("LTAI123456-prod")
+        assert store.roi()["monthly_savings"] == 30.0 and len(calls) == 2
@@ -0,0 +1,69 @@
+"""PriceCatalog 价格目录单元测试"""
+import threading
+import time
+
+from cloudlens.core.price_catalog import PriceCatalog
+
+
+class TestPriceCatalog:
+    """PriceCatalog测试类"""
+
+    def test_fetch_only_missing_skus(self):
+        """测试: 只查询未缓存的SKU，重复SKU去重"""
+        catalog = PriceCatalog()
+        calls = []
+
+        def fetch_many(skus):
+            calls.append(list(skus))
+            return {sku: sku[1] * 10 for sku in skus}
+
+        first = catalog.get_many([("ecs", 1), ("ecs", 1), ("ecs", 2)], fetch_many)
+        second = catalog.get_many([("ecs", 2), ("ecs", 3)], fetch_many)
+
+        assert first == {("ecs", 1): 10, ("ecs", 2): 20}
+        assert second == {("ecs", 2): 20, ("ecs", 3): 30}
+        assert calls == [[("ecs", 1), ("ecs", 2)], [("ecs", 3)]]
+
+    def test_failed_sku_not_cached(self):
+        """测试: 查询失败的SKU不缓存，下次重新查询"""
+        catalog = PriceCatalog()
+        calls = []
+
+        def fetch_many(skus):
+            calls.append(list(skus))
+            return {}
+
+        assert catalog.get_many(["a"], fetch_many) == {}
+        catalog.get_many(["a"], fetch_many)
+        assert calls == [["a"], ["a"]]
+
+    def test_ttl_expiry(self):
+        """测试: 过期价格重新查询"""
+        catalog = PriceCatalog(ttl_seconds=0.01)
+        catalog.put("a", 1)
+        assert catalog.get("a") == 1
+        time.sleep(0.02)
+        assert catalog.get("a") is None
+
+    def test_concurrent_requests_deduplicated(self):
+        """测试: 并发请求同一SKU只触发一次查询"""
+        catalog = PriceCatalog()
+        calls = []
+
+        def fetch_many(skus):
+            calls.append(list(skus))
+            time.sleep(0.05)
+            return {sku: 1 for sku in skus}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(catalog.get_many(["a"], fetch_many)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert calls == [["a"]]
+        assert results == [{"a": 1}] * 5
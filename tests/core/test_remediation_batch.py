@@ -0,0 +1,187 @@
+"""BatchRemediationExecutor 批量修复执行器单元测试"""
+import json
+import threading
+import time
+
+from cloudlens.core.remediation import RemediationAction, RemediationEngine, RemediationPlan
+from cloudlens.core.remediation_batch import BatchAction, BatchRemediationExecutor
+from cloudlens.core.remediation_engine import RemediationEngine as TagRemediationEngine
+
+
+def _plan(action, resource_id, region="cn-hangzhou", resource_type="ECS", **metadata):
+    metadata = {"region": region, "access_key": "ak", "secret_key": "sk", **metadata}
+    return RemediationPlan(action, resource_id, resource_type, "测试", metadata)
+
+
+class _Recorder:
+    """记录每次调用的资源ID，可指定失败的资源"""
+
+    def __init__(self, fail=(), delay=0.0):
+        self.calls = []
+        self.fail = set(fail)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, plans):
+        with self._lock:
+            self.calls.append([p.resource_id for p in plans])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {p.resource_id: ("失败" if p.resource_id in self.fail else None) for p in plans}
+
+
+class TestBatchRemediationExecutor:
+    """BatchRemediationExecutor测试类"""
+
+    def test_groups_by_region_and_action(self, tmp_path):
+        """测试: 按 (区域, 动作) 分组，多ID动作按上限切块，单ID动作逐个调用"""
+        stop, snapshot = _Recorder(delay=0.02), _Recorder(delay=0.02)
+        executor = BatchRemediationExecutor(
+            {
+                RemediationAction.STOP_INSTANCE: BatchAction(stop, 100),
+                RemediationAction.DELETE_SNAPSHOT: BatchAction(snapshot),
+            },
+            max_workers=4,
+            rate=1000,
+            state_dir=str(tmp_path),
+        )
+        plans = [_plan(RemediationAction.STOP_INSTANCE, f"i-{i}") for i in range(150)]
+        plans += [_plan(RemediationAction.STOP_INSTANCE, f"i-bj-{i}", region="cn-beijing") for i in range(10)]
+        plans += [_plan(RemediationAction.DELETE_SNAPSHOT, f"s-{i}", resource_type="Snapshot") for i in range(3)]
+
+        result = executor.run(plans)
+
+        assert sorted(len(c) for c in stop.calls) == [10, 50, 100]
+        assert all(len(c) == 1 for c in snapshot.calls) and len(snapshot.calls) == 3
+        assert result["api_calls"] == 6
+        assert (result["total"], result["success"], result["failed"]) == (163, 163, 0)
+        assert stop.max_active > 1  # 各块并发执行
+
+    def test_failures_are_per_resource_and_audited(self, tmp_path):
+        """测试: 单个资源失败和整块调用异常都按资源统计，每个资源都有审计记录"""
+        audited = []
+
+        def broken(plans):
+            raise RuntimeError("Throttling")
+
+        executor = BatchRemediationExecutor(
+            {
+                RemediationAction.STOP_INSTANCE: BatchAction(_Recorder(fail={"i-2"}), 100),
+                RemediationAction.RELEASE_EIP: BatchAction(broken),
+            },
+            rate=1000,
+            state_dir=str(tmp_path),
+            audit=lambda plan, error: audited.append((plan.resource_id, error)),
+        )
+        plans = [_plan(RemediationAction.STOP_INSTANCE, f"i-{i}") for i in range(3)]
+        plans.append(_plan(RemediationAction.RELEASE_EIP, "eip-1", resource_type="EIP"))
+
+        result = executor.run(plans)
+
+        assert (result["success"], result["failed"]) == (2, 2)
+        assert {d["resource_id"]: d["error"] for d in result["failed_details"]} == {
+            "i-2": "失败", "eip-1": "Throttling",
+        }
+        assert sorted(audited) == [("eip-1", "Throttling"), ("i-0", None), ("i-1", None), ("i-2", "失败")]
+
+    def test_resume_skips_completed_resources(self, tmp_path):
+        """测试: 用同一个 run_id 续跑时只重试未成功的资源"""
+        plans = [_plan(RemediationAction.STOP_INSTANCE, f"i-{i}") for i in range(5)]
+        first = _Recorder(fail={"i-3"})
+        run = BatchRemediationExecutor(
+            {RemediationAction.STOP_INSTANCE: BatchAction(first, 100)}, rate=1000, state_dir=str(tmp_path)
+        ).run(plans)
+        assert run["failed"] == 1
+
+        retry = _Recorder()
+        resumed = BatchRemediationExecutor(
+            {RemediationAction.STOP_INSTANCE: BatchAction(retry, 100)},
+            rate=1000,
+            run_id=run["run_id"],
+            state_dir=str(tmp_path),
+        ).run(plans)
+
+        assert retry.calls == [["i-3"]]
+        assert (resumed["skipped"], resumed["success"], resumed["failed"]) == (4, 5, 0)
+
+
+class TestRemediationEngineBatch:
+    """RemediationEngine批量执行测试类"""
+
+    def test_stop_instances_single_call(self, tmp_path, monkeypatch):
+        """测试: 停止实例合并为一次 StopInstances 调用并逐个解析结果"""
+
+        class FakeClient:
+            def __init__(self):
+                self.requests = []
+
+            def do_action_with_exception(self, request):
+                self.requests.append(request.get_query_params())
+                return json.dumps({"InstanceResponses": {"InstanceResponse": [
+                    {"InstanceId": "i-0", "Code": "200"},
+                    {"InstanceId": "i-1", "Code": "IncorrectInstanceStatus", "Message": "已停止"},
+                ]}})
+
+        client = FakeClient()
+        engine = RemediationEngine(dry_run=False)
+        monkeypatch.setattr(engine, "_batch_client", lambda plans: client)
+
+        result = engine.execute_batch(
+            [_plan(RemediationAction.STOP_INSTANCE, f"i-{i}") for i in range(2)], state_dir=str(tmp_path)
+        )
+
+        assert len(client.requests) == 1
+        assert client.requests[0]["InstanceId.2"] == "i-1"
+        assert (result["success"], result["failed"], result["api_calls"]) == (1, 1, 1)
+        assert result["failed_details"] == [{"resource_id": "i-1", "error": "已停止"}]
+
+    def test_dry_run_reports_planned_calls(self):
+        """测试: dry-run 不执行，只报告分组后的调用次数"""
+        engine = RemediationEngine(dry_run=True)
+        plans = [_plan(RemediationAction.ADD_TAGS, f"i-{i}", tags={"env": "prod"}) for i in range(120)]
+
+        result = engine.execute_batch(plans)
+
+        assert (result["success"], result["api_calls"], result["dry_run"]) == (120, 3, True)
+
+
+class TestRemediateTagsBatch:
+    """remediate_tags批量打标签测试类"""
+
+    def test_tags_in_batches_of_fifty(self, tmp_path):
+        """测试: 同区域同类型资源每50个一次 TagResources，审计逐个资源记录"""
+
+        class Resource:
+            def __init__(self, rid, region):
+                self.id = rid
+                self.region = region
+                self.tags = {"team": "a"} if rid.endswith("0") else {}
+                self.resource_type = "ecs"
+
+        class Provider:
+            def __init__(self):
+                self.calls = []
+
+            def tag_resources(self, resource_ids, tags, resource_type="ecs", region=None):
+                self.calls.append((region, len(resource_ids), tags))
+
+        resources = [Resource(f"i-{i}", "cn-hangzhou") for i in range(110)]
+        resources += [Resource(f"i-sh-{i}", "cn-shanghai") for i in range(5)]
+        provider = Provider()
+        engine = TagRemediationEngine(audit_dir=str(tmp_path))
+
+        result = engine.remediate_tags(resources, {"env": "prod", "owner": "ops"}, dry_run=False, provider=provider)
+
+        assert sorted((r, n) for r, n, _ in provider.calls) == [
+            ("cn-hangzhou", 10), ("cn-hangzhou", 50), ("cn-hangzhou", 50), ("cn-shanghai", 5),
+        ]
+        assert (result["success"], result["failed"], result["api_calls"]) == (115, 0, 4)
+        history = engine.get_audit_history(limit=200)
+        assert len(history) == 115
+        tagged = {h["resource_id"]: h["details"]["tags"] for h in history}
+        assert tagged["i-10"] == {"team": "a", "env": "prod", "owner": "ops"}
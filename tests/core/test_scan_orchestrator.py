@@ -0,0 +1,156 @@
+"""多账号扫描编排器单元测试"""
+import threading
+import time
+
+import pytest
+
+from cloudlens.core.scan_orchestrator import AccountQuota, ScanOrchestrator, ScanTask
+
+
+def _make_handlers(sleep=0.0, fail_once=None):
+    """list 阶段按 payload 中的 chunks 生成 analyze 任务；analyze 返回 chunk 编号"""
+    failed = set()
+    lock = threading.Lock()
+
+    def list_phase(task):
+        return [], [
+            ScanTask(task.account, task.region, "ecs", "analyze", {"chunk": i})
+            for i in range(task.payload["chunks"])
+        ]
+
+    def analyze_phase(task):
+        if sleep:
+            time.sleep(sleep)
+        if fail_once and task.task_id == fail_once:
+            with lock:
+                if task.task_id not in failed:
+                    failed.add(task.task_id)
+                    raise RuntimeError("boom")
+        return [f"{task.region}-{task.payload['chunk']}"], []
+
+    return {("ecs", "list"): list_phase, ("ecs", "analyze"): analyze_phase}
+
+
+class TestScanOrchestrator:
+    """ScanOrchestrator测试类"""
+
+    def test_run_collects_results_per_account(self):
+        """测试: 后续阶段任务被执行，结果按账号汇总"""
+        orch = ScanOrchestrator(_make_handlers(), max_workers=4, persist=False, default_rate=1000)
+        orch.submit(
+            [
+                ScanTask("a", "cn-hangzhou", "ecs", "list", {"chunks": 3}),
+                ScanTask("b", "cn-beijing", "ecs", "list", {"chunks": 2}),
+            ]
+        )
+
+        results = orch.run()
+
+        assert sorted(results["a"]) == ["cn-hangzhou-0", "cn-hangzhou-1", "cn-hangzhou-2"]
+        assert sorted(results["b"]) == ["cn-beijing-0", "cn-beijing-1"]
+        stats = orch.stats()
+        assert stats["accounts"]["a"]["tasks"] == 4
+        assert stats["phases"]["ecs:analyze"]["tasks"] == 5
+
+    def test_work_stealing_spreads_large_account(self):
+        """测试: 单个大账号的任务会被其他空闲 worker 偷走"""
+        orch = ScanOrchestrator(
+            _make_handlers(sleep=0.01),
+            max_workers=4,
+            persist=False,
+            quotas={"big": AccountQuota(rate=1000, max_concurrent=4)},
+        )
+        orch.submit([ScanTask("big", "cn-hangzhou", "ecs", "list", {"chunks": 40})])
+
+        start = time.monotonic()
+        results = orch.run()
+        elapsed = time.monotonic() - start
+
+        assert len(results["big"]) == 40
+        assert orch.stats()["steals"] > 0
+        assert elapsed < 40 * 0.01  # 明显快于串行
+
+    def test_account_concurrency_limit(self):
+        """测试: 账号并发上限生效"""
+        running = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def analyze_phase(task):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.01)
+            with lock:
+                running["now"] -= 1
+            return [1], []
+
+        orch = ScanOrchestrator(
+            {("ecs", "analyze"): analyze_phase},
+            max_workers=8,
+            persist=False,
+            quotas={"a": AccountQuota(rate=1000, max_concurrent=2)},
+        )
+        orch.submit([ScanTask("a", "r", "ecs", "analyze", {"chunk": i}) for i in range(10)])
+        orch.run()
+
+        assert running["max"] <= 2
+
+    def test_retry_failed_task(self):
+        """测试: 失败任务会重试"""
+        handlers = _make_handlers(fail_once="a|r|ecs|analyze|1")
+        orch = ScanOrchestrator(handlers, max_workers=2, persist=False, default_rate=1000)
+        orch.submit([ScanTask("a", "r", "ecs", "list", {"chunks": 3})])
+
+        results = orch.run()
+
+        assert sorted(results["a"]) == ["r-0", "r-1", "r-2"]
+        assert orch.errors == []
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        """测试: 用同一 run_id 续跑只执行未完成任务"""
+        handlers = _make_handlers()
+        orch = ScanOrchestrator(handlers, max_workers=2, run_id="run1", state_dir=str(tmp_path), default_rate=1000)
+        orch.submit([ScanTask("a", "r", "ecs", "list", {"chunks": 2})])
+        orch.run()
+
+        # 模拟崩溃：追加一个未完成的任务
+        orch.state.record_pending(ScanTask("a", "r", "ecs", "analyze", {"chunk": 9}))
+
+        executed = []
+        resumed_handlers = dict(handlers)
+        original = handlers[("ecs", "analyze")]
+
+        def tracking(task):
+            executed.append(task.task_id)
+            return original(task)
+
+        resumed_handlers[("ecs", "analyze")] = tracking
+        resumed = ScanOrchestrator(resumed_handlers, max_workers=2, run_id="run1", state_dir=str(tmp_path))
+        results = resumed.run()
+
+        assert executed == ["a|r|ecs|analyze|9"]
+        assert sorted(results["a"]) == ["r-0", "r-1", "r-9"]
+
+    def test_unknown_phase_rejected(self):
+        """测试: 未注册阶段直接报错"""
+        orch = ScanOrchestrator({}, persist=False)
+        with pytest.raises(ValueError):
+            orch.submit([ScanTask("a", "r", "ecs", "list")])
+
+    def test_unknown_follow_up_phase_fails_task(self):
+        """测试: 处理器产出未注册阶段的任务时该任务记为失败，运行正常结束不会挂起"""
+        handlers = {
+            ("ecs", "list"): lambda task: ([], [ScanTask(task.account, task.region, "ecs", "missing")]),
+            ("ecs", "analyze"): lambda task: (["ok"], []),
+        }
+        orch = ScanOrchestrator(handlers, max_workers=2, persist=False, default_rate=1000)
+        orch.submit([ScanTask("a", "r", "ecs", "list"), ScanTask("a", "r", "ecs", "analyze")])
+
+        done = {}
+        runner = threading.Thread(target=lambda: done.update(orch.run()), daemon=True)
+        runner.start()
+        runner.join(timeout=5)
+
+        assert not runner.is_alive()
+        assert done == {"a": ["ok"]}
+        assert [e["task_id"] for e in orch.errors] == ["a|r|ecs|list|0"]
@@ -0,0 +1,121 @@
+"""流式导出单元测试"""
+import csv
+import io
+import time
+from unittest.mock import patch
+
+import pytest
+from openpyxl import load_workbook
+
+from cloudlens.core.bill_storage import BillStorageManager
+from cloudlens.core.progress_manager import ProgressManager
+from cloudlens.core.streaming_export import (
+    ExportJobManager,
+    ExportSheet,
+    iter_csv,
+    iter_html,
+    write_xlsx,
+)
+
+
+def _rows(n, consumed=None):
+    for i in range(n):
+        if consumed is not None:
+            consumed.append(i)
+        yield [f"i-{i}", f"名称<{i}>", i * 1.5]
+
+
+class TestStreamingFormats:
+    """CSV / XLSX / HTML 流式生成测试类"""
+
+    def test_csv_chunks_lazily(self):
+        """测试: CSV 按行块输出，首块在读完所有行之前产出"""
+        consumed = []
+        chunks = iter_csv([ExportSheet("资源", ["ID", "名称", "成本"], _rows(2500, consumed))], chunk_rows=1000)
+
+        first = next(chunks)
+        assert len(consumed) == 1000
+        assert first.startswith("﻿".encode("utf-8"))
+
+        content = (first + b"".join(chunks)).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows[0] == ["ID", "名称", "成本"]
+        assert len(rows) == 2501
+
+    def test_csv_multiple_sections(self):
+        """测试: 多张表输出段标题并以空行分隔"""
+        sheets = [ExportSheet("A", ["x"], [[1]]), ExportSheet("B", ["y"], [[2]])]
+
+        rows = list(csv.reader(io.StringIO(b"".join(iter_csv(sheets)).decode("utf-8-sig"))))
+
+        assert rows == [["A"], ["x"], ["1"], [], ["B"], ["y"], ["2"]]
+
+    def test_write_only_xlsx(self, tmp_path):
+        """测试: 只写模式 XLSX 可被读回"""
+        path = tmp_path / "out.xlsx"
+        write_xlsx(str(path), [ExportSheet("资源列表", ["ID", "名称", "成本"], _rows(300))])
+
+        ws = load_workbook(path, read_only=True)["资源列表"]
+        values = list(ws.iter_rows(values_only=True))
+        assert values[0] == ("ID", "名称", "成本")
+        assert values[-1] == ("i-299", "名称<299>", 448.5)
+        assert len(values) == 301
+
+    def test_html_escapes_and_streams(self):
+        """测试: HTML 逐块渲染并转义单元格"""
+        parts = list(iter_html("报告", [ExportSheet("资源", ["ID", "名称", "成本"], _rows(5)), ExportSheet("空", ["x"], [])], chunk_rows=2))
+
+        html = "".join(parts)
+        assert len(parts) > 4
+        assert "名称&lt;3&gt;" in html and "名称<3>" not in html
+        assert "<td>6.00</td>" in html
+        assert "无数据" in html
+        assert html.rstrip().endswith("</html>")
+
+
+BILL_SCHEMA = """
+CREATE TABLE bill_items (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id TEXT,
+    billing_cycle TEXT, instance_id TEXT, pretax_amount REAL);
+"""
+
+
+@pytest.fixture
+def db_schema():
+    return BILL_SCHEMA
+
+
+class TestBillExport:
+    """账单明细分页导出测试类"""
+
+    def test_iter_bill_items_pages_by_id(self, sqlite_db):
+        """测试: 按主键分页读取全部行"""
+        sqlite_db.insert(
+            "bill_items",
+            [("acc", "2024-0%d" % (i % 3 + 1), f"i-{i}", float(i)) for i in range(25)],
+            columns=["account_id", "billing_cycle", "instance_id", "pretax_amount"],
+        )
+        with patch.object(BillStorageManager, "_get_db", return_value=sqlite_db):
+            storage = BillStorageManager()
+            rows = list(storage.iter_bill_items("acc", columns=["instance_id", "pretax_amount"], page_size=10))
+            count = storage.count_bill_items("acc", start_cycle="2024-02")
+
+        assert [r[0] for r in rows] == [f"i-{i}" for i in range(25)]
+        assert sqlite_db.queries == 4  # 3 页数据 + 1 次计数
+        assert count == len([i for i in range(25) if i % 3 != 0])
+
+    def test_background_export_job(self, tmp_path):
+        """测试: 后台导出任务完成后可取回文件"""
+        manager = ExportJobManager()
+        manager.export_dir = tmp_path
+
+        job_id = manager.submit("csv", "账单", lambda: [ExportSheet("账单", ["ID", "名称", "成本"], _rows(2100))], total_rows=2100)
+        for _ in range(100):
+            progress = ProgressManager().get_progress(job_id)
+            if progress["status"] != "running":
+                break
+            time.sleep(0.05)
+
+        assert progress["status"] == "completed"
+        assert progress["result"]["rows"] == 2100
+        with open(manager.get_file(job_id), encoding="utf-8-sig") as f:
+            assert len(f.read().splitlines()) == 2101
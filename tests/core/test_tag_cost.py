@@ -0,0 +1,186 @@
+"""虚拟标签成本归集单元测试"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cloudlens.core import tag_cost
+from cloudlens.core.cost_allocation import AllocationRule, CostAllocator
+from cloudlens.core.tag_cost import TagCostAttributor, recent_billing_cycles
+from cloudlens.core.virtual_tags import TagRule, VirtualTag, VirtualTagStorage
+
+
+BILL_SCHEMA = """
+CREATE TABLE bill_items (account_id TEXT, billing_cycle TEXT, billing_date TEXT,
+    product_code TEXT, instance_id TEXT, pretax_amount REAL);
+"""
+
+BILLS = [
+    ("bill-acc", "2024-01", "", "ecs", "i-1", 100.0),
+    ("bill-acc", "2024-02", "", "ecs", "i-1", 110.0),
+    ("bill-acc", "2024-02", "", "rds", "rm-1", 50.0),
+    ("bill-acc", "2024-02", "", "ecs", "i-2", 30.0),
+]
+
+
+@pytest.fixture
+def db_schema():
+    return BILL_SCHEMA
+
+
+@pytest.fixture
+def bill_db(sqlite_db, monkeypatch):
+    """账单库（与标签库分开），SQLite 标签存储经 MySQL 适配器查询账单时返回它"""
+    sqlite_db.insert("bill_items", BILLS)
+    monkeypatch.setattr(tag_cost, "DatabaseFactory", SimpleNamespace(create_adapter=lambda *args, **kwargs: sqlite_db))
+    return sqlite_db
+
+
+def _setup(db):
+    storage = VirtualTagStorage(db_type="mysql")
+    storage.db = db
+    storage.create_tag(VirtualTag("prod", "prod", "env", "prod", [TagRule("", "prod", "name", "starts_with", "prod-")]))
+    storage.create_tag(VirtualTag("db", "db", "role", "db", [TagRule("", "db", "type", "equals", "rds")]))
+    storage.sync_matches("acc", [
+        {"id": "i-1", "name": "prod-web", "type": "ecs"},
+        {"id": "rm-1", "name": "prod-db", "type": "rds"},
+        {"id": "i-2", "name": "dev-web", "type": "ecs"},
+    ])
+    # 之后按 SQLite 标签存储处理：tag_matches 所在库没有 bill_items
+    storage.db_type = "sqlite"
+    TagCostAttributor.invalidate()
+    return db, storage
+
+
+class TestTagCostAttributor:
+    """TagCostAttributor测试类"""
+
+    def test_recent_billing_cycles(self):
+        """测试: 最近账期按时间升序并跨年"""
+        assert recent_billing_cycles(3, "2024-02") == ["2023-12", "2024-01", "2024-02"]
+
+    def test_costs_by_tag_cached(self, tag_db, bill_db):
+        """测试: 按标签和账期归集，重复请求走缓存"""
+        db, _ = _setup(tag_db)
+        attributor = TagCostAttributor(db=db, bill_db=bill_db)
+        periods = ["2024-01", "2024-02"]
+
+        before = db.queries, bill_db.queries
+        costs = attributor.costs_by_tag(["prod", "db"], periods, "acc", "bill-acc")
+        assert (db.queries, bill_db.queries) == (before[0] + 1, before[1] + 1)
+        assert costs == {"prod": {"2024-01": 100.0, "2024-02": 160.0}, "db": {"2024-01": 0.0, "2024-02": 50.0}}
+
+        attributor.costs_by_tag(["prod", "db"], periods, "acc", "bill-acc")
+        assert (db.queries, bill_db.queries) == (before[0] + 1, before[1] + 1)
+        assert attributor.resource_counts(["prod", "db"], "acc") == {"prod": 2, "db": 1}
+
+    def test_only_affected_entries_recomputed(self, tag_db, bill_db):
+        """测试: 标签匹配变化只失效该标签的缓存"""
+        db, storage = _setup(tag_db)
+        attributor = TagCostAttributor.for_storage(storage)
+        attributor.costs_by_tag(["prod", "db"], ["2024-02"], "acc")
+
+        # i-2 改名后命中 prod，sync_matches 只失效 prod
+        storage.sync_matches("acc", [
+            {"id": "i-1", "name": "prod-web", "type": "ecs"},
+            {"id": "rm-1", "name": "prod-db", "type": "rds"},
+            {"id": "i-2", "name": "prod-api", "type": "ecs"},
+        ])
+        assert ("acc", "db", "2024-02") in TagCostAttributor._cache
+        assert ("acc", "prod", "2024-02") not in TagCostAttributor._cache
+        assert attributor.costs_by_tag(["prod"], ["2024-02"], "acc")["prod"]["2024-02"] == 190.0
+        TagCostAttributor.invalidate()
+
+    def test_cache_expires_after_ttl(self, tag_db, bill_db):
+        """测试: 其他进程写入的账单在缓存过期后可见"""
+        db, _ = _setup(tag_db)
+        attributor = TagCostAttributor(db=db, bill_db=bill_db, ttl_seconds=0)
+
+        attributor.costs_by_tag(["db"], ["2024-02"], "acc")
+        bill_db.insert("bill_items", [("bill-acc", "2024-02", "", "rds", "rm-1", 25.0)])
+
+        assert attributor.costs_by_tag(["db"], ["2024-02"], "acc")["db"]["2024-02"] == 75.0
+        TagCostAttributor.invalidate()
+
+    def test_for_storage_uses_storage_dialect(self, fake_db):
+        """测试: MySQL 标签存储按其连接、占位符和账号列同库 JOIN 账单"""
+        storage = SimpleNamespace(
+            _get_db=lambda: fake_db, _get_placeholder=lambda: "?", account_column="account_name", db_type="mysql"
+        )
+
+        TagCostAttributor.for_storage(storage).query(["prod"], ["2024-02"], "acc")
+
+        sql, params = fake_db.calls[0]
+        assert "JOIN bill_items" in sql and "%s" not in sql and "tm.account_name = ?" in sql
+        assert params == ("prod", "2024-02", "acc")
+
+    def test_separate_bill_db_filters_products(self, tag_db, bill_db):
+        """测试: 分库查询时按账号和产品过滤账单，一个实例计入其全部标签"""
+        db, storage = _setup(tag_db)
+
+        costs = TagCostAttributor.for_storage(storage).query(
+            ["prod", "db"], ["2024-02"], "acc", "bill-acc", product_codes=["rds"]
+        )
+
+        assert costs == {("prod", "2024-02"): 50.0, ("db", "2024-02"): 50.0}
+
+
+class TestTagBasedAllocation:
+    """按标签分配测试类"""
+
+    def test_allocates_attributed_cost(self, tag_db, bill_db):
+        """测试: 目标按其标签下资源的账单成本分配"""
+        db, storage = _setup(tag_db)
+        allocator = CostAllocator(storage=None, tag_storage=storage)
+        rule = AllocationRule(
+            id="r1",
+            name="by-tag",
+            method="tag_based",
+            account_id="bill-acc",
+            date_range="2024-02-01,2024-02-29",
+            allocation_targets=json.dumps([{"tag_id": "db"}, {"type": "tag", "key": "env", "value": "prod"}]),
+        )
+
+        allocations = allocator._allocate_tag_based(rule, [{"service": "ecs", "amount": 140.0}, {"service": "rds", "amount": 50.0}])
+
+        # rm-1 同时命中 db 和 prod，归集总额 210 超过源成本 190，按比例缩放
+        assert [round(a["amount"], 2) for a in allocations] == [round(50.0 * 190 / 210, 2), round(160.0 * 190 / 210, 2)]
+        assert round(sum(a["percentage"] for a in allocations), 6) == 100.0
+
+    def test_falls_back_to_equal(self, tag_db, bill_db):
+        """测试: 没有归集到成本时平均分配"""
+        _, storage = _setup(tag_db)
+        allocator = CostAllocator(storage=None, tag_storage=storage)
+        rule = AllocationRule(
+            id="r2",
+            name="by-tag",
+            method="tag_based",
+            date_range="2023-01-01,2023-01-31",
+            allocation_targets=json.dumps([{"tag_id": "db"}, {"tag_id": "prod"}]),
+        )
+
+        allocations = allocator._allocate_tag_based(rule, [{"service": "ecs", "amount": 100.0}])
+
+        assert [a["amount"] for a in allocations] == [50.0, 50.0]
+
+
+@pytest.mark.parametrize("module", ["web.backend.api_tags", "web.backend.api.v1.tags"])
+def test_costs_route_not_shadowed_by_tag_id(module, tag_db, bill_db, monkeypatch):
+    """测试: GET /virtual-tags/costs 经路由返回成本而不是被当作 tag_id"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    api = pytest.importorskip(module, exc_type=ImportError)
+    _, storage = _setup(tag_db)
+    monkeypatch.setattr(api, "_get_tag_storage", lambda: storage)
+    monkeypatch.setattr(api, "recent_billing_cycles", lambda months: ["2024-01", "2024-02"])
+    app = FastAPI()
+    app.include_router(api.router)
+
+    response = TestClient(app).get("/api/virtual-tags/costs")
+
+    assert response.status_code == 200
+    tags = {t["tag_id"]: t for t in response.json()["data"]["tags"]}
+    assert tags["prod"]["by_period"] == {"2024-01": 100.0, "2024-02": 160.0}
+    assert tags["db"]["total_cost"] == 50.0 and tags["prod"]["resource_count"] == 2
+    TagCostAttributor.invalidate()
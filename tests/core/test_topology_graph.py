@@ -0,0 +1,105 @@
+"""拓扑图模型单元测试"""
+from cloudlens.core.topology_generator import TopologyGenerator
+from cloudlens.core.topology_graph import TopologyGraph
+from cloudlens.models.resource import ResourceStatus, ResourceType, UnifiedResource
+
+
+def _ecs(instance_id, vpc="vpc-1", zone="cn-a", vswitch="vsw-1", status=ResourceStatus.RUNNING):
+    return UnifiedResource(
+        id=instance_id,
+        name=f"web-{instance_id}",
+        provider="aliyun",
+        region="cn-hangzhou",
+        zone=zone,
+        resource_type=ResourceType.ECS,
+        status=status,
+        private_ips=["10.0.0.1"],
+        vpc_id=vpc,
+        spec="ecs.g6.large",
+        raw_data={"VpcAttributes": {"VSwitchId": vswitch}} if vswitch else {},
+    )
+
+
+def _slb(slb_id, backends):
+    return UnifiedResource(
+        id=slb_id,
+        name="lb",
+        provider="aliyun",
+        region="cn-hangzhou",
+        resource_type=ResourceType.SLB,
+        vpc_id="vpc-1",
+        raw_data={
+            "MasterZoneId": "cn-a",
+            "VSwitchId": "vsw-1",
+            "BackendServers": {"BackendServer": [{"ServerId": b} for b in backends]},
+        },
+    )
+
+
+VPCS = [{"id": "vpc-1", "name": "prod", "cidr": "10.0.0.0/16"}, {"id": "vpc-2", "name": "dev", "cidr": "10.1.0.0/16"}]
+
+
+class TestTopologyGraph:
+    """TopologyGraph测试类"""
+
+    def test_build_hierarchy_and_edges(self):
+        """测试: 一次构建得到 VPC/可用区/交换机层级和 SLB 后端关联"""
+        graph = TopologyGraph.build(
+            [_ecs("i-1"), _ecs("i-2", zone="cn-b", vswitch=None), _ecs("i-3", vpc="vpc-2")],
+            VPCS,
+            slbs=[_slb("lb-1", ["i-1", "i-404"])],
+        )
+
+        assert [n.id for n in graph.children("vpc-1")] == ["vpc-1/cn-a", "vpc-1/cn-b"]
+        assert graph.nodes["i-1"].parent == "vsw-1"
+        assert graph.nodes["i-2"].parent == "vpc-1/cn-b"
+        assert list(graph.edges()) == [("lb-1", "i-1", "backend")]
+        assert graph.stats()["ecs"] == 3
+
+    def test_incremental_delta_moves_and_prunes(self):
+        """测试: 增量更新移动变更的资源，删除后清理空分组和关联"""
+        graph = TopologyGraph.build([_ecs("i-1"), _ecs("i-2", zone="cn-b", vswitch=None)], VPCS, slbs=[_slb("lb-1", ["i-1"])])
+
+        result = graph.apply_delta(upserts=[_ecs("i-2", vpc="vpc-2", vswitch=None)], removed=["i-1"])
+
+        assert result == {"upserted": 1, "removed": 1}
+        assert "vpc-1/cn-b" not in graph.nodes
+        assert graph.nodes["i-2"].parent == "vpc-2/cn-a"
+        assert list(graph.edges()) == []
+        assert graph.neighbors("lb-1") == {}
+
+    def test_collapsed_view_and_paged_json(self):
+        """测试: 超过阈值的分组折叠为计数节点（可展开），JSON 分页覆盖全部节点"""
+        instances = [_ecs(f"i-{n}", status=ResourceStatus.STOPPED if n % 4 == 0 else ResourceStatus.RUNNING) for n in range(120)]
+        graph = TopologyGraph.build(instances, VPCS, slbs=[_slb("lb-1", ["i-1", "i-2"])])
+
+        view = graph.collapsed(threshold=50)
+        cluster = view.nodes["vsw-1#ecs"]
+        assert cluster.attrs["count"] == 120 and cluster.attrs["status"]["Stopped"] == 30
+        assert "i-1" not in view.nodes
+        assert list(view.edges()) == [("lb-1", "vsw-1#ecs", "backend")]
+        assert "i-1" in graph.collapsed(threshold=50, expand=["vsw-1"]).nodes
+
+        seen, offset = [], 0
+        while offset is not None:
+            page = graph.to_json(offset=offset, limit=40)
+            seen.extend(n["id"] for n in page["nodes"])
+            offset = page["next_offset"]
+        assert len(seen) == len(set(seen)) == len(graph)
+        assert seen.index("vsw-1") < seen.index("i-0")
+
+    def test_exports(self):
+        """测试: Mermaid 按 VPC 导出且 subgraph 配对，DOT 含集群和关联"""
+        graph = TopologyGraph.build([_ecs("i-1"), _ecs("i-2", vpc="vpc-2", vswitch="vsw-2")], VPCS, slbs=[_slb("lb-1", ["i-1"])])
+
+        mermaid = dict((vpc.id, text) for vpc, text in graph.iter_mermaid())
+        assert "i_2" not in mermaid["vpc-1"] and "i_2" in mermaid["vpc-2"]
+        body = mermaid["vpc-1"].splitlines()
+        assert sum(l.strip().startswith("subgraph") for l in body) == sum(l.strip() == "end" for l in body) == 3
+        assert "lb_1 -->|backend| i_1" in mermaid["vpc-1"]
+
+        dot = graph.to_dot()
+        assert 'subgraph "cluster_vpc-1"' in dot and '"lb-1" -> "i-1"' in dot
+
+        report = TopologyGenerator.generate_markdown_report("prod", [_ecs("i-1")], VPCS)
+        assert "### prod (10.0.0.0/16)" in report
@@ -0,0 +1,141 @@
+"""虚拟标签编译引擎与 tag_matches 物化单元测试"""
+import random
+
+from cloudlens.core.virtual_tags import TagEngine, TagRule, VirtualTag, VirtualTagStorage
+
+
+def _tag(tag_id, rules, priority=0):
+    return VirtualTag(
+        id=tag_id,
+        name=tag_id,
+        tag_key="env",
+        tag_value=tag_id,
+        rules=[TagRule(f"{tag_id}-{i}", tag_id, f, op, p) for i, (f, op, p) in enumerate(rules)],
+        priority=priority,
+    )
+
+
+TAGS = [
+    _tag("prod", [("name", "starts_with", "prod-")], priority=10),
+    _tag("web", [("name", "ends_with", "-web"), ("region", "in", "cn-hangzhou, cn-beijing")]),
+    _tag("exact", [("id", "equals", "I-1")]),
+    _tag("db", [("name", "contains", "db")]),
+    _tag("num", [("name", "regex", r"-\d+$")]),
+    _tag("not-sh", [("region", "not_in", "cn-shanghai"), ("type", "equals", "rds")]),
+    _tag("empty", []),
+]
+
+
+def _storage(db):
+    storage = VirtualTagStorage(db_type="mysql")
+    storage.db = db
+    return storage
+
+
+def _random_resources(n, seed=7):
+    rnd = random.Random(seed)
+    names = ["prod-web", "prod-db-1", "test-web", "I-1", "dev-2", "DB-main", "x"]
+    regions = ["cn-hangzhou", "cn-beijing", "cn-shanghai", None]
+    return [
+        {
+            "id": rnd.choice(["I-1", f"i-{i}"]),
+            "name": rnd.choice(names) + rnd.choice(["", "-web", "-3"]),
+            "region": rnd.choice(regions),
+            "type": rnd.choice(["ecs", "rds"]),
+        }
+        for i in range(n)
+    ]
+
+
+class TestCompiledTagEngine:
+    """CompiledTagEngine测试类"""
+
+    def test_matches_reference_engine(self):
+        """测试: 编译引擎与逐规则匹配结果一致"""
+        engine = TagEngine.compile(TAGS)
+
+        for resource in _random_resources(500):
+            expected = {t.id for t in TAGS if TagEngine.match_tag(resource, t)}
+            assert set(engine.match(resource)) == expected, resource
+
+    def test_priority_order(self):
+        """测试: 匹配结果按标签优先级排序"""
+        engine = TagEngine.compile(TAGS)
+
+        matched = engine.match({"id": "i-9", "name": "prod-db-1", "region": "cn-hangzhou", "type": "ecs"})
+
+        assert matched[0] == "prod"
+        assert set(matched) == {"prod", "db", "num"}
+
+
+class TestTagMatchMaterialization:
+    """tag_matches 物化测试类"""
+
+    def test_sync_is_incremental(self, tag_db):
+        """测试: 同步只写入新增和删除的匹配"""
+        storage = _storage(tag_db)
+        storage.create_tag(_tag("prod", [("name", "starts_with", "prod-")]))
+        resources = [
+            {"id": "i-1", "name": "prod-a", "type": "ecs"},
+            {"id": "i-2", "name": "dev-b", "type": "ecs"},
+        ]
+
+        assert storage.sync_matches("acc", resources) == {"added": 1, "removed": 0, "total": 1}
+        assert storage.sync_matches("acc", resources) == {"added": 0, "removed": 0, "total": 1}
+
+        resources[1]["name"] = "prod-b"
+        resources.pop(0)
+        assert storage.sync_matches("acc", resources) == {"added": 1, "removed": 1, "total": 1}
+        assert [r["resource_id"] for r in storage.get_tag_resources("prod")] == ["i-2"]
+        assert [t.id for t in storage.get_resource_tags("i-2", "ecs", "acc")] == ["prod"]
+
+    def test_tag_change_rematerializes_only_that_tag(self, tag_db):
+        """测试: 标签新建/修改后按已知清单重算该标签"""
+        storage = _storage(tag_db)
+        storage.create_tag(_tag("prod", [("name", "starts_with", "prod-")]))
+        storage.sync_matches("acc", [{"id": "i-1", "name": "prod-a", "type": "ecs"}, {"id": "i-2", "name": "db-b", "type": "ecs"}])
+
+        storage.create_tag(_tag("db", [("name", "contains", "db")]))
+        assert [r["resource_id"] for r in storage.get_tag_resources("db", "acc")] == ["i-2"]
+
+        tag = storage.get_tag("prod")
+        tag.rules = [TagRule("", "prod", "name", "ends_with", "-b")]
+        storage.update_tag(tag)
+        assert [r["resource_id"] for r in storage.get_tag_resources("prod")] == ["i-2"]
+        assert [r["resource_id"] for r in storage.get_tag_resources("db")] == ["i-2"]
+
+    def test_inventory_refresh_resyncs_supported_types(self, tag_db):
+        """测试: 资源清单刷新后重算该类型的匹配，不支持的类型跳过"""
+        storage = _storage(tag_db)
+        storage.create_tag(_tag("prod", [("name", "starts_with", "prod-")]))
+        listed = [{"id": "i-1", "name": "prod-a", "type": "ecs", "status": "Running"}]
+
+        assert storage.on_inventory_refreshed("acc", "ecs", listed) == {"added": 1, "removed": 0, "total": 1}
+        assert storage.on_inventory_refreshed("acc", "ecs", []) == {"added": 0, "removed": 1, "total": 0}
+        assert storage.on_inventory_refreshed("acc", "vpc", listed) is None
+        assert storage.get_tag_resources("prod") == []
+
+    def test_delete_tag_removes_rules_and_matches(self, tag_db):
+        """测试: 删除标签时一并删除规则和匹配（SQLite 不做外键级联）"""
+        storage = _storage(tag_db)
+        storage.create_tag(_tag("prod", [("name", "starts_with", "prod-")]))
+        storage.sync_matches("acc", [{"id": "i-1", "name": "prod-a", "type": "ecs"}])
+
+        assert storage.delete_tag("prod")
+        assert tag_db.query("SELECT * FROM tag_rules WHERE tag_id = %s", ("prod",)) == []
+        assert tag_db.query("SELECT * FROM tag_matches WHERE tag_id = %s", ("prod",)) == []
+
+    def test_list_resource_dicts_rejects_unknown_type(self):
+        """测试: 不支持物化的资源类型直接报错，不再按ECS处理"""
+        import pytest
+
+        from cloudlens.core.virtual_tags import list_resource_dicts
+
+        class Provider:
+            def list_rds(self):
+                return [type("R", (), {"id": "rm-1", "name": "prod-db", "region": "cn-beijing"})()]
+
+        assert list_resource_dicts(Provider(), "rds")[0]["type"] == "rds"
+        with pytest.raises(ValueError):
+            list_resource_dicts(Provider(), "slb")
+
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+AsyncAliyunClient / AsyncAliyunProvider 单元测试（使用伪造的 aiohttp 会话）
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qsl
+
+import pytest
+
+from cloudlens.core.exceptions import APIError, NetworkError
+from cloudlens.providers.aliyun.async_client import AsyncAliyunClient, compute_signature
+from cloudlens.providers.aliyun.async_provider import AsyncAliyunProvider
+
+
+class _FakeResponse:
+    def __init__(self, status, payload):
+        self.status = status
+        self._payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self):
+        return json.dumps(self._payload)
+
+
+class _FakeSession:
+    """按 Action + PageNumber 返回预设响应"""
+
+    def __init__(self, handler, delay=0.0):
+        self.handler = handler
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def post(self, url, data, headers):
+        params = dict(parse_qsl(data))
+        self.calls.append((url, params))
+        session = self
+
+        class _Ctx:
+            async def __aenter__(self_inner):
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                try:
+                    if session.delay:
+                        await asyncio.sleep(session.delay)
+                finally:
+                    session.in_flight -= 1
+                status, payload = session.handler(params)
+                return _FakeResponse(status, payload)
+
+            async def __aexit__(self_inner, *exc):
+                return False
+
+        return _Ctx()
+
+
+def _ecs_page(page, per_page, total):
+    start = (page - 1) * per_page
+    instances = [
+        {
+            "InstanceId": f"i-{i:04d}",
+            "InstanceName": f"ecs-{i}",
+            "RegionId": "cn-hangzhou",
+            "ZoneId": "cn-hangzhou-h",
+            "Status": "Running",
+            "InstanceType": "ecs.g6.large",
+            "Cpu": 2,
+            "Memory": 8192,
+            "InstanceChargeType": "PostPaid",
+            "CreationTime": "2024-01-01T00:00Z",
+        }
+        for i in range(start, min(start + per_page, total))
+    ]
+    return {"TotalCount": total, "Instances": {"Instance": instances}, "RequestId": "r"}
+
+
+class TestAsyncAliyunClient:
+    """AsyncAliyunClient测试"""
+
+    def test_signed_request_params(self):
+        """测试: 请求携带公共参数且签名可复算"""
+        session = _FakeSession(lambda p: (200, {"RequestId": "r"}))
+        client = AsyncAliyunClient("ak", "sk", "cn-hangzhou", session=session)
+
+        asyncio.run(client.call("ecs", "DescribeRegions"))
+
+        url, params = session.calls[0]
+        assert url == "https://ecs.cn-hangzhou.aliyuncs.com/"
+        assert params["Action"] == "DescribeRegions"
+        assert params["RegionId"] == "cn-hangzhou"
+        signature = params.pop("Signature")
+        assert compute_signature(params, "sk", "POST") == signature
+
+    def test_api_error(self):
+        """测试: HTTP错误转换为APIError"""
+        session = _FakeSession(lambda p: (403, {"Code": "Forbidden.RAM", "Message": "denied"}))
+        client = AsyncAliyunClient("ak", "sk", "cn-hangzhou", session=session)
+
+        with pytest.raises(APIError) as exc_info:
+            asyncio.run(client.call("ecs", "DescribeInstances"))
+        assert exc_info.value.error_code == "Forbidden.RAM"
+
+    def test_timeout(self):
+        """测试: 单次调用超时"""
+        session = _FakeSession(lambda p: (200, {}), delay=0.5)
+        client = AsyncAliyunClient("ak", "sk", "cn-hangzhou", session=session)
+
+        with pytest.raises(NetworkError):
+            asyncio.run(client.call("ecs", "DescribeInstances", timeout=0.01))
+
+    def test_paginate_fetches_all_pages_concurrently(self):
+        """测试: 分页迭代器拉全所有页，剩余页并发且受并发上限约束"""
+        session = _FakeSession(lambda p: (200, _ecs_page(int(p["PageNumber"]), 10, 95)), delay=0.01)
+        client = AsyncAliyunClient("ak", "sk", "cn-hangzhou", max_concurrency=4, session=session)
+
+        items = asyncio.run(client.list_all("ecs", "DescribeInstances", "Instances.Instance", page_size=10))
+
+        assert [i["InstanceId"] for i in items] == [f"i-{i:04d}" for i in range(95)]
+        assert len(session.calls) == 10
+        assert 1 < session.max_in_flight <= 4
+
+
+class TestAsyncAliyunProvider:
+    """AsyncAliyunProvider测试"""
+
+    def test_list_resources_parallel(self):
+        """测试: 多资源并发获取，单类失败不影响其他"""
+
+        def handler(params):
+            if params["Version"] == "2014-05-26":
+                return 200, _ecs_page(int(params["PageNumber"]), 100, 3)
+            return 500, {"Code": "InternalError"}
+
+        session = _FakeSession(handler)
+        provider = AsyncAliyunProvider("test", "ak", "sk", "cn-hangzhou", session=session)
+
+        results = asyncio.run(provider.list_resources_parallel(["ecs", "rds"]))
+
+        assert [r.id for r in results["ecs"]] == ["i-0000", "i-0001", "i-0002"]
+        assert results["ecs"][0].spec == "ecs.g6.large"
+        assert results["rds"] == []
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+阿里云同步分页器单元测试
+"""
+
+import threading
+import time
+
+from cloudlens.providers.aliyun.paginator import paginate
+
+
+class _PageRequest:
+    """只支持页码翻页的请求对象"""
+
+    def set_PageSize(self, size):
+        self.size = size
+
+    def set_PageNumber(self, page):
+        self.page = page
+
+
+class _TokenRequest(_PageRequest):
+    """支持 NextToken/MaxResults 的请求对象"""
+
+    token = None
+
+    def set_MaxResults(self, size):
+        self.size = size
+
+    def set_NextToken(self, token):
+        self.token = token
+
+
+class _FakeApi:
+    """按页返回条目，记录调用和最大并发"""
+
+    def __init__(self, total, delay=0.0, total_key="TotalCount"):
+        self.total = total
+        self.delay = delay
+        self.total_key = total_key
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        with self._lock:
+            self.calls.append(request)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+
+        if isinstance(request, _TokenRequest):
+            start = int(request.token or 0)
+            end = min(start + request.size, self.total)
+            data = {"Items": {"Item": [{"Id": i} for i in range(start, end)]}}
+            if end < self.total:
+                data["NextToken"] = str(end)
+            return data
+
+        start = (request.page - 1) * request.size
+        items = [{"Id": i} for i in range(start, min(start + request.size, self.total))]
+        data = {"Items": {"Item": items}}
+        if self.total_key:
+            data[self.total_key] = self.total
+        return data
+
+
+class TestPaginate:
+    """paginate测试类"""
+
+    def test_pages_fetched_concurrently_in_order(self):
+        """测试: 首页得到总数后并发拉取，按页序产出，在途页数有上限"""
+        api = _FakeApi(total=950, delay=0.02)
+
+        items = list(paginate(api, _PageRequest, "Items.Item", page_size=100, prefetch=3))
+
+        assert [i["Id"] for i in items] == list(range(950))
+        assert len(api.calls) == 10
+        assert 1 < api.max_active <= 3
+
+    def test_token_pagination(self):
+        """测试: 支持令牌的接口按 NextToken 翻页"""
+        api = _FakeApi(total=250)
+
+        items = list(paginate(api, _TokenRequest, "Items.Item", page_size=100, use_token=True))
+
+        assert [i["Id"] for i in items] == list(range(250))
+        assert [c.token for c in api.calls] == [None, "100", "200"]
+
+    def test_token_falls_back_to_page_number(self):
+        """测试: SDK 请求不支持令牌时回退到页码翻页"""
+        api = _FakeApi(total=150)
+
+        items = list(paginate(api, _PageRequest, "Items.Item", page_size=100, use_token=True))
+
+        assert len(items) == 150
+        assert [c.page for c in api.calls] == [1, 2]
+
+    def test_without_total_and_early_stop(self):
+        """测试: 无总数字段时顺序翻页；调用方提前结束时不再拉取"""
+        api = _FakeApi(total=200, total_key="")
+        assert len(list(paginate(api, _PageRequest, "Items.Item", page_size=100))) == 200
+        assert [c.page for c in api.calls] == [1, 2, 3]
+
+        api = _FakeApi(total=5000)
+        stream = paginate(api, _PageRequest, "Items.Item", page_size=100, prefetch=2)
+        first = [next(stream) for _ in range(150)]
+        stream.close()
+
+        assert first[-1]["Id"] == 149
+        assert len(api.calls) <= 5
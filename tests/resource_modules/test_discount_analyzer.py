@@ -420,3 +420,63 @@ class TestDiscountAnalyzer:
         trade_price = 1000.0
         discount_rate = trade_price / original_price
         assert abs(discount_rate - 1.0) < 0.01
+
+    @patch("cloudlens.resource_modules.discount_analyzer.AcsClient")
+    def test_get_renewal_prices_dedupes_by_sku(self, mock_client_class):
+        """测试: ECS附属盘和带宽不在实例列表中，逐实例询价，再次查询命中缓存"""
+        from cloudlens.core.price_catalog import PriceCatalog
+
+        mock_client_class.return_value.do_action_with_exception.return_value = json.dumps(
+            {"PriceInfo": {"Price": {"OriginalPrice": 1000.0, "TradePrice": 600.0}}}
+        )
+        analyzer = DiscountAnalyzer("t", "ak", "sk", price_catalog=PriceCatalog())
+        instances = [
+            {
+                "InstanceId": f"i-{i}",
+                "InstanceName": f"ecs-{i}",
+                "InstanceChargeType": "PrePaid",
+                "InstanceType": "ecs.g6.large" if i < 3 else "ecs.g6.xlarge",
+            }
+            for i in range(4)
+        ] + [{"InstanceId": "i-post", "InstanceChargeType": "PostPaid", "InstanceType": "ecs.g6.large"}]
+
+        results = analyzer.get_renewal_prices(instances, "ecs")
+
+        assert [r["id"] for r in results] == ["i-0", "i-1", "i-2", "i-3"]
+        assert all(abs(r["discount_rate"] - 0.6) < 0.01 for r in results)
+        client = mock_client_class.return_value
+        assert client.do_action_with_exception.call_count == 4
+
+        analyzer.get_renewal_prices(instances, "ecs")
+        assert client.do_action_with_exception.call_count == 4
+
+    @patch("cloudlens.resource_modules.discount_analyzer.AcsClient")
+    def test_get_renewal_prices_keys_on_attached_storage(self, mock_client_class):
+        """测试: RDS规格和存储都相同才共用报价，存储不同或缺失时分别询价"""
+        from cloudlens.core.price_catalog import PriceCatalog
+
+        mock_client_class.return_value.do_action_with_exception.return_value = json.dumps(
+            {"PriceInfo": {"Price": {"OriginalPrice": 1000.0, "TradePrice": 800.0}}}
+        )
+        analyzer = DiscountAnalyzer("t", "ak", "sk", price_catalog=PriceCatalog())
+
+        def rds(instance_id, storage):
+            instance = {
+                "DBInstanceId": instance_id,
+                "Engine": "MySQL",
+                "DBInstanceClass": "mysql.n2.medium.1",
+                "PayType": "Prepaid",
+                "RegionId": "cn-beijing",
+                "DBInstanceStorageType": "cloud_essd",
+                "Category": "HighAvailability",
+            }
+            if storage is not None:
+                instance["DBInstanceStorage"] = storage
+            return instance
+
+        instances = [rds("rm-0", 100), rds("rm-1", 100), rds("rm-2", 500), rds("rm-3", None)]
+
+        results = analyzer.get_renewal_prices(instances, "rds")
+
+        assert [r["id"] for r in results] == ["rm-0", "rm-1", "rm-2", "rm-3"]
+        assert mock_client_class.return_value.do_action_with_exception.call_count == 3
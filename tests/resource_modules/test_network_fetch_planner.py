@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NetworkFetchPlanner 单元测试
+"""
+
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from cloudlens.resource_modules.network_analyzer import NetworkAnalyzer
+from cloudlens.resource_modules.network_fetch_planner import NetworkFetchPlanner
+
+
+class _FakeClient:
+    """按接口名返回固定数据，记录调用和最大并发"""
+
+    RESPONSES = {
+        "DescribeVpcs": {"Vpcs": {"Vpc": [{"VpcId": "vpc-1"}, {"VpcId": "vpc-2"}]}, "TotalCount": 2},
+        "DescribeVSwitches": {"VSwitches": {"VSwitch": [{"VSwitchId": "vsw-1"}]}, "TotalCount": 1},
+        "DescribeRouteTables": {
+            "RouteTables": {"RouteTable": [{"RouteTableId": "rtb-shared"}]},
+            "TotalCount": 1,
+        },
+        "DescribeRouteTableList": {
+            "RouterTableList": {
+                "RouterTableListType": [
+                    {"RouteEntrys": {"RouteEntry": [{"DestinationCidrBlock": "0.0.0.0/0"}]}}
+                ]
+            }
+        },
+        "DescribeNetworkAcls": {"NetworkAcls": {"NetworkAcl": []}},
+        "ListListeners": {"Listeners": [{"ListenerId": "lsn-1", "ListenerPort": 80}], "TotalCount": 1},
+        "GetListenerAttribute": {"HealthCheckConfig": {"HealthCheckEnabled": True}},
+        "ListServerGroups": {"ServerGroups": [{"ServerGroupId": "sgp-1"}], "TotalCount": 1},
+        "ListServerGroupServers": {"Servers": [{"ServerId": "i-1"}], "TotalCount": 1},
+    }
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_region_id(self):
+        return "cn-hangzhou"
+
+    def do_action_with_exception(self, request):
+        action = request.get_action_name()
+        with self._lock:
+            self.calls.append(action)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return json.dumps(self.RESPONSES.get(action, {})).encode()
+
+
+class TestNetworkFetchPlanner:
+    """NetworkFetchPlanner测试类"""
+
+    def _analyzer(self, client):
+        analyzer = NetworkAnalyzer("key", "secret", api_rate=1000)
+        analyzer._get_client = lambda region: client
+        return analyzer
+
+    def test_region_fan_out_matches_sequential_result(self):
+        """测试: 并发获取的结果与逐个获取一致，子资源并发执行"""
+        slbs = [{"InstanceId": f"alb-{n}", "LoadBalancerType": "alb"} for n in range(3)]
+        with patch(
+            "cloudlens.resource_modules.slb_analyzer.SLBAnalyzer.get_slb_instances",
+            side_effect=lambda self_, region=None: [dict(s) for s in slbs],
+            autospec=True,
+        ), patch("cloudlens.resource_modules.slb_analyzer.SLBAnalyzer.init_database"):
+            client = _FakeClient()
+            analyzer = self._analyzer(client)
+            planner = NetworkFetchPlanner(analyzer, max_workers=8)
+            try:
+                planned = planner.fetch_region("cn-hangzhou")
+            finally:
+                planner.close()
+
+            sequential = self._analyzer(_FakeClient(delay=0))
+            assert planned["vpcs"] == sequential.get_vpcs("cn-hangzhou")
+            assert planned["slbs"] == sequential.get_slb_detailed_info("cn-hangzhou")
+
+        assert planned["vpcs"][0]["RouteTables"][0]["Routes"][0]["DestinationCidrBlock"] == "0.0.0.0/0"
+        assert planned["slbs"][0]["Listeners"][0]["HealthCheck"]["HealthCheckEnabled"] is True
+        assert planned["slbs"][2]["ServerGroups"][0]["Servers"][0]["ServerId"] == "i-1"
+        assert client.max_active > 2
+
+    def test_repeated_requests_deduplicated_per_scan(self):
+        """测试: 同一次扫描内相同请求只调用一次，重置缓存后重新调用"""
+        client = _FakeClient(delay=0.01)
+        analyzer = self._analyzer(client)
+
+        threads = [
+            threading.Thread(target=analyzer.get_route_table_routes, args=("cn-hangzhou", "rtb-shared"))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        analyzer.get_route_table_routes("cn-hangzhou", "rtb-other")
+
+        assert client.calls.count("DescribeRouteTableList") == 2
+        assert analyzer.cache_hits == 4
+
+        analyzer.reset_scan_cache()
+        analyzer.get_route_table_routes("cn-hangzhou", "rtb-shared")
+        assert client.calls.count("DescribeRouteTableList") == 3
@@ -0,0 +1,66 @@
+"""UnifiedResource 紧凑存储单元测试"""
+import pickle
+from datetime import datetime
+
+import pytest
+
+from cloudlens.models.resource import ResourceStatus, ResourceType, UnifiedResource
+
+
+def _resource(**overrides):
+    values = dict(
+        id="i-1",
+        name="web",
+        provider="aliyun",
+        region="".join(["cn-", "hangzhou"]),
+        zone="cn-hangzhou-h",
+        resource_type=ResourceType.ECS,
+        status=ResourceStatus.RUNNING,
+        spec="".join(["ecs.", "g6.large"]),
+        raw_data={"InstanceId": "i-1", "CreationTime": datetime(2024, 1, 1), "Tags": {"Tag": []}},
+    )
+    values.update(overrides)
+    return UnifiedResource(**values)
+
+
+class TestUnifiedResource:
+    """UnifiedResource测试类"""
+
+    def test_slots_and_interned_strings(self):
+        """测试: 无实例字典，重复字符串共享同一对象"""
+        a, b = _resource(), _resource(id="i-2")
+
+        assert not hasattr(a, "__dict__")
+        assert a.region is b.region and a.spec is b.spec
+        with pytest.raises(AttributeError):
+            a.unknown_field = 1
+
+    def test_raw_data_compressed_and_decoded_on_access(self):
+        """测试: raw_data 压缩保存，访问时还原（保留原类型），可整体替换"""
+        resource = _resource()
+
+        assert isinstance(resource._raw, bytes)
+        assert resource.raw_data["CreationTime"] == datetime(2024, 1, 1)
+        resource.raw_data = {"k": "v"}
+        assert resource.raw_data == {"k": "v"}
+        assert _resource(raw_data=None).raw_data == {}
+
+    def test_decoded_raw_data_not_shared(self):
+        """测试: 相同原始数据的资源各自解码，就地修改不会串到其他资源"""
+        a, b = _resource(), _resource(id="i-2")
+
+        a.raw_data["Tags"]["Tag"].append({"Key": "env"})
+
+        assert a._raw == b._raw
+        assert b.raw_data["Tags"] == {"Tag": []} and a.raw_data["Tags"] == {"Tag": []}
+
+    def test_to_dict_equality_and_pickle(self):
+        """测试: to_dict 可省略 raw_data，比较与序列化保持原语义"""
+        resource = _resource(public_ips=["1.1.1.1"])
+
+        assert "raw_data" not in resource.to_dict(include_raw=False)
+        assert resource.to_dict()["raw_data"]["InstanceId"] == "i-1"
+        assert resource.to_dict()["ip"] == "1.1.1.1"
+        assert pickle.loads(pickle.dumps(resource)) == resource
+        assert _resource() != _resource(raw_data={"other": 1})
+        assert "raw_data" not in repr(resource)
@@ -441,6 +441,15 @@ def check_all_rules(account: Optional[str] = None) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"检查所有告警规则失败: {str(e)}")
 
 
+@router.get("/engine/stats")
+def get_alert_engine_stats() -> Dict[str, Any]:
+    """告警引擎批量评估统计（最近一轮及最近若干轮的评估耗时）"""
+    return {
+        "success": True,
+        "data": _alert_engine.planner.latency_summary()
+    }
+
+
 @router.put("/{alert_id}/status")
 def update_alert_status(
     alert_id: str,
@@ -5,10 +5,17 @@
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Optional, Any
+from datetime import datetime
 import logging
 
 from web.backend.api_base import handle_api_error
+from cloudlens.core.config import ConfigManager
+from cloudlens.core.context import ContextManager
+from cloudlens.core.streaming_export import (
+    ExportJobManager, ExportSheet, FILE_EXTENSIONS, MEDIA_TYPES, content_disposition, iter_export
+)
 
 logger = logging.getLogger(__name__)
 
@@ -53,3 +60,91 @@ def get_billing_discounts(account: Optional[str] = None):
         "success": True,
         "data": []
     }
+
+
+# ==================== 账单明细导出 ====================
+
+# 导出表头（与 BillStorageManager.EXPORT_COLUMNS 一一对应）
+_BILL_EXPORT_HEADER = [
+    "账期", "账单日期", "产品名称", "产品代码", "计费方式",
+    "实例ID", "区域", "可用区", "计费项", "计价单位", "用量",
+    "官网价", "优惠金额", "应付金额", "实付金额", "币种",
+]
+
+
+def _resolve_bill_account(account: Optional[str]) -> tuple:
+    """解析账号，返回 (账号名, bill_items 中的账号ID)"""
+    cm = ConfigManager()
+    if not account:
+        account = ContextManager().get_last_account()
+    if not account:
+        accounts = cm.list_accounts()
+        if not accounts:
+            raise HTTPException(status_code=404, detail="No accounts configured")
+        account = accounts[0].name
+    account_config = cm.get_account(account)
+    if not account_config:
+        raise HTTPException(status_code=404, detail=f"Account '{account}' not found")
+    from cloudlens.core.cost_index import bill_account_id
+    return account, bill_account_id(account_config)
+
+
+def _bill_export_sheets(bill_account: str, billing_cycle: Optional[str], start_cycle: Optional[str], end_cycle: Optional[str]):
+    from cloudlens.core.bill_storage import BillStorageManager
+    rows = BillStorageManager().iter_bill_items(
+        bill_account, billing_cycle=billing_cycle, start_cycle=start_cycle, end_cycle=end_cycle
+    )
+    return [ExportSheet("账单明细", _BILL_EXPORT_HEADER, rows, widths={5: 30, 8: 30})]
+
+
+@router.get("/billing/export")
+def export_bill_items(
+    account: Optional[str] = None,
+    billing_cycle: Optional[str] = Query(None, description="账期 YYYY-MM"),
+    start_cycle: Optional[str] = Query(None, description="开始账期 YYYY-MM"),
+    end_cycle: Optional[str] = Query(None, description="结束账期 YYYY-MM"),
+    format: str = Query("csv", pattern="^(csv|excel|html)$"),
+):
+    """流式导出账单明细（按主键分页读取，边查边写）"""
+    try:
+        account_name, bill_account = _resolve_bill_account(account)
+        sheets = _bill_export_sheets(bill_account, billing_cycle, start_cycle, end_cycle)
+        filename = f"bills_{account_name}_{billing_cycle or datetime.now().strftime('%Y%m%d')}.{FILE_EXTENSIONS[format]}"
+        return StreamingResponse(
+            iter_export(format, f"{account_name} 账单明细", sheets),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": content_disposition(filename)}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise handle_api_error(e, "export_bill_items")
+
+
+@router.post("/billing/export/jobs")
+def create_bill_export_job(
+    account: Optional[str] = None,
+    billing_cycle: Optional[str] = Query(None, description="账期 YYYY-MM"),
+    start_cycle: Optional[str] = Query(None, description="开始账期 YYYY-MM"),
+    end_cycle: Optional[str] = Query(None, description="结束账期 YYYY-MM"),
+    format: str = Query("excel", pattern="^(csv|excel|html)$"),
+) -> Dict[str, Any]:
+    """提交后台账单导出任务（大账号使用），通过 /reports/exports/{job_id} 查询进度"""
+    try:
+        account_name, bill_account = _resolve_bill_account(account)
+        from cloudlens.core.bill_storage import BillStorageManager
+        total = BillStorageManager().count_bill_items(
+            bill_account, billing_cycle=billing_cycle, start_cycle=start_cycle, end_cycle=end_cycle
+        )
+        job_id = ExportJobManager().submit(
+            format,
+            f"{account_name} 账单明细",
+            lambda: _bill_export_sheets(bill_account, billing_cycle, start_cycle, end_cycle),
+            total_rows=total,
+            filename_prefix=f"bills_{account_name}",
+        )
+        return {"success": True, "data": {"job_id": job_id, "total_rows": total}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise handle_api_error(e, "create_bill_export_job")
@@ -375,7 +375,29 @@ def get_discount_insights(account: Optional[str] = None):
 
 
 @router.get("/discounts/export")
-def export_discounts(account: Optional[str] = None):
-    """导出折扣数据"""
-    return {"success": True, "message": "导出功能正在通过报告模块实现"}
+def export_discounts(
+    account: Optional[str] = None,
+    export_type: str = Query("all", pattern="^(all|products|regions|instances)$"),
+    format: str = Query("csv", pattern="^(csv|excel|html)$"),
+):
+    """导出折扣数据（CSV / Excel / HTML 流式下载）"""
+    from fastapi.responses import StreamingResponse
+    from cloudlens.core.discount_analyzer_advanced import AdvancedDiscountAnalyzer
+    from cloudlens.core.streaming_export import FILE_EXTENSIONS, MEDIA_TYPES, content_disposition, iter_export
+    try:
+        provider, account_name = _get_provider_for_account(account)
+        cm = ConfigManager()
+        account_config = cm.get_account(account_name)
+        account_id = _get_account_id(account_config, account_name)
+        
+        analyzer = AdvancedDiscountAnalyzer()
+        sheets = analyzer.export_sheets(account_id, export_type)
+        filename = f"discounts_{account_name}_{datetime.now().strftime('%Y%m%d')}.{FILE_EXTENSIONS[format]}"
+        return StreamingResponse(
+            iter_export(format, f"{account_name} 折扣分析", sheets),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": content_disposition(filename)}
+        )
+    except Exception as e:
+        raise handle_api_error(e, "export_discounts")
 
@@ -25,6 +25,7 @@ class BackupRequest(BaseModel):
     backup_name: Optional[str] = None
     include_database: bool = True
     include_files: bool = True
+    incremental: bool = False  # 增量模式：分块去重，只存储变化的数据
 
 
 class RestoreRequest(BaseModel):
@@ -53,7 +54,8 @@ def create_backup(
         backup_path = backup_manager.create_backup(
             backup_name=backup_req.backup_name,
             include_database=backup_req.include_database,
-            include_files=backup_req.include_files
+            include_files=backup_req.include_files,
+            incremental=backup_req.incremental
         )
         
         return {
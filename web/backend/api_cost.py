@@ -778,8 +778,9 @@ def get_budget(account: Optional[str] = None):
     total_monthly_budget = 0.0
     total_spent = 0.0
     
+    statuses = storage.calculate_budget_statuses(budgets, bill_storage)
     for b in budgets:
-        status = storage.calculate_budget_status(b, account_id, bill_storage)
+        status = statuses[b.id]
         results.append({
             "budget": b.to_dict(),
             "status": status.to_dict()
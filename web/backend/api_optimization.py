@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Dict, List, Optional, Any
 import logging
+import time
 from web.backend.api_base import handle_api_error
 from cloudlens.core.config import ConfigManager
 from cloudlens.core.cache import CacheManager
+from cloudlens.core.opportunity_store import OpportunityStore
+from cloudlens.core.optimization_engine import OptimizationEngine
 from web.backend.i18n import get_locale_from_request, get_translation, Locale
-from web.backend.api_resources import _get_cost_map, _estimate_monthly_cost_from_spec
+from web.backend.api_resources import _get_cost_map, _estimate_monthly_cost_from_spec, _resource_ids
 from web.backend.api_dashboards import _get_provider_for_account
 
 logger = logging.getLogger(__name__)
@@ -56,6 +59,9 @@ def _analyze_idle_with_metrics(instances, account_config) -> List[Dict]:
     
     if not running_instances:
         return []
+
+    # 成本表只取一次，各检查任务共享
+    cost_map = _get_cost_map("ecs", account_config, _resource_ids(running_instances))
         
     # 定义单个分析任务
     def check_instance_metrics(inst):
@@ -76,7 +82,7 @@ def _analyze_idle_with_metrics(instances, account_config) -> List[Dict]:
             
             # 闲置判定: Max CPU < 5% (可配置)
             if max_cpu < 5.0:
-                cost = _get_cost_map("ecs", account_config).get(inst_id)
+                cost = cost_map.get(inst_id)
                 if cost is None:
                     cost = _estimate_monthly_cost_from_spec(spec, "ecs")
                 
@@ -104,6 +110,65 @@ def _analyze_idle_with_metrics(instances, account_config) -> List[Dict]:
                 
     return idle_instances
 
+# 建议类型（即优化机会存储中的来源，与 OptimizationEngine.PUSHED_SOURCES 一致）及其优先级、操作
+# 仪表盘的节省潜力按同一组来源汇总
+SUGGESTION_TYPES = {
+    "idle_resources": ("high", "release_or_downgrade"),
+    "stopped_instances": ("medium", "release"),
+    "unbound_eips": ("high", "release"),
+}
+
+# 存储中的建议超过该时间后重新分析（与建议缓存一致）
+SUGGESTIONS_TTL_SECONDS = 86400
+
+
+def _suggestion_card(store: OpportunityStore, source: str, lang: Locale) -> Optional[Dict]:
+    """由存储中一个来源的滚动汇总和节省最多的资源生成建议卡片"""
+    summary = store.source_summary(source)
+    count = int(summary["count"])
+    if not count:
+        return None
+    priority, action = SUGGESTION_TYPES[source]
+    resources = [o["details"] for o in store.top(source=source, limit=10)]
+    if source == "idle_resources":
+        description = f"发现 {count} 个低负载实例 (CPU < 5%)"
+        recommendation = "建议释放或降配。实例过去7天CPU最高利用率低于5%。"
+    else:
+        key = "stopped_instances" if source == "stopped_instances" else "unbound_eips"
+        description = get_translation(f"optimization.{key}.description", lang, count=count)
+        recommendation = get_translation(f"optimization.{key}.recommendation", lang)
+    return {
+        "type": source,
+        "category": get_translation(f"optimization.{source}.category", lang),
+        "priority": priority,
+        "title": get_translation(f"optimization.{source}.title", lang),
+        "description": description,
+        "savings_potential": summary["savings"],
+        "resource_count": count,
+        "resources": resources,
+        "action": action,
+        "recommendation": recommendation,
+    }
+
+
+def _suggestions_from_store(store: OpportunityStore, lang: Locale) -> Dict:
+    """从优化机会存储读取建议（只读滚动汇总和每类前10个资源）"""
+    suggestions = [c for c in (_suggestion_card(store, s, lang) for s in SUGGESTION_TYPES) if c]
+    # 按优先级排序
+    suggestions.sort(key=lambda x: {"high": 0, "medium": 1, "low": 2}.get(x.get("priority", "low"), 2))
+    total_savings = store.roi(sources=SUGGESTION_TYPES)["monthly_savings"]
+    return {
+        "suggestions": suggestions,
+        "summary": {
+            "total_suggestions": len(suggestions),
+            "total_savings_potential": round(total_savings, 2),
+            "high_priority_count": sum(1 for s in suggestions if s.get("priority") == "high"),
+            "medium_priority_count": sum(1 for s in suggestions if s.get("priority") == "medium"),
+            "low_priority_count": sum(1 for s in suggestions if s.get("priority") == "low"),
+        }
+    }
+
+
 @router.get("/optimization/suggestions")
 def get_optimization_suggestions(
     account: Optional[str] = None, 
@@ -120,6 +185,19 @@ def get_optimization_suggestions(
         
         provider, account_name = _get_provider_for_account(account)
         
+        # 优先读取进程内的优化机会存储（滚动汇总，读取开销与资源数无关）
+        store = OpportunityStore.for_account(account_name)
+        if (
+            not force_refresh
+            and all(store.has_source(s) for s in SUGGESTION_TYPES)
+            and time.time() - store.updated_at < SUGGESTIONS_TTL_SECONDS
+        ):
+            return {
+                "success": True,
+                "data": _suggestions_from_store(store, lang),
+                "cached": True,
+            }
+        
         # 初始化缓存管理器，TTL设置为24小时（86400秒）
         cache_manager = CacheManager(ttl_seconds=86400)
         
@@ -136,11 +214,10 @@ def get_optimization_suggestions(
                 "cached": True,
             }
         
-        from cloudlens.core.security_compliance import SecurityComplianceAnalyzer
         cm = ConfigManager()
         account_config = cm.get_account(account_name)
-        
-        suggestions = []
+        # 按账单成本索引定价，账单入库后存储自动重新定价
+        engine = OptimizationEngine.for_account(account_config)
         
         # 0. 统一获取实例列表 (如果缓存中没有，则实时获取)
         instances = []
@@ -150,7 +227,7 @@ def get_optimization_suggestions(
         else:
              instances_obj = _fetch_all_instances(account_config)
              # Convert to dict for caching
-             instances = [inst.to_dict() if hasattr(inst, "to_dict") else inst for inst in instances_obj]
+             instances = [inst.to_dict(include_raw=False) if hasattr(inst, "to_dict") else inst for inst in instances_obj]
              if instances:
                  cm_hour = CacheManager(ttl_seconds=3600)
                  cm_hour.set(resource_type="ecs_instances", account_name=account_name, data=instances)
@@ -166,46 +243,10 @@ def get_optimization_suggestions(
             if idle_data:
                 cache_manager.set(resource_type="idle_result", account_name=account_name, data=idle_data)
             
-        if idle_data:
-            total_savings = sum(item.get("savings", 0) for item in idle_data)
-            suggestions.append({
-                "type": "idle_resources",
-                "category": get_translation("optimization.idle_resources.category", lang),
-                "priority": "high",
-                "title": get_translation("optimization.idle_resources.title", lang),
-                "description": f"发现 {len(idle_data)} 个低负载实例 (CPU < 5%)",
-                "savings_potential": round(total_savings, 2),
-                "resource_count": len(idle_data),
-                "resources": idle_data[:10],
-                "action": "release_or_downgrade",
-                "recommendation": "建议释放或降配。实例过去7天CPU最高利用率低于5%。",
-            })
+        engine.on_idle_analyzed(account_name, idle_data)
         
         # 2. 停止实例建议 (复用 instances 列表)
-        analyzer = SecurityComplianceAnalyzer()
-        stopped = analyzer.check_stopped_instances(instances or [])
-        if stopped:
-            stopped_savings = 0.0
-            if account_config:
-                cost_map = _get_cost_map("ecs", account_config)
-                for stop_item in stopped:
-                    instance_id = stop_item.get("id")
-                    if instance_id:
-                        cost = cost_map.get(instance_id) or 300
-                        stopped_savings += cost * 0.7
-            
-            suggestions.append({
-                "type": "stopped_instances",
-                "category": get_translation("optimization.stopped_instances.category", lang),
-                "priority": "medium",
-                "title": get_translation("optimization.stopped_instances.title", lang),
-                "description": get_translation("optimization.stopped_instances.description", lang, count=len(stopped)),
-                "savings_potential": round(stopped_savings, 2),
-                "resource_count": len(stopped),
-                "resources": stopped[:10],
-                "action": "release",
-                "recommendation": get_translation("optimization.stopped_instances.recommendation", lang),
-            })
+        engine.on_inventory_refreshed(account_name, "ecs", instances or [])
         
         # 3. 未绑定EIP建议
         try:
@@ -239,40 +280,11 @@ def get_optimization_suggestions(
                     cm_hour.set(resource_type="eip_list", account_name=account_name, data=eips_dict)
                     eips = eips_dict
             
-            if eips:
-                eip_info = analyzer.analyze_eip_usage(eips)
-                unbound_eips = eip_info.get("unbound_eips", [])
-                if unbound_eips:
-                    suggestions.append({
-                        "type": "unbound_eips",
-                        "category": get_translation("optimization.unbound_eips.category", lang),
-                        "priority": "high",
-                        "title": get_translation("optimization.unbound_eips.title", lang),
-                        "description": get_translation("optimization.unbound_eips.description", lang, count=len(unbound_eips)),
-                        "savings_potential": len(unbound_eips) * 20,
-                        "resource_count": len(unbound_eips),
-                        "resources": unbound_eips[:10],
-                        "action": "release",
-                        "recommendation": get_translation("optimization.unbound_eips.recommendation", lang),
-                    })
+            engine.update_resources(account_name, "unbound_eips", eips or [], complete=True)
         except Exception as e:
             logger.warning(f"EIP分析失败: {e}")
         
-        # 按优先级排序
-        suggestions.sort(key=lambda x: {"high": 0, "medium": 1, "low": 2}.get(x.get("priority", "low"), 2))
-        
-        total_savings = sum(s.get("savings_potential", 0) for s in suggestions)
-        
-        result = {
-            "suggestions": suggestions,
-            "summary": {
-                "total_suggestions": len(suggestions),
-                "total_savings_potential": round(total_savings, 2),
-                "high_priority_count": sum(1 for s in suggestions if s.get("priority") == "high"),
-                "medium_priority_count": sum(1 for s in suggestions if s.get("priority") == "medium"),
-                "low_priority_count": sum(1 for s in suggestions if s.get("priority") == "low"),
-            }
-        }
+        result = _suggestions_from_store(store, lang)
         
         cache_manager.set(resource_type="optimization_suggestions", account_name=account_name, data=result)
         
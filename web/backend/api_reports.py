@@ -5,10 +5,14 @@
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
 from typing import Dict, List, Optional, Any
 import logging
+import os
 
 from web.backend.api_base import handle_api_error, ReportGenerateRequest
+from cloudlens.core.progress_manager import ProgressManager
+from cloudlens.core.streaming_export import ExportJobManager
 
 logger = logging.getLogger(__name__)
 
@@ -34,3 +38,28 @@ def generate_report(report_request: ReportGenerateRequest):
         "report_id": "new_report_id",
         "message": "报告生成中"
     }
+
+
+# ==================== 后台导出任务 ====================
+
+@router.get("/reports/exports/{job_id}")
+def get_export_job(job_id: str) -> Dict[str, Any]:
+    """查询后台导出任务进度"""
+    progress = ProgressManager().get_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"导出任务 {job_id} 不存在")
+    data = dict(progress)
+    if data.get("status") == "completed":
+        data["download_url"] = f"/api/reports/exports/{job_id}/download"
+    return {"success": True, "data": data}
+
+
+@router.get("/reports/exports/{job_id}/download")
+def download_export_job(job_id: str):
+    """下载已完成的导出文件"""
+    path = ExportJobManager().get_file(job_id)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"导出文件 {job_id} 不存在或未完成")
+    # 文件名去掉任务ID前缀
+    filename = os.path.basename(path)[len(job_id) + 1:]
+    return FileResponse(path, filename=filename)
@@ -5,7 +5,7 @@
 """
 
 from fastapi import APIRouter, HTTPException, Query
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any
 from datetime import datetime
 import logging
 import concurrent.futures
@@ -14,12 +14,27 @@ from web.backend.api_base import handle_api_error
 from cloudlens.core.config import ConfigManager, CloudAccount
 from cloudlens.core.context import ContextManager
 from cloudlens.core.cache import CacheManager
+from cloudlens.core.cost_index import RESOURCE_ID_PREFIXES, RESOURCE_PRODUCT_CODES, resource_cost_map
+from cloudlens.core.optimization_engine import OptimizationEngine
+from cloudlens.core.virtual_tags import VirtualTagStorage
 from cloudlens.models.resource import UnifiedResource, ResourceType, ResourceStatus
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
+# 清单刷新钩子（标签匹配、优化机会）的后台线程：单线程，按刷新顺序依次应用
+_inventory_hooks = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventory-hooks")
+
+def _on_inventory_refreshed(account_config: CloudAccount, account_name: str, resource_type: str, resources: List[Dict]) -> None:
+    """全区域清单刷新后：重算虚拟标签匹配，更新由清单得出的优化机会（停止实例等）"""
+    try:
+        VirtualTagStorage.shared().on_inventory_refreshed(account_name, resource_type, resources)
+        if resource_type in OptimizationEngine.INVENTORY_SOURCES:
+            OptimizationEngine.for_account(account_config).on_inventory_refreshed(account_name, resource_type, resources)
+    except Exception as e:
+        logger.warning(f"清单刷新钩子执行失败 ({account_name}/{resource_type}): {e}")
+
 def _get_provider_for_account(account: Optional[str] = None):
     """Helper to get provider instance"""
     cm = ConfigManager()
@@ -89,22 +104,10 @@ def _get_cost_map_from_billing(resource_type: str, account_config: CloudAccount,
     if billing_cycle is None:
         billing_cycle = _get_billing_cycle_default()
 
-    product_code_map = {
-        "ecs": "ecs", "rds": "rds", "redis": "kvstore", "slb": "slb",
-        "eip": "eip", "nat": "nat_gw", "nat_gw": "nat_gw",
-        "yundisk": "yundisk", "disk": "yundisk", "snapshot": "snapshot",
-        "oss": "oss", "nas": "nas",
-    }
-    product_code = product_code_map.get(resource_type)
+    product_code = RESOURCE_PRODUCT_CODES.get(resource_type)
     if not product_code:
         return {}
-
-    expected_prefix_map = {
-        "ecs": "i-", "rds": "rm-", "redis": "r-", "slb": "lb-",
-        "eip": "eip-", "nat": "ngw-", "nat_gw": "ngw-",
-        "yundisk": "d-", "disk": "d-", "snapshot": "s-",
-    }
-    expected_prefix = expected_prefix_map.get(resource_type)
+    expected_prefix = RESOURCE_ID_PREFIXES.get(resource_type)
 
     cache_manager = CacheManager(ttl_seconds=86400)
     cache_key = f"billing_cost_map_{resource_type}_{billing_cycle}"
@@ -132,8 +135,28 @@ def _get_cost_map_from_billing(resource_type: str, account_config: CloudAccount,
     except:
         return {}
 
-def _get_cost_map(resource_type: str, account_config: CloudAccount) -> Dict[str, float]:
-    cost_map = {}
+def _resource_ids(resources: Iterable[Any]) -> List[str]:
+    """资源列表中的实例ID（对象或字典）"""
+    ids = []
+    for r in resources:
+        rid = (r.get("id") or r.get("ResourceId") or r.get("name")) if isinstance(r, dict) else getattr(r, "id", None)
+        if rid:
+            ids.append(rid)
+    return ids
+
+def _get_cost_map(
+    resource_type: str, account_config: CloudAccount, instance_ids: Optional[Iterable[str]] = None
+) -> Dict[str, float]:
+    """
+    instance_id -> 月成本：本地账单成本索引优先，索引中没有的实例由 BSS / 折扣 / 本地库补齐
+
+    Args:
+        instance_ids: 需要成本的实例；全部命中成本索引时不再调用 BSS / 折扣接口
+    """
+    indexed = resource_cost_map(resource_type, account_config)
+    if indexed and instance_ids is not None and all(rid in indexed for rid in instance_ids):
+        return indexed
+    cost_map: Dict[str, float] = {}
     try:
         from cloudlens.resource_modules.cost_analyzer import CostAnalyzer
         cost_analyzer = CostAnalyzer(account_config.name, account_config.access_key_id, account_config.access_key_secret)
@@ -151,6 +174,8 @@ def _get_cost_map(resource_type: str, account_config: CloudAccount) -> Dict[str,
             rid, mc = c.get("instance_id"), c.get("monthly_cost", 0)
             if rid and mc > 0 and rid not in cost_map: cost_map[rid] = float(mc)
     except: pass
+    # 成本索引命中的实例以账单为准
+    cost_map.update(indexed)
     return cost_map
 
 def _estimate_monthly_cost_from_spec(spec: str, resource_type: str = "ecs") -> float:
@@ -381,7 +406,7 @@ def list_resources(
     
     logger.info(f"总共获取到 {len(all_resources)} 个 {type} 资源")
 
-    cost_map = _get_cost_map(type, account_config) if type != "vpc" else {}
+    cost_map = _get_cost_map(type, account_config, _resource_ids(all_resources)) if type != "vpc" else {}
     result = []
     
     for r in all_resources:
@@ -426,6 +451,8 @@ def list_resources(
         result.sort(key=lambda x: x.get(sortBy, ""), reverse=reverse)
     
     cache_manager.set(resource_type=type, account_name=account_name, data=result)
+    # 清单刷新钩子在后台执行，不阻塞本次请求
+    _inventory_hooks.submit(_on_inventory_refreshed, account_config, account_name, type, result)
     
     start = (page - 1) * pageSize
     end = start + pageSize
@@ -709,7 +736,7 @@ def get_resource_metrics(
 @router.get("/resources/export")
 def export_resources(
     type: str = Query("ecs"),
-    format: str = Query("csv", pattern="^(csv|excel)$"),
+    format: str = Query("csv", pattern="^(csv|excel|html)$"),
     account: Optional[str] = None,
     filter: Optional[str] = None,
 ):
@@ -742,77 +769,65 @@ def export_resources(
                         filtered.append(r)
             all_resources = filtered
         
-        # 转换为导出格式
-        cost_map = _get_cost_map(type, account_config) if type != "vpc" else {}
-        export_data = []
+        # 转换为导出格式（逐行生成，交给流式写出）
+        cost_map = _get_cost_map(type, account_config, _resource_ids(all_resources)) if type != "vpc" else {}
         
-        for r in all_resources:
-            if isinstance(r, dict):
-                rid = r.get("id") or r.get("ResourceId") or r.get("name")
-                if not rid:
-                    continue
-                cost = cost_map.get(rid, 0.0)
-                export_data.append({
-                    "ID": rid,
-                    "名称": r.get("name") or rid,
-                    "类型": type.upper(),
-                    "状态": str(r.get("status") or "Running"),
-                    "区域": str(r.get("region") or r.get("RegionId") or ""),
-                    "规格": str(r.get("spec") or "-"),
-                    "月成本(¥)": float(cost),
-                    "创建时间": r.get("created_time") or "-",
-                })
-            else:
-                cost = cost_map.get(r.id) or _estimate_monthly_cost(r)
-                export_data.append({
-                    "ID": r.id,
-                    "名称": r.name or r.id,
-                    "类型": type.upper(),
-                    "状态": r.status.value if hasattr(r.status, "value") else str(r.status),
-                    "区域": r.region,
-                    "规格": r.spec or "-",
-                    "月成本(¥)": float(cost),
-                    "创建时间": r.created_time.isoformat() if hasattr(r, "created_time") and r.created_time else "-",
-                })
+        def export_rows():
+            for r in all_resources:
+                if isinstance(r, dict):
+                    rid = r.get("id") or r.get("ResourceId") or r.get("name")
+                    if not rid:
+                        continue
+                    yield [
+                        rid,
+                        r.get("name") or rid,
+                        type.upper(),
+                        str(r.get("status") or "Running"),
+                        str(r.get("region") or r.get("RegionId") or ""),
+                        str(r.get("spec") or "-"),
+                        float(cost_map.get(rid, 0.0)),
+                        r.get("created_time") or "-",
+                    ]
+                else:
+                    yield [
+                        r.id,
+                        r.name or r.id,
+                        type.upper(),
+                        r.status.value if hasattr(r.status, "value") else str(r.status),
+                        r.region,
+                        r.spec or "-",
+                        float(cost_map.get(r.id) or _estimate_monthly_cost(r)),
+                        r.created_time.isoformat() if hasattr(r, "created_time") and r.created_time else "-",
+                    ]
         
-        # 生成导出文件
-        if format == "csv":
-            import csv
-            import io
-            from fastapi.responses import StreamingResponse
-            
-            output = io.StringIO()
-            if export_data:
-                writer = csv.DictWriter(output, fieldnames=export_data[0].keys())
-                writer.writeheader()
-                writer.writerows(export_data)
-            
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=resources_{type}_{datetime.now().strftime('%Y%m%d')}.csv"}
-            )
-        elif format == "excel":
+        # 生成导出文件（CSV/HTML 边生成边下载，Excel 使用只写模式）
+        if format == "excel":
             try:
-                import pandas as pd
-                import io
-                from fastapi.responses import StreamingResponse
-                
-                df = pd.DataFrame(export_data)
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='资源列表')
-                
-                output.seek(0)
-                return StreamingResponse(
-                    iter([output.read()]),
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": f"attachment; filename=resources_{type}_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-                )
+                import openpyxl  # noqa: F401
             except ImportError:
-                logger.error("pandas 或 openpyxl 未安装，无法导出 Excel")
-                raise HTTPException(status_code=500, detail="Excel 导出功能需要安装 pandas 和 openpyxl")
+                logger.error("openpyxl 未安装，无法导出 Excel")
+                raise HTTPException(status_code=500, detail="Excel 导出功能需要安装 openpyxl")
+        
+        from fastapi.responses import StreamingResponse
+        from cloudlens.core.streaming_export import (
+            ExportSheet, FILE_EXTENSIONS, MEDIA_TYPES, content_disposition, iter_export
+        )
+        
+        sheet = ExportSheet(
+            "资源列表",
+            ["ID", "名称", "类型", "状态", "区域", "规格", "月成本(¥)", "创建时间"],
+            export_rows(),
+            widths={0: 28, 1: 30},
+        )
+        filename = f"resources_{type}_{datetime.now().strftime('%Y%m%d')}.{FILE_EXTENSIONS[format]}"
+        return StreamingResponse(
+            iter_export(format, f"{account_name} {type.upper()} 资源列表", [sheet]),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": content_disposition(filename)}
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"导出资源列表失败: {e}")
         raise HTTPException(status_code=500, detail=f"导出失败: {str(e)}")
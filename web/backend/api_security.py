@@ -298,6 +298,7 @@ def get_security_checks(
                 "cached": True,
             }
         
+        from cloudlens.core.actiontrail_helper import ActionTrailHelper
         from cloudlens.core.security_compliance import SecurityComplianceAnalyzer
         from cloudlens.core.services.analysis_service import AnalysisService
         from cloudlens.providers.aliyun.provider import AliyunProvider
@@ -344,6 +345,16 @@ def get_security_checks(
         
         exposed = analyzer.detect_public_exposure(all_resources)
         stopped = analyzer.check_stopped_instances(all_instances)
+        # 停机时间只读 ActionTrail 本地事件索引，索引同步在后台进行
+        ActionTrailHelper.add_stop_times(
+            stopped,
+            lambda region: AliyunProvider(
+                account_name=account_name,
+                access_key=account_config.access_key_id,
+                secret_key=account_config.access_key_secret,
+                region=region,
+            ),
+        )
         tag_coverage, no_tags = analyzer.check_missing_tags(all_resources)
         encryption_info = analyzer.check_disk_encryption(all_instances)
         preemptible = analyzer.check_preemptible_instances(all_instances)
@@ -479,85 +490,94 @@ def get_cis_benchmarks(account: Optional[str] = None):
 
 @router.post("/security/deep-scan")
 def trigger_deep_scan(account: Optional[str] = None):
-    """手动触发公网安全扫描"""
+    """手动触发公网安全扫描（后台执行，通过 /security/deep-scan/{job_id} 查询进度和结果）"""
     try:
         provider, account_name = _get_provider_for_account(account)
         cm = ConfigManager()
         account_config = cm.get_account(account_name)
-        from cloudlens.core.security_compliance import SecurityComplianceAnalyzer
-        from cloudlens.core.security_scanner import PublicIPScanner
-        from cloudlens.core.services.analysis_service import AnalysisService
-        from cloudlens.providers.aliyun.provider import AliyunProvider
-        
-        # 获取所有区域
-        all_regions = AnalysisService._get_all_regions(
-            account_config.access_key_id,
-            account_config.access_key_secret
-        )
-        
-        all_exposed = []
-        
-        for region in all_regions:
-            try:
-                region_provider = AliyunProvider(
-                    account_name=account_name,
-                    access_key=account_config.access_key_id,
-                    secret_key=account_config.access_key_secret,
-                    region=region,
-                )
-                
-                # 获取该区域的所有资源
-                instances = region_provider.list_instances()
-                rds_list = region_provider.list_rds()
-                redis_list = region_provider.list_redis()
-                slb_list = region_provider.list_slb() if hasattr(region_provider, 'list_slb') else []
-                nat_list = region_provider.list_nat_gateways() if hasattr(region_provider, 'list_nat_gateways') else []
-                
-                regional_resources = instances + rds_list + redis_list + slb_list + nat_list
-                
-                analyzer = SecurityComplianceAnalyzer()
-                exposed = analyzer.detect_public_exposure(regional_resources)
-                all_exposed.extend(exposed)
-            except Exception as e:
-                logger.warning(f"Error scanning region {region} in deep scan: {e}")
-                continue
-        
-        public_ips = []
-        for res in all_exposed:
-            ips = res.get("public_ips")
-            if ips:
-                if isinstance(ips, list):
-                    public_ips.extend(ips)
-                else:
-                    public_ips.append(ips)
-        
-        if not public_ips:
-            return {
-                "success": True,
-                "message": "没有发现具有公网IP的资源，无需扫描",
-                "count": 0
-            }
-            
-        # 并发扫描 IP
-        results = []
-        for ip in public_ips:
-            scan_res = PublicIPScanner.scan_ip(ip)
-            results.append(scan_res)
-            
-        PublicIPScanner.save_results(results)
-        
-        # 清除缓存强制下次计算概览时包含新结果
-        cache_manager = CacheManager(ttl_seconds=86400)
-        cache_manager.delete(resource_type="security_overview", account_name=account_name)
-        
+        from cloudlens.core.async_port_scanner import DeepScanJobManager
+
+        def collect_public_ips() -> List[str]:
+            from cloudlens.core.security_compliance import SecurityComplianceAnalyzer
+            from cloudlens.core.services.analysis_service import AnalysisService
+            from cloudlens.providers.aliyun.provider import AliyunProvider
+
+            # 获取所有区域
+            all_regions = AnalysisService._get_all_regions(
+                account_config.access_key_id,
+                account_config.access_key_secret
+            )
+
+            all_exposed = []
+            for region in all_regions:
+                try:
+                    region_provider = AliyunProvider(
+                        account_name=account_name,
+                        access_key=account_config.access_key_id,
+                        secret_key=account_config.access_key_secret,
+                        region=region,
+                    )
+
+                    # 获取该区域的所有资源
+                    instances = region_provider.list_instances()
+                    rds_list = region_provider.list_rds()
+                    redis_list = region_provider.list_redis()
+                    slb_list = region_provider.list_slb() if hasattr(region_provider, 'list_slb') else []
+                    nat_list = region_provider.list_nat_gateways() if hasattr(region_provider, 'list_nat_gateways') else []
+
+                    regional_resources = instances + rds_list + redis_list + slb_list + nat_list
+
+                    analyzer = SecurityComplianceAnalyzer()
+                    exposed = analyzer.detect_public_exposure(regional_resources)
+                    all_exposed.extend(exposed)
+                except Exception as e:
+                    logger.warning(f"Error scanning region {region} in deep scan: {e}")
+                    continue
+
+            public_ips = []
+            for res in all_exposed:
+                ips = res.get("public_ips")
+                if ips:
+                    if isinstance(ips, list):
+                        public_ips.extend(ips)
+                    else:
+                        public_ips.append(ips)
+            return public_ips
+
+        def on_complete(results: List[Dict]):
+            from cloudlens.core.security_scanner import PublicIPScanner
+
+            if not results:
+                return
+            PublicIPScanner.save_results(results)
+            # 清除缓存强制下次计算概览时包含新结果
+            cache_manager = CacheManager(ttl_seconds=86400)
+            cache_manager.delete(resource_type="security_overview", account_name=account_name)
+
+        job_id = DeepScanJobManager().submit(collect_public_ips, on_complete=on_complete)
         return {
             "success": True,
-            "message": f"成功完成 {len(public_ips)} 个公网IP的扫描",
-            "results": results,
-            "summary": {
-                "total": len(public_ips),
-                "high_risk": sum(1 for r in results if r["risk_level"] in ["HIGH", "CRITICAL"])
-            }
+            "status": "processing",
+            "message": f"扫描任务已启动，请通过 /api/security/deep-scan/{job_id} 查询进度",
+            "job_id": job_id,
         }
     except Exception as e:
         raise handle_api_error(e, "trigger_deep_scan")
+
+
+@router.get("/security/deep-scan/{job_id}")
+def get_deep_scan_job(job_id: str, offset: int = Query(0, ge=0, description="已获取的结果条数")):
+    """查询深度扫描进度，并增量返回已完成主机的扫描结果"""
+    from cloudlens.core.async_port_scanner import DeepScanJobManager
+    from cloudlens.core.progress_manager import ProgressManager
+
+    progress = ProgressManager().get_progress(job_id)
+    results = DeepScanJobManager().get_results(job_id, offset)
+    if progress is None or results is None:
+        raise HTTPException(status_code=404, detail=f"扫描任务 {job_id} 不存在")
+    return {
+        "success": True,
+        "data": dict(progress),
+        "results": results,
+        "next_offset": offset + len(results),
+    }
@@ -17,6 +17,8 @@ from web.backend.i18n import get_translation, get_locale_from_request, Locale
 from cloudlens.core.context import ContextManager
 from cloudlens.core.cost_trend_analyzer import CostTrendAnalyzer
 from cloudlens.core.cache import CacheManager  # MySQL缓存管理器（统一使用）
+from cloudlens.core.opportunity_store import OpportunityStore
+from cloudlens.core.optimization_engine import OptimizationEngine
 from cloudlens.core.rules_manager import RulesManager
 from cloudlens.core.services.analysis_service import AnalysisService
 from cloudlens.core.virtual_tags import VirtualTagStorage, VirtualTag, TagRule, TagEngine
@@ -583,8 +585,13 @@ def _update_dashboard_summary_cache(account: str, account_config, force_refresh:
         # Savings Potential: 优先使用 optimization_suggestions 缓存的数据，保证与前端显示一致
         savings_potential = 0.0
         
-        # 先尝试从 optimization_suggestions 缓存获取（与 /api/optimization/suggestions 保持一致）
-        opt_cache = cache_manager.get(resource_type="optimization_suggestions", account_name=account)
+        # 先读取优化机会存储的滚动汇总，再尝试 optimization_suggestions 缓存（与 /api/optimization/suggestions 保持一致）
+        opportunity_store = OpportunityStore.peek(account)
+        if opportunity_store is not None and len(opportunity_store):
+            # 只汇总优化建议的来源，与 /api/optimization/suggestions 的总节省一致
+            savings_potential = float(opportunity_store.roi(sources=OptimizationEngine.PUSHED_SOURCES)["monthly_savings"])
+            logger.info(f"优化潜力: 使用优化机会存储汇总 = {savings_potential:.2f}")
+        opt_cache = cache_manager.get(resource_type="optimization_suggestions", account_name=account) if savings_potential == 0.0 else None
         if opt_cache and isinstance(opt_cache, dict):
             cached_savings = opt_cache.get("summary", {}).get("total_savings_potential", 0)
             if cached_savings and cached_savings > 0:
@@ -876,11 +883,11 @@ def _get_global_resources_consistent(account_name: str, account_config, force_re
 
     logger.info(f"✅ 全球扫描完成: ECS={len(instances)}, RDS={len(rds_list)}, Redis={len(redis_list)}")
 
-    # 序列化为 dict 以便缓存（使用增强后的 to_dict）
+    # 序列化为 dict 以便缓存（不带 raw_data，避免逐个解码并写入缓存）
     data_to_cache = {
-        "instances": [i.to_dict() if hasattr(i, 'to_dict') else i for i in instances],
-        "rds": [i.to_dict() if hasattr(i, 'to_dict') else i for i in rds_list],
-        "redis": [i.to_dict() if hasattr(i, 'to_dict') else i for i in redis_list]
+        "instances": [i.to_dict(include_raw=False) if hasattr(i, 'to_dict') else i for i in instances],
+        "rds": [i.to_dict(include_raw=False) if hasattr(i, 'to_dict') else i for i in rds_list],
+        "redis": [i.to_dict(include_raw=False) if hasattr(i, 'to_dict') else i for i in redis_list]
     }
     cache_manager.set(resource_type=cache_key, account_name=account_name, data=data_to_cache)
     
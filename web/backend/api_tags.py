@@ -10,7 +10,10 @@ import logging
 from pydantic import BaseModel
 
 from web.backend.api_base import handle_api_error
-from cloudlens.core.virtual_tags import VirtualTagStorage, VirtualTag, TagRule, TagEngine
+from cloudlens.core.virtual_tags import (
+    SYNC_RESOURCE_TYPES, VirtualTagStorage, VirtualTag, TagRule, TagEngine, list_resource_dicts,
+)
+from cloudlens.core.tag_cost import TagCostAttributor, recent_billing_cycles
 from cloudlens.core.config import ConfigManager
 from cloudlens.core.context import ContextManager
 
@@ -45,15 +48,9 @@ class TagPreviewRequest(BaseModel):
     resource_type: Optional[str] = None
 
 
-# 初始化存储管理器（延迟初始化，避免导入时连接MySQL）
-_tag_storage = None
-
 def _get_tag_storage():
-    """获取虚拟标签存储管理器（懒加载）"""
-    global _tag_storage
-    if _tag_storage is None:
-        _tag_storage = VirtualTagStorage()
-    return _tag_storage
+    """获取虚拟标签存储管理器（进程内共享，延迟初始化，避免导入时连接MySQL）"""
+    return VirtualTagStorage.shared()
 
 
 # ==================== 辅助函数 ====================
@@ -79,6 +76,25 @@ def _get_provider_for_account(account: Optional[str] = None):
     return get_provider(account_config), account
 
 
+def _list_resource_dicts(provider, resource_type: str) -> List[Dict[str, Any]]:
+    """列出资源并转换为标签规则可匹配的字典，不支持的类型返回400"""
+    try:
+        return list_resource_dicts(provider, resource_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _tag_cost_scope(account: Optional[str]):
+    """成本统计范围：(账号名, bill_items 中的账号ID)，未指定账号时统计全部"""
+    if not account:
+        return None, None
+    account_config = ConfigManager().get_account(account)
+    if not account_config:
+        raise HTTPException(status_code=404, detail=f"Account '{account}' not found")
+    from cloudlens.core.cost_index import bill_account_id
+    return account, bill_account_id(account_config)
+
+
 # ==================== 虚拟标签端点 ====================
 
 @router.get("/virtual-tags")
@@ -95,6 +111,46 @@ def list_virtual_tags() -> Dict[str, Any]:
         raise handle_api_error(e, "list_virtual_tags")
 
 
+# 固定路径需在 /virtual-tags/{tag_id} 之前注册，否则会被当作 tag_id 匹配
+@router.get("/virtual-tags/costs")
+def get_tags_cost(
+    account: Optional[str] = None,
+    months: int = Query(12, ge=1, le=36)
+) -> Dict[str, Any]:
+    """获取所有标签按账期的成本"""
+    try:
+        account_name, bill_account = _tag_cost_scope(account)
+        storage = _get_tag_storage()
+        tags = storage.list_tags()
+        periods = recent_billing_cycles(months)
+        attributor = TagCostAttributor.for_storage(storage)
+        costs = attributor.costs_by_tag([t.id for t in tags], periods, account_name, bill_account)
+        counts = attributor.resource_counts([t.id for t in tags], account_name)
+        
+        return {
+            "success": True,
+            "data": {
+                "periods": periods,
+                "tags": [
+                    {
+                        "tag_id": tag.id,
+                        "tag_name": tag.name,
+                        "tag_key": tag.tag_key,
+                        "tag_value": tag.tag_value,
+                        "total_cost": round(sum(costs[tag.id].values()), 2),
+                        "resource_count": counts.get(tag.id, 0),
+                        "by_period": {p: round(c, 2) for p, c in costs[tag.id].items()},
+                    }
+                    for tag in tags
+                ]
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise handle_api_error(e, "get_tags_cost")
+
+
 @router.get("/virtual-tags/{tag_id}")
 def get_virtual_tag(tag_id: str) -> Dict[str, Any]:
     """获取虚拟标签详情"""
@@ -272,39 +328,11 @@ def preview_tag_matches(req: TagPreviewRequest) -> Dict[str, Any]:
         
         # 获取资源列表
         resource_type = req.resource_type or "ecs"
-        if resource_type == "ecs":
-            resources = provider.list_instances()
-        elif resource_type == "rds":
-            resources = provider.list_rds()
-        elif resource_type == "redis":
-            resources = provider.list_redis()
-        else:
-            resources = provider.list_instances()  # 默认ECS
-        
-        # 转换为字典格式
-        resource_dicts = []
-        for resource in resources:
-            resource_dict = {
-                "id": getattr(resource, "id", ""),
-                "name": getattr(resource, "name", ""),
-                "type": resource_type,
-                "region": getattr(resource, "region", ""),
-                "status": str(getattr(resource, "status", "")),
-                "spec": getattr(resource, "spec", ""),
-            }
-            resource_dicts.append(resource_dict)
+        resource_dicts = _list_resource_dicts(provider, resource_type)
         
-        # 匹配资源
-        matched_resources = []
-        for resource_dict in resource_dicts:
-            # 检查是否匹配所有规则
-            match = True
-            for rule in rules:
-                if not TagEngine.match_rule(resource_dict, rule):
-                    match = False
-                    break
-            if match:
-                matched_resources.append(resource_dict)
+        # 匹配资源（规则只编译一次）
+        engine = TagEngine.compile([VirtualTag(id="preview", name="", tag_key="", tag_value="", rules=rules)])
+        matched_resources = [r for r in resource_dicts if engine.match(r)]
         
         return {
             "success": True,
@@ -327,28 +355,29 @@ def get_tag_cost(
     account: Optional[str] = None,
     days: int = Query(30, ge=1, le=365)
 ) -> Dict[str, Any]:
-    """获取标签的成本统计"""
+    """获取标签的成本统计（按账期归集，覆盖最近 days 天所在的账期）"""
     try:
         # 获取标签
-        tag = _get_tag_storage().get_tag(tag_id)
+        storage = _get_tag_storage()
+        tag = storage.get_tag(tag_id)
         if not tag:
             raise HTTPException(status_code=404, detail=f"标签 {tag_id} 不存在")
         
-        # TODO: 实现成本计算
-        # 需要：
-        # 1. 获取匹配的资源
-        # 2. 从账单数据中计算这些资源的成本
-        # 3. 返回成本统计
+        account_name, bill_account = _tag_cost_scope(account)
+        periods = recent_billing_cycles((days + 29) // 30)
+        attributor = TagCostAttributor.for_storage(storage)
+        by_period = attributor.costs_by_tag([tag_id], periods, account_name, bill_account)[tag_id]
+        resource_count = attributor.resource_counts([tag_id], account_name).get(tag_id, 0)
         
-        # 临时返回示例数据
         return {
             "success": True,
             "data": {
                 "tag_id": tag_id,
                 "tag_name": tag.name,
-                "total_cost": 0.0,
-                "resource_count": 0,
-                "message": "成本计算功能开发中"
+                "total_cost": round(sum(by_period.values()), 2),
+                "resource_count": resource_count,
+                "periods": periods,
+                "by_period": {p: round(c, 2) for p, c in by_period.items()},
             }
         }
     except HTTPException:
@@ -357,6 +386,33 @@ def get_tag_cost(
         raise handle_api_error(e, "get_tag_cost")
 
 
+@router.post("/virtual-tags/sync")
+def sync_tag_matches(
+    account: str,
+    resource_types: List[str] = Query(["ecs", "rds", "redis"])
+) -> Dict[str, Any]:
+    """按账号当前资源清单增量刷新标签匹配（tag_matches）"""
+    try:
+        unknown = [t for t in resource_types if t not in SYNC_RESOURCE_TYPES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的资源类型: {', '.join(unknown)}")
+        provider, account_name = _get_provider_for_account(account)
+        stats = {}
+        for resource_type in resource_types:
+            resources = _list_resource_dicts(provider, resource_type)
+            stats[resource_type] = _get_tag_storage().sync_matches(
+                account_name, resources, resource_types=[resource_type]
+            )
+        return {
+            "success": True,
+            "data": stats
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise handle_api_error(e, "sync_tag_matches")
+
+
 @router.post("/virtual-tags/clear-cache")
 def clear_tag_cache(tag_id: Optional[str] = None) -> Dict[str, Any]:
     """清除标签匹配缓存"""